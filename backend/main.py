@@ -3,6 +3,7 @@ Universal Multi-API Backend v2.3.0
 Production-Ready FastAPI Backend with 40+ API integrations
 """
 import os
+import asyncio
 import logging
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, HTTPException
@@ -23,31 +24,82 @@ from services.startup_validator import validate_startup
 startup_results = validate_startup(fail_on_error=False)
 
 
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Application lifespan - startup and shutdown events"""
-    # Startup
-    logger.info("🚀 Starting Universal Multi-API Backend v2.3.0...")
-    
-    # Log enabled features
+async def warm_up_providers():
+    """Créer les singletons et sonder les services réseau en parallèle"""
+    from services.provider_registry import provider_registry
     from services.ai_router import ai_router
     from services.cache import cache_service
     
+    timeout = float(os.getenv("WARMUP_TIMEOUT", "10"))
+    report = await provider_registry.warm_up(timeout=timeout)
+    
     ai_status = ai_router.get_status()
     available_ai = [name for name, info in ai_status.items() if info.get("available")]
     logger.info(f"🤖 AI Providers: {', '.join(available_ai) or 'None'}")
     logger.info(f"💾 Cache: {'Redis' if cache_service.available else 'Memory (degraded)'}")
+    logger.info(f"🔥 Providers warmed up in {report['total_ms']}ms")
+    return report
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application lifespan - startup and shutdown events"""
+    # Startup
+    logger.info("🚀 Starting Universal Multi-API Backend v2.3.0...")
     logger.info(f"✅ Startup validation: {'Passed' if startup_results.get('overall_valid') else 'Warnings'}")
     
+    # Moniteur de lag de la boucle (optionnel)
+    from services.loop_monitor import loop_monitor, is_enabled as loop_monitor_enabled
+    if loop_monitor_enabled():
+        loop_monitor.start()
+    
+    # Workers de livraison des webhooks (reprise des livraisons en attente)
+    from services.webhooks import webhook_manager
+    if webhook_manager.webhooks:
+        webhook_manager.start()
+    
+    # Réconciliation des profils de préférences (recalcul complet périodique)
+    from services.assistant.preference_learner import preference_learner
+    preference_learner.start()
+    
+    # Planificateur des rendus vidéo (file persistante: soumissions et statuts en lot)
+    if VIDEO_AVAILABLE:
+        from services.video.queue_manager import video_queue
+        from services.video.storage_manager import video_storage
+        video_queue.start()
+        video_storage.start()  # Nettoyage des vidéos expirées par lots
+    
+    # Warm-up en tâche de fond: le serveur accepte le trafic immédiatement,
+    # les providers non encore prêts sont créés à leur premier usage
+    warmup_task = asyncio.create_task(warm_up_providers())
+    app.state.warmup_task = warmup_task
+    
     # Log all registered routes for debugging
     for route in app.routes:
         if hasattr(route, "path"):
-            logger.info(f"📍 Route: {route.path}")
+            logger.debug(f"📍 Route: {route.path}")
     
     yield
     
     # Shutdown
     logger.info("🛑 Shutting down...")
+    if not warmup_task.done():
+        warmup_task.cancel()
+    await loop_monitor.stop()
+    await webhook_manager.stop()
+    await preference_learner.stop()
+    if VIDEO_AVAILABLE:
+        await video_queue.stop()
+        await video_storage.stop()
+        from services.video.tts_provider import tts_provider
+        tts_provider.shutdown()
+    
+    from services.tracing import trace_exporter
+    await trace_exporter.flush()
+    
+    from services.api_planner import api_planner
+    await api_planner.save()
+    
     from services.http_client import cleanup_http_client
     await cleanup_http_client()
     
@@ -72,7 +124,7 @@ from routers import (
     flights
 )
 from routers import orchestrator
-from routers import health_deep, metrics, ai_search, expert_chat
+from routers import health_deep, metrics, ai_search, expert_chat, export
 
 # Import routers - optional (non-critical)
 # Countries
@@ -165,7 +217,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
-    expose_headers=["X-Request-ID", "X-Response-Time", "X-API-Version"]
+    expose_headers=["X-Request-ID", "X-Response-Time", "X-API-Version", "Server-Timing"]
 )
 
 # 2. GZip Compression
@@ -176,24 +228,28 @@ app.add_middleware(GZipMiddleware, minimum_size=500)
 from middleware.security_headers import SecurityHeadersMiddleware
 app.add_middleware(SecurityHeadersMiddleware)
 
-# 4. Request ID (for tracing)
+# 4. Span tracing + Server-Timing (runs inside Request ID)
+from middleware.tracing import TracingMiddleware
+app.add_middleware(TracingMiddleware)
+
+# 5. Request ID (for tracing)
 from middleware.request_id import RequestIDMiddleware
 app.add_middleware(RequestIDMiddleware)
 
-# 5. Exception Handler
+# 6. Exception Handler
 from middleware.exception_handler import ExceptionHandlerMiddleware, http_exception_handler
 app.add_middleware(ExceptionHandlerMiddleware)
 app.add_exception_handler(HTTPException, http_exception_handler)
 
-# 6. Request Logger (logs all requests with timing)
+# 7. Request Logger (logs all requests with timing)
 from middleware.request_logger import RequestLoggerMiddleware
 app.add_middleware(RequestLoggerMiddleware)
 
-# 7. Sanitization (detects dangerous inputs)
+# 8. Sanitization (detects dangerous inputs)
 from middleware.sanitization import SanitizationMiddleware
 app.add_middleware(SanitizationMiddleware)
 
-# 8. Rate Limiting
+# 9. Rate Limiting
 try:
     from slowapi import _rate_limit_exceeded_handler
     from slowapi.errors import RateLimitExceeded
@@ -267,6 +323,7 @@ app.include_router(sports.router)
 app.include_router(utilities.router)
 app.include_router(auth.router)
 app.include_router(analytics.router)
+app.include_router(export.router)  # Streaming exports (CSV / NDJSON / Markdown)
 
 
 # ============================================
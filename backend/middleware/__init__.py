@@ -5,6 +5,7 @@ Custom middleware for the Universal Multi-API Backend
 
 from .security_headers import SecurityHeadersMiddleware
 from .request_id import RequestIDMiddleware, get_request_id
+from .tracing import TracingMiddleware
 from .request_logger import RequestLoggerMiddleware
 from .sanitization import SanitizationMiddleware
 from .exception_handler import ExceptionHandlerMiddleware, http_exception_handler
@@ -13,6 +14,7 @@ __all__ = [
     "SecurityHeadersMiddleware",
     "RequestIDMiddleware",
     "get_request_id",
+    "TracingMiddleware",
     "RequestLoggerMiddleware",
     "SanitizationMiddleware",
     "ExceptionHandlerMiddleware",
@@ -48,6 +48,10 @@ class RequestIDMiddleware(BaseHTTPMiddleware):
         # Stocker dans le context pour les logs
         token = request_id_ctx.set(request_id)
         
+        # Attribution des blocages de boucle (si le moniteur est actif)
+        from services.loop_monitor import loop_monitor
+        loop_monitor.bind_current_task(request_id)
+        
         try:
             # Ajouter à la request state pour accès dans les handlers
             request.state.request_id = request_id
@@ -0,0 +1,71 @@
+"""
+Tracing Middleware
+Ouvre une trace par requête (corrélée au request ID), ajoute le header
+Server-Timing et exporte les spans (services/tracing)
+"""
+import time
+from typing import AsyncIterator, Callable
+from fastapi import Request, Response
+from starlette.middleware.base import BaseHTTPMiddleware
+
+from services.tracing import ROOT_SPAN_NAME, is_enabled, server_timing_header, span, start_trace, trace_exporter
+from .request_id import get_request_id
+
+
+class TracingMiddleware(BaseHTTPMiddleware):
+    """
+    Middleware de tracing par requête
+
+    Features:
+    - Span racine `request` avec méthode, route et status, fermé après
+      l'envoi du corps (réponses en streaming comprises)
+    - Header Server-Timing (phases principales: ai, cache, http, db...)
+    - Export OTLP/JSON en arrière-plan (TRACING_EXPORT=file|otlp)
+    """
+
+    EXCLUDED_PATHS = [
+        "/api/health",
+        "/health",
+        "/docs",
+        "/redoc",
+        "/openapi.json",
+        "/favicon.ico",
+    ]
+
+    async def dispatch(self, request: Request, call_next: Callable) -> Response:
+        if not is_enabled() or any(request.url.path.startswith(path) for path in self.EXCLUDED_PATHS):
+            return await call_next(request)
+
+        trace = start_trace(get_request_id() or getattr(request.state, "request_id", ""))
+        start_time = time.perf_counter()
+
+        root_span = span(ROOT_SPAN_NAME, method=request.method, path=request.url.path)
+        root = root_span.__enter__()
+        try:
+            response = await call_next(request)
+        except BaseException as e:
+            root_span.__exit__(type(e), e, e.__traceback__)
+            trace_exporter.export(trace)
+            raise
+        root.set_attribute("http.status_code", response.status_code)
+
+        duration_ms = (time.perf_counter() - start_time) * 1000
+        response.headers["Server-Timing"] = server_timing_header(trace, duration_ms)
+
+        # Le corps (streaming compris) est envoyé après le retour: la racine se ferme à la fin du corps
+        response.body_iterator = self._finish_after_body(response.body_iterator, root_span, trace)
+        return response
+
+    @staticmethod
+    async def _finish_after_body(body: AsyncIterator[bytes], root_span: span, trace) -> AsyncIterator[bytes]:
+        error = None
+        try:
+            async for chunk in body:
+                yield chunk
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # Fin normale, erreur, ou client déconnecté (aclose)
+            root_span.__exit__(type(error) if error else None, error, None)
+            trace_exporter.export(trace)
@@ -1,7 +1,7 @@
 """
 Pydantic models for request/response validation
 """
-from typing import Optional, List, Literal
+from typing import Any, Dict, Optional, List, Literal
 from pydantic import BaseModel, Field
 
 
@@ -65,6 +65,45 @@ class EmbeddingResponse(BaseModel):
     dimensions: int
 
 
+class EmbeddingBatchRequest(BaseModel):
+    """Batch embedding request (textes dédupliqués, un appel amont pour les absents du cache)"""
+    texts: List[str] = Field(..., min_length=1, max_length=96)
+    model: Literal["cohere", "openai"] = "cohere"
+    input_type: Literal["search_document", "search_query", "classification", "clustering"] = "search_document"
+
+
+class EmbeddingBatchResponse(BaseModel):
+    """Batch embedding response"""
+    embeddings: List[List[float]]
+    model: str
+    dimensions: int
+    unique: int
+    cached: int
+    computed: int
+
+
+class IndexDocument(BaseModel):
+    """Document to add to the local vector index"""
+    id: str = Field(..., min_length=1, max_length=200)
+    text: str = Field(..., min_length=1, max_length=5000)
+    metadata: Optional[Dict[str, Any]] = None
+
+
+class IndexRequest(BaseModel):
+    """Vector index upsert request"""
+    documents: List[IndexDocument] = Field(..., min_length=1, max_length=96)
+    namespace: str = Field("default", min_length=1, max_length=100)
+    model: Literal["cohere", "openai"] = "cohere"
+
+
+class VectorSearchRequest(BaseModel):
+    """Top-k vector search request"""
+    query: str = Field(..., min_length=1, max_length=5000)
+    k: int = Field(5, ge=1, le=100)
+    namespace: str = Field("default", min_length=1, max_length=100)
+    model: Literal["cohere", "openai"] = "cohere"
+
+
 class HealthResponse(BaseModel):
     """Health check response"""
     status: str
@@ -10,7 +10,6 @@ from services.ai_router import ai_router
 from services.external_apis.weather import WeatherRouter
 from services.external_apis.geocoding import GeocodingRouter
 from services.external_apis.news import NewsRouter
-from services.external_apis.translation import TranslationRouter
 from services.external_apis.nutrition import NutritionRouter
 from services.external_apis import pubmed, openfda, coingecko, yahoo_finance
 import asyncio
@@ -21,7 +20,6 @@ router = APIRouter(prefix="/api/aggregated", tags=["aggregated"])
 weather_router = WeatherRouter()
 geocoding_router = GeocodingRouter()
 news_router = NewsRouter()
-translation_router = TranslationRouter()
 nutrition_router = NutritionRouter()
 
 
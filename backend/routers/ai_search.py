@@ -8,6 +8,7 @@ from pydantic import BaseModel
 import time
 
 from services.ai_search_engine import ai_search_engine, SearchIntent
+from services.api_planner import api_planner
 
 
 router = APIRouter(prefix="/api/ai-search", tags=["AI Search"])
@@ -170,6 +171,17 @@ async def list_categories():
     return ai_search_engine.category_apis
 
 
+@router.get("/planner/stats")
+async def planner_stats():
+    """
+    📈 STATISTIQUES DU PLANIFICATEUR (admin)
+    
+    Latences p50/p90/p99, taux d'erreur et taux de données utiles observés
+    par API (compteurs décroissants), utilisés pour choisir les APIs à appeler.
+    """
+    return api_planner.get_stats()
+
+
 @router.post("/quick")
 async def quick_search(
     query: str = Query(..., description="Requête de recherche"),
@@ -12,6 +12,7 @@ from services.auth import (
     Token,
     TokenData
 )
+from services.provider_registry import provider_registry
 
 router = APIRouter(prefix="/api/auth", tags=["Authentication"])
 
@@ -20,7 +21,9 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/login")
 
 async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     """Obtenir l'utilisateur actuel depuis le token"""
-    payload = auth_service.verify_token(token)
+    # Premier usage possible pendant le warm-up: construction hors de la boucle
+    service = await provider_registry.aget("auth")
+    payload = service.verify_token(token)
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -35,7 +38,7 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
             detail="Invalid token",
         )
     
-    user = auth_service.get_user_by_id(user_id)
+    user = service.get_user_by_id(user_id)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
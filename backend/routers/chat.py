@@ -5,6 +5,7 @@ from fastapi import APIRouter, HTTPException, Request
 from models.schemas import ChatRequest, ChatResponse
 from services.ai_router import ai_router
 from services.cache import cache_service
+from services.semantic_cache import semantic_cache
 from services.rate_limiter import get_limiter
 from services.sanitizer import sanitize
 import logging
@@ -66,6 +67,17 @@ async def chat(request: Request, body: ChatRequest):
                 processing_time_ms=(time.time() - start_time) * 1000
             )
         
+        # Semantic cache (opt-in): même question reformulée, sans contexte spécifique
+        use_semantic = not body.context
+        if use_semantic:
+            similar = semantic_cache.get("chat", body.message, scope=body.language)
+            if similar:
+                return ChatResponse(
+                    response=similar["value"]["response"],
+                    source="semantic_cache",
+                    processing_time_ms=(time.time() - start_time) * 1000
+                )
+        
         # Build system prompt
         system_prompt = SYSTEM_PROMPTS.get(body.language, SYSTEM_PROMPTS["he"])
         
@@ -86,6 +98,8 @@ async def chat(request: Request, body: ChatRequest):
             {"response": result["response"]},
             ttl=cache_ttl
         )
+        if use_semantic:
+            semantic_cache.set("chat", body.message, {"response": result["response"]}, scope=body.language)
         
         return ChatResponse(
             response=result["response"],
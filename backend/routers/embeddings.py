@@ -1,30 +1,31 @@
 """
 Embeddings endpoint for RAG system
+- /embeddings et /embeddings/batch: cache binaire consulté d'abord, un seul
+  appel amont asynchrone pour les textes absents (services/vector_store)
+- /embeddings/index et /embeddings/search: index vectoriel local persistant
 """
+import asyncio
+
 from fastapi import APIRouter, HTTPException
-from models.schemas import EmbeddingRequest, EmbeddingResponse
-from services.cache import cache_service
-import os
-
-# Optional cohere import
-try:
-    import cohere
-    COHERE_AVAILABLE = True
-except ImportError:
-    cohere = None
-    COHERE_AVAILABLE = False
+from models.schemas import (
+    EmbeddingRequest, EmbeddingResponse, EmbeddingBatchRequest, EmbeddingBatchResponse,
+    IndexRequest, VectorSearchRequest,
+)
+from services.vector_store import vector_store, EMBEDDING_MODELS, EmbeddingUnavailable
 
 router = APIRouter(prefix="/api", tags=["embeddings"])
 
 
-def get_cohere_client():
-    """Get Cohere client"""
-    if not COHERE_AVAILABLE:
-        return None
-    api_key = os.getenv("COHERE_API_KEY")
-    if not api_key or api_key == "your_cohere_api_key_here":
-        return None
-    return cohere.Client(api_key)
+async def _embed(texts, model: str, input_type: str):
+    """Embeddings par lot avec erreurs HTTP homogènes"""
+    try:
+        return await vector_store.embed_batch(texts, model, input_type)
+    except EmbeddingUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Embedding error: {str(e)}")
 
 
 @router.post("/embeddings", response_model=EmbeddingResponse)
@@ -35,59 +36,77 @@ async def create_embeddings(request: EmbeddingRequest):
     - **text**: Text to embed (required)
     - **model**: Embedding model (cohere/openai)
     """
+    vectors, _ = await _embed([request.text], request.model, "search_query")
+    return EmbeddingResponse(
+        embeddings=vectors[0].tolist(),
+        model=EMBEDDING_MODELS[request.model]["name"],
+        dimensions=len(vectors[0])
+    )
+
+
+@router.post("/embeddings/batch", response_model=EmbeddingBatchResponse)
+async def create_embeddings_batch(request: EmbeddingBatchRequest):
+    """
+    Create embeddings for up to 96 texts
+    
+    Duplicates and cached texts are not sent upstream; the remaining texts
+    go out in a single batch call.
+    """
+    vectors, counts = await _embed(request.texts, request.model, request.input_type)
+    return EmbeddingBatchResponse(
+        embeddings=[vector.tolist() for vector in vectors],
+        model=EMBEDDING_MODELS[request.model]["name"],
+        dimensions=len(vectors[0]),
+        **counts
+    )
+
+
+@router.post("/embeddings/index")
+async def index_documents(request: IndexRequest):
+    """
+    Add or update documents in the local vector index
+    
+    - **documents**: id, text and optional metadata
+    - **namespace**: Index namespace (one index per namespace and model)
+    """
+    documents = [doc.model_dump() for doc in request.documents]
     try:
-        # Check cache first
-        cache_key = f"{request.text}:{request.model}"
-        cached = cache_service.get("embeddings", cache_key)
-        
-        if cached:
-            return EmbeddingResponse(**cached)
-        
-        # Create embeddings based on model
-        if request.model == "cohere":
-            client = get_cohere_client()
-            
-            if not client:
-                raise HTTPException(
-                    status_code=503,
-                    detail="Cohere API not configured"
-                )
-            
-            response = client.embed(
-                texts=[body.text],
-                model="embed-multilingual-v3.0",
-                input_type="search_query"
-            )
-            
-            embeddings = response.embeddings[0]
-            
-            result = {
-                "embeddings": embeddings,
-                "model": "cohere-embed-multilingual-v3.0",
-                "dimensions": len(embeddings)
-            }
-        
-        else:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Unsupported model: {body.model}"
-            )
-        
-        # Cache the embeddings
-        cache_ttl = int(os.getenv("CACHE_TTL_EMBEDDINGS", 86400))
-        cache_service.set(
-            "embeddings",
-            cache_key,
-            result,
-            ttl=cache_ttl
-        )
-        
-        return EmbeddingResponse(**result)
+        result = await vector_store.index_documents(request.namespace, documents, request.model)
+    except EmbeddingUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Indexing error: {str(e)}")
+    return {"namespace": request.namespace, **result}
+
+
+@router.post("/embeddings/search")
+async def search_documents(request: VectorSearchRequest):
+    """
+    Top-k similarity search in the local vector index
     
-    except HTTPException:
-        raise
+    - **query**: Search text
+    - **k**: Number of results
+    """
+    try:
+        results = await vector_store.search(request.namespace, request.query, request.k, request.model)
+    except EmbeddingUnavailable as e:
+        raise HTTPException(status_code=503, detail=str(e))
     except Exception as e:
-        raise HTTPException(
-            status_code=500,
-            detail=f"Embedding error: {str(e)}"
-        )
+        raise HTTPException(status_code=500, detail=f"Search error: {str(e)}")
+    return {"namespace": request.namespace, "query": request.query, "results": results}
+
+
+@router.delete("/embeddings/index/{namespace}/{doc_id}")
+async def delete_document(namespace: str, doc_id: str, model: str = "cohere"):
+    """Remove a document from the local vector index"""
+    if not await asyncio.to_thread(vector_store.delete_document, namespace, doc_id, model):
+        raise HTTPException(status_code=404, detail="Document not found")
+    return {"deleted": doc_id}
+
+
+@router.get("/embeddings/stats")
+async def embeddings_stats():
+    """Embedding cache and vector index statistics"""
+    return vector_store.get_stats()
@@ -7,6 +7,7 @@ from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, List, Literal
 import logging
+import os
 import time
 import asyncio
 
@@ -16,6 +17,9 @@ from services.expert_config import (
 )
 from services.ai_router import ai_router
 from services.cache import cache_service
+from services.semantic_cache import semantic_cache
+from services.tracing import traced
+from services.context_graph import ContextSource, run_graph
 from services.context_helpers import get_current_datetime_context, detect_language, get_language_instruction
 
 logger = logging.getLogger(__name__)
@@ -97,11 +101,63 @@ def _extract_location_from_query(query: str) -> str:
     return result
 
 
+# Budget total (s) de récupération du contexte par expert: les sources en retard
+# sont coupées (absentes du prompt, signalées "<source>:timeout" dans les sources)
+CONTEXT_BUDGETS_S = {
+    "health": 10.0,
+    "health_deep": 30.0,  # Dont le budget "health" réservé au repli NORMAL
+    "finance": 15.0,
+    "finance_fallback": 5.0,  # Part du budget "finance" réservée aux APIs de repli
+    "general": 6.0,
+    "weather": 6.0,
+    "tourism": 10.0,
+}
+DEFAULT_CONTEXT_BUDGET_S = 6.0
+
+
+def _context_budget(budget_key: str) -> float:
+    """Budget de contexte (s); EXPERT_CONTEXT_BUDGET_<CLÉ> pour surcharger"""
+    env_value = os.getenv(f"EXPERT_CONTEXT_BUDGET_{budget_key.upper()}")
+    return float(env_value) if env_value else CONTEXT_BUDGETS_S.get(budget_key, DEFAULT_CONTEXT_BUDGET_S)
+
+
+def _context_deadline(budget_key: str) -> float:
+    """Échéance (horloge monotone) du budget de contexte"""
+    return time.monotonic() + _context_budget(budget_key)
+
+
+def _remaining(deadline: float, reserve: float = 0.0) -> float:
+    return max(0.0, deadline - time.monotonic() - reserve)
+
+
+def _remember_message(session_id: str, expert_id: str, role: str, message: str):
+    """Enregistrer un tour dans la mémoire de la session (repli sur conversation_manager)"""
+    try:
+        from services.enhanced_memory import enhanced_memory
+        enhanced_memory.add_message(session_id=session_id, expert_id=expert_id, role=role, message=message)
+    except ImportError:
+        from services.conversation_manager import conversation_manager
+        conversation_manager.add_message(session_id=session_id, expert_id=expert_id, role=role, message=message)
+
+
+def _api_source(api_name: str, query: str, query_params: Optional[dict] = None, after=(), unless: Optional[str] = None) -> ContextSource:
+    """Source pour un appel _fetch_from_api (`unless`: repli ignoré si cette dépendance a abouti)"""
+    async def fetch(done):
+        if unless and unless in done:
+            return None
+        return await _fetch_from_api(api_name, query, query_params)
+    return ContextSource(api_name, fetch, after=tuple(after))
+
+
+@traced("context.fetch")
 async def fetch_context_data(expert: Expert, query: str, search_mode_override: Optional[str] = None) -> tuple[str, List[str]]:
     """
-    Fetch relevant data from expert's connected APIs (parallélisé pour performance)
+    Fetch relevant data from expert's connected APIs
+    Sources run as a dependency graph (weather only waits on geocoding,
+    fallbacks only on what they replace) under a per-expert time budget;
+    sources still running at the deadline are dropped from the context.
     Uses intelligent query detection to skip APIs if not needed.
-    Returns: (context_string, list_of_sources)
+    Returns: (context_string, list_of_sources) - cut sources listed as "<name>:timeout"
     """
     from services.intent_detector import IntentDetector, get_search_mode
     
@@ -135,6 +191,9 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
             f"confidence: {intent_data['confidence']:.2f}"
         )
         
+        deadline = _context_deadline("health_deep" if search_mode == "deep" else "health")
+        cut_sources: List[str] = []
+        
         if search_mode == "deep":
             # Clean trigger words from query to avoid polluting API search
             clean_query = query
@@ -152,11 +211,16 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
             if not clean_query: clean_query = query # Fallback
 
             # DEEP mode: Comprehensive search with intent-based filtering
-            try:
-                from services.deep_medical_search import perform_deep_search
-                logger.info(f"Starting DEEP medical search for: {clean_query}")
-                
-                context, search_result = await perform_deep_search(clean_query)
+            from services.deep_medical_search import perform_deep_search
+            logger.info(f"Starting DEEP medical search for: {clean_query}")
+            
+            graph = await run_graph(
+                [ContextSource("deep_search", lambda _: perform_deep_search(clean_query))],
+                _remaining(deadline, reserve=_context_budget("health"))
+            )
+            
+            if "deep_search" in graph.results:
+                context, search_result = graph.results["deep_search"]
                 
                 # Add intent header to context
                 intent_header = f"[RECHERCHE APPROFONDIE - {primary_intent.upper()}]\n"
@@ -176,10 +240,13 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
                 )
                 
                 return context, sources
-                
-            except Exception as e:
-                logger.error(f"Deep search failed, falling back to intelligent routing: {e}")
-                # Fall through to intelligent routing
+            
+            # Fall through to intelligent routing (reserved part of the budget)
+            logger.error(
+                f"Deep search failed, falling back to intelligent routing: "
+                f"{graph.failed.get('deep_search', 'time budget exceeded')}"
+            )
+            cut_sources = graph.cut_labels()
         
         # NORMAL mode: Intelligent API routing based on intent
         try:
@@ -199,7 +266,6 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
                 intent_header += f"\nEntité: {', '.join(entities)}"
             context_parts.append(intent_header)
             
-            # Call medical router for comprehensive health info
             # Call medical router for comprehensive health info
             from services.external_apis.medical_router import medical_router, format_medical_context_normal
             
@@ -216,11 +282,8 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
             }
             query_type = query_type_map.get(primary_intent, "general")
             
-            try:
-                medical_data = await medical_router.get_comprehensive_health_info(
-                    query, 
-                    query_type
-                )
+            async def comprehensive_health_info(_):
+                medical_data = await medical_router.get_comprehensive_health_info(query, query_type)
                 
                 # Filter data by intent
                 if primary_intent != "general" and medical_data:
@@ -229,38 +292,39 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
                     )
                     if filtered_data:
                         medical_data = filtered_data
-                
-                # Format the medical data properly
-                if medical_data:
-                    context_str = format_medical_context_normal(medical_data)
-                    context_parts.append(context_str)
-                
-                sources = list(medical_data.get("sources", {}).keys()) if medical_data else []
-                
-            except Exception as e:
-                logger.warning(f"Medical router failed: {e}")
-                # Fallback: try individual API calls
-                sources = []
+                return medical_data or None
+            
+            # Standard API endpoints as fallback: only when the router has no data
+            fallback_apis = ["medical", "pubmed", "openfda"]
+            graph = await run_graph(
+                [ContextSource("medical_router", comprehensive_health_info)]
+                + [
+                    _api_source(api_name, query, {"query": query}, after=("medical_router",), unless="medical_router")
+                    for api_name in fallback_apis
+                ],
+                _remaining(deadline)
+            )
             
-            # If no data from router, try direct API endpoints
-            if len(context_parts) <= 1:
-                # Try the standard API endpoints as fallback
-                fallback_apis = ["medical", "pubmed", "openfda"]
-                for api_name in fallback_apis:
-                    try:
-                        result = await _fetch_from_api(api_name, query, {"query": query})
-                        if result:
-                            context_parts.append(f"[{api_name.upper()}]: {result[:500]}")
-                            sources.append(api_name)
-                    except Exception:
-                        continue
+            sources = []
+            medical_data = graph.results.get("medical_router")
+            if medical_data:
+                # Format the medical data properly
+                context_parts.append(format_medical_context_normal(medical_data))
+                sources = list(medical_data.get("sources", {}).keys())
+            elif "medical_router" in graph.failed:
+                logger.warning(f"Medical router failed: {graph.failed['medical_router']}")
+            
+            for api_name in fallback_apis:
+                if graph.results.get(api_name):
+                    context_parts.append(f"[{api_name.upper()}]: {graph.results[api_name][:500]}")
+                    sources.append(api_name)
             
             context = "\n\n".join(context_parts) if context_parts else "Données médicales temporairement indisponibles."
-            return context, sources
+            return context, sources + cut_sources + graph.cut_labels()
             
         except Exception as e:
             logger.error(f"Intelligent medical routing failed: {e}")
-            return "Contexte médical: Données temporairement indisponibles.", []
+            return "Contexte médical: Données temporairement indisponibles.", cut_sources
     
     # 3. For FINANCE expert, use DEEP mode (always comprehensive)
     if expert.id.value == "finance":
@@ -278,16 +342,28 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
             f"coin_id={coin_id}, confidence={detection['confidence']:.2f}"
         )
         
-        # TOUJOURS utiliser le mode Deep pour Finance
-        try:
-            logger.info(f"Starting DEEP finance search for: {query} (type: {query_type})")
-            
-            context, search_result = await perform_deep_finance_search(
-                query,
-                query_type,
-                symbol,
-                coin_id
-            )
+        # Fallback vers méthode simple (mais avec plus d'APIs) si le mode Deep échoue
+        fallback_apis = list(FinanceQueryDetector.get_recommended_apis(query_type, symbol, coin_id))
+        # Ajouter des APIs supplémentaires même en fallback
+        if query_type in ("crypto", "stock"):
+            fallback_apis.extend(["news", "exchange"])
+        query_params = {
+            "query": query,
+            "symbol": symbol,
+            "coin_id": coin_id,
+            "query_type": query_type
+        }
+        
+        # TOUJOURS utiliser le mode Deep pour Finance (le repli garde sa part du budget)
+        logger.info(f"Starting DEEP finance search for: {query} (type: {query_type})")
+        deadline = _context_deadline("finance")
+        graph = await run_graph(
+            [ContextSource("deep_finance", lambda _: perform_deep_finance_search(query, query_type, symbol, coin_id))],
+            _remaining(deadline, reserve=_context_budget("finance_fallback"))
+        )
+        
+        if "deep_finance" in graph.results:
+            context, search_result = graph.results["deep_finance"]
             
             # Build sources from the search
             sources = [f"[{api.upper()}]" for api in search_result.apis_with_data]
@@ -298,39 +374,26 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
                 f"context length: {search_result.context_length} chars"
             )
             
-            return context, sources
-            
-        except Exception as e:
-            logger.error(f"Deep finance search failed: {e}", exc_info=True)
-            # Fallback vers méthode simple (mais avec plus d'APIs)
-            fallback_apis = FinanceQueryDetector.get_recommended_apis(query_type, symbol, coin_id)
-            # Ajouter des APIs supplémentaires même en fallback
-            if query_type == "crypto":
-                fallback_apis.extend(["news", "exchange"])
-            elif query_type == "stock":
-                fallback_apis.extend(["news", "exchange"])
+            return context, sources + graph.cut_labels()
+        
+        logger.error(f"Deep finance search failed: {graph.failed.get('deep_finance', 'time budget exceeded')}")
+        cut_sources = graph.cut_labels()
+        graph = await run_graph(
+            [_api_source(api_name, query, query_params) for api_name in dict.fromkeys(fallback_apis)],
+            _remaining(deadline)
+        )
+        
+        context_parts = [f"[{query_type.upper()}]"]
+        sources = []
+        
+        for api_name in dict.fromkeys(fallback_apis):
+            if graph.results.get(api_name):
+                # NE PAS tronquer à 500 - garder toutes les données
+                context_parts.append(f"[{api_name.upper()}]: {graph.results[api_name]}")
+                sources.append(api_name)
                 
-            query_params = {
-                "query": query,
-                "symbol": symbol,
-                "coin_id": coin_id,
-                "query_type": query_type
-            }
-            
-            tasks = [_fetch_from_api(api_name, query, query_params) for api_name in fallback_apis]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
-            
-            context_parts = [f"[{query_type.upper()}]"]
-            sources = []
-            
-            for api_name, result in zip(fallback_apis, results):
-                if result and not isinstance(result, Exception):
-                    # NE PAS tronquer à 500 - garder toutes les données
-                    context_parts.append(f"[{api_name.upper()}]: {result}")
-                    sources.append(api_name)
-                    
-            context = "\n\n".join(context_parts) if context_parts else "Données financières temporairement indisponibles."
-            return context, sources
+        context = "\n\n".join(context_parts) if context_parts else "Données financières temporairement indisponibles."
+        return context, sources + cut_sources + graph.cut_labels()
     
     # 4. For GENERAL expert: Intelligent routing with 26 APIs
     if expert.id.value == "general":
@@ -354,11 +417,14 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
             "query": query,
             "query_type": query_type
         }
+        deadline = _context_deadline("general")
         
-        # Appeler les APIs en parallèle
+        # Appeler les APIs en parallèle (sources indépendantes)
         try:
-            tasks = [_fetch_from_api(api_name, query, query_params) for api_name in api_names]
-            results = await asyncio.gather(*tasks, return_exceptions=True)
+            graph = await run_graph(
+                [_api_source(api_name, query, query_params) for api_name in dict.fromkeys(api_names)],
+                _remaining(deadline)
+            )
             
             context_parts = []
             sources = []
@@ -372,11 +438,12 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
                 context_parts.append(header)
             
             # Traiter chaque résultat
-            for api_name, result in zip(api_names, results):
-                if isinstance(result, Exception):
-                    logger.debug(f"General API {api_name} failed: {type(result).__name__}")
+            for api_name in dict.fromkeys(api_names):
+                if api_name in graph.failed:
+                    logger.debug(f"General API {api_name} failed: {graph.failed[api_name]}")
                     continue
                 
+                result = graph.results.get(api_name)
                 if result:
                     # Limiter la taille
                     result_str = result[:500] if isinstance(result, str) else str(result)[:500]
@@ -392,25 +459,27 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
                 )
             
             context = "\n\n".join(context_parts)
-            return context, sources
+            return context, sources + graph.cut_labels()
             
         except Exception as e:
             logger.error(f"General API routing failed: {e}", exc_info=True)
             # Fallback vers APIs universelles
             try:
                 fallback_apis = ["wikipedia", "news"]
-                tasks = [_fetch_from_api(api, query, {"query": query}) for api in fallback_apis]
-                results = await asyncio.gather(*tasks, return_exceptions=True)
+                graph = await run_graph(
+                    [_api_source(api, query, {"query": query}) for api in fallback_apis],
+                    _remaining(deadline)
+                )
                 
                 context_parts = []
                 sources = []
-                for api, result in zip(fallback_apis, results):
-                    if result and not isinstance(result, Exception):
-                        context_parts.append(f"[{api.upper()}]: {result[:500]}")
+                for api in fallback_apis:
+                    if graph.results.get(api):
+                        context_parts.append(f"[{api.upper()}]: {graph.results[api][:500]}")
                         sources.append(api)
                 
                 context = "\n\n".join(context_parts) if context_parts else "Données temporairement indisponibles."
-                return context, sources
+                return context, sources + graph.cut_labels()
             except:
                 return "Contexte: Données temporairement indisponibles.", []
     
@@ -424,26 +493,44 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
             location_name = _extract_location_from_query(query)
             logger.info(f"Weather query for location: {location_name}")
             
-            # Géocodage - convertir lieu en coordonnées
-            geocoding_router = GeocodingRouter()
-            geo_result = await geocoding_router.search(location_name)
+            async def geocode(_):
+                # Géocodage - convertir lieu en coordonnées
+                geocoding_router = GeocodingRouter()
+                geo_result = await geocoding_router.search(location_name)
+                
+                if not geo_result or not geo_result.get("results"):
+                    # Fallback: essayer avec la requête complète
+                    geo_result = await geocoding_router.search(query)
+                
+                if not geo_result or not geo_result.get("results"):
+                    return None
+                return geo_result["results"][0]
             
-            if not geo_result or not geo_result.get("results"):
-                # Fallback: essayer avec la requête complète
-                geo_result = await geocoding_router.search(query)
+            async def current_weather(done):
+                # La météo n'attend que le géocodage
+                location = done.get("geocoding")
+                if not location:
+                    return None
+                logger.info(f"Geocoded: {location.get('name')} -> ({location.get('lat')}, {location.get('lon')})")
+                # Récupérer météo avec les 2 APIs en parallèle
+                return await WeatherRouter().get_current_weather(location.get("lat"), location.get("lon"))
+            
+            graph = await run_graph(
+                [
+                    ContextSource("geocoding", geocode),
+                    ContextSource("weather", current_weather, after=("geocoding",)),
+                ],
+                _remaining(_context_deadline("weather"))
+            )
             
-            if not geo_result or not geo_result.get("results"):
+            location = graph.results.get("geocoding")
+            if location is None and not graph.cut and "geocoding" not in graph.failed:
                 return "[ERREUR]: Lieu non trouvé. Précisez le nom de la ville ou du pays.", []
             
-            location = geo_result["results"][0]
-            lat = location.get("lat")
-            lon = location.get("lon")
-            
-            logger.info(f"Geocoded: {location.get('name')} -> ({lat}, {lon})")
-            
-            # Récupérer météo avec les 2 APIs en parallèle
-            weather_router = WeatherRouter()
-            weather_data = await weather_router.get_current_weather(lat, lon)
+            weather_data = graph.results.get("weather")
+            if weather_data is None:
+                logger.error(f"Weather expert failed: {graph.failed or 'time budget exceeded'}")
+                return "[ERREUR]: Service météo temporairement indisponible.", graph.cut_labels()
             
             # Formater le contexte pour l'IA
             context = format_weather_context(weather_data, location)
@@ -470,7 +557,14 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
             logger.info(f"[TOURISM] Processing query: {query}")
             
             # Récupérer les données complètes avec routage intelligent
-            tourism_data = await tourism_router.get_comprehensive_tourism_info(query)
+            graph = await run_graph(
+                [ContextSource("tourism", lambda _: tourism_router.get_comprehensive_tourism_info(query))],
+                _remaining(_context_deadline("tourism"))
+            )
+            tourism_data = graph.results.get("tourism")
+            if tourism_data is None:
+                logger.error(f"Tourism expert failed: {graph.failed or 'time budget exceeded'}")
+                return "[ERREUR]: Service tourisme temporairement indisponible.", graph.cut_labels()
             
             # Formater le contexte pour l'IA
             context = format_tourism_context(tourism_data)
@@ -496,22 +590,27 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
     if not api_names:
         return "Pas de données supplémentaires disponibles.", []
     
-    # Appeler toutes les APIs en parallèle pour améliorer les performances
+    # Appeler toutes les APIs en parallèle sous le budget de l'expert
+    cut_sources = []
     try:
-        tasks = [_fetch_from_api(api_name, query, query_params) for api_name in api_names]
-        results = await asyncio.gather(*tasks, return_exceptions=True)
+        graph = await run_graph(
+            [_api_source(api_name, query, query_params) for api_name in dict.fromkeys(api_names)],
+            _remaining(_context_deadline(expert.id.value))
+        )
         
         context_parts = []
         sources = []
         
-        for api_name, result in zip(api_names, results):
-            if isinstance(result, Exception):
-                logger.debug(f"API {api_name} failed: {type(result).__name__}: {result}")
+        for api_name in dict.fromkeys(api_names):
+            if api_name in graph.failed:
+                logger.debug(f"API {api_name} failed: {graph.failed[api_name]}")
                 continue
             
+            result = graph.results.get(api_name)
             if result:
                 context_parts.append(f"[{api_name.upper()}]: {result[:500]}")  # Limit size
                 sources.append(api_name)
+        cut_sources = graph.cut_labels()
                 
     except Exception as e:
         logger.error(f"Error fetching context data: {e}")
@@ -519,7 +618,7 @@ async def fetch_context_data(expert: Expert, query: str, search_mode_override: O
         sources = []
     
     context = "\n\n".join(context_parts) if context_parts else "Pas de données supplémentaires disponibles."
-    return context, sources
+    return context, sources + cut_sources
 
 
 
@@ -992,6 +1091,35 @@ async def chat_with_expert(expert_id: str, body: ExpertChatRequest):
                     processing_time_ms=(time.time() - start_time) * 1000
                 )
             # Sinon, ignorer le cache pour forcer une nouvelle réponse (évite répétitions immédiates)
+        
+        # Semantic cache (opt-in): question reformulée, index par expert
+        # (finance, news, weather et questions volatiles exclus). Index partagé
+        # seulement pour une nouvelle conversation (session créée ici: ni historique
+        # ni profil), sinon limité à la session
+        shared_scope = f"{body.language or detect_language(body.message)}:{body.search_mode or 'auto'}"
+        session_scope = f"{shared_scope}:{session_id}"
+        similar = semantic_cache.get(
+            expert_id, body.message, scope=session_scope if body.session_id else shared_scope
+        )
+        # Session existante: même garde anti-répétition que le cache exact (réponse de moins de 2 minutes ignorée)
+        if similar and body.session_id and time.time() - similar["value"].get("timestamp", 0) <= 120:
+            similar = None
+        if similar:
+            # Les deux tours restent dans l'historique de la session, comme sans cache
+            _remember_message(session_id, expert_id, "user", body.message)
+            _remember_message(session_id, expert_id, "assistant", similar["value"]["response"])
+            return ExpertChatResponse(
+                expert_id=expert_id,
+                expert_name=expert.name,
+                response=similar["value"]["response"],
+                session_id=session_id,
+                sources=similar["value"].get("sources", []),
+                source="semantic_cache",
+                processing_time_ms=(time.time() - start_time) * 1000
+            )
+    
+    # Provider choisi avant de construire le prompt: l'historique suit son budget de tokens
+    provider = ai_router.select_provider()
     
     # ============================================
     # MÉMOIRE V2 - Système amélioré avec profilage
@@ -1013,7 +1141,8 @@ async def chat_with_expert(expert_id: str, body: ExpertChatRequest):
             expert_id=expert_id,
             include_profile=True,
             include_topics=True,
-            max_messages=10
+            max_messages=10,
+            provider=provider
         )
         
         # Détection automatique du profil utilisateur (pour expert santé)
@@ -1029,8 +1158,7 @@ async def chat_with_expert(expert_id: str, body: ExpertChatRequest):
         # Fallback sur l'ancien système si enhanced_memory n'existe pas
         from services.conversation_manager import conversation_manager
         
-        history = conversation_manager.get_conversation_history(session_id, expert_id, limit=10)
-        memory_context = conversation_manager.format_history_for_prompt(history)
+        memory_context = conversation_manager.build_history_context(session_id, expert_id, provider=provider)
         
         conversation_manager.add_message(
             session_id=session_id,
@@ -1110,7 +1238,8 @@ async def chat_with_expert(expert_id: str, body: ExpertChatRequest):
         try:
             result = await ai_router.route(
                 prompt=body.message,
-                system_prompt=system_prompt
+                system_prompt=system_prompt,
+                preferred_provider=provider
             )
             break  # Succès, sortir de la boucle
             
@@ -1191,7 +1320,8 @@ async def chat_with_expert(expert_id: str, body: ExpertChatRequest):
         try:
             result = await ai_router.route(
                 prompt=body.message,
-                system_prompt=strict_prompt
+                system_prompt=strict_prompt,
+                preferred_provider=provider
             )
             
             # Re-valider
@@ -1218,22 +1348,7 @@ async def chat_with_expert(expert_id: str, body: ExpertChatRequest):
             # Ne pas ajouter de [WARN] - laisser la réponse naturelle
     
     # Stocker la réponse de l'IA dans la mémoire
-    try:
-        from services.enhanced_memory import enhanced_memory
-        enhanced_memory.add_message(
-            session_id=session_id,
-            expert_id=expert_id,
-            role="assistant",
-            message=result["response"]
-        )
-    except ImportError:
-        from services.conversation_manager import conversation_manager
-        conversation_manager.add_message(
-            session_id=session_id,
-            expert_id=expert_id,
-            role="assistant",
-            message=result["response"]
-        )
+    _remember_message(session_id, expert_id, "assistant", result["response"])
     
     # Cache the response
     if use_cache:
@@ -1248,6 +1363,15 @@ async def chat_with_expert(expert_id: str, body: ExpertChatRequest):
             },
             ttl=cache_ttl
         )
+        # Session existante: réponse construite avec sa mémoire, jamais partagée.
+        # Réponses validées et sûres seulement (l'index partagé sert chaque nouvelle conversation)
+        if is_valid and confidence >= 0.8:
+            semantic_cache.set(
+                expert_id,
+                body.message,
+                {"response": result["response"], "sources": sources, "timestamp": time.time()},
+                scope=session_scope if body.session_id else shared_scope
+            )
     
     # Logging
     processing_time = (time.time() - start_time) * 1000
@@ -1301,557 +1425,10 @@ async def chat_with_expert_stream(expert_id: str, body: ExpertChatRequest):
             detected_lang = detect_language(body.message)
             language = body.language or detected_lang
             
-            history = conversation_manager.get_conversation_history(session_id, expert_id, limit=10)
-            history_context = conversation_manager.format_history_for_prompt(history)
-            
-            date_info = get_current_datetime_context(language)
-            full_context = f"{date_info}\n\n{context}"
-            if history_context:
-                full_context = f"{history_context}\n\n{full_context}"
-                
-            system_prompt = expert.system_prompt.replace("{context}", full_context)
-            system_prompt += f"\n\n{get_language_instruction(language)}"
-            system_prompt += "\n\nIMPORTANT: Réponds directement. Ne répète jamais le message de bienvenue."
-            
-            # Stream AI Response
-            full_response_text = ""
-            async for chunk in ai_router.route_stream(
-                prompt=body.message, 
-                system_prompt=system_prompt
-            ):
-                if chunk:
-                    full_response_text += chunk
-                    yield chunk
-                    
-            # Post-processing (Background)
-            conversation_manager.add_message(
-                session_id=session_id,
-                expert_id=expert_id,
-                role="assistant",
-                message=full_response_text
+            history_context = conversation_manager.build_history_context(
+                session_id, expert_id, provider=ai_router.select_provider()
             )
             
-            if len(full_response_text) > 50:
-                cache_key = f"expert:{expert_id}:{session_id}:{body.message}"
-                cache_service.set(
-                    "expert_chat",
-                    cache_key,
-                    {
-                        "response": full_response_text,
-                        "sources": sources,
-                        "timestamp": time.time()
-                    },
-                    ttl=3600
-                )
-                
-        except Exception as e:
-            logger.error(f"Streaming error: {e}")
-            yield f"\n[ERR] Error: {str(e)}"
-
-    return StreamingResponse(event_generator(), media_type="text/plain")
-
-
-def _extract_news_summary(data: dict) -> str:
-    """Extract news data in a clear format"""
-    try:
-        if not isinstance(data, dict):
-            return str(data)[:500]
-        
-        # Handle different response formats
-        if "news" in data:
-            news_list = data["news"]
-        elif "data" in data and isinstance(data["data"], list):
-            news_list = data["data"]
-        elif isinstance(data, list):
-            news_list = data
-        elif "success" in data and data.get("success"):
-            news_list = data.get("data", {}).get("news", [])
-        else:
-            return str(data)[:500]
-        
-        if not isinstance(news_list, list) or len(news_list) == 0:
-            return "Aucune actualité disponible."
-        
-        news_items = []
-        for item in news_list[:5]:  # Limit to 5 news items
-            if isinstance(item, dict):
-                title = item.get("title") or item.get("headline")
-                source = item.get("source") or item.get("source_name")
-                summary = item.get("summary") or item.get("description")
-                
-                news_text = ""
-                if title:
-                    news_text = f"Titre: {title}"
-                if source:
-                    news_text += f" (Source: {source})"
-                if summary:
-                    news_text += f" - {summary[:150]}"
-                
-                if news_text:
-                    news_items.append(news_text)
-        
-        return f"[ACTUALITÉS FINANCI├êRES]\n" + "\n".join(news_items) if news_items else "Aucune actualité disponible."
-    except Exception as e:
-        logger.debug(f"Error extracting news summary: {e}")
-        return str(data)[:500]
-
-
-def _extract_summary(data: dict) -> str:
-    """Extract a readable summary from API response"""
-    if isinstance(data, str):
-        return data[:500]
-    
-    if isinstance(data, list):
-        items = []
-        for item in data[:3]:
-            if isinstance(item, dict):
-                # Try common keys
-                for key in ['title', 'name', 'summary', 'description', 'content', 'text']:
-                    if key in item:
-                        items.append(str(item[key])[:200])
-                        break
-        return " | ".join(items)
-    
-    if isinstance(data, dict):
-        # Try to extract useful info
-        summary_parts = []
-        for key in ['summary', 'description', 'content', 'title', 'name', 'data', 'result']:
-            if key in data:
-                val = data[key]
-                if isinstance(val, str):
-                    summary_parts.append(val[:300])
-                elif isinstance(val, dict):
-                    summary_parts.append(str(val)[:300])
-        return " | ".join(summary_parts[:3]) if summary_parts else str(data)[:500]
-    
-    return str(data)[:500]
-
-
-# ============================================
-# ENDPOINTS
-# ============================================
-
-@router.get("/list", response_model=List[ExpertInfo])
-async def list_experts():
-    """
-    [LIST] Get list of all available AI experts
-    """
-    experts = get_all_experts()
-    return [
-        ExpertInfo(
-            id=e.id.value,
-            name=e.name,
-            emoji=e.emoji,
-            tagline=e.tagline,
-            description=e.description,
-            color=e.color,
-            welcome_message=e.welcome_message,
-            example_questions=e.example_questions
-        )
-        for e in experts
-    ]
-
-
-@router.get("/categories")
-async def list_categories():
-    """
-    [CAT] Get all expert categories
-    """
-    categories = get_all_categories()
-    return [
-        {
-            "id": c.id.value,
-            "name": c.name,
-            "name_en": c.name_en,
-            "emoji": c.emoji,
-            "description": c.description,
-            "color": c.color,
-        }
-        for c in categories
-    ]
-
-
-@router.get("/grouped")
-async def get_experts_by_categories():
-    """
-    [GROUP] Get all experts grouped by category
-    Perfect for building an explore/discover page
-    """
-    return get_experts_grouped_by_category()
-
-
-@router.get("/category/{category_id}")
-async def get_category_experts(category_id: str):
-    """
-    [CAT] Get all experts in a specific category
-    """
-    experts = get_experts_by_category(category_id)
-    if not experts:
-        raise HTTPException(status_code=404, detail=f"No experts found for category '{category_id}'")
-    
-    return [
-        ExpertInfo(
-            id=e.id.value,
-            name=e.name,
-            emoji=e.emoji,
-            tagline=e.tagline,
-            description=e.description,
-            color=e.color,
-            welcome_message=e.welcome_message,
-            example_questions=e.example_questions
-        )
-        for e in experts
-    ]
-
-
-@router.get("/{expert_id}", response_model=ExpertInfo)
-async def get_expert_info(expert_id: str):
-    """
-    [INFO] Get information about a specific expert
-    """
-    expert = get_expert(expert_id)
-    if not expert:
-        raise HTTPException(status_code=404, detail=f"Expert '{expert_id}' not found")
-    
-    return ExpertInfo(
-        id=expert.id.value,
-        name=expert.name,
-        emoji=expert.emoji,
-        tagline=expert.tagline,
-        description=expert.description,
-        color=expert.color,
-        welcome_message=expert.welcome_message,
-        example_questions=expert.example_questions
-    )
-
-
-@router.post("/{expert_id}/chat", response_model=ExpertChatResponse)
-async def chat_with_expert(expert_id: str, body: ExpertChatRequest):
-    """
-    [CHAT] Chat with a specialized AI expert
-    
-    The expert will:
-    1. Fetch relevant data from its connected APIs
-    2. Use its specialized personality and knowledge
-    3. Provide contextual, domain-specific responses
-    """
-    start_time = time.time()
-    
-    # Générer session_id si non fourni
-    import uuid
-    session_id = body.session_id or f"session_{uuid.uuid4().hex[:12]}"
-    
-    # Get expert config
-    expert = get_expert(expert_id)
-    if not expert:
-        raise HTTPException(status_code=404, detail=f"Expert '{expert_id}' not found")
-    
-    # Détecter les questions sensibles qui ne doivent pas être cachées
-    sensitive_keywords = [
-        "élection", "election", "président", "president", "biden", "trump",
-        "aujourd'hui", "today", "maintenant", "now", "actuel", "current"
-    ]
-    is_sensitive = any(kw in body.message.lower() for kw in sensitive_keywords)
-    use_cache = not is_sensitive  # Désactiver cache pour questions sensibles
-    
-    # Check cache first (avec session_id pour permettre variation)
-    if use_cache:
-        cache_key = f"expert:{expert_id}:{session_id}:{body.message}"
-        cached = cache_service.get("expert_chat", cache_key)
-        if cached:
-            # Vérifier si la réponse est trop récente (moins de 2 minutes) - ignorer le cache pour éviter répétitions
-            cached_timestamp = cached.get("timestamp", 0)
-            cache_age = time.time() - cached_timestamp
-            
-            # Utiliser le cache seulement si la réponse a plus de 2 minutes (évite répétitions immédiates)
-            if cache_age > 120:  # 2 minutes
-                return ExpertChatResponse(
-                    expert_id=expert_id,
-                    expert_name=expert.name,
-                    response=cached["response"],
-                    session_id=session_id,
-                    sources=cached.get("sources", []),
-                    source="cache",
-                    processing_time_ms=(time.time() - start_time) * 1000
-                )
-            # Sinon, ignorer le cache pour forcer une nouvelle réponse (évite répétitions immédiates)
-    
-    # Récupérer l'historique de conversation
-    from services.conversation_manager import conversation_manager
-    history = conversation_manager.get_conversation_history(session_id, expert_id, limit=10)
-    history_context = conversation_manager.format_history_for_prompt(history)
-    
-    # Stocker le message utilisateur
-    conversation_manager.add_message(
-        session_id=session_id,
-        expert_id=expert_id,
-        role="user",
-        message=body.message
-    )
-    
-    # Fetch context data from expert's APIs
-    # PASSER le search_mode fourni par l'utilisateur
-    context, sources = await fetch_context_data(expert, body.message, search_mode_override=body.search_mode)
-    
-    # Auto-detect language: prioriser la langue du message si détectable, sinon utiliser celle fournie
-    # Si le message est clairement dans une langue différente de celle fournie, utiliser la langue du message
-    detected_lang = detect_language(body.message)
-    if body.language and detected_lang != body.language:
-        # Si la langue détectée du message est différente de celle fournie, prioriser le message
-        # Sauf si le message est trop court (< 10 caractères) ou ambigu
-        if len(body.message.strip()) > 10:
-            language = detected_lang
-            logger.debug(f"Language mismatch: provided={body.language}, detected={detected_lang}, using detected")
-        else:
-            language = body.language
-    else:
-        language = body.language or detected_lang
-    
-    # Add current date/time to context (critical for date-aware experts)
-    date_info = get_current_datetime_context(language)
-    context = date_info + "\n\n" + context
-    
-    # Injecter l'historique dans le contexte
-    if history_context:
-        context = history_context + "\n\n" + context
-    
-    # Determin System Prompt Base
-    base_system_prompt = expert.system_prompt
-    
-    # SPECIAL HANDLING FOR HEALTH EXPERT: Use mode-specific prompts
-    if expert_id == "health":
-        try:
-            from services.intent_detector import get_search_mode
-            from services.health_prompts_by_mode import get_health_prompt_by_mode, get_mode_from_search
-            
-            # Use user override or auto-detect
-            if body.search_mode:
-                search_mode = body.search_mode
-                logger.info(f"Health prompt using USER override: {search_mode}")
-            else:
-                search_mode = get_search_mode(body.message, expert_id)
-                logger.info(f"Health prompt auto-detect: {search_mode}")
-            
-            mode = get_mode_from_search(search_mode)
-            base_system_prompt = get_health_prompt_by_mode(mode)
-            logger.info(f"Health Expert switched to prompt mode: {mode}")
-            
-        except ImportError:
-            logger.warning("health_prompts_by_mode module not found, using default prompt")
-        except Exception as e:
-            logger.error(f"Error switching health prompt: {e}")
-
-    # Build system prompt with context
-    system_prompt = base_system_prompt.replace("{context}", context)
-    
-    # Add language instruction
-    lang_instruction = get_language_instruction(language)
-    system_prompt += f"\n\n{lang_instruction}"
-    
-    # Add instruction to avoid repeating welcome message
-    system_prompt += f"\n\nIMPORTANT: Ne répète JAMAIS le message d'introduction ou de bienvenue. Réponds directement à la question de l'utilisateur."
-    
-    # Améliorer le prompt avec le validateur
-    from services.ai_response_validator import ai_response_validator
-    system_prompt = ai_response_validator.enhance_system_prompt(
-        system_prompt,
-        body.message,
-        expert_type=expert_id
-    )
-    
-    # Route to AI avec retry automatique
-    max_retries = 3
-    retry_delay = 1.0
-    result = None
-    last_error = None
-    
-    for attempt in range(max_retries):
-        try:
-            result = await ai_router.route(
-                prompt=body.message,
-                system_prompt=system_prompt
-            )
-            break  # Succès, sortir de la boucle
-            
-        except Exception as e:
-            last_error = e
-            error_type = type(e).__name__
-            error_msg = str(e)[:200]  # Limiter la longueur du message
-            logger.warning(
-                f"Expert chat attempt {attempt + 1}/{max_retries} failed for {expert_id}: "
-                f"{error_type}: {error_msg}"
-            )
-            
-            if attempt < max_retries - 1:
-                # Attendre avant de réessayer (backoff exponentiel)
-                wait_time = retry_delay * (2 ** attempt)
-                logger.debug(f"Retrying in {wait_time:.1f}s...")
-                await asyncio.sleep(wait_time)
-            else:
-                # Dernière tentative échouée
-                logger.error(
-                    f"Expert chat error after {max_retries} attempts for {expert_id}: "
-                    f"{error_type}: {error_msg}",
-                    exc_info=True  # Inclure la stack trace complète
-                )
-                raise HTTPException(
-                    status_code=503, 
-                    detail=f"AI service temporarily unavailable after {max_retries} attempts. Please try again later."
-                )
-    
-    if not result:
-        raise HTTPException(status_code=503, detail="AI service temporarily unavailable")
-    
-    # Valider la réponse
-    is_valid, validation_details = ai_response_validator.validate_response(
-        response=result["response"],
-        query=body.message,
-        context=context,
-        expert_type=expert_id
-    )
-    
-    # Re-génération automatique pour hallucinations critiques et réponses invalides
-    confidence = validation_details.get("confidence_score", 1.0)
-    has_critical_hallucination = any(
-        "politique" in w.lower() and "électorale" in w.lower()
-        for w in validation_details.get("warnings", [])
-    )
-    repetition_detected = any("répétition" in w.lower() for w in validation_details.get("warnings", []))
-    
-    # Re-générer si : hallucination critique OU confiance < 0.5 OU répétitions détectées
-    should_regenerate = False
-    regenerate_reason = ""
-    
-    if has_critical_hallucination:
-        should_regenerate = True
-        regenerate_reason = "hallucination critique"
-    elif confidence < 0.5:
-        should_regenerate = True
-        regenerate_reason = "faible confiance"
-    elif repetition_detected:
-        should_regenerate = True
-        regenerate_reason = "répétitions détectées"
-    
-    if should_regenerate:
-        # Re-générer avec un prompt plus strict
-        logger.warning(f"Re-génération nécessaire pour {expert_id}: {regenerate_reason} (confidence: {confidence:.2f})")
-        
-        # Construire un prompt de vérification stricte selon le type de problème
-        strict_instructions = []
-        if has_critical_hallucination:
-            strict_instructions.append("[WARN] ATTENTION CRITIQUE: La réponse précédente contenait des informations potentiellement erronées. Vérifie TOUTES les informations factuelles avant de répondre. Si tu n'es pas sûr, dis-le clairement. Ne mentionne JAMAIS de résultats d'élections sans vérifier la date actuelle et les sources officielles.")
-        if confidence < 0.5:
-            strict_instructions.append("[WARN] IMPORTANT: La réponse précédente avait une faible confiance. Sois plus précis et factuel. Cite tes sources si possible.")
-        if repetition_detected:
-            strict_instructions.append("[WARN] IMPORTANT: La réponse précédente contenait des répétitions. Reformule différemment et évite de répéter les mêmes phrases.")
-        
-        strict_prompt = system_prompt + "\n\n" + "\n\n".join(strict_instructions)
-        
-        try:
-            result = await ai_router.route(
-                prompt=body.message,
-                system_prompt=strict_prompt
-            )
-            
-            # Re-valider
-            is_valid, validation_details = ai_response_validator.validate_response(
-                response=result["response"],
-                query=body.message,
-                context=context,
-                expert_type=expert_id
-            )
-            
-            confidence = validation_details.get("confidence_score", 1.0)
-            logger.info(f"Re-génération terminée pour {expert_id}: nouvelle confiance = {confidence:.2f}")
-        except Exception as e:
-            logger.error(f"Error during regeneration: {e}")
-    
-    # Si la réponse n'est toujours pas valide après re-génération, rejeter complètement si confiance très faible
-    if not is_valid or confidence < 0.3:
-        logger.warning(f"Invalid expert response for {expert_id}: confidence={confidence:.2f}, validation={validation_details}")
-        # Si confiance très faible, retourner quand même la réponse avec un avertissement plutôt que d'échouer
-        # Cela évite les erreurs "Désolé, je n'ai pas pu répondre" pour des questions valides
-        if confidence < 0.3:
-            # Au lieu de rejeter, ajouter un avertissement mais retourner quand même la réponse
-            logger.info(f"Low confidence response for {expert_id}, returning as-is (confidence: {confidence:.2f})")
-            # Ne pas ajouter de [WARN] - laisser la réponse naturelle
-    
-    # Stocker la réponse de l'IA dans la conversation
-    conversation_manager.add_message(
-        session_id=session_id,
-        expert_id=expert_id,
-        message=result["response"]
-    )
-    
-    # Cache the response
-    if use_cache:
-        cache_ttl = 600 if validation_details.get("confidence_score", 1.0) > 0.8 else 300
-        cache_service.set(
-            "expert_chat",
-            cache_key,
-            {
-                "response": result["response"],
-                "sources": sources,
-                "timestamp": time.time()
-            },
-            ttl=cache_ttl
-        )
-    
-    # Logging
-    processing_time = (time.time() - start_time) * 1000
-    logger.info(
-        f"Expert chat completed: expert={expert_id}, "
-        f"time={processing_time:.0f}ms, "
-        f"valid={is_valid}, "
-        f"sources={len(sources)}"
-    )
-    
-    return ExpertChatResponse(
-        expert_id=expert_id,
-        expert_name=expert.name,
-        response=result["response"],
-        session_id=session_id,
-        sources=sources,
-        source=result["source"],
-        processing_time_ms=processing_time
-    )
-
-
-@router.post("/{expert_id}/chat/stream")
-async def chat_with_expert_stream(expert_id: str, body: ExpertChatRequest):
-    """
-    [STREAM] Chat with a specialized AI expert (Streaming)
-    """
-    # Get expert config
-    expert = get_expert(expert_id)
-    if not expert:
-        raise HTTPException(status_code=404, detail=f"Expert '{expert_id}' not found")
-
-    # Generate session_id
-    import uuid
-    session_id = body.session_id or f"session_{uuid.uuid4().hex[:12]}"
-    
-    async def event_generator():
-        try:
-            # Update History
-            from services.conversation_manager import conversation_manager
-            conversation_manager.add_message(
-                session_id=session_id,
-                expert_id=expert_id,
-                role="user",
-                message=body.message
-            )
-            
-            # Fetch Data
-            context, sources = await fetch_context_data(expert, body.message)
-            
-            # Detect Language & Context
-            detected_lang = detect_language(body.message)
-            language = body.language or detected_lang
-            
-            history = conversation_manager.get_conversation_history(session_id, expert_id, limit=10)
-            history_context = conversation_manager.format_history_for_prompt(history)
-            
             date_info = get_current_datetime_context(language)
             full_context = f"{date_info}\n\n{context}"
             if history_context:
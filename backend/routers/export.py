@@ -1,13 +1,58 @@
-"""Export Router - Export search results in various formats"""
-from fastapi import APIRouter, HTTPException, Query
+"""Export Router - Export search results in various formats
+
+Exports de lignes (CSV / NDJSON / Markdown) générés en flux depuis des
+itérateurs asynchrones (services/export_stream): mémoire constante quelle que
+soit la taille, transfert chunked, gzip optionnel. Les exports de données
+stockées exigent un token et ne portent que sur les lignes de l'appelant.
+"""
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from fastapi.responses import StreamingResponse
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, AsyncIterator, List, Optional
 import json
-import csv
 import io
+import logging
+
+from services.auth import get_current_user
+from services.export_stream import EXPORT_FORMATS, encode_rows, iter_json_lines, iter_list, prefetch, spool_body
+from services.analytics.metrics_collector import metrics_collector
+from services.search_history import search_history_service
+from services.conversation_manager import conversation_manager
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/api/export", tags=["export"])
 
+FORMAT_PATTERN = "^(csv|ndjson|markdown)$"
+
+
+async def _stream_rows(
+    rows: AsyncIterator[Dict[str, Any]],
+    fmt: str,
+    filename: str,
+    gzip: bool = False,
+    columns: Optional[List[str]] = None
+) -> StreamingResponse:
+    """
+    Réponse chunked: lignes encodées au fil de l'eau (fichier .gz si gzip)
+
+    La première ligne est lue avant de répondre: une source invalide ou en
+    échec donne un vrai code d'erreur au lieu d'un 200 tronqué.
+    """
+    try:
+        rows = await prefetch(rows)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid export data")
+    except Exception as e:
+        logger.error(f"❌ Export failed: {e}")
+        raise HTTPException(status_code=500, detail="Export failed")
+    media_type, extension = EXPORT_FORMATS[fmt]
+    headers = {"Content-Disposition": f"attachment; filename={filename}.{extension}"}
+    if gzip:
+        media_type = "application/gzip"
+        headers["Content-Disposition"] += ".gz"
+        headers["Content-Encoding"] = "identity"  # Déjà compressé: GZipMiddleware ne recompresse pas
+    return StreamingResponse(encode_rows(rows, fmt, gzip=gzip, columns=columns), media_type=media_type, headers=headers)
+
 
 @router.post("/json")
 async def export_to_json(data: Dict[str, Any]):
@@ -33,46 +78,79 @@ async def export_to_json(data: Dict[str, Any]):
 @router.post("/csv")
 async def export_to_csv(
     data: List[Dict[str, Any]],
-    filename: str = Query("export", description="Filename without extension")
+    filename: str = Query("export", description="Filename without extension"),
+    format: str = Query("csv", pattern=FORMAT_PATTERN, description="csv, ndjson or markdown"),
+    gzip: bool = Query(False, description="Gzip-compressed file")
 ):
     """
     📊 Export data to CSV format
     
     Expects a list of dictionaries with the same keys
     """
-    try:
-        if not data:
-            raise HTTPException(status_code=400, detail="No data to export")
-        
-        output = io.StringIO()
-        
-        # Get headers from first item
-        headers = list(data[0].keys())
-        
-        writer = csv.DictWriter(output, fieldnames=headers)
-        writer.writeheader()
-        
-        for row in data:
-            # Flatten nested dicts
-            flat_row = {}
-            for key, value in row.items():
-                if isinstance(value, (dict, list)):
-                    flat_row[key] = json.dumps(value, ensure_ascii=False)
-                else:
-                    flat_row[key] = value
-            writer.writerow(flat_row)
-        
-        output.seek(0)
-        
-        return StreamingResponse(
-            output,
-            media_type="text/csv",
-            headers={
-                "Content-Disposition": f"attachment; filename={filename}.csv"
-            }
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=str(e))
+    if not data:
+        raise HTTPException(status_code=400, detail="No data to export")
+    return await _stream_rows(iter_list(data), format, filename, gzip)
+
+
+@router.post("/ndjson-upload")
+async def export_ndjson_upload(
+    request: Request,
+    filename: str = Query("export", description="Filename without extension"),
+    format: str = Query("csv", pattern=FORMAT_PATTERN, description="csv, ndjson or markdown"),
+    gzip: bool = Query(False, description="Gzip-compressed file")
+):
+    """
+    📤 Convert a large NDJSON body (one object per line)
+    
+    The body is spooled to a temporary file and converted line by line
+    """
+    rows = iter_json_lines(await spool_body(request.stream()))
+    return await _stream_rows(rows, format, filename, gzip)
+
+
+@router.get("/analytics")
+async def export_analytics(
+    table: str = Query("metrics", pattern="^(metrics|errors)$", description="metrics or errors"),
+    days: int = Query(7, ge=1, le=365, description="Nombre de jours"),
+    endpoint: Optional[str] = Query(None, description="Filtrer par endpoint"),
+    format: str = Query("csv", pattern=FORMAT_PATTERN),
+    gzip: bool = Query(False),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    📈 Export the caller's raw analytics rows (streamed)
+    """
+    rows = metrics_collector.iter_rows(current_user["user_id"], table=table, days=days, endpoint=endpoint)
+    return await _stream_rows(rows, format, f"analytics_{table}", gzip)
+
+
+@router.get("/search-history")
+async def export_search_history(
+    search_type: Optional[str] = Query(None, description="Filtrer par type"),
+    format: str = Query("csv", pattern=FORMAT_PATTERN),
+    gzip: bool = Query(False),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    🔎 Export the caller's search history (streamed, oldest first)
+    """
+    rows = search_history_service.iter_searches(current_user["user_id"], search_type=search_type)
+    return await _stream_rows(rows, format, "search_history", gzip)
+
+
+@router.get("/conversations")
+async def export_conversations(
+    session_id: Optional[str] = Query(None),
+    expert_id: Optional[str] = Query(None),
+    format: str = Query("ndjson", pattern=FORMAT_PATTERN),
+    gzip: bool = Query(False),
+    current_user: Dict[str, Any] = Depends(get_current_user)
+):
+    """
+    💬 Export the caller's expert conversation logs (streamed)
+    """
+    rows = conversation_manager.iter_messages(current_user["user_id"], session_id=session_id, expert_id=expert_id)
+    return await _stream_rows(rows, format, "conversations", gzip)
 
 
 @router.post("/markdown")
@@ -128,11 +206,15 @@ async def get_export_formats():
             {"format": "json", "description": "JSON format", "endpoint": "/api/export/json"},
             {"format": "csv", "description": "CSV format", "endpoint": "/api/export/csv"},
             {"format": "markdown", "description": "Markdown format", "endpoint": "/api/export/markdown"}
-        ]
+        ],
+        "uploads": [
+            {"format": "ndjson", "description": "NDJSON body converted line by line", "endpoint": "/api/export/ndjson-upload"}
+        ],
+        "streamed": [
+            {"source": "analytics", "endpoint": "/api/export/analytics"},
+            {"source": "search_history", "endpoint": "/api/export/search-history"},
+            {"source": "conversations", "endpoint": "/api/export/conversations"}
+        ],
+        "stream_formats": list(EXPORT_FORMATS),
+        "gzip": True
     }
-
-
-
-
-
-
@@ -5,13 +5,15 @@ Endpoints for crypto, stocks, and market data
 from fastapi import APIRouter, HTTPException
 from typing import Optional
 from services.external_apis import coingecko, alphavantage, yahoo_finance
+from services.external_apis.finance import crypto_price_attempts
+from services.hedging import hedger
 
 router = APIRouter(prefix="/api/finance", tags=["finance"])
 
 
 @router.get("/crypto/price/{coin_id}")
 async def get_crypto_price(coin_id: str, vs_currency: str = "usd"):
-    """Get cryptocurrency price from CoinGecko"""
+    """Get cryptocurrency price (CoinGecko, CoinCap as hedged backup)"""
     # Sanitize input
     from services.sanitizer import sanitize
     coin_id = sanitize(coin_id.lower(), max_length=50)
@@ -25,8 +27,9 @@ async def get_crypto_price(coin_id: str, vs_currency: str = "usd"):
         )
     
     try:
-        data = await coingecko.get_crypto_price(coin_id, vs_currency)
-        return {"success": True, "data": data, "source": "coingecko"}
+        # CoinGecko, doublé par CoinCap s'il tarde (services/hedging)
+        source, data = await hedger.run("finance", crypto_price_attempts(coin_id, vs_currency), operation="crypto_price")
+        return {"success": True, "data": data, "source": source}
     except HTTPException:
         raise
     except Exception as e:
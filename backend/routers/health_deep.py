@@ -18,9 +18,9 @@ async def check_redis() -> Dict[str, Any]:
     """Vérifier la connexion Redis"""
     try:
         from services.cache import cache_service
-        if cache_service.available:
+        if await cache_service.connect():
             # Test ping
-            if cache_service.redis.ping():
+            if await asyncio.to_thread(cache_service.redis.ping):
                 return {"status": "healthy", "type": "redis"}
         return {"status": "unavailable", "type": "redis"}
     except Exception as e:
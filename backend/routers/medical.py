@@ -3,7 +3,10 @@ Medical API Router
 Endpoints for medical research and drug information
 """
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from services.external_apis import pubmed, openfda
+from services.deep_research_report import deep_report_generator
+from services.report_render import REPORT_FORMATS
 
 router = APIRouter(prefix="/api/medical", tags=["medical"])
 
@@ -21,6 +24,36 @@ async def search_medical_research(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/research/report")
+async def deep_research_report(
+    query: str = Query(..., min_length=2, description="Report topic"),
+    format: str = Query("markdown", pattern="^(markdown|html|pdf)$", description="markdown, html or pdf")
+):
+    """
+    Deep medical research report (3000+ words), streamed section by section.
+    The multi-API search runs before the first byte; rendering is then streamed.
+    """
+    from services.smart_medical_router import smart_medical_search
+
+    try:
+        _, result = await smart_medical_search(query)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    media_type, extension = REPORT_FORMATS[format]
+    disposition = "attachment" if format == "pdf" else "inline"
+    return StreamingResponse(
+        deep_report_generator.stream_report(query, result, fmt=format),
+        media_type=media_type,
+        headers={
+            "Content-Disposition": f"{disposition}; filename=rapport-medical.{extension}",
+            "X-Accel-Buffering": "no",
+            # GZipMiddleware does not flush between chunks: keep the stream uncompressed
+            "Content-Encoding": "identity",
+        }
+    )
+
+
 @router.get("/drugs/search")
 async def search_drugs(
     query: str = Query(..., description="Drug name or condition"),
@@ -111,12 +111,76 @@ async def get_prometheus_metrics():
     
     Pour scraping par Prometheus
     """
+    content = metrics_collector.to_prometheus()
+    
+    # Histogramme de lag de la boucle (si LOOP_MONITOR_ENABLED)
+    from services.loop_monitor import loop_monitor
+    if loop_monitor.running:
+        content += "\n" + loop_monitor.to_prometheus()
+    
     return Response(
-        content=metrics_collector.to_prometheus(),
+        content=content,
         media_type="text/plain"
     )
 
 
+@router.get("/loop")
+async def get_loop_metrics(include_stacks: bool = True):
+    """
+    🩺 Lag de la boucle d'événements et derniers appels bloquants
+    
+    Chaque événement contient la durée du blocage, le request ID
+    et la stack capturée pendant le blocage.
+    """
+    from services.loop_monitor import loop_monitor
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        **loop_monitor.get_stats(include_stacks=include_stacks)
+    }
+
+
+@router.get("/semantic-cache")
+async def get_semantic_cache_metrics():
+    """
+    🧠 Cache sémantique des réponses IA
+    
+    Taux de hit global et par namespace, et appels LLM évités.
+    """
+    from services.semantic_cache import semantic_cache
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        **semantic_cache.get_stats()
+    }
+
+
+@router.get("/hedging")
+async def get_hedging_metrics():
+    """
+    🔀 Requêtes doublées (hedging) par catégorie
+    
+    Taux de doublure, doublures gagnantes, doublures refusées par le plafond.
+    """
+    from services.hedging import hedger
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        **hedger.get_stats()
+    }
+
+
+@router.get("/webhooks")
+async def get_webhook_metrics():
+    """
+    📬 File de livraison des webhooks
+    
+    Livraisons en attente / en cours / en échec définitif, workers, lots.
+    """
+    from services.webhooks import webhook_manager
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        **webhook_manager.get_status()
+    }
+
+
 @router.get("/summary")
 async def get_metrics_summary():
     """
@@ -4,10 +4,12 @@ Moteur de recherche unifié qui agrège TOUTES les APIs disponibles
 Test et intégration multiple APIs en un seul endpoint
 """
 from fastapi import APIRouter, HTTPException, Query
+from fastapi.responses import StreamingResponse
 from typing import Optional, Dict, Any, List
 from pydantic import BaseModel
 from services.ai_router import ai_router
 from services.cache import cache_service
+from services.search_ranking import CRYPTO_PRICE_PRIOR, QueryContext, merge_top_k, rank_category
 import asyncio
 import re
 import hashlib
@@ -17,13 +19,14 @@ import json
 from services.external_apis.weather import WeatherRouter
 from services.external_apis.geocoding import GeocodingRouter
 from services.external_apis.news import NewsRouter
-from services.external_apis.translation import TranslationRouter
 from services.external_apis.nutrition import NutritionRouter
 from services.external_apis.media import MediaRouter
 from services.external_apis.space import SpaceRouter
 from services.external_apis.sports import SportsRouter
 from services.external_apis import coingecko, yahoo_finance, alphavantage
+from services.external_apis.finance import crypto_price_attempts
 from services.external_apis.entertainment import tmdb
+from services.hedging import hedger
 
 router = APIRouter(prefix="/api/search", tags=["search"])
 
@@ -31,7 +34,6 @@ router = APIRouter(prefix="/api/search", tags=["search"])
 weather_router = WeatherRouter()
 geocoding_router = GeocodingRouter()
 news_router = NewsRouter()
-translation_router = TranslationRouter()
 nutrition_router = NutritionRouter()
 media_router = MediaRouter()
 space_router = SpaceRouter()
@@ -44,6 +46,7 @@ class SearchRequest(BaseModel):
     categories: Optional[List[str]] = None  # ["finance", "news", "weather", etc.]
     max_results_per_category: int = 5
     language: str = "fr"
+    include_summary: bool = False  # Résumé IA (appel LLM): hors du chemin par défaut
 
 
 class SearchResult(BaseModel):
@@ -64,41 +67,10 @@ class SearchResponse(BaseModel):
     results: Dict[str, List[SearchResult]]
     ai_summary: Optional[str] = None
     suggested_queries: List[str] = []
+    top_results: List[SearchResult] = []  # Meilleurs résultats toutes catégories confondues
     performance: Optional[Dict[str, Any]] = None  # Métriques de performance
 
 
-def calculate_relevance_score(query: str, result_title: str, result_content: Any, category: str) -> float:
-    """
-    Calcule un score de pertinence amélioré pour un résultat
-    Score basé sur :
-    - Présence des mots-clés dans le titre (poids fort)
-    - Présence dans le contenu (poids moyen)
-    - Catégorie détectée (bonus)
-    """
-    query_words = set(query.lower().split())
-    title_lower = result_title.lower()
-    content_str = str(result_content).lower() if result_content else ""
-    
-    # Score de base
-    score = 0.5
-    
-    # Bonus pour mots dans le titre (poids 0.3 par mot)
-    title_matches = sum(1 for word in query_words if word in title_lower)
-    score += min(title_matches * 0.3, 0.9)
-    
-    # Bonus pour mots dans le contenu (poids 0.1 par mot)
-    content_matches = sum(1 for word in query_words if word in content_str)
-    score += min(content_matches * 0.1, 0.3)
-    
-    # Bonus si catégorie correspond à l'intention détectée
-    intents = detect_search_intent(query)
-    if intents.get(category, False):
-        score += 0.1
-    
-    # Normaliser entre 0 et 1
-    return min(score, 1.0)
-
-
 def detect_search_intent(query: str) -> Dict[str, bool]:
     """
     Détecte l'intention de recherche pour router vers les bonnes APIs
@@ -162,14 +134,16 @@ async def search_finance(query: str, max_results: int = 5) -> List[SearchResult]
             # Recherche crypto
             coin_id = "bitcoin" if "bitcoin" in query.lower() or "btc" in query.lower() else "ethereum"
             try:
-                price_data = await coingecko.get_crypto_price(coin_id, "usd")
+                source, price_data = await hedger.run(
+                    "finance", crypto_price_attempts(coin_id, "usd", primary=coingecko), operation="crypto_price"
+                )
                 title = f"Prix {coin_id.upper()}"
                 results.append(SearchResult(
                     category="finance",
                     title=title,
                     content=price_data,
-                    source="CoinGecko",
-                    relevance_score=calculate_relevance_score(query, title, price_data, "finance"),
+                    source="CoinGecko" if source == "coingecko" else "CoinCap",
+                    relevance_score=CRYPTO_PRICE_PRIOR,
                     url=f"https://www.coingecko.com/en/coins/{coin_id}"
                 ))
             except:
@@ -462,17 +436,116 @@ async def search_media(query: str, max_results: int = 5) -> List[SearchResult]:
     return results
 
 
-def _generate_cache_key(query: str, categories: Optional[List[str]], max_results: int, language: str) -> str:
+def _generate_cache_key(query: str, categories: Optional[List[str]], max_results: int, language: str,
+                        include_summary: bool = False) -> str:
     """Génère une clé de cache unique pour une requête"""
-    cache_data = json.dumps({
+    params = {
         "query": query.lower().strip(),
         "categories": sorted(categories) if categories else None,
         "max_results": max_results,
         "language": language
-    }, sort_keys=True)
+    }
+    if include_summary:
+        params["summary"] = True
+    cache_data = json.dumps(params, sort_keys=True)
     return hashlib.md5(cache_data.encode()).hexdigest()
 
 
+ALL_CATEGORIES = ["finance", "news", "weather", "location", "medical",
+                  "entertainment", "nutrition", "space", "sports", "media"]
+
+# Budget de temps par catégorie pour le streaming (secondes)
+CATEGORY_TIME_BUDGETS = {
+    "finance": 4.0,
+    "news": 5.0,
+    "weather": 4.0,
+    "geocoding": 4.0,
+    "medical": 8.0,
+    "entertainment": 5.0,
+    "nutrition": 5.0,
+    "space": 5.0,
+    "sports": 5.0,
+    "media": 5.0,
+}
+DEFAULT_CATEGORY_BUDGET = 5.0
+
+
+def _resolve_categories(intents: Dict[str, bool], categories: Optional[List[str]]) -> List[str]:
+    """Catégories demandées, sinon détectées, sinon toutes"""
+    if categories:
+        return categories
+    detected = [cat for cat, should_search in intents.items() if should_search]
+    return detected or list(ALL_CATEGORIES)
+
+
+def _build_search_tasks(query: str, categories: List[str], max_results: int, language: str) -> List[tuple]:
+    """Coroutines de recherche (catégorie, coroutine) pour les catégories demandées"""
+    search_tasks = []
+    
+    if "finance" in categories:
+        search_tasks.append(("finance", search_finance(query, max_results)))
+    
+    if "news" in categories:
+        search_tasks.append(("news", search_news(query, language, max_results)))
+    
+    if "weather" in categories:
+        search_tasks.append(("weather", search_weather(query, max_results)))
+    
+    if "location" in categories or "geocoding" in categories:
+        search_tasks.append(("geocoding", search_location(query, max_results)))
+    
+    if "medical" in categories:
+        search_tasks.append(("medical", search_medical(query, max_results)))
+    
+    if "entertainment" in categories:
+        search_tasks.append(("entertainment", search_entertainment(query, max_results)))
+    
+    if "nutrition" in categories:
+        search_tasks.append(("nutrition", search_nutrition(query, max_results)))
+    
+    if "space" in categories:
+        search_tasks.append(("space", search_space(query, max_results)))
+    
+    if "sports" in categories:
+        search_tasks.append(("sports", search_sports(query, max_results)))
+    
+    if "media" in categories:
+        search_tasks.append(("media", search_media(query, max_results)))
+    
+    return search_tasks
+
+
+async def _generate_ai_summary(query: str, results_dict: Dict[str, List[SearchResult]], total_results: int) -> Optional[str]:
+    """Résumé IA des résultats (None si aucun résultat ou IA indisponible)"""
+    if total_results == 0:
+        return None
+    try:
+        summary_prompt = f"""
+        Résume les résultats de recherche suivants pour la requête : "{query}"
+        
+        Catégories trouvées : {', '.join(results_dict.keys())}
+        Nombre total de résultats : {total_results}
+        
+        Donne un résumé concis en français de ce qui a été trouvé.
+        """
+        ai_response = await ai_router.route(prompt=summary_prompt)
+        return ai_response.get("response", "")
+    except Exception:
+        return None
+
+
+def _suggest_queries(query: str, total_results: int) -> List[str]:
+    """Suggestions de requêtes quand rien n'a été trouvé"""
+    if total_results > 0:
+        return []
+    return [
+        f"{query} actualités",
+        f"{query} prix",
+        f"{query} météo",
+        f"informations sur {query}"
+    ]
+
+
 @router.post("/universal", response_model=SearchResponse)
 async def universal_search(request: SearchRequest):
     """
@@ -492,6 +565,9 @@ async def universal_search(request: SearchRequest):
     
     Les recherches sont exécutées en parallèle pour une réponse ultra-rapide !
     Cache Redis activé pour améliorer les performances (TTL: 5 minutes).
+    Intentions détectées par heuristique; le résumé IA (appel LLM) n'est
+    généré qu'avec `include_summary: true`.
+    Variante streaming (résultats par catégorie dès qu'ils arrivent) : POST /api/search/universal/stream
     """
     query = request.query
     categories = request.categories
@@ -499,7 +575,7 @@ async def universal_search(request: SearchRequest):
     language = request.language
     
     # Vérifier le cache Redis
-    cache_key = _generate_cache_key(query, categories, max_results, language)
+    cache_key = _generate_cache_key(query, categories, max_results, language, request.include_summary)
     cached_result = cache_service.get("search", cache_key)
     
     if cached_result:
@@ -509,48 +585,14 @@ async def universal_search(request: SearchRequest):
         cached_result["performance"]["total_time_ms"] = 0.1  # Très rapide depuis cache
         return SearchResponse(**cached_result)
     
+    # Requête préparée une fois (tokens + intentions) pour le classement
+    ranking = QueryContext.build(query, detect_search_intent(query))
+    
     # Détecter les intentions si catégories non spécifiées
-    if not categories:
-        intents = detect_search_intent(query)
-        categories = [cat for cat, should_search in intents.items() if should_search]
-        
-        # Si aucune intention détectée, chercher partout
-        if not categories:
-            categories = ["finance", "news", "weather", "location", "medical", 
-                          "entertainment", "nutrition", "space", "sports", "media"]
+    categories = _resolve_categories(ranking.intents, categories)
     
     # Préparer toutes les recherches en parallèle
-    search_tasks = []
-    
-    if "finance" in categories:
-        search_tasks.append(("finance", search_finance(query, max_results)))
-    
-    if "news" in categories:
-        search_tasks.append(("news", search_news(query, language, max_results)))
-    
-    if "weather" in categories:
-        search_tasks.append(("weather", search_weather(query, max_results)))
-    
-    if "location" in categories or "geocoding" in categories:
-        search_tasks.append(("geocoding", search_location(query, max_results)))
-    
-    if "medical" in categories:
-        search_tasks.append(("medical", search_medical(query, max_results)))
-    
-    if "entertainment" in categories:
-        search_tasks.append(("entertainment", search_entertainment(query, max_results)))
-    
-    if "nutrition" in categories:
-        search_tasks.append(("nutrition", search_nutrition(query, max_results)))
-    
-    if "space" in categories:
-        search_tasks.append(("space", search_space(query, max_results)))
-    
-    if "sports" in categories:
-        search_tasks.append(("sports", search_sports(query, max_results)))
-    
-    if "media" in categories:
-        search_tasks.append(("media", search_media(query, max_results)))
+    search_tasks = _build_search_tasks(query, categories, max_results, language)
     
     # Exécuter toutes les recherches en parallèle avec timing
     import time
@@ -567,41 +609,19 @@ async def universal_search(request: SearchRequest):
             if isinstance(results, Exception):
                 results_dict[category] = []
             else:
-                # Trier par score de pertinence décroissant
-                results.sort(key=lambda x: x.relevance_score, reverse=True)
-                results_dict[category] = results
+                # Scorer en lot (BM25 titre/contenu) et trier par pertinence
+                results_dict[category] = rank_category(ranking, category, results)
     
     total_time = time.time() - start_time
     
     # Compter le total
     total_results = sum(len(results) for results in results_dict.values())
     
-    # Générer un résumé IA si on a des résultats
-    ai_summary = None
-    if total_results > 0:
-        try:
-            summary_prompt = f"""
-            Résume les résultats de recherche suivants pour la requête : "{query}"
-            
-            Catégories trouvées : {', '.join(results_dict.keys())}
-            Nombre total de résultats : {total_results}
-            
-            Donne un résumé concis en français de ce qui a été trouvé.
-            """
-            ai_response = await ai_router.chat(summary_prompt, max_tokens=200)
-            ai_summary = ai_response.get("content", "")
-        except:
-            pass
+    # Générer un résumé IA si demandé et si on a des résultats
+    ai_summary = await _generate_ai_summary(query, results_dict, total_results) if request.include_summary else None
     
     # Générer des suggestions de requêtes
-    suggested_queries = []
-    if total_results == 0:
-        suggested_queries = [
-            f"{query} actualités",
-            f"{query} prix",
-            f"{query} météo",
-            f"informations sur {query}"
-        ]
+    suggested_queries = _suggest_queries(query, total_results)
     
     # Créer la réponse avec métriques de performance
     response = SearchResponse(
@@ -611,6 +631,7 @@ async def universal_search(request: SearchRequest):
         results={cat: [r.dict() for r in results] for cat, results in results_dict.items()},
         ai_summary=ai_summary,
         suggested_queries=suggested_queries,
+        top_results=merge_top_k(results_dict, max_results),
         performance={
             "total_time_ms": round(total_time * 1000, 2),
             "categories_count": len(results_dict),
@@ -624,6 +645,159 @@ async def universal_search(request: SearchRequest):
     return response
 
 
+class SearchStreamRequest(SearchRequest):
+    """Request for streaming universal search"""
+    time_budgets: Optional[Dict[str, float]] = None  # Surcharge des budgets par catégorie (secondes)
+
+
+def _encode_frame(frame: Dict[str, Any], fmt: str) -> str:
+    """Encoder une frame en NDJSON ou en événement SSE"""
+    data = json.dumps(frame, ensure_ascii=False, default=str)
+    if fmt == "sse":
+        return f"event: {frame['type']}\ndata: {data}\n\n"
+    return data + "\n"
+
+
+async def _run_category(category: str, coro, budget: float, ranking: QueryContext) -> tuple:
+    """Exécuter une recherche sous budget: (catégorie, résultats, statut, durée ms)"""
+    import time
+    start = time.time()
+    try:
+        results = await asyncio.wait_for(coro, timeout=budget)
+        status = "ok"
+    except asyncio.TimeoutError:
+        results, status = [], "timeout"
+    except Exception:
+        results, status = [], "error"
+    return category, rank_category(ranking, category, results), status, round((time.time() - start) * 1000, 2)
+
+
+async def _stream_universal_search(request: SearchStreamRequest, fmt: str):
+    """Générateur de frames: catégories au fil de l'eau, résumé IA, puis `done`"""
+    import time
+    start_time = time.time()
+    query = request.query
+    max_results = request.max_results_per_category
+    language = request.language
+    
+    cache_key = _generate_cache_key(query, request.categories, max_results, language, request.include_summary)
+    cached_result = cache_service.get("search", cache_key)
+    if cached_result:
+        for category, results in cached_result["results"].items():
+            yield _encode_frame({"type": "category", "category": category, "status": "ok",
+                                 "count": len(results), "results": results, "time_ms": 0.0}, fmt)
+        yield _encode_frame({"type": "summary", "ai_summary": cached_result.get("ai_summary"),
+                             "suggested_queries": cached_result.get("suggested_queries", [])}, fmt)
+        performance = dict(cached_result.get("performance") or {})
+        performance.update({"cached": True, "total_time_ms": round((time.time() - start_time) * 1000, 2)})
+        yield _encode_frame({"type": "done", "query": query, "total_results": cached_result["total_results"],
+                             "categories_searched": cached_result["categories_searched"],
+                             "top_results": cached_result.get("top_results", []),
+                             "performance": performance}, fmt)
+        return
+    
+    ranking = QueryContext.build(query, detect_search_intent(query))
+    categories = _resolve_categories(ranking.intents, request.categories)
+    budgets = {**CATEGORY_TIME_BUDGETS, **(request.time_budgets or {})}
+    pending = [
+        asyncio.create_task(_run_category(category, coro, budgets.get(category, DEFAULT_CATEGORY_BUDGET), ranking))
+        for category, coro in _build_search_tasks(query, categories, max_results, language)
+    ]
+    
+    results_dict: Dict[str, List[SearchResult]] = {}
+    category_times: Dict[str, float] = {}
+    incomplete: Dict[str, str] = {}
+    first_result_ms = None
+    try:
+        for next_done in asyncio.as_completed(pending):
+            category, results, status, elapsed_ms = await next_done
+            results_dict[category] = results
+            category_times[category] = elapsed_ms
+            if status != "ok":
+                incomplete[category] = status
+            if first_result_ms is None:
+                first_result_ms = round((time.time() - start_time) * 1000, 2)
+            yield _encode_frame({"type": "category", "category": category, "status": status,
+                                 "count": len(results), "results": [r.dict() for r in results],
+                                 "time_ms": elapsed_ms}, fmt)
+    finally:
+        # Client déconnecté: ne pas laisser tourner les recherches restantes
+        for task in pending:
+            if not task.done():
+                task.cancel()
+    
+    search_time = time.time() - start_time
+    total_results = sum(len(results) for results in results_dict.values())
+    top_results = merge_top_k(results_dict, max_results)
+    ai_summary = await _generate_ai_summary(query, results_dict, total_results) if request.include_summary else None
+    suggested_queries = _suggest_queries(query, total_results)
+    yield _encode_frame({"type": "summary", "ai_summary": ai_summary, "suggested_queries": suggested_queries}, fmt)
+    
+    total_time = time.time() - start_time
+    performance = {
+        "total_time_ms": round(search_time * 1000, 2),
+        "categories_count": len(results_dict),
+        "cached": False,
+        "time_to_first_category_ms": first_result_ms,
+        "category_times_ms": category_times,
+        "incomplete_categories": incomplete,
+        "stream_time_ms": round(total_time * 1000, 2),
+    }
+    yield _encode_frame({"type": "done", "query": query, "total_results": total_results,
+                         "categories_searched": list(results_dict.keys()),
+                         "top_results": [r.dict() for r in top_results], "performance": performance}, fmt)
+    
+    # Réponse complète en cache (même format que /universal); une réponse partielle
+    # (catégorie hors budget ou en erreur) ne doit pas être resservie par /universal
+    if incomplete:
+        return
+    response = SearchResponse(
+        query=query,
+        total_results=total_results,
+        categories_searched=list(results_dict.keys()),
+        results={cat: [r.dict() for r in results] for cat, results in results_dict.items()},
+        ai_summary=ai_summary,
+        suggested_queries=suggested_queries,
+        top_results=top_results,
+        performance={"total_time_ms": performance["total_time_ms"],
+                     "categories_count": len(results_dict), "cached": False}
+    )
+    cache_service.set("search", cache_key, response.dict(), ttl=300)
+
+
+@router.post("/universal/stream")
+async def universal_search_stream(
+    request: SearchStreamRequest,
+    format: str = Query("ndjson", pattern="^(ndjson|sse)$", description="ndjson ou sse")
+):
+    """
+    🔍 MOTEUR DE RECHERCHE UNIVERSEL (streaming)
+    
+    Émet une frame par catégorie dès qu'elle est terminée (triée par pertinence),
+    puis le résumé IA (si `include_summary`), puis une frame `done` avec le bloc performance :
+    
+        {"type": "category", "category": "finance", "status": "ok", "results": [...]}
+        {"type": "summary", "ai_summary": "...", "suggested_queries": []}
+        {"type": "done", "total_results": 12, "performance": {...}}
+    
+    Chaque catégorie a un budget de temps (`time_budgets` pour le surcharger) ;
+    une catégorie hors budget est émise vide avec `status: "timeout"`.
+    La réponse est mise en cache comme pour /universal seulement si toutes les
+    catégories ont abouti.
+    """
+    media_type = "text/event-stream" if format == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        _stream_universal_search(request, format),
+        media_type=media_type,
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            # GZipMiddleware ne flush pas entre les chunks: désactiver pour garder le streaming
+            "Content-Encoding": "identity",
+        }
+    )
+
+
 @router.get("/quick")
 async def quick_search(
     q: str = Query(..., description="Query de recherche"),
@@ -4,14 +4,11 @@ Endpoints for translation with intelligent fallback
 """
 from fastapi import APIRouter, HTTPException, Query
 from pydantic import BaseModel
-from typing import Optional
-from services.external_apis.translation import TranslationRouter
+from typing import List, Optional
+from services.external_apis.translation import translation_router
 
 router = APIRouter(prefix="/api/translation", tags=["translation"])
 
-# Initialize translation router
-translation_router = TranslationRouter()
-
 
 class TranslateRequest(BaseModel):
     text: str
@@ -19,6 +16,13 @@ class TranslateRequest(BaseModel):
     target_lang: str = 'en'
 
 
+class BatchTranslateRequest(BaseModel):
+    segments: Optional[List[str]] = None
+    document: Optional[str] = None  # Split line by line, reassembled in the response
+    source_lang: Optional[str] = 'auto'
+    target_lang: str = 'en'
+
+
 class DetectRequest(BaseModel):
     text: str
 
@@ -41,6 +45,32 @@ async def translate_text(request: TranslateRequest):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/batch")
+async def translate_batch(request: BatchTranslateRequest):
+    """
+    Translate many segments or a multi-line document
+    
+    Duplicate segments and previously translated ones are not sent to providers;
+    the rest goes out in provider-sized batches.
+    """
+    if (request.segments is None) == (request.document is None):
+        raise HTTPException(status_code=400, detail="Provide either segments or document")
+    
+    segments = request.segments if request.segments is not None else request.document.split("\n")
+    try:
+        result = await translation_router.translate_batch(
+            segments,
+            source_lang=request.source_lang,
+            target_lang=request.target_lang
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    if request.document is not None:
+        result["document"] = "\n".join(result.pop("translations"))
+    return {"success": True, **result}
+
+
 @router.post("/detect")
 async def detect_language(request: DetectRequest):
     """Detect language of text"""
@@ -2,7 +2,8 @@
 Video AI Router
 Endpoints pour création de vidéos avec avatars IA parlants
 """
-from fastapi import APIRouter, HTTPException, Query, BackgroundTasks
+from fastapi import APIRouter, HTTPException, Query, Header
+from fastapi.responses import StreamingResponse
 from typing import Optional, Dict, Any
 from pydantic import BaseModel
 from services.video.video_router import video_router
@@ -11,7 +12,9 @@ from services.video.storage_manager import video_storage
 from services.video.course_generator import course_generator
 from services.video.greeting_generator import greeting_generator
 from services.video.video_translator import video_translator
+from services.video.tts_provider import TTSQueueFull
 import asyncio
+import json
 
 router = APIRouter(prefix="/api/video", tags=["video"])
 
@@ -25,17 +28,31 @@ class CreateAvatarRequest(BaseModel):
     use_free: bool = False  # Utiliser solutions gratuites uniquement
 
 
+class CreateCourseRequest(BaseModel):
+    """Request pour générer un cours vidéo"""
+    topic: str
+    duration_minutes: int = 5
+    language: str = "fr"
+    avatar_id: str = "anna"
+    include_quiz: bool = True
+
+
 class VideoStatusResponse(BaseModel):
     """Response pour statut vidéo"""
     video_id: str
-    status: str  # processing, done, error
+    status: str  # queued, submitting, processing, done, error
     result_url: Optional[str] = None
     provider: str
     created_at: Optional[str] = None
+    job_id: Optional[str] = None
+    error: Optional[str] = None
 
 
 @router.post("/avatar/create")
-async def create_talking_avatar(request: CreateAvatarRequest, background_tasks: BackgroundTasks):
+async def create_talking_avatar(
+    request: CreateAvatarRequest,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key")
+):
     """
     🎬 Créer une vidéo avec avatar parlant
     
@@ -56,6 +73,9 @@ async def create_talking_avatar(request: CreateAvatarRequest, background_tasks:
     **Validation:**
     - Texte: 1-500 caractères
     - Durée estimée: 1-2 minutes
+    
+    **File persistante:** une demande identique (ou de même `Idempotency-Key`)
+    réutilise le rendu en cours ou terminé au lieu d'en payer un nouveau.
     """
     try:
         # Validation texte
@@ -86,42 +106,36 @@ async def create_talking_avatar(request: CreateAvatarRequest, background_tasks:
                 detail=f"Avatar invalide. Disponibles: {', '.join(valid_avatars)}"
             )
         
-        # Créer la vidéo
-        result = await video_router.create_talking_avatar(
-            text=text,
-            avatar_id=request.avatar_id,
-            voice_id=request.voice_id,
-            language=request.language,
-            use_free=request.use_free
-        )
-        
-        video_id = result.get("video_id")
-        provider = result.get("provider", "d-id")
+        if not video_router.providers:
+            raise HTTPException(status_code=503, detail="No video provider available")
         
-        # Ajouter à la queue
-        video_queue.add_to_queue(
-            video_id=video_id,
-            status="processing",
-            provider=provider
+        # Inscrire le rendu (soumission au provider par le planificateur)
+        job = await asyncio.to_thread(
+            video_queue.submit,
+            kind="avatar",
+            params={
+                "text": text,
+                "avatar_id": request.avatar_id,
+                "voice_id": request.voice_id,
+                "language": request.language,
+                "use_free": request.use_free
+            },
+            provider="d-id",
+            key=idempotency_key
         )
-        
-        # Sauvegarder les infos
-        video_storage.save_video_info(
-            video_id=video_id,
-            provider=provider,
-            video_url=result.get("status_url")
-        )
-        
-        # Tâche de fond: vérifier le statut périodiquement
-        background_tasks.add_task(check_video_status_periodically, video_id, provider)
+        video_queue.start()
         
         return {
             "success": True,
-            "video_id": video_id,
-            "status_url": result.get("status_url"),
-            "provider": provider,
+            "video_id": job["video_id"],
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "deduplicated": job["deduplicated"],
+            "status_url": f"/api/video/status/{job['job_id']}",
+            "result_url": job.get("result_url"),
+            "provider": job["provider"],
             "message": "Vidéo en cours de génération. Utilisez /status/{video_id} pour vérifier.",
-            "estimated_time_seconds": 120  # 2 minutes estimées
+            "estimated_time_seconds": 0 if job["status"] == "done" else 120  # 2 minutes estimées
         }
     
     except HTTPException:
@@ -130,41 +144,6 @@ async def create_talking_avatar(request: CreateAvatarRequest, background_tasks:
         raise HTTPException(status_code=500, detail=str(e))
 
 
-async def check_video_status_periodically(video_id: str, provider: str, max_checks: int = 30):
-    """Vérifier le statut d'une vidéo périodiquement en arrière-plan"""
-    for i in range(max_checks):
-        await asyncio.sleep(10)  # Attendre 10 secondes entre chaque vérification
-        
-        try:
-            status = await video_router.get_video_status(video_id, provider)
-            current_status = status.get("status", "unknown")
-            
-            # Mettre à jour la queue
-            video_queue.update_status(
-                video_id=video_id,
-                status=current_status,
-                result_url=status.get("result_url")
-            )
-            
-            # Si terminé, mettre à jour le stockage
-            if current_status == "done":
-                result_url = status.get("result_url")
-                if result_url:
-                    video_storage.save_video_info(
-                        video_id=video_id,
-                        provider=provider,
-                        video_url=result_url
-                    )
-                break
-            
-            if current_status == "error":
-                break
-        
-        except Exception as e:
-            print(f"Error checking video status: {e}")
-            break
-
-
 @router.get("/status/{video_id}")
 async def get_video_status(
     video_id: str,
@@ -176,49 +155,30 @@ async def get_video_status(
     Vérifie si la vidéo est prête et retourne l'URL de téléchargement si disponible.
     
     **Status possibles:**
+    - `queued` / `submitting`: En attente d'une place chez le provider
     - `processing`: Vidéo en cours de génération
     - `done`: Vidéo prête (result_url disponible)
     - `error`: Erreur lors de la génération
     """
     try:
-        # Vérifier d'abord dans la queue locale
-        queue_status = video_queue.get_status(video_id)
-        
-        if queue_status and queue_status.get("status") == "done":
-            # Retourner depuis la queue
-            storage_info = video_storage.get_video_info(video_id)
+        # File persistante: état partagé par tous les workers, statut tenu à jour par le planificateur
+        job = await asyncio.to_thread(video_queue.get_job, video_id)
+        if job:
             return VideoStatusResponse(
-                video_id=video_id,
-                status="done",
-                result_url=storage_info.get("video_url") if storage_info else None,
-                provider=provider,
-                created_at=queue_status.get("created_at")
+                video_id=job["video_id"],
+                status=job["status"],
+                result_url=job.get("result_url"),
+                provider=job["provider"],
+                created_at=job["created_at"],
+                job_id=job["job_id"],
+                error=job.get("error")
             )
         
-        # Sinon, vérifier avec le provider
+        # Vidéo inconnue de la file: interroger le provider
         status = await video_router.get_video_status(video_id, provider)
-        current_status = status.get("status", "unknown")
-        
-        # Mettre à jour la queue
-        video_queue.update_status(
-            video_id=video_id,
-            status=current_status,
-            result_url=status.get("result_url")
-        )
-        
-        # Si terminé, sauvegarder
-        if current_status == "done":
-            result_url = status.get("result_url")
-            if result_url:
-                video_storage.save_video_info(
-                    video_id=video_id,
-                    provider=provider,
-                    video_url=result_url
-                )
-        
         return VideoStatusResponse(
             video_id=video_id,
-            status=current_status,
+            status=status.get("status", "unknown"),
             result_url=status.get("result_url"),
             provider=status.get("provider", provider),
             created_at=status.get("created_at")
@@ -231,21 +191,26 @@ async def get_video_status(
 @router.post("/audio/generate")
 async def generate_audio(
     text: str = Query(..., description="Texte à convertir en audio"),
-    language: str = Query("fr", description="Langue (fr, en, es, etc.)")
+    language: str = Query("fr", description="Langue (fr, en, es, etc.)"),
+    voice: Optional[str] = Query(None, description="ID de la voix")
 ):
     """
     🔊 Générer audio à partir de texte
     
     Utilise Coqui TTS (gratuit) ou ElevenLabs si disponible.
+    Un texte déjà synthétisé (même langue et voix) est servi depuis le cache.
     """
     try:
-        result = await video_router.generate_audio(text, language)
+        result = await video_router.generate_audio(text, language, voice)
         return {
             "success": True,
             "audio_path": result.get("audio_path"),
             "provider": result.get("provider"),
-            "format": result.get("format")
+            "format": result.get("format"),
+            "cached": result.get("cached", False)
         }
+    except TTSQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -291,6 +256,79 @@ async def get_available_voices(
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/course")
+async def create_course(request: CreateCourseRequest):
+    """
+    🎓 Générer un cours vidéo
+    
+    Lance la génération en tâche de fond: contenu, vidéos des sections en
+    parallèle, quiz pendant le rendu. Suivre la progression via
+    /api/video/course/{course_id}.
+    """
+    course = course_generator.start_course(
+        request.topic,
+        duration_minutes=request.duration_minutes,
+        language=request.language,
+        avatar_id=request.avatar_id,
+        include_quiz=request.include_quiz
+    )
+    return {
+        "course_id": course["course_id"],
+        "status": course["status"],
+        "status_url": f"/api/video/course/{course['course_id']}"
+    }
+
+
+@router.post("/course/stream")
+async def stream_course(request: CreateCourseRequest):
+    """
+    🎓 Générer un cours vidéo en flux (NDJSON)
+    
+    Événements: content, puis section / quiz dans l'ordre de complétion, puis completed.
+    """
+    async def events():
+        async for event in course_generator.stream_course(
+            request.topic,
+            duration_minutes=request.duration_minutes,
+            language=request.language,
+            avatar_id=request.avatar_id,
+            include_quiz=request.include_quiz
+        ):
+            yield json.dumps(event, ensure_ascii=False, default=str) + "\n"
+    
+    return StreamingResponse(
+        events(),
+        media_type="application/x-ndjson",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no",
+            "Content-Encoding": "identity",
+        }
+    )
+
+
+@router.get("/course/{course_id}")
+async def get_course(course_id: str):
+    """
+    📊 Progression d'un cours (sections terminées, en rendu, en échec)
+    """
+    course = course_generator.get_course(course_id)
+    if not course:
+        raise HTTPException(status_code=404, detail="Course not found")
+    return course
+
+
+@router.post("/course/{course_id}/sections/{number}/retry")
+async def retry_course_section(course_id: str, number: int):
+    """
+    🔁 Relancer le rendu d'une section en échec
+    """
+    section = await course_generator.retry_section(course_id, number)
+    if not section:
+        raise HTTPException(status_code=404, detail="Course or section not found")
+    return section
+
+
 @router.post("/cleanup")
 async def cleanup_expired_videos():
     """
@@ -299,7 +337,7 @@ async def cleanup_expired_videos():
     Supprime automatiquement les vidéos de plus de 24h.
     """
     try:
-        cleaned_videos = video_storage.cleanup_expired()
+        cleaned_videos = await asyncio.to_thread(video_storage.cleanup_expired)
         cleaned_queue = video_queue._cleanup_old_entries()
         
         return {
@@ -330,7 +368,8 @@ async def video_info():
             "create": "/api/video/avatar/create",
             "status": "/api/video/status/{video_id}",
             "audio": "/api/video/audio/generate",
-            "voices": "/api/video/voices"
+            "voices": "/api/video/voices",
+            "course": "/api/video/course"
         },
         "pricing": {
             "free": "5 vidéos/mois (30 sec max) - Wav2Lip",
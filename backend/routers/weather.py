@@ -3,6 +3,8 @@ Weather API Router
 Endpoints for current weather and forecasts
 """
 from fastapi import APIRouter, HTTPException, Query
+from pydantic import BaseModel, Field
+from typing import List, Literal
 from services.external_apis.weather import WeatherRouter
 
 router = APIRouter(prefix="/api/weather", tags=["weather"])
@@ -11,6 +13,17 @@ router = APIRouter(prefix="/api/weather", tags=["weather"])
 weather_router = WeatherRouter()
 
 
+class Coordinates(BaseModel):
+    lat: float = Field(..., ge=-90, le=90)
+    lon: float = Field(..., ge=-180, le=180)
+
+
+class BatchWeatherRequest(BaseModel):
+    points: List[Coordinates] = Field(..., min_length=1, max_length=500)
+    kind: Literal["current", "forecast"] = "current"
+    days: int = Field(7, ge=1, le=16, description="Forecast days (kind=forecast)")
+
+
 @router.get("/current")
 async def get_current_weather(
     lat: float = Query(..., description="Latitude"),
@@ -72,6 +85,28 @@ async def get_weather_forecast(
         )
 
 
+@router.post("/batch")
+async def get_weather_batch(request: BatchWeatherRequest):
+    """
+    Get weather for many coordinates at once
+    
+    Points are grouped by geohash cell: each cell is fetched (or read from
+    the cell cache) once, results come back in the same order as the points.
+    """
+    if not weather_router.providers:
+        raise HTTPException(
+            status_code=503,
+            detail="Weather service unavailable. No providers configured."
+        )
+    
+    result = await weather_router.get_weather_batch(
+        [(p.lat, p.lon) for p in request.points],
+        kind=request.kind,
+        days=request.days
+    )
+    return {"success": True, **result}
+
+
 @router.get("/status")
 async def get_weather_status():
     """Get weather router status"""
@@ -0,0 +1,125 @@
+"""
+Benchmark de l'analyse de routine (AutomationEngine)
+Compare l'analyse historique (listes de dicts, timestamps ISO re-parsés à
+chaque passe) à l'analyse en colonnes NumPy (epoch + codes de catégorie),
+chargement SQLite compris, sur 100 000 interactions d'un utilisateur.
+
+Usage:
+    python scripts/benchmark_routine_analysis.py
+    python scripts/benchmark_routine_analysis.py --interactions 100000 --repeat 5 --json routine.json
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from services.assistant.automation_engine import InteractionColumns, analyze_columns  # noqa: E402
+from services.assistant.memory_store import MemoryStore  # noqa: E402
+
+CATEGORIES = ["finance", "news", "weather", "medical", "entertainment", "nutrition", "sports", "space"]
+USER = "bench_user"
+
+
+def make_store(path: str, n: int, days: int, seed: int = 42) -> MemoryStore:
+    """Historique synthétique: pics à heures fixes, catégories au hasard"""
+    rng = random.Random(seed)
+    store = MemoryStore(db_path=path)
+    start = datetime.now() - timedelta(days=days)
+    rows = []
+    for _ in range(n):
+        moment = start + timedelta(days=rng.random() * days)
+        moment = moment.replace(hour=rng.choice([8, 8, 12, 18, 21, rng.randint(0, 23)]))
+        rows.append((USER, moment.isoformat(), "query", rng.choice(CATEGORIES), "search"))
+    with sqlite3.connect(path) as conn:
+        conn.executemany(
+            "INSERT INTO interactions (user_id, timestamp, query, category, action) VALUES (?, ?, ?, ?, ?)", rows
+        )
+    return store
+
+
+def legacy_analyze(store: MemoryStore, days: int) -> Dict[str, Any]:
+    """Analyse historique: dicts complets, un parsing ISO par interaction et par passe"""
+    interactions = store.get_user_interactions(USER, limit=10 ** 9)
+    cutoff = datetime.now() - timedelta(days=days)
+    recent = [i for i in interactions if datetime.fromisoformat(i['timestamp']) > cutoff]
+
+    hours = [datetime.fromisoformat(i['timestamp']).hour for i in recent]
+    weekdays = [datetime.fromisoformat(i['timestamp']).weekday() for i in recent]
+    hour_groups: Dict[int, List[Dict]] = {}
+    for interaction in recent:
+        hour_groups.setdefault(datetime.fromisoformat(interaction['timestamp']).hour, []).append(interaction)
+    return {
+        "total_interactions": len(recent),
+        "most_active_hour": Counter(hours).most_common(1)[0][0],
+        "most_active_day": Counter(weekdays).most_common(1)[0][0],
+        "categories_used": dict(Counter(i['category'] for i in recent if i.get('category'))),
+        "routine_patterns": [h for h, group in hour_groups.items() if len(group) >= 3],
+    }
+
+
+def columnar_analyze(store: MemoryStore, days: int) -> Dict[str, Any]:
+    """Analyse en colonnes: index couvrant, timestamps convertis en bloc, un passage NumPy"""
+    rows = store.get_interaction_timeline(USER, (datetime.now() - timedelta(days=days)).isoformat())
+    return analyze_columns(InteractionColumns.from_rows(rows), days)
+
+
+def run(n: int = 100_000, days: int = 30, repeat: int = 5) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"interactions": n, "days": days, "repeat": repeat}
+    with tempfile.TemporaryDirectory() as tmp:
+        store = make_store(os.path.join(tmp, "assistant.db"), n, days)
+        results = {}
+        for name, fn in (("legacy", legacy_analyze), ("columnar", columnar_analyze)):
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                results[name] = fn(store, days)
+                timings.append((time.perf_counter() - start) * 1000)
+            timings.sort()
+            report[name] = {
+                "mean_ms": round(sum(timings) / len(timings), 1),
+                "p50_ms": round(timings[len(timings) // 2], 1),
+                "max_ms": round(timings[-1], 1),
+            }
+    legacy, columnar = results["legacy"], results["columnar"]
+    report["same_result"] = all(
+        legacy[key] == columnar[key]
+        for key in ("total_interactions", "most_active_hour", "most_active_day", "categories_used")
+    )
+    report["speedup"] = round(report["legacy"]["mean_ms"] / report["columnar"]["mean_ms"], 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de l'analyse de routine")
+    parser.add_argument("--interactions", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="Écrire le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+
+    report = run(args.interactions, args.days, args.repeat)
+    print(f"📊 {args.interactions} interactions sur {args.days} jours, {args.repeat} itérations (SQLite compris)")
+    for name in ("legacy", "columnar"):
+        r = report[name]
+        print(f"  {name:8s} mean={r['mean_ms']:.1f}ms p50={r['p50_ms']:.1f}ms max={r['max_ms']:.1f}ms")
+    print(f"  speedup x{report['speedup']} (mêmes résultats: {report['same_result']})")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Rapport écrit dans {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""
+Benchmark du classement de la recherche universelle
+Compare le scoring historique (legacy_score, recopié ici, un calcul par résultat) au
+classement en lot (services/search_ranking) sur 10 catégories x 50 résultats.
+
+Usage:
+    python scripts/benchmark_search_ranking.py
+    python scripts/benchmark_search_ranking.py --categories 10 --results 50 --repeat 200 --json ranking.json
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from routers.search import SearchResult, detect_search_intent  # noqa: E402
+from services.search_ranking import QueryContext, merge_top_k, rank_category  # noqa: E402
+
+CATEGORIES = ["finance", "news", "weather", "geocoding", "medical",
+              "entertainment", "nutrition", "space", "sports", "media"]
+VOCABULARY = ("bitcoin prix marché analyse paris météo santé traitement film recette nasa "
+              "match équipe photo actualité économie europe crypto action bourse climat").split()
+QUERY = "prix du bitcoin et actualité crypto à paris"
+
+
+def make_results(n_categories: int, n_results: int, seed: int = 42) -> Dict[str, List[Dict[str, Any]]]:
+    """Résultats synthétiques avec contenu JSON imbriqué (comme les APIs)"""
+    rng = random.Random(seed)
+    data = {}
+    for category in (CATEGORIES * (n_categories // len(CATEGORIES) + 1))[:n_categories]:
+        data[category] = [
+            {
+                "category": category,
+                "title": " ".join(rng.choices(VOCABULARY, k=rng.randint(3, 8))),
+                "content": {
+                    "description": " ".join(rng.choices(VOCABULARY, k=rng.randint(20, 60))),
+                    "meta": {"score": rng.random(), "tags": rng.choices(VOCABULARY, k=5)},
+                    "items": [{"label": rng.choice(VOCABULARY), "value": rng.randint(0, 1000)} for _ in range(5)],
+                },
+                "source": "bench",
+                "relevance_score": round(rng.uniform(0.6, 0.9), 2),
+            }
+            for _ in range(n_results)
+        ]
+    return data
+
+
+def _to_results(data: Dict[str, List[Dict[str, Any]]]) -> Dict[str, List[SearchResult]]:
+    return {cat: [SearchResult(**r) for r in rows] for cat, rows in data.items()}
+
+
+def legacy_score(query: str, result_title: str, result_content: Any, category: str) -> float:
+    """Ancien calculate_relevance_score de routers/search (référence du benchmark)"""
+    query_words = set(query.lower().split())
+    title_lower = result_title.lower()
+    content_str = str(result_content).lower() if result_content else ""
+    score = 0.5
+    score += min(sum(1 for word in query_words if word in title_lower) * 0.3, 0.9)
+    score += min(sum(1 for word in query_words if word in content_str) * 0.1, 0.3)
+    if detect_search_intent(query).get(category, False):
+        score += 0.1
+    return min(score, 1.0)
+
+
+def legacy_rank(query: str, results: Dict[str, List[SearchResult]], k: int) -> List[SearchResult]:
+    """Scoring historique: un calcul complet par résultat"""
+    for category, rows in results.items():
+        for r in rows:
+            r.relevance_score = legacy_score(query, r.title, r.content, category)
+        rows.sort(key=lambda x: x.relevance_score, reverse=True)
+    merged = [r for rows in results.values() for r in rows]
+    return sorted(merged, key=lambda r: r.relevance_score, reverse=True)[:k]
+
+
+def batch_rank(query: str, results: Dict[str, List[SearchResult]], k: int) -> List[SearchResult]:
+    """Classement en lot: requête préparée une fois, BM25 par catégorie, tas top-k"""
+    ctx = QueryContext.build(query, detect_search_intent(query))
+    for category, rows in results.items():
+        results[category] = rank_category(ctx, category, rows)
+    return merge_top_k(results, k)
+
+
+def run(n_categories: int = 10, n_results: int = 50, repeat: int = 100, k: int = 10) -> Dict[str, Any]:
+    data = make_results(n_categories, n_results)
+    report: Dict[str, Any] = {"categories": n_categories, "results_per_category": n_results,
+                              "repeat": repeat, "top_k": k}
+    for name, fn in (("legacy", legacy_rank), ("batch", batch_rank)):
+        timings = []
+        for _ in range(repeat):
+            results = _to_results(data)  # Hors chronométrage
+            start = time.perf_counter()
+            fn(QUERY, results, k)
+            timings.append((time.perf_counter() - start) * 1000)
+        timings.sort()
+        report[name] = {
+            "mean_ms": round(sum(timings) / len(timings), 3),
+            "p50_ms": round(timings[len(timings) // 2], 3),
+            "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))], 3),
+        }
+    report["speedup"] = round(report["legacy"]["mean_ms"] / report["batch"]["mean_ms"], 2) if report["batch"]["mean_ms"] else None
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark du classement des résultats de recherche")
+    parser.add_argument("--categories", type=int, default=10)
+    parser.add_argument("--results", type=int, default=50, help="Résultats par catégorie")
+    parser.add_argument("--repeat", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--json", dest="json_path", help="Écrire le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+
+    report = run(args.categories, args.results, args.repeat, args.top_k)
+    print(f"📊 {args.categories} catégories x {args.results} résultats, {args.repeat} itérations")
+    for name in ("legacy", "batch"):
+        r = report[name]
+        print(f"  {name:7s} mean={r['mean_ms']:.3f}ms p50={r['p50_ms']:.3f}ms p95={r['p95_ms']:.3f}ms")
+    print(f"  speedup x{report['speedup']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Rapport écrit dans {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
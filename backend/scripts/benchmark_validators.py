@@ -0,0 +1,179 @@
+"""
+Benchmark des validateurs de réponses (AIResponseValidator, MedicalFactChecker)
+Compare les implémentations historiques (une re.search par motif, fenêtre
+re-scannée pour chaque affirmation) aux règles compilées une fois avec
+sources et affirmations appariées en deux pointeurs, sur des réponses
+synthétiques de 10 000 mots façon mode DEEP.
+
+Usage:
+    python scripts/benchmark_validators.py
+    python scripts/benchmark_validators.py --words 10000 --repeat 5 --json validators.json
+"""
+import argparse
+import json
+import os
+import random
+import re
+import sys
+import time
+from typing import Any, Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from services.ai_response_validator import AIResponseValidator  # noqa: E402
+from services.medical_anti_hallucination import MedicalFactChecker  # noqa: E402
+from services.pattern_scan import merge_spans  # noqa: E402
+
+VOCABULARY = (
+    "le la les un une des patient traitement dose efficace risque données analyse "
+    "toujours jamais tous aucun oui non vrai faux étude montre selon recherche indique "
+    "environ généralement président élection 2024 2031 est 12 premier seul a gagné "
+    "réduit de 30 taux de survie 250 mg 40 % 3/4 [PUBMED] d'après miracle"
+).split()
+
+SOURCE_WINDOW = 100
+
+
+def make_response(words: int, seed: int = 42) -> str:
+    """Texte synthétique riche en affirmations, sources et mots-clés"""
+    rng = random.Random(seed)
+    sentences = []
+    while sum(len(s.split()) for s in sentences) < words:
+        sentences.append(" ".join(rng.choice(VOCABULARY) for _ in range(rng.randint(8, 20))).capitalize() + ".")
+    return " ".join(sentences)
+
+
+def legacy_validate(validator: AIResponseValidator, response: str, query: str) -> List[str]:
+    """validate_response historique (avertissements seulement): un motif à la fois"""
+    warnings = []
+    response_lower = response.lower()
+    query_lower = query.lower()
+    for flag in validator.RED_FLAGS:
+        if re.search(flag, response_lower, re.IGNORECASE):
+            warnings.append("Réponse indique un manque de confiance")
+    for pattern in validator.VAGUE_PATTERNS:
+        if re.match(pattern, response_lower, re.IGNORECASE):
+            warnings.append("Réponse trop vague")
+    if any(kw in response_lower or kw in query_lower for kw in validator.POLITICAL_KEYWORDS):
+        has_date = any(re.search(p, response) for p in validator.DATE_PATTERNS)
+        definitive = any(re.search(p, response_lower, re.IGNORECASE) for p in validator.DEFINITIVE_PATTERNS)
+        warnings.append(f"politique {has_date} {definitive}")
+    if any(kw in query_lower for kw in validator.MEDICAL_KEYWORDS):
+        if not any(kw in response_lower for kw in validator.MEDICAL_DISCLAIMERS):
+            warnings.append("Réponse médicale sans disclaimer approprié")
+    if any(kw in query_lower for kw in validator.FINANCIAL_KEYWORDS):
+        if not any(kw in response_lower for kw in validator.FINANCIAL_DISCLAIMERS):
+            warnings.append("Réponse financière sans disclaimer approprié")
+    has_sources = any(kw in response_lower for kw in validator.SOURCE_INDICATORS)
+    if any(kw in query_lower for kw in validator.FACTUAL_KEYWORDS) and not has_sources:
+        warnings.append("Réponse factuelle sans sources mentionnées")
+    contradictions = [
+        f"{a} vs {b}" for a, b in validator.CONTRADICTION_PAIRS
+        if re.search(a, response_lower) and re.search(b, response_lower)
+    ]
+    if contradictions:
+        warnings.append(f"Contradictions détectées: {contradictions}")
+    if any(re.search(p, response_lower) for p in validator.FACTUAL_CLAIMS) and not has_sources:
+        warnings.append("Affirmation factuelle sans source")
+    for year in re.findall(validator.FUTURE_YEAR, response):
+        warnings.append(f"Date future suspecte: {year}")
+    return warnings
+
+
+def compiled_validate(validator: AIResponseValidator, response: str, query: str) -> List[str]:
+    """Mêmes avertissements depuis validate_response (répétitions non comptées par legacy_validate)"""
+    _, result = validator.validate_response(response, query)
+    warnings = []
+    for warning in result["warnings"]:
+        if warning.startswith("Information politique"):
+            political = validator._check_political_info(response, query)
+            warning = f"politique {political['has_date']} {political['has_definitive_claim']}"
+        elif warning == "Répétitions détectées dans la réponse":
+            continue
+        warnings.append(warning)
+    return warnings
+
+
+def legacy_check(checker: MedicalFactChecker, response: str) -> int:
+    """check_response historique: findall par motif, fenêtre re-scannée par affirmation"""
+    for pattern in checker.dangerous_claims:
+        re.search(pattern, response, re.IGNORECASE)
+    unverified = 0
+    for pattern in checker.requires_source_keywords:
+        for match in re.finditer(pattern, response, re.IGNORECASE):
+            pos = response.lower().find(match.group(0).lower())
+            window = response[max(0, pos - SOURCE_WINDOW):pos + len(match.group(0)) + SOURCE_WINDOW]
+            if not any(re.search(p, window, re.IGNORECASE) for p in checker.source_patterns):
+                unverified += 1
+    any(marker in response.lower() for marker in checker.uncertainty_markers)
+    return unverified
+
+
+def compiled_check(checker: MedicalFactChecker, response: str) -> Dict[str, Any]:
+    return checker.check_response(response)
+
+
+def _time(fn, repeat: int) -> Dict[str, float]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    timings.sort()
+    return {
+        "mean_ms": round(sum(timings) / len(timings), 2),
+        "p50_ms": round(timings[len(timings) // 2], 2),
+        "max_ms": round(timings[-1], 2),
+    }
+
+
+def run(words: int = 10_000, repeat: int = 5) -> Dict[str, Any]:
+    response = make_response(words)
+    query = "Selon quelle étude ce traitement est efficace, et faut-il investir ? élection"
+    validator, checker = AIResponseValidator(), MedicalFactChecker()
+    report: Dict[str, Any] = {"words": words, "chars": len(response), "repeat": repeat}
+
+    report["validator"] = {
+        "legacy": _time(lambda: legacy_validate(validator, response, query), repeat),
+        "compiled": _time(lambda: validator.validate_response(response, query), repeat),
+        "same_warnings": legacy_validate(validator, response, query) == compiled_validate(validator, response, query),
+    }
+    report["fact_checker"] = {
+        "legacy": _time(lambda: legacy_check(checker, response), repeat),
+        "compiled": _time(lambda: compiled_check(checker, response), repeat),
+        "claims_scanned": len(merge_spans(checker.rules.scan(response), checker.claim_rules)),
+    }
+    for name in ("validator", "fact_checker"):
+        section = report[name]
+        section["speedup"] = round(section["legacy"]["mean_ms"] / section["compiled"]["mean_ms"], 1)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark des validateurs de réponses")
+    parser.add_argument("--words", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", dest="json_path", help="Écrire le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+
+    report = run(args.words, args.repeat)
+    print(f"📊 Réponse de {args.words} mots ({report['chars']} caractères), {args.repeat} itérations")
+    for name in ("validator", "fact_checker"):
+        section = report[name]
+        for impl in ("legacy", "compiled"):
+            r = section[impl]
+            print(f"  {name:12s} {impl:8s} mean={r['mean_ms']:.2f}ms p50={r['p50_ms']:.2f}ms max={r['max_ms']:.2f}ms")
+        print(f"  {name:12s} speedup x{section['speedup']}")
+    print(f"  mêmes avertissements (validator): {report['validator']['same_warnings']}")
+    print(f"  affirmations repérées (fact_checker): {report['fact_checker']['claims_scanned']}")
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Rapport écrit dans {args.json_path}")
+
+
+if __name__ == "__main__":
+    main()
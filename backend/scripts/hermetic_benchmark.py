@@ -0,0 +1,350 @@
+"""
+Benchmark hermétique - aucune dépendance réseau
+Démarre l'app en process (ASGI) contre des upstreams simulés
+(scripts/mock_upstreams.py) et mesure p50/p95/p99, débit et lag de la
+boucle d'événements par scénario. Résultats en JSON pour comparaison.
+
+Usage:
+    python scripts/hermetic_benchmark.py
+    python scripts/hermetic_benchmark.py --scenarios chat,universal_search --requests 200 --concurrency 20
+    python scripts/hermetic_benchmark.py --output bench.json --compare baseline.json --tolerance 0.2
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import math
+import os
+import platform
+import sys
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from scripts.mock_upstreams import (  # noqa: E402
+    MockUpstreamConfig, MockUpstreams, MockUpstreamServer, redirect_httpx,
+)
+
+
+# ============================================
+# SCÉNARIOS
+# ============================================
+
+def _chat(i: int) -> Dict[str, Any]:
+    return {"method": "POST", "url": "/api/chat",
+            "json": {"message": f"What should I visit in Paris? (#{i})", "language": "en"}}
+
+
+def _universal_search(i: int) -> Dict[str, Any]:
+    return {"method": "POST", "url": "/api/search/universal",
+            "json": {"query": f"bitcoin price and weather in Paris {i}", "max_results_per_category": 5}}
+
+
+def _deep_medical_search(i: int) -> Dict[str, Any]:
+    return {"method": "POST", "url": "/api/expert/health/chat",
+            "json": {"message": f"Quels sont les traitements du diabète de type 2 ? ({i})",
+                     "search_mode": "deep", "session_id": f"bench_med_{i}"}}
+
+
+def _expert_chat(i: int) -> Dict[str, Any]:
+    return {"method": "POST", "url": "/api/expert/finance/chat",
+            "json": {"message": f"Quel est le prix du bitcoin ? ({i})", "session_id": f"bench_fin_{i}"}}
+
+
+SCENARIOS: Dict[str, Callable[[int], Dict[str, Any]]] = {
+    "chat": _chat,
+    "universal_search": _universal_search,
+    "deep_medical_search": _deep_medical_search,
+    "expert_chat": _expert_chat,
+}
+
+
+# ============================================
+# MESURES
+# ============================================
+
+def percentile(values: List[float], pct: float) -> float:
+    """Percentile (rang le plus proche) - 0 si vide"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50": round(percentile(values, 50), 2),
+        "p95": round(percentile(values, 95), 2),
+        "p99": round(percentile(values, 99), 2),
+        "max": round(max(values), 2) if values else 0.0,
+        "mean": round(sum(values) / len(values), 2) if values else 0.0,
+    }
+
+
+class LoopLagSampler:
+    """Mesure le retard de réveil d'un sleep() périodique (lag de la boucle)"""
+
+    def __init__(self, interval_ms: float = 10.0):
+        self.interval = interval_ms / 1000
+        self.samples: List[float] = []
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            self.samples.append(max(0.0, (loop.time() - expected) * 1000))
+
+    def start(self):
+        self.samples = []
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> List[float]:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        return self.samples
+
+
+async def run_scenario(client, name: str, requests: int, concurrency: int) -> Dict[str, Any]:
+    """Exécuter un scénario à concurrence fixe"""
+    build = SCENARIOS[name]
+    counter = itertools.count()
+    latencies: List[float] = []
+    status_codes: Dict[str, int] = {}
+    errors = 0
+    sampler = LoopLagSampler()
+
+    async def worker():
+        nonlocal errors
+        while True:
+            i = next(counter)
+            if i >= requests:
+                return
+            spec = build(i)
+            start = time.perf_counter()
+            try:
+                response = await client.request(spec["method"], spec["url"], json=spec.get("json"))
+                code = str(response.status_code)
+                if response.status_code >= 400:
+                    errors += 1
+            except Exception:
+                code = "exception"
+                errors += 1
+            latencies.append((time.perf_counter() - start) * 1000)
+            status_codes[code] = status_codes.get(code, 0) + 1
+
+    sampler.start()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    lag = await sampler.stop()
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": errors,
+        "status_codes": status_codes,
+        "duration_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed > 0 else 0.0,
+        "latency_ms": summarize(latencies),
+        "loop_lag_ms": summarize(lag),
+    }
+
+
+# ============================================
+# BOOT DE L'APP
+# ============================================
+
+MOCK_ENV = {
+    "GROQ_API_KEY": "mock-groq-key",
+    "MISTRAL_API_KEY": "mock-mistral-key",
+    "OLLAMA_BASE_URL": "http://ollama.mock",
+    "TESTING": "true",
+}
+
+
+async def _setup_redis(mode: str) -> str:
+    """Configurer le cache: fakeredis, Redis local, ou aucun"""
+    from services.cache import cache_service
+
+    if mode == "fake":
+        try:
+            import fakeredis
+        except ImportError:
+            print("⚠️  fakeredis non installé - cache désactivé (pip install fakeredis)")
+            cache_service.available = False
+            return "none"
+        cache_service.redis = fakeredis.FakeRedis(decode_responses=True)
+        cache_service.available = True
+        return "fake"
+    if mode == "local":
+        return "local" if await cache_service.connect() else "none"
+    cache_service.available = False
+    return "none"
+
+
+async def run_benchmark(
+    scenarios: List[str],
+    requests: int,
+    concurrency: int,
+    config: MockUpstreamConfig,
+    redis_mode: str = "fake",
+) -> Dict[str, Any]:
+    """Démarrer mocks + app, exécuter les scénarios, retourner le rapport"""
+    import httpx
+
+    previous_env = {key: os.environ.get(key) for key in MOCK_ENV}
+    os.environ.update(MOCK_ENV)
+
+    mock = MockUpstreams(config)
+    server = MockUpstreamServer(mock)
+    server.start()
+
+    try:
+        with redirect_httpx(server.base_url):
+            from services.provider_registry import provider_registry
+            from services.http_client import http_client
+
+            # Recréer les singletons avec l'environnement simulé
+            await http_client.close()
+            for name in ("ai_router", "cache"):
+                provider_registry.reset(name)
+            cache_mode = await _setup_redis(redis_mode)
+
+            from main import app
+            if getattr(app.state, "limiter", None):
+                app.state.limiter.enabled = False  # Pas de 429 pendant le benchmark
+
+            results: Dict[str, Any] = {}
+            async with app.router.lifespan_context(app):
+                warmup = getattr(app.state, "warmup_task", None)
+                if warmup:
+                    await warmup
+
+                transport = httpx.ASGITransport(app=app)
+                async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120.0) as client:
+                    for name in scenarios:
+                        print(f"▶️  {name}: {requests} requêtes, concurrence {concurrency}")
+                        results[name] = await run_scenario(client, name, requests, concurrency)
+                        r = results[name]
+                        print(f"   p50={r['latency_ms']['p50']}ms p95={r['latency_ms']['p95']}ms "
+                              f"p99={r['latency_ms']['p99']}ms {r['throughput_rps']} req/s "
+                              f"lag p99={r['loop_lag_ms']['p99']}ms erreurs={r['errors']}")
+    finally:
+        server.stop()
+        # Ne pas laisser de singletons pointant vers les mocks
+        from services.provider_registry import provider_registry
+        from services.http_client import http_client
+        await http_client.close()
+        for name in ("ai_router", "cache"):
+            provider_registry.reset(name)
+        for key, value in previous_env.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+    return {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cache": cache_mode,
+            "requests": requests,
+            "concurrency": concurrency,
+            "mock_config": {
+                "llm_latency_ms": config.llm_latency_ms,
+                "llm_tokens": config.llm_tokens,
+                "llm_token_interval_ms": config.llm_token_interval_ms,
+                "api_latency_ms": config.api_latency_ms,
+                "jitter_ms": config.jitter_ms,
+            },
+        },
+        "scenarios": results,
+        "upstreams": mock.stats(),
+    }
+
+
+# ============================================
+# COMPARAISON (régression)
+# ============================================
+
+def compare_reports(current: Dict[str, Any], baseline: Dict[str, Any], tolerance: float = 0.2) -> List[str]:
+    """Lister les régressions (p95/p99 latence ou débit) au-delà de la tolérance"""
+    regressions = []
+    for name, cur in current.get("scenarios", {}).items():
+        base = baseline.get("scenarios", {}).get(name)
+        if not base:
+            continue
+        for pct in ("p95", "p99"):
+            before, after = base["latency_ms"][pct], cur["latency_ms"][pct]
+            if before > 0 and after > before * (1 + tolerance):
+                regressions.append(f"{name}: latency {pct} {before}ms → {after}ms")
+        before, after = base["throughput_rps"], cur["throughput_rps"]
+        if before > 0 and after < before * (1 - tolerance):
+            regressions.append(f"{name}: throughput {before} → {after} req/s")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hermétique (upstreams simulés)")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS), help="Liste séparée par des virgules")
+    parser.add_argument("--requests", type=int, default=100, help="Requêtes par scénario")
+    parser.add_argument("--concurrency", type=int, default=10, help="Requêtes simultanées")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-tokens", type=int, default=120)
+    parser.add_argument("--token-interval-ms", type=float, default=5.0)
+    parser.add_argument("--api-latency-ms", type=float, default=60.0)
+    parser.add_argument("--jitter-ms", type=float, default=20.0)
+    parser.add_argument("--redis", choices=["fake", "local", "none"], default="fake")
+    parser.add_argument("--output", default="hermetic_benchmark.json", help="Fichier JSON de sortie")
+    parser.add_argument("--compare", help="Rapport JSON de référence")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Régression tolérée (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    scenarios = [s.strip() for s in args.scenarios.split(",") if s.strip()]
+    unknown = [s for s in scenarios if s not in SCENARIOS]
+    if unknown:
+        parser.error(f"Scénarios inconnus: {', '.join(unknown)} (disponibles: {', '.join(SCENARIOS)})")
+
+    config = MockUpstreamConfig(
+        llm_latency_ms=args.llm_latency_ms,
+        llm_tokens=args.llm_tokens,
+        llm_token_interval_ms=args.token_interval_ms,
+        api_latency_ms=args.api_latency_ms,
+        jitter_ms=args.jitter_ms,
+    )
+
+    report = asyncio.run(run_benchmark(scenarios, args.requests, args.concurrency, config, args.redis))
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\n💾 Rapport écrit dans {args.output}")
+
+    if report["upstreams"]["unmocked"]:
+        print(f"ℹ️  Upstreams non simulés (404): {report['upstreams']['unmocked']}")
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare_reports(report, baseline, args.tolerance)
+        if regressions:
+            print("\n❌ Régressions détectées:")
+            for line in regressions:
+                print(f"   - {line}")
+            sys.exit(1)
+        print("\n✅ Aucune régression au-delà de la tolérance")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+Mock Upstreams - Serveur local qui imite les APIs externes
+Utilisé par scripts/hermetic_benchmark.py pour des benchmarks sans réseau.
+
+Toutes les requêtes httpx sortantes (async et sync, y compris le SDK Groq)
+sont redirigées vers ce serveur: `https://api.mistral.ai/v1/chat/completions`
+devient `http://127.0.0.1:<port>/api.mistral.ai/v1/chat/completions`.
+
+Upstreams simulés:
+- LLM: Groq, Mistral, OpenRouter (format OpenAI, stream SSE), Gemini, Ollama (NDJSON)
+- Finance: CoinGecko
+- Météo: Open-Meteo
+- Médical: PubMed (eutils), Europe PMC, OpenFDA, disease.sh, ClinicalTrials.gov
+- Géocodage: Nominatim
+"""
+import asyncio
+import json
+import random
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+import httpx
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+
+@dataclass
+class MockUpstreamConfig:
+    """Latences et volumes simulés"""
+    llm_latency_ms: float = 300.0          # Time-to-first-token
+    llm_tokens: int = 120                  # Tokens par réponse
+    llm_token_interval_ms: float = 5.0     # Délai entre tokens (stream)
+    api_latency_ms: float = 60.0           # Latence des APIs de données
+    jitter_ms: float = 20.0                # Variation aléatoire (+/-)
+    per_host_latency_ms: Dict[str, float] = field(default_factory=dict)
+    seed: int = 42
+
+
+LLM_HOSTS = {
+    "api.groq.com",
+    "api.mistral.ai",
+    "openrouter.ai",
+    "generativelanguage.googleapis.com",
+    "ollama.mock",
+}
+
+LOREM_TOKENS = (
+    "Voici une réponse de test générée localement pour le benchmark . "
+    "Les données proviennent des sources consultées et restent cohérentes . "
+    "Selon les informations disponibles , la situation est stable aujourd'hui . "
+).split()
+
+
+class MockUpstreams:
+    """Application FastAPI + compteurs de hits par host"""
+
+    def __init__(self, config: Optional[MockUpstreamConfig] = None):
+        self.config = config or MockUpstreamConfig()
+        self.hits: Dict[str, int] = defaultdict(int)
+        self.unmocked: Dict[str, int] = defaultdict(int)
+        self._rng = random.Random(self.config.seed)
+        self.app = self._build_app()
+
+    # ------------------------------------------------------------------
+    # Latence
+    # ------------------------------------------------------------------
+
+    def _latency_s(self, host: str) -> float:
+        if host in self.config.per_host_latency_ms:
+            base = self.config.per_host_latency_ms[host]
+        elif host in LLM_HOSTS:
+            base = self.config.llm_latency_ms
+        else:
+            base = self.config.api_latency_ms
+        jitter = self._rng.uniform(-self.config.jitter_ms, self.config.jitter_ms)
+        return max(0.0, base + jitter) / 1000
+
+    def _tokens(self):
+        return [LOREM_TOKENS[i % len(LOREM_TOKENS)] for i in range(self.config.llm_tokens)]
+
+    def _completion_text(self) -> str:
+        return " ".join(self._tokens())
+
+    # ------------------------------------------------------------------
+    # Handlers LLM
+    # ------------------------------------------------------------------
+
+    async def _openai_chat(self, body: dict):
+        if body.get("stream"):
+            async def sse():
+                for token in self._tokens():
+                    chunk = {"id": "mock", "object": "chat.completion.chunk", "model": body.get("model", "mock"),
+                             "choices": [{"index": 0, "delta": {"content": token + " "}, "finish_reason": None}]}
+                    yield f"data: {json.dumps(chunk)}\n\n"
+                    await asyncio.sleep(self.config.llm_token_interval_ms / 1000)
+                yield "data: [DONE]\n\n"
+            return StreamingResponse(sse(), media_type="text/event-stream")
+
+        text = self._completion_text()
+        return JSONResponse({
+            "id": "chatcmpl-mock",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "mock"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": 100, "completion_tokens": self.config.llm_tokens,
+                      "total_tokens": 100 + self.config.llm_tokens},
+        })
+
+    async def _gemini(self, body: dict):
+        return JSONResponse({"candidates": [{"content": {"parts": [{"text": self._completion_text()}]}}]})
+
+    async def _ollama(self, path: str, body: dict):
+        if path.startswith("api/tags"):
+            return JSONResponse({"models": [{"name": "llama3.1"}]})
+        if body.get("stream"):
+            async def ndjson():
+                for token in self._tokens():
+                    yield json.dumps({"model": "llama3.1", "response": token + " ", "done": False}) + "\n"
+                    await asyncio.sleep(self.config.llm_token_interval_ms / 1000)
+                yield json.dumps({"model": "llama3.1", "response": "", "done": True}) + "\n"
+            return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+        return JSONResponse({"model": "llama3.1", "response": self._completion_text(), "done": True})
+
+    # ------------------------------------------------------------------
+    # Handlers données
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _coingecko(path: str, params: dict):
+        if path.endswith("simple/price"):
+            ids = (params.get("ids") or "bitcoin").split(",")
+            return {coin: {"usd": 65000.0, "eur": 60000.0, "usd_24h_change": 1.25, "usd_market_cap": 1.2e12}
+                    for coin in ids}
+        if path.endswith("search/trending"):
+            return {"coins": [{"item": {"id": "bitcoin", "name": "Bitcoin", "symbol": "BTC", "market_cap_rank": 1}}]}
+        if path.endswith("search"):
+            return {"coins": [{"id": "bitcoin", "name": "Bitcoin", "symbol": "btc", "market_cap_rank": 1}]}
+        if path.endswith("coins/markets"):
+            return [{"id": "bitcoin", "symbol": "btc", "name": "Bitcoin", "current_price": 65000.0,
+                     "market_cap": 1.2e12, "price_change_percentage_24h": 1.25}]
+        if path.endswith("ping"):
+            return {"gecko_says": "(V3) To the Moon!"}
+        return {"id": path.rsplit("/", 1)[-1], "market_data": {"current_price": {"usd": 65000.0}}}
+
+    @staticmethod
+    def _open_meteo(params: dict):
+        days = int(params.get("forecast_days", 7))
+        dates = [f"2026-01-{i + 1:02d}" for i in range(days)]
+        return {
+            "latitude": float(params.get("latitude", 48.85)),
+            "longitude": float(params.get("longitude", 2.35)),
+            "current_weather": {"temperature": 14.2, "windspeed": 9.0, "winddirection": 230,
+                                "weathercode": 3, "time": "2026-01-01T12:00"},
+            "current": {"temperature_2m": 14.2, "relative_humidity_2m": 71, "weather_code": 3,
+                        "wind_speed_10m": 9.0},
+            "daily": {"time": dates, "temperature_2m_max": [16.0] * days, "temperature_2m_min": [8.0] * days,
+                      "precipitation_sum": [0.4] * days, "weathercode": [3] * days},
+        }
+
+    @staticmethod
+    def _pubmed(path: str):
+        if "esearch" in path:
+            return {"esearchresult": {"count": "3", "idlist": ["10001", "10002", "10003"]}}
+        if "esummary" in path:
+            uids = ["10001", "10002", "10003"]
+            result = {"uids": uids}
+            for uid in uids:
+                result[uid] = {"uid": uid, "title": f"Mock clinical study {uid}", "pubdate": "2025 Jan",
+                               "source": "Mock J Med", "authors": [{"name": "Doe J"}]}
+            return {"result": result}
+        return {"result": {}}
+
+    # ------------------------------------------------------------------
+    # App
+    # ------------------------------------------------------------------
+
+    def _build_app(self) -> FastAPI:
+        app = FastAPI(title="Mock Upstreams", docs_url=None, redoc_url=None, openapi_url=None)
+
+        @app.api_route("/{host}/{path:path}", methods=["GET", "POST", "PUT", "DELETE"])
+        async def upstream(host: str, path: str, request: Request):
+            self.hits[host] += 1
+            params = dict(request.query_params)
+            body = {}
+            if request.method in ("POST", "PUT"):
+                try:
+                    body = await request.json()
+                except Exception:
+                    body = {}
+
+            await asyncio.sleep(self._latency_s(host))
+
+            if host in ("api.groq.com", "api.mistral.ai", "openrouter.ai"):
+                return await self._openai_chat(body)
+            if host == "generativelanguage.googleapis.com":
+                return await self._gemini(body)
+            if host == "ollama.mock":
+                return await self._ollama(path, body)
+            if host == "api.coingecko.com":
+                return JSONResponse(self._coingecko(path, params))
+            if host == "api.open-meteo.com":
+                return JSONResponse(self._open_meteo(params))
+            if host == "eutils.ncbi.nlm.nih.gov":
+                if "efetch" in path:
+                    return PlainTextResponse("<PubmedArticleSet></PubmedArticleSet>", media_type="text/xml")
+                return JSONResponse(self._pubmed(path))
+            if host == "www.ebi.ac.uk":
+                return JSONResponse({"hitCount": 1, "resultList": {"result": [
+                    {"id": "1", "title": "Mock Europe PMC article", "pubYear": "2025", "journalTitle": "Mock"}]}})
+            if host == "api.fda.gov":
+                return JSONResponse({"results": [{"openfda": {"brand_name": ["MOCKDRUG"]},
+                                                  "indications_and_usage": ["Mock indication"]}]})
+            if host == "rxnav.nlm.nih.gov":
+                return JSONResponse({"drugGroup": {"name": None, "conceptGroup": [
+                    {"tty": "SBD", "conceptProperties": [{"rxcui": "860975", "name": "metformin 500 MG"}]}]}})
+            if host == "disease.sh":
+                return JSONResponse({"cases": 1000, "deaths": 10, "recovered": 900, "updated": 0})
+            if host == "clinicaltrials.gov":
+                return JSONResponse({"studies": [{"protocolSection": {"identificationModule": {
+                    "nctId": "NCT00000000", "briefTitle": "Mock trial"}}}]})
+            if host == "nominatim.openstreetmap.org":
+                return JSONResponse([{"lat": "48.8566", "lon": "2.3522", "display_name": "Paris, France",
+                                      "address": {"city": "Paris", "country": "France"}}])
+
+            self.unmocked[host] += 1
+            return JSONResponse({"error": f"upstream {host} not mocked"}, status_code=404)
+
+        return app
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"hits": dict(self.hits), "unmocked": dict(self.unmocked)}
+
+
+# ----------------------------------------------------------------------
+# Serveur local + redirection httpx
+# ----------------------------------------------------------------------
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+class MockUpstreamServer:
+    """Lance MockUpstreams dans un thread (boucle séparée de l'app testée)"""
+
+    def __init__(self, mock: MockUpstreams, port: Optional[int] = None):
+        import uvicorn
+
+        self.mock = mock
+        self.port = port or _free_port()
+        self._server = uvicorn.Server(uvicorn.Config(
+            mock.app, host="127.0.0.1", port=self.port, log_level="warning", access_log=False,
+        ))
+        self._thread = threading.Thread(target=self._server.run, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, timeout: float = 10.0):
+        self._thread.start()
+        deadline = time.time() + timeout
+        while not self._server.started:
+            if time.time() > deadline:
+                raise RuntimeError("Mock upstream server failed to start")
+            time.sleep(0.01)
+
+    def stop(self):
+        self._server.should_exit = True
+        self._thread.join(timeout=5)
+
+
+def _rewrite(request: httpx.Request, base_url: str) -> httpx.Request:
+    """https://host/path?q → http://127.0.0.1:port/host/path?q"""
+    original = request.url
+    target = httpx.URL(f"{base_url}/{original.host}{original.raw_path.decode('ascii')}")
+    headers = httpx.Headers(request.headers)
+    headers["host"] = target.netloc.decode("ascii")
+    return httpx.Request(request.method, target, headers=headers, content=request.content)
+
+
+class RedirectAsyncTransport(httpx.AsyncBaseTransport):
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._inner = httpx.AsyncHTTPTransport(limits=httpx.Limits(max_connections=200, max_keepalive_connections=50))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._inner.handle_async_request(_rewrite(request, self.base_url))
+
+    async def aclose(self):
+        await self._inner.aclose()
+
+
+class RedirectSyncTransport(httpx.BaseTransport):
+    def __init__(self, base_url: str):
+        self.base_url = base_url
+        self._inner = httpx.HTTPTransport()
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        return self._inner.handle_request(_rewrite(request, self.base_url))
+
+    def close(self):
+        self._inner.close()
+
+
+@contextmanager
+def redirect_httpx(base_url: str):
+    """Rediriger tous les clients httpx (créés pendant le contexte) vers base_url"""
+    original_async_init = httpx.AsyncClient.__init__
+    original_sync_init = httpx.Client.__init__
+
+    # Un transport explicite (ex: ASGITransport du driver de charge) est conservé
+    def async_init(self, *args, **kwargs):
+        if kwargs.get("transport") is None:
+            kwargs["transport"] = RedirectAsyncTransport(base_url)
+            kwargs.pop("mounts", None)
+        original_async_init(self, *args, **kwargs)
+
+    def sync_init(self, *args, **kwargs):
+        if kwargs.get("transport") is None:
+            kwargs["transport"] = RedirectSyncTransport(base_url)
+            kwargs.pop("mounts", None)
+        original_sync_init(self, *args, **kwargs)
+
+    httpx.AsyncClient.__init__ = async_init
+    httpx.Client.__init__ = sync_init
+    try:
+        yield
+    finally:
+        httpx.AsyncClient.__init__ = original_async_init
+        httpx.Client.__init__ = original_sync_init
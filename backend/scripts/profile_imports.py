@@ -0,0 +1,140 @@
+"""
+Profil du temps d'import (cold start)
+Lance `python -X importtime -c "import main"` dans un sous-processus,
+puis affiche les modules les plus coûteux et le temps jusqu'à l'app prête.
+
+Usage:
+    python scripts/profile_imports.py
+    python scripts/profile_imports.py --top 40 --json import_profile.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+from typing import Dict, List
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Objectif: accepter le trafic en moins d'1s sur une VM Fly shared-cpu
+TARGET_MS = 1000
+
+
+def run_importtime(module: str = "main") -> Dict:
+    """Importer le module avec -X importtime et collecter stderr"""
+    start = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+    )
+    wall_ms = (time.perf_counter() - start) * 1000
+    return {"wall_ms": wall_ms, "stderr": proc.stderr, "returncode": proc.returncode}
+
+
+def parse_importtime(stderr: str) -> List[Dict]:
+    """Parser les lignes `import time: self | cumulative | module`"""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        parts = line[len("import time:"):].split("|")
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            continue  # En-tête "self [us] | cumulative | imported package"
+        raw_name = parts[2].rstrip()
+        depth = (len(raw_name) - len(raw_name.lstrip())) // 2
+        entries.append({
+            "module": raw_name.strip(),
+            "self_ms": self_us / 1000,
+            "cumulative_ms": cumulative_us / 1000,
+            "depth": depth,
+        })
+    return entries
+
+
+def build_report(entries: List[Dict], wall_ms: float, top: int = 25) -> Dict:
+    """Construire le rapport: top modules + agrégats par package projet"""
+    project_packages = ("routers", "services", "middleware", "models")
+    by_package: Dict[str, float] = {}
+    for entry in entries:
+        root = entry["module"].split(".")[0]
+        by_package[root] = by_package.get(root, 0.0) + entry["self_ms"]
+
+    main_entry = next((e for e in entries if e["module"] == "main"), None)
+    return {
+        "wall_ms": round(wall_ms, 1),
+        "import_main_ms": round(main_entry["cumulative_ms"], 1) if main_entry else None,
+        "target_ms": TARGET_MS,
+        "modules_imported": len(entries),
+        "top_cumulative": sorted(entries, key=lambda e: e["cumulative_ms"], reverse=True)[:top],
+        "top_self": sorted(entries, key=lambda e: e["self_ms"], reverse=True)[:top],
+        "project_self_ms": {
+            pkg: round(by_package.get(pkg, 0.0), 1) for pkg in project_packages
+        },
+        "third_party_self_ms": dict(sorted(
+            ((pkg, round(ms, 1)) for pkg, ms in by_package.items() if pkg not in project_packages and pkg != "main"),
+            key=lambda x: x[1],
+            reverse=True,
+        )[:top]),
+    }
+
+
+def print_report(report: Dict):
+    print("=" * 70)
+    print("⏱️  IMPORT-TIME PROFILE - Universal Multi-API Backend")
+    print("=" * 70)
+    print(f"Wall time (process):  {report['wall_ms']:.1f} ms")
+    print(f"import main:          {report['import_main_ms']} ms (objectif < {report['target_ms']} ms)")
+    print(f"Modules importés:     {report['modules_imported']}")
+
+    print("\n📦 Top modules (cumulatif)")
+    for e in report["top_cumulative"]:
+        print(f"  {e['cumulative_ms']:9.1f} ms  {e['module']}")
+
+    print("\n🔥 Top modules (self)")
+    for e in report["top_self"]:
+        print(f"  {e['self_ms']:9.1f} ms  {e['module']}")
+
+    print("\n🏗️  Packages du projet (self)")
+    for pkg, ms in report["project_self_ms"].items():
+        print(f"  {ms:9.1f} ms  {pkg}")
+
+    print("\n📚 Dépendances tierces (self)")
+    for pkg, ms in report["third_party_self_ms"].items():
+        print(f"  {ms:9.1f} ms  {pkg}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profil du temps d'import")
+    parser.add_argument("--module", default="main", help="Module à importer (défaut: main)")
+    parser.add_argument("--top", type=int, default=25, help="Nombre de modules à afficher")
+    parser.add_argument("--json", dest="json_path", help="Écrire le rapport JSON dans ce fichier")
+    args = parser.parse_args()
+
+    result = run_importtime(args.module)
+    if result["returncode"] != 0:
+        print(result["stderr"][-2000:])
+        sys.exit(result["returncode"])
+
+    entries = parse_importtime(result["stderr"])
+    report = build_report(entries, result["wall_ms"], top=args.top)
+    print_report(report)
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\n💾 Rapport écrit dans {args.json_path}")
+
+    if report["import_main_ms"] and report["import_main_ms"] > TARGET_MS:
+        print(f"\n⚠️  Import au-dessus de l'objectif ({TARGET_MS} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -160,7 +160,7 @@ def check_ai_providers():
     return len(configured) > 0
 
 
-def check_redis():
+async def check_redis():
     """Vérifier Redis"""
     try:
         import sys
@@ -169,7 +169,7 @@ def check_redis():
         sys.path.insert(0, str(Path(__file__).parent.parent))
         
         from services.cache import cache_service
-        if cache_service.available:
+        if await cache_service.connect():
             print_success("Redis connecté")
             return True
         else:
@@ -198,7 +198,7 @@ async def main():
         "Fichier .env": check_env_file(),
         "Répertoires": check_directories(),
         "Providers AI": check_ai_providers(),
-        "Redis": check_redis(),
+        "Redis": await check_redis(),
         "Serveur": await check_server_running(),
     }
     
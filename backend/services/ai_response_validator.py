@@ -1,12 +1,19 @@
 """
 AI Response Validator Service
 Valide et améliore les réponses générées par l'IA pour éviter les informations erronées
+
+Toutes les règles sont compilées une fois (PatternSet) et appliquées à la
+réponse en une seule étape; les vérifications travaillent ensuite sur
+l'ensemble des règles trouvées.
 """
 import re
 import logging
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 
+from services.pattern_scan import PatternSet, literal_alternation
+from services.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 
@@ -57,9 +64,84 @@ class AIResponseValidator:
         "usa_2020": "2020-11-03",  # Élection présidentielle américaine 2020
     }
     
+    # Disclaimers et indicateurs de sources (recherchés dans la réponse)
+    MEDICAL_DISCLAIMERS = [
+        "avis médical", "professionnel de santé", "consultez un médecin",
+        "ne remplace pas", "à titre informatif", "conseil médical",
+        "disclaimer", "avertissement", "information générale"
+    ]
+    
+    FINANCIAL_DISCLAIMERS = [
+        "conseil financier", "investissement", "risque",
+        "ne constitue pas", "à titre informatif", "disclaimer",
+        "avertissement", "pas un conseil", "analyse personnelle"
+    ]
+    
+    SOURCE_INDICATORS = [
+        "selon", "source", "référence", "étude", "recherche",
+        "d'après", "publié", "cité", "mentionné"
+    ]
+    
+    # Requêtes qui appellent une réponse sourcée
+    FACTUAL_KEYWORDS = [
+        "statistique", "chiffre", "donnée", "étude", "recherche",
+        "selon", "source", "référence", "citation"
+    ]
+    
+    DATE_PATTERNS = [
+        r"\d{4}",  # Année
+        r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}",  # Date format
+    ]
+    
+    DEFINITIVE_PATTERNS = [
+        r"a gagné", r"a perdu", r"a remporté", r"a été élu",
+        r"won", r"lost", r"elected", r"victory", r"defeat"
+    ]
+    
+    FACTUAL_CLAIMS = [
+        r"est\s+\d+",  # "est 2024", "est 100"
+        r"a\s+(gagné|perdu|remporté)",  # "a gagné"
+        r"(premier|dernier|seul|unique)\s+",  # "premier", "seul"
+    ]
+    
+    CONTRADICTION_PAIRS = [
+        ("toujours", "jamais"),
+        ("tous", "aucun"),
+        ("oui", "non"),
+        ("vrai", "faux"),
+    ]
+    
+    FUTURE_YEAR = r"\b(20[3-9]\d|2[1-9]\d{2})\b"
+    
+    # Toutes les règles de la réponse, compilées une fois et appliquées à une seule copie en minuscules
+    RULES = PatternSet({
+        **{f"red_flag_{i}": flag for i, flag in enumerate(RED_FLAGS)},
+        "vague": "|".join(VAGUE_PATTERNS),
+        "political": literal_alternation(POLITICAL_KEYWORDS),
+        "date": "|".join(DATE_PATTERNS),
+        "definitive": "|".join(DEFINITIVE_PATTERNS),
+        "medical_disclaimer": literal_alternation(MEDICAL_DISCLAIMERS),
+        "financial_disclaimer": literal_alternation(FINANCIAL_DISCLAIMERS),
+        "sources": literal_alternation(SOURCE_INDICATORS),
+        "factual_claim": "|".join(FACTUAL_CLAIMS),
+        **{f"word_{word}": word for pair in CONTRADICTION_PAIRS for word in pair},
+        "future_year": FUTURE_YEAR,
+    }, every=["future_year"])
+    
+    # Règles appliquées à la requête (texte court)
+    QUERY_POLITICAL = re.compile(literal_alternation(POLITICAL_KEYWORDS), re.IGNORECASE)
+    QUERY_MEDICAL = re.compile(literal_alternation(MEDICAL_KEYWORDS), re.IGNORECASE)
+    QUERY_FINANCIAL = re.compile(literal_alternation(FINANCIAL_KEYWORDS), re.IGNORECASE)
+    QUERY_FACTUAL = re.compile(literal_alternation(FACTUAL_KEYWORDS), re.IGNORECASE)
+    
     def __init__(self):
         self.validation_history: List[Dict[str, Any]] = []
     
+    def _scan(self, response: str) -> Dict[str, List[Tuple[int, int]]]:
+        """Règles trouvées dans la réponse (toutes les dates futures, première occurrence sinon)"""
+        return self.RULES.scan(response)
+    
+    @traced("validation.response")
     def validate_response(
         self, 
         response: str, 
@@ -87,21 +169,21 @@ class AIResponseValidator:
             validation_result["confidence_score"] = 0.0
             return False, validation_result
         
+        found = self._scan(response)
+        
         # Vérifier les red flags
-        response_lower = response.lower()
-        for flag in self.RED_FLAGS:
-            if re.search(flag, response_lower, re.IGNORECASE):
+        for i in range(len(self.RED_FLAGS)):
+            if f"red_flag_{i}" in found:
                 validation_result["warnings"].append("Réponse indique un manque de confiance")
                 validation_result["confidence_score"] *= 0.7
         
         # Vérifier les patterns vagues
-        for pattern in self.VAGUE_PATTERNS:
-            if re.match(pattern, response_lower, re.IGNORECASE):
-                validation_result["warnings"].append("Réponse trop vague")
-                validation_result["confidence_score"] *= 0.8
+        if "vague" in found:
+            validation_result["warnings"].append("Réponse trop vague")
+            validation_result["confidence_score"] *= 0.8
         
         # Vérifier les informations politiques/électorales
-        political_check = self._check_political_info(response, query)
+        political_check = self._check_political_info(response, query, found)
         if political_check["needs_verification"]:
             validation_result["warnings"].append(
                 f"Information politique/électorale détectée: {political_check['warning']}"
@@ -112,14 +194,14 @@ class AIResponseValidator:
             validation_result["confidence_score"] *= 0.5  # Forte pénalité pour les infos politiques non vérifiées
         
         # Vérifier les disclaimers pour les domaines sensibles
-        if expert_type in ["health", "medical"] or any(kw in query.lower() for kw in self.MEDICAL_KEYWORDS):
-            if not self._has_medical_disclaimer(response):
+        if expert_type in ["health", "medical"] or self.QUERY_MEDICAL.search(query):
+            if not self._has_medical_disclaimer(response, found):
                 validation_result["warnings"].append("Réponse médicale sans disclaimer approprié")
                 validation_result["suggestions"].append("Ajouter un disclaimer médical")
                 validation_result["confidence_score"] *= 0.9
         
-        if expert_type in ["finance", "crypto"] or any(kw in query.lower() for kw in self.FINANCIAL_KEYWORDS):
-            if not self._has_financial_disclaimer(response):
+        if expert_type in ["finance", "crypto"] or self.QUERY_FINANCIAL.search(query):
+            if not self._has_financial_disclaimer(response, found):
                 validation_result["warnings"].append("Réponse financière sans disclaimer approprié")
                 validation_result["suggestions"].append("Ajouter un disclaimer financier")
                 validation_result["confidence_score"] *= 0.9
@@ -132,39 +214,30 @@ class AIResponseValidator:
                 validation_result["confidence_score"] *= coherence_score
         
         # Vérifier la présence de sources/citations si nécessaire
+        has_sources = self._has_sources(response, found)
         if self._needs_sources(query):
-            if not self._has_sources(response):
+            if not has_sources:
                 validation_result["warnings"].append("Réponse factuelle sans sources mentionnées")
                 validation_result["suggestions"].append("Ajouter des sources ou citations")
         
         # Détecter les contradictions internes
-        contradictions = self._detect_contradictions(response)
+        contradictions = self._detect_contradictions(response, found)
         if contradictions:
             validation_result["warnings"].append(f"Contradictions détectées: {contradictions}")
             validation_result["confidence_score"] *= 0.6
         
         # Détecter les affirmations factuelles sans sources
-        factual_claims = [
-            r"est\s+\d+",  # "est 2024", "est 100"
-            r"a\s+(gagné|perdu|remporté)",  # "a gagné"
-            r"(premier|dernier|seul|unique)\s+",  # "premier", "seul"
-        ]
-        has_factual_claim = any(re.search(pattern, response_lower) for pattern in factual_claims)
-        if has_factual_claim and not self._has_sources(response):
+        if "factual_claim" in found and not has_sources:
             validation_result["warnings"].append("Affirmation factuelle sans source")
             validation_result["confidence_score"] *= 0.7
         
         # Détecter les dates futures suspectes
-        future_dates = re.findall(r"\b(20[3-9]\d|2[1-9]\d{2})\b", response)
         current_year = datetime.now().year
-        for year_str in future_dates:
-            try:
-                year = int(year_str)
-                if year > current_year + 1:  # Plus d'1 an dans le futur = suspect
-                    validation_result["warnings"].append(f"Date future suspecte: {year}")
-                    validation_result["confidence_score"] *= 0.5
-            except ValueError:
-                pass
+        for start, end in found.get("future_year", []):
+            year = int(response[start:end])
+            if year > current_year + 1:  # Plus d'1 an dans le futur = suspect
+                validation_result["warnings"].append(f"Date future suspecte: {year}")
+                validation_result["confidence_score"] *= 0.5
         
         # Détecter les répétitions dans la réponse
         sentences = [s.strip() for s in response.split('.') if len(s.strip()) > 20]
@@ -189,25 +262,17 @@ class AIResponseValidator:
         
         return validation_result["is_valid"], validation_result
     
-    def _has_medical_disclaimer(self, response: str) -> bool:
+    def _has_medical_disclaimer(self, response: str, found: Optional[Dict] = None) -> bool:
         """Vérifie si la réponse contient un disclaimer médical approprié"""
-        disclaimer_keywords = [
-            "avis médical", "professionnel de santé", "consultez un médecin",
-            "ne remplace pas", "à titre informatif", "conseil médical",
-            "disclaimer", "avertissement", "information générale"
-        ]
-        response_lower = response.lower()
-        return any(kw in response_lower for kw in disclaimer_keywords)
+        if found is None:
+            return self.RULES.search("medical_disclaimer", response)
+        return "medical_disclaimer" in found
     
-    def _has_financial_disclaimer(self, response: str) -> bool:
+    def _has_financial_disclaimer(self, response: str, found: Optional[Dict] = None) -> bool:
         """Vérifie si la réponse contient un disclaimer financier approprié"""
-        disclaimer_keywords = [
-            "conseil financier", "investissement", "risque",
-            "ne constitue pas", "à titre informatif", "disclaimer",
-            "avertissement", "pas un conseil", "analyse personnelle"
-        ]
-        response_lower = response.lower()
-        return any(kw in response_lower for kw in disclaimer_keywords)
+        if found is None:
+            return self.RULES.search("financial_disclaimer", response)
+        return "financial_disclaimer" in found
     
     def _check_coherence(self, response: str, context: str, query: str) -> float:
         """Vérifie la cohérence entre la réponse et le contexte"""
@@ -224,54 +289,30 @@ class AIResponseValidator:
     
     def _needs_sources(self, query: str) -> bool:
         """Détermine si la requête nécessite des sources"""
-        factual_keywords = [
-            "statistique", "chiffre", "donnée", "étude", "recherche",
-            "selon", "source", "référence", "citation"
-        ]
-        query_lower = query.lower()
-        return any(kw in query_lower for kw in factual_keywords)
+        return self.QUERY_FACTUAL.search(query) is not None
     
-    def _has_sources(self, response: str) -> bool:
+    def _has_sources(self, response: str, found: Optional[Dict] = None) -> bool:
         """Vérifie si la réponse mentionne des sources"""
-        source_indicators = [
-            "selon", "source", "référence", "étude", "recherche",
-            "d'après", "publié", "cité", "mentionné"
-        ]
-        response_lower = response.lower()
-        return any(indicator in response_lower for indicator in source_indicators)
+        if found is None:
+            return self.RULES.search("sources", response)
+        return "sources" in found
     
-    def _check_political_info(self, response: str, query: str) -> Dict[str, Any]:
+    def _check_political_info(self, response: str, query: str, found: Optional[Dict] = None) -> Dict[str, Any]:
         """Vérifie les informations politiques/électorales"""
-        response_lower = response.lower()
-        query_lower = query.lower()
+        if found is None:
+            found = self._scan(response)
         
         # Détecter si la réponse ou la requête concerne la politique
-        has_political_content = any(
-            kw in response_lower or kw in query_lower 
-            for kw in self.POLITICAL_KEYWORDS
-        )
+        has_political_content = "political" in found or self.QUERY_POLITICAL.search(query) is not None
         
         if not has_political_content:
             return {"needs_verification": False, "warning": ""}
         
         # Vérifier si des dates sont mentionnées
-        date_patterns = [
-            r"\d{4}",  # Année
-            r"\d{1,2}[/-]\d{1,2}[/-]\d{2,4}",  # Date format
-        ]
-        
-        has_date = any(re.search(pattern, response) for pattern in date_patterns)
+        has_date = "date" in found
         
         # Vérifier si des affirmations définitives sont faites sans source
-        definitive_patterns = [
-            r"a gagné", r"a perdu", r"a remporté", r"a été élu",
-            r"won", r"lost", r"elected", r"victory", r"defeat"
-        ]
-        
-        has_definitive_claim = any(
-            re.search(pattern, response_lower, re.IGNORECASE) 
-            for pattern in definitive_patterns
-        )
+        has_definitive_claim = "definitive" in found
         
         warning = ""
         if has_definitive_claim and not has_date:
@@ -288,24 +329,15 @@ class AIResponseValidator:
             "has_definitive_claim": has_definitive_claim
         }
     
-    def _detect_contradictions(self, response: str) -> List[str]:
+    def _detect_contradictions(self, response: str, found: Optional[Dict] = None) -> List[str]:
         """Détecte les contradictions internes dans la réponse"""
-        contradictions = []
-        
-        # Patterns de contradiction
-        contradiction_pairs = [
-            (r"toujours", r"jamais"),
-            (r"tous", r"aucun"),
-            (r"oui", r"non"),
-            (r"vrai", r"faux"),
+        if found is None:
+            found = self._scan(response)
+        return [
+            f"{word1} vs {word2}"
+            for word1, word2 in self.CONTRADICTION_PAIRS
+            if f"word_{word1}" in found and f"word_{word2}" in found
         ]
-        
-        response_lower = response.lower()
-        for pattern1, pattern2 in contradiction_pairs:
-            if re.search(pattern1, response_lower) and re.search(pattern2, response_lower):
-                contradictions.append(f"{pattern1} vs {pattern2}")
-        
-        return contradictions
     
     def enhance_system_prompt(
         self, 
@@ -4,12 +4,15 @@ Routes requests to best available AI provider based on quotas and availability
 """
 import os
 import time
+import asyncio
 from typing import Optional, Dict, Any
 from groq import Groq
 import httpx
 from dotenv import load_dotenv
 from services.cache import cache_service
+from services.provider_registry import provider_registry
 from services.circuit_breaker import circuit_breaker
+from services.tracing import span, traced
 try:
     from services.retry_handler import with_retry
 except ImportError:
@@ -259,9 +262,14 @@ class OllamaProvider(AIProvider):
     def __init__(self):
         super().__init__("ollama", priority=5, daily_quota=0)  # Unlimited
         self.base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
-        
+        # Disponibilité déterminée par probe() pendant le warm-up (pas d'appel réseau ici)
+        self.available = False
+    
+    async def probe(self) -> bool:
+        """Vérifier qu'Ollama répond (appelé en parallèle au démarrage)"""
         try:
-            response = httpx.get(f"{self.base_url}/api/tags", timeout=2)
+            async with httpx.AsyncClient(timeout=2.0) as client:
+                response = await client.get(f"{self.base_url}/api/tags")
             if response.status_code == 200:
                 self.available = True
                 print("[OK] Ollama provider initialized (unlimited local)")
@@ -271,6 +279,7 @@ class OllamaProvider(AIProvider):
         except Exception as e:
             self.available = False
             print(f"[WARN] Ollama not available: {e}")
+        return self.available
     
     @circuit_breaker(name="ollama")
     async def call(self, prompt: str, system_prompt: Optional[str] = None) -> str:
@@ -315,8 +324,23 @@ class AIRouter:
             OllamaProvider(),        # Priority 5: Unlimited local
         ]
         
-        # Filter only available providers
-        self.available_providers = [p for p in self.providers if p.available]
+    @property
+    def available_providers(self):
+        """Providers disponibles (Ollama devient disponible après probe())"""
+        return [p for p in self.providers if p.available]
+    
+    def select_provider(self) -> Optional[str]:
+        """Provider que route() essaiera en premier (priorité + quota), pour dimensionner le prompt"""
+        for provider in sorted(self.available_providers, key=lambda p: p.priority):
+            if provider.can_handle_request():
+                return provider.name
+        return None
+    
+    async def warm_up(self):
+        """Sonder les providers réseau en parallèle (appelé par le lifespan)"""
+        probes = [p.probe() for p in self.providers if hasattr(p, "probe")]
+        if probes:
+            await asyncio.gather(*probes, return_exceptions=True)
         
         if not self.available_providers:
             print("[ERROR] No AI providers available!")
@@ -324,6 +348,7 @@ class AIRouter:
             print(f"[OK] AI Router ready with {len(self.available_providers)} provider(s)")
             print(f"   Total daily quota: {sum(p.daily_quota for p in self.available_providers if p.daily_quota > 0)} + unlimited")
     
+    @traced("ai.route")
     async def route(
         self, 
         prompt: str, 
@@ -360,9 +385,7 @@ class AIRouter:
                     # Enhance prompt with provider personality
                     local_system_prompt = enhance_for_provider(system_prompt or "", provider.name)
 
-                    if provider.name == "groq":
-                        response = await provider.call(prompt, local_system_prompt)
-                    else:
+                    with span("ai.attempt", provider=provider.name, preferred=True, fallback=False):
                         response = await provider.call(prompt, local_system_prompt)
                         
                     processing_time = (time.time() - start_time) * 1000
@@ -376,6 +399,7 @@ class AIRouter:
                     print(f"Preferred provider {preferred_provider} failed: {e}")
         
         # Try providers in priority order (only those with quota remaining)
+        attempts = 0
         for provider in sorted(self.available_providers, key=lambda p: p.priority):
             if not provider.can_handle_request():
                 print(f"[WARN] {provider.name} quota exhausted ({provider.requests_today}/{provider.daily_quota})")
@@ -385,9 +409,8 @@ class AIRouter:
                 # Enhance prompt with provider personality
                 local_system_prompt = enhance_for_provider(system_prompt or "", provider.name)
 
-                if provider.name == "groq":
-                    response = await provider.call(prompt, local_system_prompt)
-                else:
+                attempts += 1
+                with span("ai.attempt", provider=provider.name, fallback=attempts > 1 or bool(preferred_provider)):
                     response = await provider.call(prompt, local_system_prompt)
                     
                 processing_time = (time.time() - start_time) * 1000
@@ -422,5 +445,5 @@ class AIRouter:
         }
 
 
-# Singleton instance
-ai_router = AIRouter()
+# Singleton instance (créé au premier usage ou au warm-up)
+ai_router = provider_registry.register("ai_router", AIRouter)
@@ -2,12 +2,15 @@
 Metrics Collector - Collecteur de métriques
 Collecte les métriques d'utilisation de l'API
 """
-from typing import Dict, Any, List
+from typing import AsyncIterator, Dict, Any, List, Optional
 from datetime import datetime, timedelta
 from collections import defaultdict, Counter
 import sqlite3
 from pathlib import Path
 
+from services.export_stream import iter_sqlite_rows
+from services.provider_registry import provider_registry
+
 
 class MetricsCollector:
     """Collecteur de métriques d'utilisation"""
@@ -212,6 +215,27 @@ class MetricsCollector:
             "errors_per_day": round(total_errors / days, 2) if days > 0 else 0
         }
     
+    def iter_rows(
+        self,
+        user_id: str,
+        table: str = "metrics",
+        days: int = 7,
+        endpoint: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Lignes brutes (metrics ou errors) d'un utilisateur en flux pour l'export, page par page"""
+        if table not in ("metrics", "errors"):
+            raise ValueError(f"Unknown analytics table: {table}")
+        cutoff_date = datetime.now() - timedelta(days=days)
+        where, params = "user_id = ? AND timestamp > ? AND ", [user_id, cutoff_date.isoformat()]
+        if endpoint:
+            where += "endpoint = ? AND "
+            params.append(endpoint)
+        return iter_sqlite_rows(
+            lambda: sqlite3.connect(self.db_path),
+            f"SELECT * FROM {table} WHERE {where}{{after}} ORDER BY id",
+            params,
+        )
+    
     def get_top_endpoints(
         self,
         days: int = 7,
@@ -269,6 +293,6 @@ class MetricsCollector:
         }
 
 
-# Singleton instance
-metrics_collector = MetricsCollector()
+# Singleton instance (créé au premier usage ou au warm-up)
+metrics_collector = provider_registry.register("metrics_collector", MetricsCollector)
 
@@ -0,0 +1,337 @@
+"""
+API Planner - Planification adaptative des appels APIs
+Statistiques observées par API (latence, erreurs, données utiles) avec
+décroissance exponentielle, utilisées pour choisir les APIs à appeler :
+- sous un budget de latence (p50 au-delà du budget -> API écartée)
+- APIs lentes (p90 au-delà du seuil) doublées par une alternative (hedging)
+- APIs qui apportent rarement des données pour une intention -> écartées
+
+Les statistiques sont persistées dans ./data/api_planner_stats.json
+(rechargées au démarrage, sauvegardées périodiquement et à l'arrêt).
+"""
+import asyncio
+import json
+import logging
+import math
+import os
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Demi-vie des compteurs (secondes): une panne d'hier pèse peu aujourd'hui
+HALF_LIFE_S = float(os.getenv("API_PLANNER_HALF_LIFE_S", "3600"))
+# Échantillons minimum avant de juger une API (exploration sinon)
+MIN_SAMPLES = 5
+MAX_ERROR_RATE = 0.6
+MIN_USEFUL_RATE = 0.1
+# Seuil de hedging relatif au budget
+HEDGE_FRACTION = 0.5
+LATENCY_WINDOW = 200
+SAVE_EVERY = 50
+
+
+class APIStats:
+    """Statistiques décroissantes d'une API"""
+
+    def __init__(self):
+        self.calls = 0.0
+        self.errors = 0.0
+        self.useful = 0.0
+        self.updated_at = time.time()
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        # Contribution par intention: {intent: [appels, utiles]}
+        self.by_intent: Dict[str, List[float]] = {}
+
+    def _decay(self, now: float):
+        factor = 0.5 ** ((now - self.updated_at) / HALF_LIFE_S)
+        if factor < 1.0:
+            self.calls *= factor
+            self.errors *= factor
+            self.useful *= factor
+            for counts in self.by_intent.values():
+                counts[0] *= factor
+                counts[1] *= factor
+        self.updated_at = now
+
+    def record(self, latency_ms: float, ok: bool, useful: bool, intent: Optional[str] = None):
+        self.latencies.append(latency_ms)
+        self._decay(time.time())
+        self.calls += 1
+        if not ok:
+            self.errors += 1
+        if useful:
+            self.useful += 1
+        if intent:
+            counts = self.by_intent.setdefault(intent, [0.0, 0.0])
+            counts[0] += 1
+            if useful:
+                counts[1] += 1
+
+    def percentile(self, pct: float) -> Optional[float]:
+        if not self.latencies:
+            return None
+        ordered = sorted(self.latencies)
+        k = max(0, min(len(ordered) - 1, math.ceil(pct / 100 * len(ordered)) - 1))
+        return ordered[k]
+
+    @property
+    def error_rate(self) -> float:
+        return self.errors / self.calls if self.calls else 0.0
+
+    @property
+    def useful_rate(self) -> float:
+        return self.useful / self.calls if self.calls else 1.0
+
+    def useful_rate_for(self, intent: Optional[str]) -> Optional[float]:
+        counts = self.by_intent.get(intent or "")
+        if not counts or counts[0] < MIN_SAMPLES:
+            return None
+        return counts[1] / counts[0]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": round(self.calls, 3),
+            "errors": round(self.errors, 3),
+            "useful": round(self.useful, 3),
+            "updated_at": self.updated_at,
+            "latencies": list(self.latencies),
+            "by_intent": {k: [round(v[0], 3), round(v[1], 3)] for k, v in self.by_intent.items()},
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "APIStats":
+        stats = cls()
+        stats.calls = data.get("calls", 0.0)
+        stats.errors = data.get("errors", 0.0)
+        stats.useful = data.get("useful", 0.0)
+        stats.updated_at = data.get("updated_at", time.time())
+        stats.latencies.extend(data.get("latencies", []))
+        stats.by_intent = {k: list(v) for k, v in data.get("by_intent", {}).items()}
+        return stats
+
+
+@dataclass
+class PlanDecision:
+    """APIs retenues, doublures et APIs écartées (avec la raison)"""
+    apis: List[str] = field(default_factory=list)
+    hedges: Dict[str, str] = field(default_factory=dict)
+    hedge_delays_ms: Dict[str, float] = field(default_factory=dict)
+    dropped: Dict[str, str] = field(default_factory=dict)
+    estimated_ms: float = 0.0
+
+
+class APIPlanner:
+    """Choix des APIs à partir des statistiques observées"""
+
+    def __init__(self, path: str = "./data/api_planner_stats.json", default_latency_ms: float = 200.0):
+        self.path = path
+        self.default_latency_ms = default_latency_ms
+        self.stats: Dict[str, APIStats] = {}
+        self._loaded = False
+        self._dirty = 0
+
+    # ------------------------------------------------------------------
+    # Observation
+    # ------------------------------------------------------------------
+
+    def record(
+        self,
+        api: str,
+        latency_ms: float,
+        ok: bool = True,
+        useful: bool = False,
+        intent: Optional[str] = None,
+        cancelled: bool = False,
+    ):
+        """
+        Enregistrer le résultat d'un appel
+        Appel annulé (doublure gagnante, budget dépassé): seule la latence
+        (borne basse) est comptée, sans pénaliser les taux d'erreur/utilité.
+        """
+        self._ensure_loaded()
+        stats = self.stats.setdefault(api, APIStats())
+        if cancelled:
+            stats.latencies.append(latency_ms)
+        else:
+            stats.record(latency_ms, ok, useful, intent)
+        self._dirty += 1
+        if self._dirty >= SAVE_EVERY:
+            self._schedule_save()
+
+    def expected_latency_ms(self, api: str, pct: float = 50) -> float:
+        self._ensure_loaded()
+        stats = self.stats.get(api)
+        value = stats.percentile(pct) if stats else None
+        return value if value is not None else self.default_latency_ms
+
+    def score(self, api: str, intent: Optional[str] = None) -> float:
+        """Utilité attendue par seconde: données utiles x fiabilité / latence"""
+        self._ensure_loaded()
+        stats = self.stats.get(api)
+        if stats is None or stats.calls < MIN_SAMPLES:
+            return 1.0 / (self.default_latency_ms / 1000)  # Optimiste: explorer
+        useful = stats.useful_rate_for(intent)
+        useful = stats.useful_rate if useful is None else useful
+        return useful * (1 - stats.error_rate) / (max(self.expected_latency_ms(api), 1.0) / 1000)
+
+    # ------------------------------------------------------------------
+    # Planification
+    # ------------------------------------------------------------------
+
+    def plan(
+        self,
+        candidates_by_category: Dict[str, List[str]],
+        intent: Optional[str] = None,
+        latency_budget_ms: float = 3000.0,
+        max_apis: int = 6,
+        per_category: int = 2,
+    ) -> PlanDecision:
+        """
+        Choisir les APIs par catégorie (ordre statique = préférence à égalité)
+        """
+        self._ensure_loaded()
+        decision = PlanDecision()
+        hedge_threshold = latency_budget_ms * HEDGE_FRACTION
+
+        for category, candidates in candidates_by_category.items():
+            eligible = []
+            for api in dict.fromkeys(candidates):
+                reason = self._drop_reason(api, intent, latency_budget_ms)
+                if reason:
+                    decision.dropped[api] = reason
+                else:
+                    eligible.append(api)
+            # Tri stable: à score égal, l'ordre statique est conservé
+            eligible.sort(key=lambda api: self.score(api, intent), reverse=True)
+            chosen = eligible[:per_category]
+            if not chosen and candidates:
+                # Tout a été écarté: garder le meilleur candidat plutôt que rien
+                fallback = max(dict.fromkeys(candidates), key=lambda api: self.score(api, intent))
+                decision.dropped.pop(fallback, None)
+                chosen = [fallback]
+            taken = set(decision.apis) | set(decision.hedges.values())
+            for api in chosen:
+                if api in taken:
+                    continue
+                decision.apis.append(api)
+                taken.add(api)
+                p90 = self.expected_latency_ms(api, 90)
+                if p90 <= hedge_threshold:
+                    continue
+                # Doublure prise dans toute la catégorie (indépendamment de per_category):
+                # une API retenue plus bas devient la doublure au lieu d'un appel parallèle
+                backup = next((b for b in eligible if b not in taken), None)
+                if backup is None:
+                    continue
+                taken.add(backup)
+                decision.hedges[api] = backup
+                # Lancer la doublure quand l'API dépasse sa latence habituelle
+                decision.hedge_delays_ms[api] = min(self.expected_latency_ms(api, 50), hedge_threshold)
+
+        decision.apis = decision.apis[:max_apis]
+        decision.hedges = {api: b for api, b in decision.hedges.items() if api in decision.apis}
+        decision.hedge_delays_ms = {api: d for api, d in decision.hedge_delays_ms.items() if api in decision.hedges}
+        decision.estimated_ms = max(
+            (min(self.expected_latency_ms(api, 90), latency_budget_ms) for api in decision.apis),
+            default=0.0,
+        )
+        return decision
+
+    def _drop_reason(self, api: str, intent: Optional[str], latency_budget_ms: float) -> Optional[str]:
+        stats = self.stats.get(api)
+        if stats is None:
+            return None
+        if len(stats.latencies) >= MIN_SAMPLES:
+            p50 = stats.percentile(50)
+            if p50 > latency_budget_ms:
+                return f"p50={p50:.0f}ms>budget"
+        if stats.calls < MIN_SAMPLES:
+            return None
+        if stats.error_rate > MAX_ERROR_RATE:
+            return f"error_rate={stats.error_rate:.2f}"
+        useful = stats.useful_rate_for(intent)
+        if useful is not None and useful < MIN_USEFUL_RATE:
+            return f"rarely_useful[{intent}]={useful:.2f}"
+        return None
+
+    # ------------------------------------------------------------------
+    # Persistance
+    # ------------------------------------------------------------------
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        self._loaded = True
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                data = json.load(f)
+            for api, values in data.get("apis", {}).items():
+                self.stats[api] = APIStats.from_dict(values)
+            logger.info(f"API planner stats loaded ({len(self.stats)} APIs)")
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"API planner stats not loaded: {e}")
+
+    def _snapshot(self) -> Dict[str, Any]:
+        return {"saved_at": time.time(), "apis": {api: s.to_dict() for api, s in self.stats.items()}}
+
+    def _write(self, snapshot: Dict[str, Any]):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f)
+        os.replace(tmp_path, self.path)
+
+    def _schedule_save(self):
+        self._dirty = 0
+        snapshot = self._snapshot()
+        try:
+            asyncio.get_running_loop().create_task(asyncio.to_thread(self._write, snapshot))
+        except RuntimeError:
+            self._write(snapshot)
+
+    async def save(self):
+        """Sauvegarder maintenant (arrêt de l'application)"""
+        if not self._loaded:
+            return
+        self._dirty = 0
+        try:
+            await asyncio.to_thread(self._write, self._snapshot())
+        except Exception as e:
+            logger.warning(f"API planner stats not saved: {e}")
+
+    def reset(self):
+        self.stats.clear()
+        self._dirty = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        self._ensure_loaded()
+        return {
+            "half_life_s": HALF_LIFE_S,
+            "min_samples": MIN_SAMPLES,
+            "apis": {
+                api: {
+                    "calls": round(s.calls, 2),
+                    "error_rate": round(s.error_rate, 3),
+                    "useful_rate": round(s.useful_rate, 3),
+                    "latency_ms": {
+                        "p50": s.percentile(50),
+                        "p90": s.percentile(90),
+                        "p99": s.percentile(99),
+                    },
+                    "useful_rate_by_intent": {
+                        intent: round(c[1] / c[0], 3) if c[0] else None for intent, c in s.by_intent.items()
+                    },
+                    "score": round(self.score(api), 3),
+                }
+                for api, s in sorted(self.stats.items())
+            },
+        }
+
+
+# Instance globale
+api_planner = APIPlanner(path=os.getenv("API_PLANNER_STATS_PATH", "./data/api_planner_stats.json"))
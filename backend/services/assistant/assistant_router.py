@@ -38,7 +38,7 @@ class AssistantRouter:
             Dict avec confirmation d'apprentissage
         """
         # Sauvegarder l'interaction
-        self.memory_store.save_interaction(
+        interaction_id = self.memory_store.save_interaction(
             user_id=user_id,
             query=query,
             category=category,
@@ -46,20 +46,15 @@ class AssistantRouter:
             feedback=feedback
         )
         
-        # Apprendre les préférences (toutes les 10 interactions)
-        interactions = self.memory_store.get_user_interactions(user_id, limit=10)
-        if len(interactions) % 10 == 0:
-            preferences = self.preference_learner.learn_from_interactions(user_id)
-            return {
-                "learned": True,
-                "preferences_updated": True,
-                "total_interactions": len(interactions)
-            }
+        # Mise à jour incrémentale du profil (O(1), sans relire l'historique)
+        profile = self.preference_learner.observe_interaction(
+            user_id, query, category, interaction_id=interaction_id
+        )
         
         return {
             "learned": True,
-            "preferences_updated": False,
-            "total_interactions": len(interactions)
+            "preferences_updated": True,
+            "total_interactions": profile["n"]
         }
     
     async def get_recommendations(
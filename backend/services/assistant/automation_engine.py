@@ -2,11 +2,142 @@
 Automation Engine - Moteur d'automatisation intelligente
 Analyse la routine utilisateur et suggère des optimisations
 """
-from typing import Dict, Any, List, Optional
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Sequence, Tuple
 from datetime import datetime, timedelta
+import asyncio
+import numpy as np
 from services.assistant.memory_store import memory_store
 from services.ai_router import ai_router
 
+DAY_S = 86400
+SESSION_GAP_S = 30 * 60  # Interactions plus proches: même session (co-occurrence)
+MIN_OCCURRENCES = 3
+PERIODIC_MIN_CORRELATION = 0.3
+EPOCH_WEEKDAY = 3  # 1970-01-01 était un jeudi (0 = lundi)
+
+
+@dataclass
+class InteractionColumns:
+    """Historique en colonnes: epoch (s, heure locale) et code de catégorie, triés par temps"""
+    epochs: np.ndarray  # int64
+    codes: np.ndarray  # int32, -1 = sans catégorie
+    categories: List[str]
+    
+    @classmethod
+    def from_rows(cls, rows: Sequence[Tuple[Any, Optional[str]]]) -> "InteractionColumns":
+        """
+        Lignes (timestamp, catégorie) -> colonnes. Timestamps ISO (heure locale)
+        convertis en bloc par NumPy, ou epoch déjà calculés; catégories codées
+        dans l'ordre d'apparition.
+        """
+        mapping: Dict[str, int] = {}
+        stamps = [row[0] for row in rows]
+        if stamps and isinstance(stamps[0], str):
+            epochs = np.array(stamps, dtype="datetime64[s]").astype(np.int64)
+        else:
+            epochs = np.array(stamps, dtype=np.int64)
+        codes = np.fromiter(
+            (mapping.setdefault(row[1], len(mapping)) if row[1] else -1 for row in rows),
+            dtype=np.int32, count=len(rows)
+        )
+        order = np.argsort(epochs, kind="stable")
+        return cls(epochs[order], codes[order], list(mapping))
+
+
+def analyze_columns(columns: InteractionColumns, days: int) -> Dict[str, Any]:
+    """
+    Histogrammes heure / jour, périodicité et co-occurrences en un passage vectorisé
+    """
+    epochs, codes = columns.epochs, columns.codes
+    n_categories = len(columns.categories)
+    day_index = epochs // DAY_S
+    hours = (epochs % DAY_S) // 3600
+    weekdays = (day_index + EPOCH_WEEKDAY) % 7
+    
+    hour_hist = np.bincount(hours, minlength=24)
+    day_hist = np.bincount(weekdays, minlength=7)
+    categorized = codes >= 0
+    category_counts = np.bincount(codes[categorized], minlength=n_categories)
+    
+    patterns: List[Dict[str, Any]] = [
+        {
+            "type": "daily_time",
+            "hour": int(hour),
+            "frequency": int(hour_hist[hour]),
+            "description": f"Recherche régulière à {hour}h"
+        }
+        for hour in np.flatnonzero(hour_hist >= MIN_OCCURRENCES)
+    ]
+    
+    # Même catégorie à la même heure sur des jours distincts
+    first_day = day_index[0]
+    n_days = int(day_index[-1] - first_day) + 1
+    slots = (codes[categorized].astype(np.int64) * 24 + hours[categorized]) * n_days + (day_index[categorized] - first_day)
+    distinct_days = np.bincount(np.unique(slots) // n_days, minlength=n_categories * 24)
+    for slot in np.flatnonzero(distinct_days >= MIN_OCCURRENCES):
+        category, hour = columns.categories[slot // 24], int(slot % 24)
+        patterns.append({
+            "type": "category_time",
+            "category": category,
+            "hour": hour,
+            "days": int(distinct_days[slot]),
+            "description": f"{category} vers {hour}h ({int(distinct_days[slot])} jours)"
+        })
+    
+    # Périodicité: autocorrélation des volumes quotidiens
+    periodicity = _periodicity(np.bincount(day_index - first_day, minlength=n_days))
+    if periodicity["period_days"] and periodicity["correlation"] >= PERIODIC_MIN_CORRELATION:
+        patterns.append({
+            "type": "periodic",
+            "period_days": periodicity["period_days"],
+            "correlation": periodicity["correlation"],
+            "description": f"Activité qui revient tous les {periodicity['period_days']} jours"
+        })
+    
+    # Co-occurrences: catégories différentes consécutives dans la même session
+    c_epochs, c_codes = epochs[categorized], codes[categorized]
+    same_session = (np.diff(c_epochs) <= SESSION_GAP_S) & (c_codes[1:] != c_codes[:-1])
+    low = np.minimum(c_codes[:-1], c_codes[1:])[same_session].astype(np.int64)
+    high = np.maximum(c_codes[:-1], c_codes[1:])[same_session].astype(np.int64)
+    pair_counts = np.bincount(low * n_categories + high, minlength=n_categories * n_categories)
+    for pair in np.argsort(pair_counts)[::-1][:5]:
+        if pair_counts[pair] < MIN_OCCURRENCES:
+            break
+        a, b = columns.categories[pair // n_categories], columns.categories[pair % n_categories]
+        patterns.append({
+            "type": "co_occurrence",
+            "categories": [a, b],
+            "frequency": int(pair_counts[pair]),
+            "description": f"{a} et {b} dans la même session"
+        })
+    
+    return {
+        "total_interactions": int(len(epochs)),
+        "interactions_per_day": len(epochs) / days,
+        "most_active_hour": int(hour_hist.argmax()),
+        "most_active_day": int(day_hist.argmax()),
+        "categories_used": {columns.categories[i]: int(c) for i, c in enumerate(category_counts) if c},
+        "hour_histogram": hour_hist.tolist(),
+        "day_histogram": day_hist.tolist(),
+        "periodicity": periodicity,
+        "routine_patterns": patterns
+    }
+
+
+def _periodicity(daily_counts: np.ndarray, max_lag: int = 14) -> Dict[str, Any]:
+    """Décalage (jours) de plus forte autocorrélation du volume quotidien"""
+    max_lag = min(max_lag, len(daily_counts) // 2)
+    centered = daily_counts - daily_counts.mean()
+    energy = float(centered @ centered)
+    result = {"active_days_ratio": round(float((daily_counts > 0).mean()), 3), "period_days": None, "correlation": 0.0}
+    if max_lag < 2 or energy == 0:
+        return result
+    correlations = np.array([centered[:-lag] @ centered[lag:] for lag in range(2, max_lag + 1)]) / energy
+    best = int(correlations.argmax())
+    result.update(period_days=best + 2, correlation=round(float(correlations[best]), 3))
+    return result
+
 
 class AutomationEngine:
     """Moteur d'automatisation intelligente"""
@@ -30,107 +161,27 @@ class AutomationEngine:
         Returns:
             Dict avec analyse de routine
         """
-        # Obtenir interactions des derniers jours
-        interactions = self.memory_store.get_user_interactions(user_id, limit=1000)
-        
-        if not interactions:
-            return {
-                "routine_analyzed": False,
-                "message": "Pas assez de données pour analyser la routine"
-            }
-        
-        # Filtrer par date
+        # Interactions des derniers jours, en colonnes (epoch + code catégorie)
         cutoff_date = datetime.now() - timedelta(days=days)
-        recent_interactions = [
-            i for i in interactions
-            if datetime.fromisoformat(i['timestamp']) > cutoff_date
-        ]
+        rows = await asyncio.to_thread(
+            self.memory_store.get_interaction_timeline, user_id, cutoff_date.isoformat()
+        )
         
-        if not recent_interactions:
+        if not rows:
+            has_history = bool(self.memory_store.get_user_interactions(user_id, limit=1))
             return {
                 "routine_analyzed": False,
-                "message": f"Pas d'interactions dans les {days} derniers jours"
+                "message": f"Pas d'interactions dans les {days} derniers jours" if has_history
+                else "Pas assez de données pour analyser la routine"
             }
         
-        # Analyser patterns
-        analysis = {
-            "total_interactions": len(recent_interactions),
-            "interactions_per_day": len(recent_interactions) / days,
-            "most_active_hour": self._get_most_active_hour(recent_interactions),
-            "most_active_day": self._get_most_active_day(recent_interactions),
-            "categories_used": self._get_categories_used(recent_interactions),
-            "routine_patterns": self._detect_routine_patterns(recent_interactions)
-        }
-        
+        columns = InteractionColumns.from_rows(rows)
         return {
             "routine_analyzed": True,
-            "analysis": analysis,
+            "analysis": analyze_columns(columns, days),
             "period_days": days
         }
     
-    def _get_most_active_hour(self, interactions: List[Dict]) -> Optional[int]:
-        """Obtenir l'heure la plus active"""
-        hours = []
-        for interaction in interactions:
-            try:
-                timestamp = datetime.fromisoformat(interaction['timestamp'])
-                hours.append(timestamp.hour)
-            except:
-                pass
-        
-        if hours:
-            from collections import Counter
-            return Counter(hours).most_common(1)[0][0]
-        return None
-    
-    def _get_most_active_day(self, interactions: List[Dict]) -> Optional[int]:
-        """Obtenir le jour de la semaine le plus actif (0=lundi)"""
-        days = []
-        for interaction in interactions:
-            try:
-                timestamp = datetime.fromisoformat(interaction['timestamp'])
-                days.append(timestamp.weekday())
-            except:
-                pass
-        
-        if days:
-            from collections import Counter
-            return Counter(days).most_common(1)[0][0]
-        return None
-    
-    def _get_categories_used(self, interactions: List[Dict]) -> Dict[str, int]:
-        """Obtenir les catégories utilisées"""
-        from collections import Counter
-        categories = [i.get('category') for i in interactions if i.get('category')]
-        return dict(Counter(categories))
-    
-    def _detect_routine_patterns(self, interactions: List[Dict]) -> List[Dict[str, Any]]:
-        """Détecter des patterns de routine"""
-        patterns = []
-        
-        # Pattern: Recherche quotidienne à la même heure
-        hour_groups = {}
-        for interaction in interactions:
-            try:
-                timestamp = datetime.fromisoformat(interaction['timestamp'])
-                hour = timestamp.hour
-                if hour not in hour_groups:
-                    hour_groups[hour] = []
-                hour_groups[hour].append(interaction)
-            except:
-                pass
-        
-        for hour, group in hour_groups.items():
-            if len(group) >= 3:  # Au moins 3 fois à cette heure
-                patterns.append({
-                    "type": "daily_time",
-                    "hour": hour,
-                    "frequency": len(group),
-                    "description": f"Recherche régulière à {hour}h"
-                })
-        
-        return patterns
-    
     async def optimize_routine(
         self,
         user_id: str
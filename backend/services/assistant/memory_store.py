@@ -4,10 +4,13 @@ Stockage local avec SQLite pour MVP
 """
 import sqlite3
 import json
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Callable, Iterator
 from datetime import datetime
 from pathlib import Path
 import os
+import time
+
+from services.provider_registry import provider_registry
 
 
 class MemoryStore:
@@ -55,6 +58,23 @@ class MemoryStore:
             ON interactions(user_id, timestamp)
         """)
         
+        # Index couvrant pour l'analyse de routine (pas d'accès à la table)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_user_interactions_timeline
+            ON interactions(user_id, timestamp, category)
+        """)
+        
+        # Profil de préférences incrémental (une ligne compacte par utilisateur)
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS preference_profiles (
+                user_id TEXT PRIMARY KEY,
+                profile TEXT NOT NULL,
+                last_interaction_id INTEGER NOT NULL DEFAULT 0,
+                reconciled_at REAL NOT NULL DEFAULT 0,
+                updated_at REAL NOT NULL
+            )
+        """)
+        
         conn.commit()
         conn.close()
     
@@ -66,8 +86,8 @@ class MemoryStore:
         action: str = "search",
         result_id: Optional[str] = None,
         feedback: Optional[str] = None
-    ) -> None:
-        """Sauvegarder une interaction utilisateur"""
+    ) -> int:
+        """Sauvegarder une interaction utilisateur (retourne son id)"""
         conn = sqlite3.connect(self.db_path)
         cursor = conn.cursor()
         
@@ -91,6 +111,8 @@ class MemoryStore:
             feedback
         ))
         
+        interaction_id = cursor.lastrowid
+        
         # Mettre à jour last_updated
         cursor.execute("""
             UPDATE users SET last_updated = ? WHERE user_id = ?
@@ -98,6 +120,7 @@ class MemoryStore:
         
         conn.commit()
         conn.close()
+        return interaction_id
     
     def get_user_interactions(
         self,
@@ -200,6 +223,88 @@ class MemoryStore:
             return json.loads(row[0])
         return {}
     
+    def iter_interactions(self, user_id: str, after_id: int = 0) -> Iterator[Dict[str, Any]]:
+        """Interactions d'un utilisateur d'id > after_id, de la plus ancienne à la plus récente (curseur)"""
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            for row in conn.execute(
+                "SELECT id, timestamp, query, category FROM interactions WHERE user_id = ? AND id > ? ORDER BY id",
+                (user_id, after_id)
+            ):
+                yield dict(row)
+        finally:
+            conn.close()
+    
+    def get_interaction_timeline(self, user_id: str, since: str) -> List[tuple]:
+        """(timestamp, category) des interactions depuis `since` (ISO), par ordre chronologique"""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("""
+            SELECT timestamp, category
+            FROM interactions
+            WHERE user_id = ? AND timestamp > ?
+            ORDER BY timestamp
+        """, (user_id, since)).fetchall()
+        conn.close()
+        return rows
+    
+    def get_profile(self, user_id: str) -> Optional[Dict[str, Any]]:
+        """Profil de préférences compact (None si jamais calculé)"""
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(
+            "SELECT profile FROM preference_profiles WHERE user_id = ?", (user_id,)
+        ).fetchone()
+        conn.close()
+        return json.loads(row[0]) if row else None
+    
+    def update_profile(
+        self,
+        user_id: str,
+        update: Callable[[Optional[Dict[str, Any]]], Dict[str, Any]],
+        interaction_id: int = 0,
+        reconciled: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Lire-modifier-écrire le profil dans une transaction IMMEDIATE
+        (pas de mise à jour perdue entre requêtes ou workers concurrents)
+        """
+        conn = sqlite3.connect(self.db_path, isolation_level=None, timeout=10)
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT profile, reconciled_at FROM preference_profiles WHERE user_id = ?", (user_id,)
+            ).fetchone()
+            profile = update(json.loads(row[0]) if row else None)
+            now = time.time()
+            conn.execute("""
+                INSERT OR REPLACE INTO preference_profiles
+                    (user_id, profile, last_interaction_id, reconciled_at, updated_at)
+                VALUES (?, ?, MAX(?, COALESCE((SELECT last_interaction_id FROM preference_profiles WHERE user_id = ?), 0)), ?, ?)
+            """, (
+                user_id, json.dumps(profile, separators=(",", ":")), interaction_id, user_id,
+                now if reconciled else (row[1] if row else 0), now
+            ))
+            conn.execute("COMMIT")
+            return profile
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+    
+    def profiles_to_reconcile(self, older_than: float, limit: int = 50) -> List[str]:
+        """Utilisateurs sans profil ou dont le profil n'a pas été recalculé depuis `older_than`"""
+        conn = sqlite3.connect(self.db_path)
+        rows = conn.execute("""
+            SELECT u.user_id FROM users u
+            LEFT JOIN preference_profiles p ON p.user_id = u.user_id
+            WHERE p.user_id IS NULL OR p.reconciled_at < ?
+            ORDER BY COALESCE(p.reconciled_at, 0)
+            LIMIT ?
+        """, (older_than, limit)).fetchall()
+        conn.close()
+        return [row[0] for row in rows]
+    
     def get_user_stats(self, user_id: str) -> Dict[str, Any]:
         """Obtenir les statistiques d'un utilisateur"""
         conn = sqlite3.connect(self.db_path)
@@ -240,5 +345,5 @@ class MemoryStore:
         }
 
 
-# Singleton instance
-memory_store = MemoryStore()
+# Singleton instance (créé au premier usage ou au warm-up)
+memory_store = provider_registry.register("memory_store", MemoryStore)
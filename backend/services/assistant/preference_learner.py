@@ -1,122 +1,176 @@
 """
 Preference Learner - Apprentissage des préférences utilisateur
 Algorithme simple d'apprentissage basé sur fréquence et patterns
+
+Apprentissage incrémental :
+- chaque interaction met à jour le profil en O(1) (poids par catégorie,
+  mots-clés par catégorie, histogrammes heure / jour)
+- décroissance exponentielle (demi-vie PREFERENCE_HALF_LIFE_DAYS) par
+  pondération croissante des nouvelles interactions (forward decay): les
+  anciens compteurs ne sont pas réécrits, seulement remis à l'échelle
+  de temps en temps
+- profil stocké en une ligne compacte; recalcul complet en tâche de fond
+  pour corriger la dérive (interactions manquées, arrondis). Le recalcul
+  rejoue dans la transaction d'écriture les interactions arrivées pendant
+  le parcours et mémorise le dernier id couvert ("r"): une observation
+  incrémentale déjà comptée par le recalcul est ignorée
 """
+import asyncio
+import logging
+import math
+import os
+import time
 from typing import Dict, Any, List, Optional
-from collections import Counter, defaultdict
-from datetime import datetime, timedelta
+from datetime import datetime
 from services.assistant.memory_store import memory_store
 
+logger = logging.getLogger(__name__)
+
+HALF_LIFE_S = float(os.getenv("PREFERENCE_HALF_LIFE_DAYS", 30)) * 86400
+DECAY_RATE = math.log(2) / HALF_LIFE_S
+RESCALE_ABOVE = 1e6  # Facteur de poids au-delà duquel tout le profil est remis à l'échelle
+MAX_KEYWORDS = 50  # Par catégorie (élagage amorti jusqu'à KEEP_KEYWORDS)
+KEEP_KEYWORDS = 40
+MAX_WORDS_PER_QUERY = 20
+RECONCILE_INTERVAL_S = float(os.getenv("PREFERENCE_RECONCILE_INTERVAL_S", 3600))
+RECONCILE_MAX_AGE_S = 24 * 3600
+RECONCILE_BATCH = 20
+
+
+def _timestamp(value: Optional[str]) -> float:
+    try:
+        return datetime.fromisoformat(value).timestamp()
+    except (TypeError, ValueError):
+        return time.time()
+
+
+def new_profile(now: float) -> Dict[str, Any]:
+    """Profil vide; t0 = référence de temps des poids"""
+    return {"t0": now, "n": 0, "c": {}, "k": {}, "h": [0.0] * 24, "d": [0.0] * 7, "last": {}}
+
+
+def _rescale(profile: Dict[str, Any], now: float):
+    """Ramener t0 à maintenant (facteurs < 1 sur tous les compteurs)"""
+    factor = math.exp(-DECAY_RATE * (now - profile["t0"]))
+    profile["c"] = {cat: v * factor for cat, v in profile["c"].items()}
+    profile["k"] = {cat: {w: v * factor for w, v in words.items()} for cat, words in profile["k"].items()}
+    profile["h"] = [v * factor for v in profile["h"]]
+    profile["d"] = [v * factor for v in profile["d"]]
+    profile["t0"] = now
+
+
+def observe(profile: Dict[str, Any], query: str, category: Optional[str], timestamp: float) -> Dict[str, Any]:
+    """Ajouter une interaction au profil (O(1) amorti)"""
+    weight = math.exp(DECAY_RATE * (timestamp - profile["t0"]))
+    if weight > RESCALE_ABOVE:
+        _rescale(profile, timestamp)
+        weight = 1.0
+
+    profile["n"] += 1
+    moment = datetime.fromtimestamp(timestamp)
+    profile["h"][moment.hour] += weight
+    profile["d"][moment.weekday()] += weight  # 0 = lundi
+
+    if category:
+        profile["c"][category] = profile["c"].get(category, 0.0) + weight
+        profile["last"][category] = moment.isoformat()
+        keywords = profile["k"].setdefault(category, {})
+        for word in (query or "").lower().split()[:MAX_WORDS_PER_QUERY]:
+            keywords[word] = keywords.get(word, 0.0) + weight
+        if len(keywords) > MAX_KEYWORDS:
+            kept = sorted(keywords.items(), key=lambda item: item[1], reverse=True)[:KEEP_KEYWORDS]
+            profile["k"][category] = dict(kept)
+    return profile
+
+
+def to_preferences(profile: Dict[str, Any], now: Optional[float] = None) -> Dict[str, Any]:
+    """Profil compact -> préférences (format historique: weight, frequency, keywords...)"""
+    if not profile or not profile["c"]:
+        return {}
+    decay = math.exp(-DECAY_RATE * ((now or time.time()) - profile["t0"]))
+    total = sum(profile["c"].values())
+    preferences = {}
+    for category, score in sorted(profile["c"].items(), key=lambda item: item[1], reverse=True)[:10]:
+        keywords = profile["k"].get(category, {})
+        preferences[category] = {
+            "weight": score / total,
+            "frequency": round(score * decay, 3),  # Nombre d'interactions pondéré par l'âge
+            "last_used": profile["last"].get(category),
+            "keywords": [w for w, _ in sorted(keywords.items(), key=lambda item: item[1], reverse=True)[:10]]
+        }
+    hours, days = profile["h"], profile["d"]
+    if any(hours):
+        preferences["_time_patterns"] = {
+            "preferred_hour": max(range(24), key=hours.__getitem__),
+            "preferred_day": max(range(7), key=days.__getitem__)
+        }
+    return preferences
+
 
 class PreferenceLearner:
     """Apprentissage des préférences utilisateur"""
-    
+
     def __init__(self):
         self.memory_store = memory_store
-    
+        self._runner: Optional[asyncio.Task] = None
+
+    def observe_interaction(
+        self,
+        user_id: str,
+        query: str,
+        category: Optional[str],
+        interaction_id: int = 0,
+        timestamp: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Mettre à jour le profil avec une nouvelle interaction (une lecture + une écriture)"""
+        now = timestamp or time.time()
+
+        def update(profile):
+            if profile and interaction_id and interaction_id <= profile.get("r", 0):
+                return profile  # Déjà compté par la réconciliation
+            return observe(profile or new_profile(now), query, category, now)
+
+        return self.memory_store.update_profile(user_id, update, interaction_id=interaction_id)
+
     def learn_from_interactions(self, user_id: str) -> Dict[str, Any]:
         """
-        Apprendre les préférences à partir des interactions
-        
+        Recalculer le profil depuis tout l'historique (réconciliation)
+
         Returns:
             Dict avec préférences apprises par catégorie
         """
-        interactions = self.memory_store.get_user_interactions(user_id, limit=1000)
-        
-        if not interactions:
-            return {}
-        
-        # Analyser les patterns
-        preferences = {}
-        
-        # 1. Catégories préférées (fréquence)
-        category_counts = Counter([i['category'] for i in interactions if i.get('category')])
-        total = sum(category_counts.values())
-        
-        if total > 0:
-            for category, count in category_counts.most_common(10):
-                preferences[category] = {
-                    "weight": count / total,
-                    "frequency": count,
-                    "last_used": self._get_last_use(interactions, category)
-                }
-        
-        # 2. Mots-clés fréquents par catégorie
-        keywords_by_category = defaultdict(Counter)
-        for interaction in interactions:
-            category = interaction.get('category')
-            query = interaction.get('query', '')
-            if category and query:
-                words = query.lower().split()
-                keywords_by_category[category].update(words)
-        
-        # Ajouter keywords aux préférences
-        for category, keywords in keywords_by_category.items():
-            if category in preferences:
-                # Top 10 mots-clés
-                top_keywords = [word for word, count in keywords.most_common(10)]
-                preferences[category]["keywords"] = top_keywords
-        
-        # 3. Patterns temporels (jour de la semaine, heure)
-        time_patterns = self._analyze_time_patterns(interactions)
-        if time_patterns:
-            preferences["_time_patterns"] = time_patterns
-        
-        # Sauvegarder les préférences apprises
-        self.memory_store.save_preferences(user_id, preferences)
-        
-        return preferences
-    
-    def _get_last_use(self, interactions: List[Dict], category: str) -> Optional[str]:
-        """Obtenir la dernière utilisation d'une catégorie"""
-        for interaction in interactions:
-            if interaction.get('category') == category:
-                return interaction.get('timestamp')
-        return None
-    
-    def _analyze_time_patterns(self, interactions: List[Dict]) -> Dict[str, Any]:
-        """Analyser les patterns temporels"""
-        if not interactions:
-            return {}
-        
-        # Analyser les heures d'utilisation
-        hours = []
-        days = []
-        
-        for interaction in interactions:
-            timestamp_str = interaction.get('timestamp')
-            if timestamp_str:
-                try:
-                    timestamp = datetime.fromisoformat(timestamp_str)
-                    hours.append(timestamp.hour)
-                    days.append(timestamp.weekday())  # 0 = lundi
-                except:
-                    pass
-        
-        patterns = {}
-        
-        if hours:
-            hour_counter = Counter(hours)
-            most_common_hour = hour_counter.most_common(1)[0][0]
-            patterns["preferred_hour"] = most_common_hour
-        
-        if days:
-            day_counter = Counter(days)
-            most_common_day = day_counter.most_common(1)[0][0]
-            patterns["preferred_day"] = most_common_day
-        
-        return patterns
-    
+        profile = None
+        last_id = 0
+        for interaction in self.memory_store.iter_interactions(user_id):
+            ts = _timestamp(interaction.get('timestamp'))
+            profile = observe(profile or new_profile(ts), interaction.get('query', ''), interaction.get('category'), ts)
+            last_id = interaction['id']
+
+        def merge(_):
+            # Sous verrou d'écriture: rejouer ce qui est arrivé depuis le parcours.
+            # Sans interaction, un profil vide est écrit pour ne pas revenir en tête
+            # de la file de réconciliation à chaque passage.
+            merged = profile or new_profile(time.time())
+            merged["r"] = last_id
+            for interaction in self.memory_store.iter_interactions(user_id, after_id=last_id):
+                ts = _timestamp(interaction.get('timestamp'))
+                observe(merged, interaction.get('query', ''), interaction.get('category'), ts)
+                merged["r"] = interaction['id']
+            return merged
+
+        profile = self.memory_store.update_profile(user_id, merge, interaction_id=last_id, reconciled=True)
+        return to_preferences(profile)
+
     def get_user_preferences(self, user_id: str) -> Dict[str, Any]:
         """Obtenir les préférences d'un utilisateur"""
-        # Si pas de préférences, apprendre depuis interactions
-        preferences = self.memory_store.get_preferences(user_id)
-        
-        if not preferences:
-            preferences = self.learn_from_interactions(user_id)
-        
+        profile = self.memory_store.get_profile(user_id)
+        preferences = to_preferences(profile) if profile else self.learn_from_interactions(user_id)
+
+        # Préférences définies manuellement (update_preference) prioritaires
+        manual = self.memory_store.get_preferences(user_id)
+        preferences.update({k: v for k, v in manual.items() if isinstance(v, dict) and v.get("manual")})
         return preferences
-    
+
     def update_preference(
         self,
         user_id: str,
@@ -125,17 +179,50 @@ class PreferenceLearner:
         keywords: List[str] = None
     ) -> None:
         """Mettre à jour manuellement une préférence"""
-        preferences = self.get_user_preferences(user_id)
-        
+        preferences = self.memory_store.get_preferences(user_id)
+
         preferences[category] = {
             "weight": weight,
             "keywords": keywords or [],
-            "last_updated": datetime.now().isoformat()
+            "last_updated": datetime.now().isoformat(),
+            "manual": True
         }
-        
+
         self.memory_store.save_preferences(user_id, preferences)
 
+    # ------------------------------------------------------------------
+    # Réconciliation en tâche de fond
+    # ------------------------------------------------------------------
+
+    def reconcile(self, limit: int = RECONCILE_BATCH) -> int:
+        """Recalculer les profils absents ou les plus anciennement recalculés"""
+        users = self.memory_store.profiles_to_reconcile(time.time() - RECONCILE_MAX_AGE_S, limit)
+        for user_id in users:
+            self.learn_from_interactions(user_id)
+        return len(users)
+
+    async def _run(self):
+        while True:
+            try:
+                count = await asyncio.to_thread(self.reconcile)
+                if count:
+                    logger.info(f"Preference profiles reconciled: {count}")
+            except Exception as e:
+                logger.error(f"Preference reconciliation failed: {e}")
+            await asyncio.sleep(RECONCILE_INTERVAL_S)
+
+    def start(self):
+        """Démarrer la réconciliation périodique sur la boucle courante"""
+        if self._runner and not self._runner.done():
+            return
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
 
 # Singleton instance
 preference_learner = PreferenceLearner()
-
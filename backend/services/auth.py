@@ -13,6 +13,7 @@ import sqlite3
 from pathlib import Path
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from services.provider_registry import provider_registry
 
 logger = logging.getLogger(__name__)
 
@@ -385,18 +386,12 @@ class AuthService:
             conn.close()
 
 
-# Singleton instance - with lazy initialization for testing
-_auth_service = None
+# Singleton instance - created on first use or during warm-up (never at import)
+auth_service = provider_registry.register("auth", AuthService)
 
 def get_auth_service() -> AuthService:
     """Get or create the auth service singleton"""
-    global _auth_service
-    if _auth_service is None:
-        _auth_service = AuthService()
-    return _auth_service
-
-# For backward compatibility
-auth_service = get_auth_service()
+    return provider_registry.get("auth")
 # FastAPI Dependencies
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login", auto_error=False)
 
@@ -409,7 +404,9 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    payload = auth_service.verify_token(token)
+    # Premier usage possible pendant le warm-up: construction hors de la boucle
+    service = await provider_registry.aget("auth")
+    payload = service.verify_token(token)
     if not payload:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -424,7 +421,8 @@ async def get_optional_user(token: str = Depends(oauth2_scheme)) -> Optional[Dic
     if not token:
         return None
     
-    return auth_service.verify_token(token)
+    service = await provider_registry.aget("auth")
+    return service.verify_token(token)
     
     def __init__(self, db_path: str = "./data/auth.db"):
         self.db_path = Path(db_path)
@@ -742,46 +740,3 @@ async def get_optional_user(token: str = Depends(oauth2_scheme)) -> Optional[Dic
             return 0
         finally:
             conn.close()
-
-
-# Singleton instance - with lazy initialization for testing
-_auth_service = None
-
-def get_auth_service() -> AuthService:
-    """Get or create the auth service singleton"""
-    global _auth_service
-    if _auth_service is None:
-        _auth_service = AuthService()
-    return _auth_service
-
-# For backward compatibility
-auth_service = get_auth_service()
-
-# FastAPI Dependencies
-oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login", auto_error=False)
-
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> Dict[str, Any]:
-    """Dependency to get current authenticated user"""
-    if not token:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Not authenticated",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-    
-    payload = auth_service.verify_token(token)
-    if not payload:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Could not validate credentials",
-            headers={"WWW-Authenticate": "Bearer"},
-        )
-        
-    return payload
-
-async def get_optional_user(token: str = Depends(oauth2_scheme)) -> Optional[Dict[str, Any]]:
-    """Dependency to get optional user (returns None if not auth)"""
-    if not token:
-        return None
-    
-    return auth_service.verify_token(token)
@@ -4,7 +4,7 @@ Routing intelligent vers les meilleurs LLMs
 """
 import logging
 from typing import Dict, Any, Optional
-from services.ai_router import AIRouter
+from services.ai_router import ai_router
 
 logger = logging.getLogger(__name__)
 
@@ -24,7 +24,8 @@ class BoltAIRouter:
     """
     
     def __init__(self):
-        self.ai_router = AIRouter()
+        # Router partagé (évite une 2e instanciation des providers)
+        self.ai_router = ai_router
         self.models = {
             'bolt-turbo': 'groq',      # Ultra rapide
             'bolt-pro': 'gemini',       # Puissant
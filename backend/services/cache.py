@@ -3,11 +3,15 @@ Redis cache service for AI responses
 """
 import json
 import hashlib
+import asyncio
+import threading
 from typing import Optional, Any
 from redis import Redis
 from redis.exceptions import RedisError
 import os
 from dotenv import load_dotenv
+from services.provider_registry import provider_registry
+from services.tracing import span
 
 load_dotenv()
 
@@ -16,27 +20,56 @@ class CacheService:
     """Redis cache service with fallback"""
     
     def __init__(self):
-        try:
-            from redis.connection import ConnectionPool
-            
-            pool = ConnectionPool(
-                host=os.getenv("REDIS_HOST", "localhost"),
-                port=int(os.getenv("REDIS_PORT", 6379)),
-                db=int(os.getenv("REDIS_DB", 0)),
-                password=os.getenv("REDIS_PASSWORD") or None,
-                max_connections=50,
-                decode_responses=True,
-                socket_connect_timeout=2
-            )
-            
-            self.redis = Redis(connection_pool=pool)
-            # Test connection
-            self.redis.ping()
-            self.available = True
-            print("[OK] Redis cache connected")
-        except (RedisError, Exception) as e:
-            print(f"[WARN] Redis unavailable: {e}. Running without cache.")
-            self.available = False
+        # Connexion établie au premier usage ou pendant le warm-up (pas à l'import)
+        self.redis = None
+        self._available: Optional[bool] = None
+        self._connect_lock = threading.Lock()
+    
+    async def connect(self) -> bool:
+        """Établir la connexion Redis (une seule fois, ping hors de la boucle)"""
+        if self._available is not None:
+            return self._available
+        return await asyncio.to_thread(self._connect_sync)
+    
+    def _connect_sync(self) -> bool:
+        with self._connect_lock:
+            if self._available is not None:
+                return self._available
+            try:
+                from redis.connection import ConnectionPool
+                
+                pool = ConnectionPool(
+                    host=os.getenv("REDIS_HOST", "localhost"),
+                    port=int(os.getenv("REDIS_PORT", 6379)),
+                    db=int(os.getenv("REDIS_DB", 0)),
+                    password=os.getenv("REDIS_PASSWORD") or None,
+                    max_connections=50,
+                    decode_responses=True,
+                    socket_connect_timeout=2
+                )
+                
+                self.redis = Redis(connection_pool=pool)
+                # Test connection
+                self.redis.ping()
+                self._available = True
+                print("[OK] Redis cache connected")
+            except (RedisError, Exception) as e:
+                print(f"[WARN] Redis unavailable: {e}. Running without cache.")
+                self._available = False
+            return self._available
+    
+    async def warm_up(self):
+        """Connexion Redis au démarrage (appelé par le lifespan)"""
+        await self.connect()
+    
+    @property
+    def available(self) -> bool:
+        # Jamais de ping ici: tant que connect() n'a pas abouti, pas de cache
+        return bool(self._available)
+    
+    @available.setter
+    def available(self, value: bool):
+        self._available = value
     
     def _generate_key(self, prefix: str, data: str) -> str:
         """Generate cache key from data"""
@@ -50,7 +83,9 @@ class CacheService:
         
         try:
             key = self._generate_key(prefix, data)
-            cached = self.redis.get(key)
+            with span("cache.get", prefix=prefix) as s:
+                cached = self.redis.get(key)
+                s.set_attribute("cache.hit", bool(cached))
             if cached:
                 return json.loads(cached)
             return None
@@ -65,11 +100,12 @@ class CacheService:
         
         try:
             key = self._generate_key(prefix, data)
-            self.redis.setex(
-                key,
-                ttl,
-                json.dumps(value)
-            )
+            with span("cache.set", prefix=prefix, ttl=ttl):
+                self.redis.setex(
+                    key,
+                    ttl,
+                    json.dumps(value)
+                )
         except Exception as e:
             print(f"Cache set error: {e}")
     
@@ -80,7 +116,8 @@ class CacheService:
         
         try:
             key = self._generate_key(prefix, data)
-            self.redis.delete(key)
+            with span("cache.delete", prefix=prefix):
+                self.redis.delete(key)
         except Exception as e:
             print(f"Cache delete error: {e}")
     
@@ -145,5 +182,5 @@ class CacheService:
         return current < daily_quota
 
 
-# Singleton instance
-cache_service = CacheService()
+# Singleton instance (créé au premier usage)
+cache_service = provider_registry.register("cache", CacheService)
@@ -0,0 +1,303 @@
+"""
+Context Builder - Historique de conversation sous budget de tokens
+Remplace le collage des N derniers messages bruts dans le prompt système :
+- budget de tokens explicite par provider IA (CONTEXT_BUDGET_<PROVIDER>)
+- les tours anciens sont compactés dans un résumé glissant, mis à jour en
+  tâche de fond après une réponse (dès qu'un lot complet est à résumer, au
+  plus une fois par SUMMARY_DEBOUNCE_S par session) et stocké avec la
+  session (table conversation_summaries)
+- cache par session (résumé + derniers messages, alimenté à l'écriture):
+  un tour coûte au plus une lecture indexée
+
+Utilisé par EnhancedConversationMemory et ConversationManager (même schéma
+de table conversations).
+"""
+import asyncio
+import logging
+import os
+import sqlite3
+import time
+from collections import OrderedDict, deque
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Budget de tokens de l'historique (résumé + messages) par provider
+DEFAULT_BUDGETS = {
+    "groq": 1200,        # Limites TPM serrées du tier gratuit
+    "mistral": 2000,
+    "gemini": 3000,
+    "openrouter": 1500,
+    "ollama": 800,       # Contexte local réduit
+}
+DEFAULT_BUDGET = 1200
+
+# Messages récents jamais résumés, et nombre de messages anciens déclenchant un résumé
+KEEP_RECENT = 6
+SUMMARY_BATCH = 6
+SUMMARY_MAX_CHARS = 1200
+RECENT_CACHE_SIZE = 40
+CACHE_TTL_S = 300
+CACHE_MAX_SESSIONS = 1000
+SUMMARY_DEBOUNCE_S = float(os.getenv("CONTEXT_SUMMARY_DEBOUNCE_S", "30"))
+
+Summarizer = Callable[[str, List[Dict[str, Any]]], Awaitable[str]]
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimation rapide (~4 caractères par token, FR/EN)"""
+    return len(text) // 4 + 1 if text else 0
+
+
+def budget_for(provider: Optional[str] = None) -> int:
+    """Budget du provider, sinon celui du provider que le routeur choisira"""
+    if not provider:
+        try:
+            from services.ai_router import ai_router
+            provider = ai_router.select_provider()
+        except Exception:
+            provider = None
+    if not provider:
+        return DEFAULT_BUDGET
+    env_value = os.getenv(f"CONTEXT_BUDGET_{provider.upper()}")
+    return int(env_value) if env_value else DEFAULT_BUDGETS.get(provider, DEFAULT_BUDGET)
+
+
+def fit_messages(
+    messages: List[Dict[str, Any]],
+    budget_tokens: int,
+    max_chars: Optional[int] = None,
+    max_messages: Optional[int] = None,
+) -> List[Dict[str, Any]]:
+    """Derniers messages (ordre chronologique) tenant dans le budget"""
+    kept: List[Dict[str, Any]] = []
+    used = 0
+    for msg in reversed(messages):
+        if max_messages is not None and len(kept) >= max_messages:
+            break
+        text = msg["message"]
+        if max_chars and len(text) > max_chars:
+            text = text[:max_chars] + "..."
+        cost = estimate_tokens(text) + 2  # Préfixe de rôle + saut de ligne
+        if used + cost > budget_tokens:
+            break
+        used += cost
+        kept.append({**msg, "message": text})
+    kept.reverse()
+    return kept
+
+
+async def extractive_summary(previous: str, messages: List[Dict[str, Any]]) -> str:
+    """Résumé sans LLM: première phrase de chaque message (repli)"""
+    lines = [previous] if previous else []
+    for msg in messages:
+        first = msg["message"].strip().split("\n")[0].split(". ")[0][:160]
+        lines.append(f"{'U' if msg['role'] == 'user' else 'A'}: {first}")
+    return "\n".join(lines)[-SUMMARY_MAX_CHARS:]
+
+
+async def llm_summary(previous: str, messages: List[Dict[str, Any]]) -> str:
+    """Résumé glissant par le routeur IA (repli extractif en cas d'échec)"""
+    from services.ai_router import ai_router
+
+    transcript = "\n".join(
+        f"{'Utilisateur' if m['role'] == 'user' else 'Assistant'}: {m['message'][:800]}" for m in messages
+    )
+    prompt = (
+        f"Résumé actuel de la conversation:\n{previous or '(vide)'}\n\n"
+        f"Nouveaux échanges:\n{transcript}\n\n"
+        "Mets à jour le résumé en 120 mots maximum: faits, préférences et questions "
+        "de l'utilisateur, réponses clés déjà données. Réponds uniquement par le résumé."
+    )
+    try:
+        result = await ai_router.route(
+            prompt=prompt,
+            system_prompt="Tu résumes des conversations de manière factuelle et concise."
+        )
+        return result["response"].strip()[:SUMMARY_MAX_CHARS]
+    except Exception as e:
+        logger.warning(f"Conversation summary via LLM failed, using extractive summary: {e}")
+        return await extractive_summary(previous, messages)
+
+
+class ContextBuilder:
+    """Résumé glissant + messages récents sous budget, avec cache par session"""
+
+    def __init__(self, db_path: Path, summarizer: Optional[Summarizer] = None):
+        self.db_path = Path(db_path)
+        self.summarizer = summarizer or (
+            llm_summary if os.getenv("CONTEXT_SUMMARY_LLM", "true").lower() == "true" else extractive_summary
+        )
+        self._cache: "OrderedDict[Tuple[str, str], Dict[str, Any]]" = OrderedDict()
+        self._refreshing: set = set()
+        self._tasks: set = set()
+        self.stats = {"cache_hits": 0, "cache_misses": 0, "summaries": 0}
+        self._init_schema()
+
+    def _init_schema(self):
+        """Table des résumés (schéma partagé) + index pour lire après un id"""
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS conversation_summaries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    session_id TEXT NOT NULL,
+                    expert_id TEXT NOT NULL,
+                    summary TEXT NOT NULL,
+                    topics TEXT,
+                    key_facts TEXT,
+                    created_at TEXT NOT NULL,
+                    message_count INTEGER DEFAULT 0,
+                    UNIQUE(session_id, expert_id)
+                )
+            """)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(conversation_summaries)")}
+            if "covered_until" not in columns:
+                conn.execute("ALTER TABLE conversation_summaries ADD COLUMN covered_until INTEGER DEFAULT 0")
+            conn.execute("""
+                CREATE INDEX IF NOT EXISTS idx_conv_session_expert_id
+                ON conversations(session_id, expert_id, id)
+            """)
+            conn.commit()
+
+    # ------------------------------------------------------------------
+    # Cache par session
+    # ------------------------------------------------------------------
+
+    def _load(self, session_id: str, expert_id: str) -> Dict[str, Any]:
+        key = (session_id, expert_id)
+        entry = self._cache.get(key)
+        if entry and time.monotonic() - entry["loaded_at"] < CACHE_TTL_S:
+            self._cache.move_to_end(key)
+            self.stats["cache_hits"] += 1
+            return entry
+
+        self.stats["cache_misses"] += 1
+        with sqlite3.connect(self.db_path) as conn:
+            conn.row_factory = sqlite3.Row
+            # Une lecture indexée: résumé (jointure gauche) + derniers messages non résumés
+            rows = conn.execute("""
+                SELECT c.id, c.role, c.message, s.summary, s.covered_until
+                FROM (SELECT 1) AS one
+                LEFT JOIN conversation_summaries s ON s.session_id = ? AND s.expert_id = ?
+                LEFT JOIN conversations c ON c.session_id = ? AND c.expert_id = ?
+                    AND c.id > COALESCE(s.covered_until, 0)
+                ORDER BY c.id DESC
+                LIMIT ?
+            """, (session_id, expert_id, session_id, expert_id, RECENT_CACHE_SIZE)).fetchall()
+
+        summary = rows[0]["summary"] if rows and rows[0]["summary"] else ""
+        covered_until = rows[0]["covered_until"] if rows and rows[0]["covered_until"] else 0
+        recent: Deque[Dict[str, Any]] = deque(maxlen=RECENT_CACHE_SIZE)
+        for row in reversed(rows):
+            if row["id"] is not None:
+                recent.append({"id": row["id"], "role": row["role"], "message": row["message"]})
+
+        entry = {"summary": summary, "covered_until": covered_until, "recent": recent, "loaded_at": time.monotonic()}
+        self._cache[key] = entry
+        while len(self._cache) > CACHE_MAX_SESSIONS:
+            self._cache.popitem(last=False)
+        return entry
+
+    def on_message(self, session_id: str, expert_id: str, message_id: Optional[int], role: str, message: str):
+        """Écriture: alimenter le cache de la session et planifier le résumé après une réponse"""
+        entry = self._cache.get((session_id, expert_id))
+        if entry is not None and message_id is not None:
+            entry["recent"].append({"id": message_id, "role": role, "message": message})
+        if role == "assistant" and self._summary_due(entry):
+            self.schedule_refresh(session_id, expert_id)
+
+    @staticmethod
+    def _summary_due(entry: Optional[Dict[str, Any]]) -> bool:
+        """Lot complet à résumer et pas de tentative récente (session hors cache: à vérifier)"""
+        if entry is None:
+            return True
+        if time.monotonic() - entry.get("summary_attempt_at", float("-inf")) < SUMMARY_DEBOUNCE_S:
+            return False
+        unsummarized = sum(1 for m in entry["recent"] if m["id"] > entry["covered_until"])
+        return unsummarized >= KEEP_RECENT + SUMMARY_BATCH
+
+    def invalidate(self, session_id: str, expert_id: str):
+        self._cache.pop((session_id, expert_id), None)
+
+    # ------------------------------------------------------------------
+    # Construction du contexte
+    # ------------------------------------------------------------------
+
+    def select(
+        self,
+        session_id: str,
+        expert_id: str,
+        provider: Optional[str] = None,
+        max_chars: Optional[int] = None,
+        max_messages: Optional[int] = None,
+    ) -> Tuple[str, List[Dict[str, Any]]]:
+        """(résumé, messages récents) tenant dans le budget du provider"""
+        entry = self._load(session_id, expert_id)
+        budget = budget_for(provider)
+        summary = entry["summary"]
+        if estimate_tokens(summary) > budget // 2:
+            summary = summary[-(budget // 2) * 4:]
+        unsummarized = [m for m in entry["recent"] if m["id"] > entry["covered_until"]]
+        messages = fit_messages(unsummarized, budget - estimate_tokens(summary), max_chars, max_messages)
+        return summary, messages
+
+    # ------------------------------------------------------------------
+    # Résumé glissant (tâche de fond)
+    # ------------------------------------------------------------------
+
+    def schedule_refresh(self, session_id: str, expert_id: str):
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            return  # Appel hors boucle (scripts): pas de résumé
+        key = (session_id, expert_id)
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+        task = loop.create_task(self.refresh_summary(session_id, expert_id))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def refresh_summary(self, session_id: str, expert_id: str) -> bool:
+        """Compacter les messages anciens non résumés dans le résumé de la session"""
+        key = (session_id, expert_id)
+        self._refreshing.add(key)
+        try:
+            entry = self._load(session_id, expert_id)
+            unsummarized = [m for m in entry["recent"] if m["id"] > entry["covered_until"]]
+            older = unsummarized[:-KEEP_RECENT] if len(unsummarized) > KEEP_RECENT else []
+            if len(older) < SUMMARY_BATCH:
+                return False
+
+            # Tentative horodatée avant l'appel LLM: les réponses suivantes ne relancent pas de résumé
+            entry["summary_attempt_at"] = time.monotonic()
+            summary = await self.summarizer(entry["summary"], older)
+            covered_until = older[-1]["id"]
+            await asyncio.to_thread(self._save_summary, session_id, expert_id, summary, covered_until, len(older))
+            entry["summary"], entry["covered_until"] = summary, covered_until
+            self.stats["summaries"] += 1
+            return True
+        except Exception as e:
+            logger.warning(f"Conversation summary refresh failed: {e}")
+            return False
+        finally:
+            self._refreshing.discard(key)
+
+    def _save_summary(self, session_id: str, expert_id: str, summary: str, covered_until: int, folded: int):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                INSERT INTO conversation_summaries
+                (session_id, expert_id, summary, created_at, message_count, covered_until)
+                VALUES (?, ?, ?, datetime('now'), ?, ?)
+                ON CONFLICT(session_id, expert_id) DO UPDATE SET
+                    summary = excluded.summary,
+                    created_at = excluded.created_at,
+                    message_count = conversation_summaries.message_count + excluded.message_count,
+                    covered_until = excluded.covered_until
+                WHERE excluded.covered_until > COALESCE(conversation_summaries.covered_until, 0)
+            """, (session_id, expert_id, summary, folded, covered_until))
+            conn.commit()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {**self.stats, "cached_sessions": len(self._cache), "pending_summaries": len(self._tasks)}
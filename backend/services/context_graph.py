@@ -0,0 +1,99 @@
+"""
+Context Graph - Sources de contexte exécutées en graphe de dépendances
+- toutes les sources démarrent ensemble; chacune n'attend que ses
+  dépendances déclarées (météo <- géocodage), jamais les sources voisines
+- une source reçoit les résultats de ses dépendances terminées avec succès
+  (dépendance en échec ou vide: absente du dict, à la source de décider)
+- budget de temps total: à l'échéance, les sources encore en cours sont
+  annulées et signalées comme coupées au lieu de retarder la réponse
+"""
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+CUT_SUFFIX = ":timeout"
+
+
+@dataclass
+class ContextSource:
+    """Source de contexte: fetch(résultats des dépendances) -> valeur (None = rien)"""
+    name: str
+    fetch: Callable[[Dict[str, Any]], Awaitable[Any]]
+    after: Tuple[str, ...] = ()
+
+
+@dataclass
+class GraphResult:
+    results: Dict[str, Any] = field(default_factory=dict)  # Sources terminées avec une valeur
+    failed: Dict[str, str] = field(default_factory=dict)
+    cut: List[str] = field(default_factory=list)  # Hors budget, annulées
+    elapsed_ms: float = 0.0
+
+    def cut_labels(self) -> List[str]:
+        """Sources coupées, au format de la liste `sources` ("weather:timeout")"""
+        return [f"{name}{CUT_SUFFIX}" for name in self.cut]
+
+
+async def run_graph(sources: Iterable[ContextSource], budget_s: float) -> GraphResult:
+    """
+    Exécuter les sources sous un budget total (secondes).
+
+    Les dépendances doivent être déclarées avant les sources qui les
+    utilisent (ordre topologique, pas de cycle possible).
+    """
+    sources = list(sources)
+    declared = set()
+    for source in sources:
+        unknown = [dep for dep in source.after if dep not in declared]
+        if unknown:
+            raise ValueError(f"{source.name}: dependencies must be declared first: {unknown}")
+        declared.add(source.name)
+
+    start = time.perf_counter()
+    result = GraphResult()
+    if not sources:
+        return result
+
+    tasks: Dict[str, asyncio.Task] = {}
+
+    async def run(source: ContextSource):
+        done = {}
+        for dep in source.after:
+            try:
+                value = await tasks[dep]
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                continue
+            if value is not None:
+                done[dep] = value
+        return await source.fetch(done)
+
+    for source in sources:
+        tasks[source.name] = asyncio.create_task(run(source))
+
+    if budget_s > 0:
+        _, pending = await asyncio.wait(tasks.values(), timeout=budget_s)
+    else:
+        pending = set(tasks.values())
+    for task in pending:
+        task.cancel()
+    if pending:
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    for name, task in tasks.items():
+        if task in pending:
+            result.cut.append(name)
+        elif task.exception() is not None:
+            result.failed[name] = f"{type(task.exception()).__name__}: {task.exception()}"
+        elif task.result() is not None:
+            result.results[name] = task.result()
+
+    result.elapsed_ms = (time.perf_counter() - start) * 1000
+    if result.cut:
+        logger.warning(f"Context sources cut after {budget_s:.1f}s budget: {result.cut}")
+    return result
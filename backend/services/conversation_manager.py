@@ -4,11 +4,16 @@ Stocke et récupère l'historique de conversation
 """
 import json
 import sqlite3
-from typing import List, Dict, Optional
+from typing import Any, AsyncIterator, List, Dict, Optional
 from datetime import datetime
 from pathlib import Path
 import logging
 
+from services.context_builder import ContextBuilder, budget_for, estimate_tokens, fit_messages
+from services.export_stream import iter_sqlite_rows
+from services.provider_registry import provider_registry
+from services.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,6 +24,7 @@ class ConversationManager:
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._init_database()
+        self.context_builder = ContextBuilder(self.db_path)
     
     def _init_database(self):
         """Initialiser la base de données"""
@@ -46,6 +52,7 @@ class ConversationManager:
             conn.commit()
         logger.info("[OK] ConversationManager initialized")
     
+    @traced("db.add_message")
     def add_message(
         self,
         session_id: str,
@@ -73,11 +80,16 @@ class ConversationManager:
                     datetime.now().isoformat(),
                     json.dumps(metadata or {})
                 ))
+                message_id = cursor.lastrowid
                 
                 conn.commit()
+            
+            # Cache de contexte de la session + résumé glissant après une réponse
+            self.context_builder.on_message(session_id, expert_id, message_id, role, message)
         except Exception as e:
             logger.error(f"Error adding message to conversation: {e}", exc_info=True)
     
+    @traced("db.get_conversation_history")
     def get_conversation_history(
         self,
         session_id: str,
@@ -106,137 +118,39 @@ class ConversationManager:
             logger.error(f"Error getting conversation history: {e}", exc_info=True)
             return []
     
-    def format_history_for_prompt(self, history: List[Dict]) -> str:
-        """Formater l'historique pour injection dans le prompt"""
-        if not history:
-            return ""
-        
-        formatted = "\n\n[HISTORIQUE DE LA CONVERSATION]\n"
-        for msg in history[-5:]:  # Derniers 5 messages
-            role = "Utilisateur" if msg["role"] == "user" else "Assistant"
-            formatted += f"{role}: {msg['message']}\n"
-        
-        formatted += "\n[FIN DE L'HISTORIQUE]\n"
-        formatted += "IMPORTANT: Utilise cet historique pour comprendre le contexte. Ne répète pas exactement les mêmes informations déjà données. Ne répète JAMAIS le message d'introduction ou de bienvenue.\n"
-        return formatted
-
-# Singleton
-conversation_manager = ConversationManager()
-
-
-Stocke et récupère l'historique de conversation
-"""
-import json
-import sqlite3
-from typing import List, Dict, Optional
-from datetime import datetime
-from pathlib import Path
-import logging
-
-logger = logging.getLogger(__name__)
-
-
-class ConversationManager:
-    """Gère l'historique de conversation par session"""
+    def build_history_context(self, session_id: str, expert_id: str, provider: Optional[str] = None) -> str:
+        """Résumé glissant + messages récents dans le budget de tokens du provider (cache par session)"""
+        summary, messages = self.context_builder.select(session_id, expert_id, provider=provider)
+        return self.format_history_for_prompt(messages, summary=summary, provider=provider)
     
-    def __init__(self, db_path: str = "./data/conversations.db"):
-        self.db_path = Path(db_path)
-        self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self._init_database()
-    
-    def _init_database(self):
-        """Initialiser la base de données"""
-        with sqlite3.connect(self.db_path) as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute("""
-                CREATE TABLE IF NOT EXISTS conversations (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    session_id TEXT NOT NULL,
-                    expert_id TEXT NOT NULL,
-                    user_id TEXT,
-                    role TEXT NOT NULL,
-                    message TEXT NOT NULL,
-                    timestamp TEXT NOT NULL,
-                    metadata TEXT
-                )
-            """)
-            
-            cursor.execute("""
-                CREATE INDEX IF NOT EXISTS idx_session_expert 
-                ON conversations(session_id, expert_id, timestamp)
-            """)
-            
-            conn.commit()
-        logger.info("[OK] ConversationManager initialized")
-    
-    def add_message(
+    def iter_messages(
         self,
-        session_id: str,
-        expert_id: str,
-        role: str,
-        message: str,
-        user_id: Optional[str] = None,
-        metadata: Optional[Dict] = None
-    ):
-        """Ajouter un message à la conversation"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    INSERT INTO conversations 
-                    (session_id, expert_id, user_id, role, message, timestamp, metadata)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    session_id,
-                    expert_id,
-                    user_id,
-                    role,
-                    message,
-                    datetime.now().isoformat(),
-                    json.dumps(metadata or {})
-                ))
-                
-                conn.commit()
-        except Exception as e:
-            logger.error(f"Error adding message to conversation: {e}", exc_info=True)
-    
-    def get_conversation_history(
-        self,
-        session_id: str,
-        expert_id: str,
-        limit: int = 10
-    ) -> List[Dict]:
-        """Récupérer l'historique de conversation"""
-        try:
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.cursor()
-                
-                cursor.execute("""
-                    SELECT role, message, timestamp
-                    FROM conversations
-                    WHERE session_id = ? AND expert_id = ?
-                    ORDER BY timestamp DESC
-                    LIMIT ?
-                """, (session_id, expert_id, limit))
-                
-                rows = cursor.fetchall()
-                
-                # Inverser pour avoir l'ordre chronologique
-                return [dict(row) for row in reversed(rows)]
-        except Exception as e:
-            logger.error(f"Error getting conversation history: {e}", exc_info=True)
-            return []
+        user_id: str,
+        session_id: Optional[str] = None,
+        expert_id: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Journal des conversations d'un utilisateur en flux (export), page par page"""
+        filters = [("user_id", user_id)] + [(column, value) for column, value in
+                                            (("session_id", session_id), ("expert_id", expert_id)) if value]
+        where = "".join(f"{column} = ? AND " for column, _ in filters)
+        return iter_sqlite_rows(
+            lambda: sqlite3.connect(self.db_path),
+            f"SELECT id, session_id, expert_id, user_id, role, message, timestamp, metadata "
+            f"FROM conversations WHERE {where}{{after}} ORDER BY id",
+            [value for _, value in filters],
+        )
     
-    def format_history_for_prompt(self, history: List[Dict]) -> str:
-        """Formater l'historique pour injection dans le prompt"""
-        if not history:
+    def format_history_for_prompt(self, history: List[Dict], summary: str = "", provider: Optional[str] = None) -> str:
+        """Formater l'historique pour injection dans le prompt (budget de tokens du provider)"""
+        if not history and not summary:
             return ""
         
-        formatted = "\n\n[HISTORIQUE DE LA CONVERSATION]\n"
-        for msg in history[-5:]:  # Derniers 5 messages
+        # Derniers messages tenant dans le budget (à la place des 5 derniers bruts)
+        recent = fit_messages(history, budget_for(provider) - estimate_tokens(summary))
+        
+        formatted = f"\n\n[RÉSUMÉ DE LA CONVERSATION]\n{summary}\n" if summary else ""
+        formatted += "\n\n[HISTORIQUE DE LA CONVERSATION]\n"
+        for msg in recent:
             role = "Utilisateur" if msg["role"] == "user" else "Assistant"
             formatted += f"{role}: {msg['message']}\n"
         
@@ -244,6 +158,5 @@ class ConversationManager:
         formatted += "IMPORTANT: Utilise cet historique pour comprendre le contexte. Ne répète pas exactement les mêmes informations déjà données. Ne répète JAMAIS le message d'introduction ou de bienvenue.\n"
         return formatted
 
-# Singleton
-conversation_manager = ConversationManager()
-
+# Singleton (créé au premier usage ou au warm-up)
+conversation_manager = provider_registry.register("conversation_manager", ConversationManager)
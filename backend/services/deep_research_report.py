@@ -5,12 +5,17 @@ Generates comprehensive 3000+ word medical research reports
 with AI analysis, source comparison, and evidence-based conclusions
 
 This is the DEFINITIVE implementation for DEEP mode
+
+Templates are compiled once; build_report() collects section fields with
+running word counts, and the same report dict renders (streamed, section
+by section) to Markdown, HTML or PDF.
 """
 import asyncio
-import time
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, AsyncIterator, Iterator, List, Tuple
 from datetime import datetime
 
+from services.report_render import CompiledTemplate, FragmentWriter, render_markdown
+
 
 class DeepResearchReportGenerator:
     """
@@ -209,265 +214,10 @@ Ce rapport a analysé {api_count} sources médicales officielles pour fournir un
 
 ---
 *Ce rapport a été généré automatiquement par le système de recherche médicale avancée utilisant {api_count} APIs médicales mondiales.*
-"""
-    }
-    
-    def __init__(self):
-        self.min_words = 3000
-        
-    async def generate_report(
-        self, 
-        query: str, 
-        search_result: Any,
-        ai_response: str = ""
-    ) -> str:
-        """
-        Generate a comprehensive 3000+ word medical research report
-        """
-        start_time = time.time()
-        
-        # Extract data from search result
-        apis_called = getattr(search_result, 'apis_called', [])
-        apis_with_data = getattr(search_result, 'apis_with_data', [])
-        detected_topics = getattr(search_result, 'detected_topics', ['general'])
-        data = getattr(search_result, 'data', {})
-        total_time = getattr(search_result, 'total_time_ms', 0)
-        
-        # Build report sections
-        sections = []
-        
-        # 1. Introduction
-        sections.append(self._build_introduction(
-            query, apis_called, apis_with_data, total_time
-        ))
-        
-        # 2. Scientific Literature
-        sections.append(self._build_literature_section(query, data))
-        
-        # 3. Drug Information (if relevant)
-        if any(t in detected_topics for t in ['drugs', 'diabetes', 'cardiovascular']):
-            sections.append(self._build_drug_section(query, data))
-        
-        # 4. Clinical Trials
-        sections.append(self._build_trials_section(query, data))
-        
-        # 5. Epidemiology
-        sections.append(self._build_epidemiology_section(query, data))
-        
-        # 6. AI Analysis
-        sections.append(self._build_ai_analysis(
-            query, apis_called, apis_with_data, data, ai_response
-        ))
-        
-        # 7. Conclusion
-        sections.append(self._build_conclusion(
-            query, apis_called, apis_with_data, total_time
-        ))
-        
-        # Combine all sections
-        full_report = "\n\n".join(sections)
-        
-        # Ensure minimum word count - keep expanding until we reach 3000
-        word_count = len(full_report.split())
-        expansion_count = 0
-        while word_count < self.min_words and expansion_count < 3:
-            full_report = self._expand_report(full_report, query, data, expansion_count)
-            word_count = len(full_report.split())
-            expansion_count += 1
-        
-        # Add header
-        header = f"""
-# 🔬 RAPPORT DE RECHERCHE MÉDICALE APPROFONDIE
-
-**Sujet**: {query}
-**Date**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-**Sources consultées**: {len(apis_called)} APIs médicales mondiales
-**Nombre de mots**: {len(full_report.split())}+
-
----
-"""
-        return header + full_report
-    
-    def _build_introduction(
-        self, query: str, apis_called: List, apis_with_data: List, search_time: float
-    ) -> str:
-        sources_list = "\n".join([
-            f"- {self._get_api_display_name(api)}" for api in apis_called[:10]
-        ])
-        
-        return self.SECTION_TEMPLATES["introduction"].format(
-            query_context=f"Ce rapport présente une analyse approfondie sur le sujet: **{query}**",
-            api_count=len(apis_called),
-            sources_list=sources_list,
-            search_time=f"{search_time:.0f}"
-        )
-    
-    def _build_literature_section(self, query: str, data: Dict) -> str:
-        # Extract PubMed and Europe PMC data
-        pubmed_data = data.get('pubmed', {})
-        europe_pmc = data.get('europe_pmc', {})
-        
-        articles = []
-        if pubmed_data.get('articles'):
-            articles.extend(pubmed_data['articles'][:5])
-        if europe_pmc.get('articles'):
-            articles.extend(europe_pmc['articles'][:3])
-        
-        article_text = ""
-        if articles:
-            for i, article in enumerate(articles[:5], 1):
-                title = article.get('title', 'N/A')
-                authors = article.get('authors', 'N/A')
-                year = article.get('year', article.get('pubYear', 'N/A'))
-                article_text += f"\n{i}. **{title}**\n   - Auteurs: {authors}\n   - Année: {year}\n"
-        else:
-            article_text = "Données en cours de récupération depuis PubMed et Europe PMC..."
-        
-        return self.SECTION_TEMPLATES["scientific_literature"].format(
-            pubmed_data=article_text,
-            article_count=len(articles) if articles else "des milliers d'",
-            query=query,
-            key_citations="Les citations clés sont disponibles dans les sources originales."
-        )
-    
-    def _build_drug_section(self, query: str, data: Dict) -> str:
-        drug_data = data.get('openfda', {}) or data.get('rxnorm', {}) or data.get('drugbank', {})
-        
-        drug_text = ""
-        if drug_data:
-            drug_text = f"Données pharmacologiques trouvées pour: {query}"
-        else:
-            drug_text = "Consultation des bases FDA, RxNorm et DrugBank en cours..."
-        
-        return self.SECTION_TEMPLATES["drug_information"].format(
-            drug_data=drug_text,
-            drug_comparison="Analyse comparative basée sur les données FDA et EMA."
-        )
-    
-    def _build_trials_section(self, query: str, data: Dict) -> str:
-        trials_data = data.get('clinical_trials', {})
-        
-        trials_text = ""
-        trial_count = 0
-        if trials_data.get('trials'):
-            trial_count = len(trials_data['trials'])
-            for i, trial in enumerate(trials_data['trials'][:3], 1):
-                title = trial.get('title', 'N/A')[:100]
-                status = trial.get('status', 'N/A')
-                trials_text += f"\n{i}. **{title}...**\n   - Statut: {status}\n"
-        else:
-            trials_text = "Recherche sur ClinicalTrials.gov et registres internationaux..."
-            trial_count = "Plusieurs centaines"
-        
-        return self.SECTION_TEMPLATES["clinical_trials"].format(
-            trials_data=trials_text,
-            trial_count=trial_count
-        )
-    
-    def _build_epidemiology_section(self, query: str, data: Dict) -> str:
-        who_data = data.get('who_gho', {})
-        disease_data = data.get('disease_sh', {})
-        
-        epi_text = ""
-        if who_data or disease_data:
-            epi_text = "Données épidémiologiques de l'OMS et sources internationales disponibles."
-        else:
-            epi_text = "Consultation des bases épidémiologiques mondiales..."
-        
-        return self.SECTION_TEMPLATES["epidemiology"].format(
-            epidemiology_data=epi_text,
-            public_health_impact="Analyse d'impact basée sur les données de l'OMS et du CDC."
-        )
-    
-    def _build_ai_analysis(
-        self, query: str, apis_called: List, apis_with_data: List, 
-        data: Dict, ai_response: str
-    ) -> str:
-        # Build source comparison table
-        source_table = ""
-        for api in apis_with_data[:10]:
-            name = self._get_api_display_name(api)
-            source_table += f"| {name} | Base de données | Haute | Temps réel |\n"
-        
-        confidence = min(95, 60 + len(apis_with_data) * 5)
-        
-        return self.SECTION_TEMPLATES["ai_analysis"].format(
-            api_count=len(apis_called),
-            ai_synthesis=ai_response if ai_response else f"Analyse en cours sur le sujet '{query}'...",
-            consensus_points="Points de consensus identifiés dans les sources consultées.",
-            uncertainty_areas="Zones nécessitant des recherches supplémentaires.",
-            evidence_recommendations="Recommandations basées sur le niveau de preuve le plus élevé.",
-            source_comparison_table=source_table,
-            confidence_score=confidence
-        )
-    
-    def _build_conclusion(
-        self, query: str, apis_called: List, apis_with_data: List, total_time: float
-    ) -> str:
-        sources_list = "\n".join([
-            f"- [{self._get_api_display_name(api)}]" for api in apis_called
-        ])
-        
-        key_takeaways = """
-1. Les données proviennent de sources médicales officielles et vérifiées
-2. L'analyse croise plusieurs bases de données internationales
-3. Les recommandations sont basées sur les dernières preuves scientifiques
-4. Une consultation médicale reste indispensable pour tout cas personnel
-"""
-        
-        return self.SECTION_TEMPLATES["conclusion"].format(
-            api_count=len(apis_called),
-            query=query,
-            key_takeaways=key_takeaways,
-            full_sources_list=sources_list,
-            generation_date=datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-            total_time=f"{total_time:.0f}",
-            apis_with_data=len(apis_with_data)
-        )
-    
-    def _expand_report(self, report: str, query: str, data: Dict, expansion_count: int = 0) -> str:
-        """Expand report to meet minimum 3000 word count"""
-        
-        # Extra content for second expansion
-        extra_content = ""
-        if expansion_count >= 1:
-            extra_content = f"""
-
-## 📖 ANALYSE APPROFONDIE DU SUJET: {query.upper()}
-
-### État des Connaissances Actuelles
-
-Le domaine médical concernant "{query}" a connu des avancées considérables au cours des dernières années. Les recherches menées par les institutions internationales de premier plan ont permis d'améliorer significativement notre compréhension de ce sujet et d'optimiser les approches thérapeutiques disponibles.
-
-#### Données Épidémiologiques Détaillées
-
-Selon les dernières statistiques publiées par l'Organisation Mondiale de la Santé et les centres nationaux de contrôle des maladies:
-
-- La prévalence mondiale de conditions liées à ce sujet continue d'évoluer, nécessitant une surveillance épidémiologique constante.
-- Les facteurs de risque identifiés par les études observationnelles multicentriques permettent de mieux cibler les populations à risque.
-- Les disparités géographiques et socio-économiques dans l'accès aux soins influencent significativement les outcomes des patients.
-- Les tendances temporelles montrent l'importance des stratégies de prévention primaire et secondaire.
-
-#### Impact des Nouvelles Technologies
-
-L'avènement des technologies numériques a transformé la pratique médicale dans ce domaine:
-
-1. **Télémédecine**: Amélioration de l'accès aux soins spécialisés pour les populations éloignées des centres médicaux.
-2. **Intelligence Artificielle**: Développement d'algorithmes de diagnostic assisté par ordinateur avec des performances comparables aux experts humains.
-3. **Big Data Santé**: Exploitation des données de vie réelle pour identifier de nouveaux signaux et améliorer les stratégies thérapeutiques.
-4. **Applications Mobiles**: Outils d'auto-surveillance et d'adhésion thérapeutique facilitant le suivi ambulatoire des patients.
-
-#### Considérations Éthiques et Réglementaires
-
-Les avancées dans ce domaine soulèvent également des questions éthiques importantes:
-
-- Protection des données personnelles de santé conformément au RGPD et aux réglementations internationales.
-- Équité d'accès aux nouvelles thérapies innovantes souvent coûteuses.
-- Balance bénéfice-risque dans la décision thérapeutique partagée avec le patient.
-- Responsabilité médicale dans l'utilisation des outils d'aide à la décision automatisés.
-"""
+""",
         
-        additional_content = f"""
+        # Expansion sections (appended until the report reaches min_words)
+        "annexes": """
 
 ## 📊 ANNEXES ET DONNÉES COMPLÉMENTAIRES
 
@@ -660,8 +410,294 @@ Ce rapport de recherche médicale est fourni à titre informatif et éducatif un
 Les informations contenues dans ce document sont issues de sources fiables mais l'auteur ne peut garantir leur exactitude absolue ni leur applicabilité à des cas individuels. La médecine évolue constamment et les recommandations peuvent changer avec les nouvelles découvertes.
 
 En cas de problème de santé, consultez toujours votre médecin ou un autre professionnel de santé qualifié.
+""",
+        
+        "deep_analysis": """
+
+## 📖 ANALYSE APPROFONDIE DU SUJET: {query_upper}
+
+### État des Connaissances Actuelles
+
+Le domaine médical concernant "{query}" a connu des avancées considérables au cours des dernières années. Les recherches menées par les institutions internationales de premier plan ont permis d'améliorer significativement notre compréhension de ce sujet et d'optimiser les approches thérapeutiques disponibles.
+
+#### Données Épidémiologiques Détaillées
+
+Selon les dernières statistiques publiées par l'Organisation Mondiale de la Santé et les centres nationaux de contrôle des maladies:
+
+- La prévalence mondiale de conditions liées à ce sujet continue d'évoluer, nécessitant une surveillance épidémiologique constante.
+- Les facteurs de risque identifiés par les études observationnelles multicentriques permettent de mieux cibler les populations à risque.
+- Les disparités géographiques et socio-économiques dans l'accès aux soins influencent significativement les outcomes des patients.
+- Les tendances temporelles montrent l'importance des stratégies de prévention primaire et secondaire.
+
+#### Impact des Nouvelles Technologies
+
+L'avènement des technologies numériques a transformé la pratique médicale dans ce domaine:
+
+1. **Télémédecine**: Amélioration de l'accès aux soins spécialisés pour les populations éloignées des centres médicaux.
+2. **Intelligence Artificielle**: Développement d'algorithmes de diagnostic assisté par ordinateur avec des performances comparables aux experts humains.
+3. **Big Data Santé**: Exploitation des données de vie réelle pour identifier de nouveaux signaux et améliorer les stratégies thérapeutiques.
+4. **Applications Mobiles**: Outils d'auto-surveillance et d'adhésion thérapeutique facilitant le suivi ambulatoire des patients.
+
+#### Considérations Éthiques et Réglementaires
+
+Les avancées dans ce domaine soulèvent également des questions éthiques importantes:
+
+- Protection des données personnelles de santé conformément au RGPD et aux réglementations internationales.
+- Équité d'accès aux nouvelles thérapies innovantes souvent coûteuses.
+- Balance bénéfice-risque dans la décision thérapeutique partagée avec le patient.
+- Responsabilité médicale dans l'utilisation des outils d'aide à la décision automatisés.
+"""
+    }
+    
+    HEADER_TEMPLATE = """
+# 🔬 RAPPORT DE RECHERCHE MÉDICALE APPROFONDIE
+
+**Sujet**: {query}
+**Date**: {generated_at}
+**Sources consultées**: {api_count} APIs médicales mondiales
+**Nombre de mots**: {word_count}+
+
+---
 """
-        return report + additional_content + extra_content
+    
+    # Parsed once: rendering is a walk over literals and fields
+    TEMPLATES = {name: CompiledTemplate(source) for name, source in SECTION_TEMPLATES.items()}
+    HEADER = CompiledTemplate(HEADER_TEMPLATE)
+    
+    MAX_EXPANSIONS = 3
+    
+    def __init__(self):
+        self.min_words = 3000
+    
+    def build_report(
+        self,
+        query: str,
+        search_result: Any,
+        ai_response: str = ""
+    ) -> Dict[str, Any]:
+        """
+        Collect every section's fields once.
+        
+        The returned dict is format-agnostic: render() turns it into
+        Markdown, HTML or PDF. Word counts come from the compiled templates,
+        so the expansion decision never re-splits the report.
+        """
+        # Extract data from search result
+        apis_called = getattr(search_result, 'apis_called', [])
+        apis_with_data = getattr(search_result, 'apis_with_data', [])
+        detected_topics = getattr(search_result, 'detected_topics', ['general'])
+        data = getattr(search_result, 'data', {})
+        total_time = getattr(search_result, 'total_time_ms', 0)
+        generated_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        
+        sections: List[Tuple[str, Dict[str, Any]]] = [
+            ("introduction", self._introduction_fields(query, apis_called, total_time)),
+            ("scientific_literature", self._literature_fields(query, data)),
+        ]
+        if any(t in detected_topics for t in ['drugs', 'diabetes', 'cardiovascular']):
+            sections.append(("drug_information", self._drug_fields(query, data)))
+        sections += [
+            ("clinical_trials", self._trials_fields(query, data)),
+            ("epidemiology", self._epidemiology_fields(query, data)),
+            ("ai_analysis", self._ai_analysis_fields(query, apis_called, apis_with_data, ai_response)),
+            ("conclusion", self._conclusion_fields(query, apis_called, apis_with_data, total_time, generated_at)),
+        ]
+        
+        # Sections are separated by a blank line; word counts run over the whole body
+        counter = FragmentWriter(keep=False)
+        report_sections = []
+        for i, (name, fields) in enumerate(sections):
+            separator = "\n\n" if i else ""
+            counter.write(separator)
+            self.TEMPLATES[name].render_into(counter, fields)
+            report_sections.append({"id": name, "separator": separator, "fields": fields})
+        
+        # Ensure minimum word count - expand until we reach min_words
+        expansion_fields = {"query": query, "query_upper": query.upper()}
+        expansion_count = 0
+        while counter.words < self.min_words and expansion_count < self.MAX_EXPANSIONS:
+            names = ["annexes"] + (["deep_analysis"] if expansion_count >= 1 else [])
+            for name in names:
+                self.TEMPLATES[name].render_into(counter, expansion_fields)
+                report_sections.append({"id": name, "separator": "", "fields": expansion_fields})
+            expansion_count += 1
+        
+        return {
+            "query": query,
+            "generated_at": generated_at,
+            "api_count": len(apis_called),
+            "word_count": counter.words,
+            "expansions": expansion_count,
+            "sections": report_sections,
+        }
+    
+    def iter_markdown(self, report: Dict[str, Any]) -> Iterator[str]:
+        """Markdown of a built report, one chunk per section (header first)"""
+        yield self.HEADER.render(report)
+        for section in report["sections"]:
+            writer = FragmentWriter()
+            writer.write(section["separator"])
+            self.TEMPLATES[section["id"]].render_into(writer, section["fields"])
+            yield writer.drain()
+    
+    def render(self, report: Dict[str, Any], fmt: str = "markdown") -> Iterator[Any]:
+        """Render a built report as markdown/html (str chunks) or pdf (bytes chunks)"""
+        title = f"Rapport de recherche médicale - {report['query']}"
+        return render_markdown(self.iter_markdown(report), fmt, title)
+    
+    async def stream_report(
+        self,
+        query: str,
+        search_result: Any,
+        ai_response: str = "",
+        fmt: str = "markdown"
+    ) -> AsyncIterator[Any]:
+        """Report chunks as sections are rendered (for StreamingResponse)"""
+        report = self.build_report(query, search_result, ai_response)
+        for chunk in self.render(report, fmt):
+            yield chunk
+            await asyncio.sleep(0)  # Let other requests run between sections
+    
+    async def generate_report(
+        self, 
+        query: str, 
+        search_result: Any,
+        ai_response: str = ""
+    ) -> str:
+        """
+        Generate a comprehensive 3000+ word medical research report
+        """
+        return "".join(self.iter_markdown(self.build_report(query, search_result, ai_response)))
+    
+    def _introduction_fields(self, query: str, apis_called: List, search_time: float) -> Dict[str, Any]:
+        sources_list = "\n".join([
+            f"- {self._get_api_display_name(api)}" for api in apis_called[:10]
+        ])
+        
+        return {
+            "query_context": f"Ce rapport présente une analyse approfondie sur le sujet: **{query}**",
+            "api_count": len(apis_called),
+            "sources_list": sources_list,
+            "search_time": f"{search_time:.0f}"
+        }
+    
+    def _literature_fields(self, query: str, data: Dict) -> Dict[str, Any]:
+        # Extract PubMed and Europe PMC data
+        pubmed_data = data.get('pubmed', {})
+        europe_pmc = data.get('europe_pmc', {})
+        
+        articles = []
+        if pubmed_data.get('articles'):
+            articles.extend(pubmed_data['articles'][:5])
+        if europe_pmc.get('articles'):
+            articles.extend(europe_pmc['articles'][:3])
+        
+        if articles:
+            article_text = "".join(
+                f"\n{i}. **{article.get('title', 'N/A')}**\n"
+                f"   - Auteurs: {article.get('authors', 'N/A')}\n"
+                f"   - Année: {article.get('year', article.get('pubYear', 'N/A'))}\n"
+                for i, article in enumerate(articles[:5], 1)
+            )
+        else:
+            article_text = "Données en cours de récupération depuis PubMed et Europe PMC..."
+        
+        return {
+            "pubmed_data": article_text,
+            "article_count": len(articles) if articles else "des milliers d'",
+            "query": query,
+            "key_citations": "Les citations clés sont disponibles dans les sources originales."
+        }
+    
+    def _drug_fields(self, query: str, data: Dict) -> Dict[str, Any]:
+        drug_data = data.get('openfda', {}) or data.get('rxnorm', {}) or data.get('drugbank', {})
+        
+        if drug_data:
+            drug_text = f"Données pharmacologiques trouvées pour: {query}"
+        else:
+            drug_text = "Consultation des bases FDA, RxNorm et DrugBank en cours..."
+        
+        return {
+            "drug_data": drug_text,
+            "drug_comparison": "Analyse comparative basée sur les données FDA et EMA."
+        }
+    
+    def _trials_fields(self, query: str, data: Dict) -> Dict[str, Any]:
+        trials_data = data.get('clinical_trials', {})
+        
+        if trials_data.get('trials'):
+            trial_count = len(trials_data['trials'])
+            trials_text = "".join(
+                f"\n{i}. **{trial.get('title', 'N/A')[:100]}...**\n   - Statut: {trial.get('status', 'N/A')}\n"
+                for i, trial in enumerate(trials_data['trials'][:3], 1)
+            )
+        else:
+            trials_text = "Recherche sur ClinicalTrials.gov et registres internationaux..."
+            trial_count = "Plusieurs centaines"
+        
+        return {
+            "trials_data": trials_text,
+            "trial_count": trial_count
+        }
+    
+    def _epidemiology_fields(self, query: str, data: Dict) -> Dict[str, Any]:
+        who_data = data.get('who_gho', {})
+        disease_data = data.get('disease_sh', {})
+        
+        if who_data or disease_data:
+            epi_text = "Données épidémiologiques de l'OMS et sources internationales disponibles."
+        else:
+            epi_text = "Consultation des bases épidémiologiques mondiales..."
+        
+        return {
+            "epidemiology_data": epi_text,
+            "public_health_impact": "Analyse d'impact basée sur les données de l'OMS et du CDC."
+        }
+    
+    def _ai_analysis_fields(
+        self, query: str, apis_called: List, apis_with_data: List, ai_response: str
+    ) -> Dict[str, Any]:
+        # Build source comparison table
+        source_table = "".join(
+            f"| {self._get_api_display_name(api)} | Base de données | Haute | Temps réel |\n"
+            for api in apis_with_data[:10]
+        )
+        
+        confidence = min(95, 60 + len(apis_with_data) * 5)
+        
+        return {
+            "api_count": len(apis_called),
+            "ai_synthesis": ai_response if ai_response else f"Analyse en cours sur le sujet '{query}'...",
+            "consensus_points": "Points de consensus identifiés dans les sources consultées.",
+            "uncertainty_areas": "Zones nécessitant des recherches supplémentaires.",
+            "evidence_recommendations": "Recommandations basées sur le niveau de preuve le plus élevé.",
+            "source_comparison_table": source_table,
+            "confidence_score": confidence
+        }
+    
+    def _conclusion_fields(
+        self, query: str, apis_called: List, apis_with_data: List, total_time: float, generated_at: str
+    ) -> Dict[str, Any]:
+        sources_list = "\n".join([
+            f"- [{self._get_api_display_name(api)}]" for api in apis_called
+        ])
+        
+        key_takeaways = """
+1. Les données proviennent de sources médicales officielles et vérifiées
+2. L'analyse croise plusieurs bases de données internationales
+3. Les recommandations sont basées sur les dernières preuves scientifiques
+4. Une consultation médicale reste indispensable pour tout cas personnel
+"""
+        
+        return {
+            "api_count": len(apis_called),
+            "query": query,
+            "key_takeaways": key_takeaways,
+            "full_sources_list": sources_list,
+            "generation_date": generated_at,
+            "total_time": f"{total_time:.0f}",
+            "apis_with_data": len(apis_with_data)
+        }
     
     def _get_api_display_name(self, api_id: str) -> str:
         """Get display name for an API"""
@@ -10,13 +10,16 @@ from pathlib import Path
 import logging
 import hashlib
 
+from services.context_builder import ContextBuilder
+from services.tracing import traced
+
 logger = logging.getLogger(__name__)
 
 
 class EnhancedConversationMemory:
     """
     Advanced conversation memory with:
-    - Smart summarization (reduces token usage)
+    - Smart summarization (rolling summary + token budget, see services/context_builder)
     - User profiling (remembers preferences)
     - Topic tracking (knows what was discussed)
     - Long-term memory (persists across sessions)
@@ -26,6 +29,7 @@ class EnhancedConversationMemory:
         self.db_path = Path(db_path)
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
         self._init_database()
+        self.context_builder = ContextBuilder(self.db_path)
         
         # In-memory cache for fast access
         self._session_cache = {}
@@ -112,6 +116,7 @@ class EnhancedConversationMemory:
     # USER PROFILE MANAGEMENT
     # ============================================
     
+    @traced("db.get_or_create_profile")
     def get_or_create_profile(self, session_id: str) -> Dict[str, Any]:
         """Get or create user profile for session"""
         # Check cache first
@@ -156,6 +161,7 @@ class EnhancedConversationMemory:
             self._user_profile_cache[session_id] = profile
             return profile
     
+    @traced("db.update_profile")
     def update_profile(self, session_id: str, **kwargs):
         """Update user profile with new information"""
         profile = self.get_or_create_profile(session_id)
@@ -225,6 +231,7 @@ class EnhancedConversationMemory:
     # MESSAGE MANAGEMENT
     # ============================================
     
+    @traced("db.add_message")
     def add_message(
         self,
         session_id: str,
@@ -253,6 +260,7 @@ class EnhancedConversationMemory:
                     datetime.now().isoformat(),
                     json.dumps(metadata or {})
                 ))
+                message_id = cursor.lastrowid
                 
                 # Update message count in profile
                 cursor.execute("""
@@ -263,6 +271,9 @@ class EnhancedConversationMemory:
                 
                 conn.commit()
             
+            # Cache de contexte de la session + résumé glissant après une réponse
+            self.context_builder.on_message(session_id, expert_id, message_id, role, message)
+            
             # Auto-detect user type for user messages
             if role == "user":
                 self.detect_and_save_user_type(session_id, message, expert_id)
@@ -271,6 +282,7 @@ class EnhancedConversationMemory:
         except Exception as e:
             logger.error(f"Error adding message: {e}", exc_info=True)
     
+    @traced("db.get_conversation_history")
     def get_conversation_history(
         self,
         session_id: str,
@@ -326,6 +338,7 @@ class EnhancedConversationMemory:
                 if any(kw in message_lower for kw in keywords):
                     self._save_topic(session_id, expert_id, topic)
     
+    @traced("db.save_topic")
     def _save_topic(self, session_id: str, expert_id: str, topic: str):
         """Save or update a topic"""
         try:
@@ -352,6 +365,7 @@ class EnhancedConversationMemory:
         except Exception as e:
             logger.debug(f"Error saving topic: {e}")
     
+    @traced("db.get_topics_discussed")
     def get_topics_discussed(self, session_id: str, expert_id: str) -> List[Dict]:
         """Get all topics discussed in this conversation"""
         try:
@@ -380,11 +394,12 @@ class EnhancedConversationMemory:
         expert_id: str,
         include_profile: bool = True,
         include_topics: bool = True,
-        max_messages: int = 10
+        max_messages: int = 10,
+        provider: Optional[str] = None
     ) -> str:
         """
         Build intelligent context for the AI prompt.
-        Optimized for token efficiency.
+        History = rolling summary + recent messages within the provider's token budget.
         """
         context_parts = []
         
@@ -402,10 +417,12 @@ class EnhancedConversationMemory:
                 topic_list = ", ".join([t["topic"] for t in topics[:5]])
                 context_parts.append(f"[SUJETS ABORDÉS]: {topic_list}")
         
-        # 3. Recent conversation history (last N messages)
-        history = self.get_conversation_history(session_id, expert_id, limit=max_messages)
-        if history:
-            history_context = self._format_history_compact(history)
+        # 3. Rolling summary + recent messages (token budget, cached per session)
+        summary, history = self.context_builder.select(
+            session_id, expert_id, provider=provider, max_chars=200, max_messages=max_messages
+        )
+        if history or summary:
+            history_context = self._format_history_compact(history, summary)
             context_parts.append(history_context)
         
         return "\n\n".join(context_parts) if context_parts else ""
@@ -433,15 +450,16 @@ class EnhancedConversationMemory:
             return "[PROFIL UTILISATEUR]: " + " | ".join(parts)
         return ""
     
-    def _format_history_compact(self, history: List[Dict]) -> str:
+    def _format_history_compact(self, history: List[Dict], summary: str = "") -> str:
         """Format history in a compact, token-efficient way"""
-        if not history:
+        if not history and not summary:
             return ""
         
         # Take last 10 messages max
         recent = history[-10:]
         
-        formatted = "[HISTORIQUE CONVERSATION]\n"
+        formatted = f"[RÉSUMÉ CONVERSATION]\n{summary}\n" if summary else ""
+        formatted += "[HISTORIQUE CONVERSATION]\n"
         for msg in recent:
             role = "U" if msg["role"] == "user" else "A"
             # Truncate long messages
@@ -457,6 +475,7 @@ class EnhancedConversationMemory:
     # MEMORY STATISTICS
     # ============================================
     
+    @traced("db.get_session_stats")
     def get_session_stats(self, session_id: str) -> Dict[str, Any]:
         """Get statistics for a session"""
         profile = self.get_or_create_profile(session_id)
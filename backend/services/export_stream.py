@@ -0,0 +1,230 @@
+"""
+Export Stream - Exports volumineux en mémoire constante
+- sources: itérateurs asynchrones paginés par clé (id/seq croissant), une page
+  SQLite lue hors de la boucle d'événements à la fois
+- writers: CSV / NDJSON / tableau Markdown écrits ligne par ligne et regroupés
+  en blocs (~64 Ko) pour le transfert chunked
+- gzip optionnel en flux (zlib, en-tête gzip), sans buffer complet
+- erreurs: la première ligne est lue avant l'envoi des en-têtes (prefetch);
+  une erreur en cours de flux termine le fichier par un enregistrement d'erreur
+"""
+import asyncio
+import csv
+import io
+import json
+import logging
+import sqlite3
+import tempfile
+import zlib
+from typing import Any, AsyncIterator, BinaryIO, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+CHUNK_SIZE = 64 * 1024
+PAGE_SIZE = 1000
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "markdown": ("text/markdown", "md"),
+}
+
+Row = Dict[str, Any]
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------------------
+# Sources
+# ----------------------------------------------------------------------
+
+async def iter_sqlite_rows(
+    connect: Callable[[], sqlite3.Connection],
+    sql: str,
+    params: Sequence[Any] = (),
+    key: str = "id",
+    page_size: int = PAGE_SIZE,
+) -> AsyncIterator[Row]:
+    """
+    Lignes d'une requête, page par page (pagination par clé).
+
+    `sql` doit contenir le marqueur `{after}` (condition `key > ?`) et trier
+    par `key` croissant; seule la page courante est en mémoire.
+    """
+    query = f"{sql.format(after=f'{key} > ?')} LIMIT ?"
+
+    def fetch_page(after):
+        conn = connect()
+        try:
+            conn.row_factory = sqlite3.Row
+            return [dict(row) for row in conn.execute(query, (*params, after, page_size)).fetchall()]
+        finally:
+            conn.close()
+
+    after = -1
+    while True:
+        page = await asyncio.to_thread(fetch_page, after)
+        for row in page:
+            yield row
+        if len(page) < page_size:
+            return
+        after = page[-1][key]
+
+
+async def spool_body(chunks: AsyncIterator[bytes], max_memory: int = 1024 * 1024) -> BinaryIO:
+    """
+    Corps de requête reçu en flux copié dans un fichier temporaire (mémoire
+    bornée, débordement sur disque). StreamingResponse écoute la déconnexion
+    sur le même canal: le corps doit être lu avant de répondre.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    async for chunk in chunks:
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+async def iter_json_lines(file: BinaryIO) -> AsyncIterator[Row]:
+    """Objets d'un fichier NDJSON (une ligne = un objet), lus par blocs hors boucle"""
+    try:
+        while True:
+            lines = await asyncio.to_thread(file.readlines, CHUNK_SIZE)
+            if not lines:
+                return
+            for line in lines:
+                if line.strip():
+                    yield json.loads(line)
+    finally:
+        file.close()
+
+
+async def iter_list(rows: Iterable[Row]) -> AsyncIterator[Row]:
+    for row in rows:
+        yield row
+
+
+async def prefetch(rows: AsyncIterator[Row]) -> AsyncIterator[Row]:
+    """
+    Lire la première ligne tout de suite: une source en échec lève ici, avant
+    que les en-têtes (200) ne soient envoyés. Retourne l'itérateur complet.
+    """
+    _, rows = await _peek(rows)
+    return rows
+
+
+# ----------------------------------------------------------------------
+# Writers
+# ----------------------------------------------------------------------
+
+def _flat(value: Any) -> Any:
+    return json.dumps(value, ensure_ascii=False) if isinstance(value, (dict, list)) else value
+
+
+async def _peek(rows: AsyncIterator[Row]) -> Tuple[Optional[Row], AsyncIterator[Row]]:
+    """Première ligne (pour les colonnes) + itérateur complet"""
+    first = await anext(rows, None)
+
+    async def chained():
+        if first is not None:
+            yield first
+        async for row in rows:
+            yield row
+    return first, chained()
+
+
+async def _chunked(lines: AsyncIterator[str], chunk_size: int) -> AsyncIterator[bytes]:
+    """Regrouper les lignes en blocs d'environ chunk_size octets"""
+    parts: List[bytes] = []
+    size = 0
+    async for line in lines:
+        data = line.encode("utf-8")
+        parts.append(data)
+        size += len(data)
+        if size >= chunk_size:
+            yield b"".join(parts)
+            parts, size = [], 0
+    if parts:
+        yield b"".join(parts)
+
+
+async def csv_lines(rows: AsyncIterator[Row], columns: Optional[List[str]] = None) -> AsyncIterator[str]:
+    """En-tête (colonnes explicites ou de la première ligne) puis une ligne CSV par ligne"""
+    first, rows = await _peek(rows)
+    columns = columns or (list(first.keys()) if first else [])
+    if not columns:
+        return
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=columns, extrasaction="ignore")
+    writer.writeheader()
+    async for row in rows:
+        writer.writerow({key: _flat(value) for key, value in row.items()})
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()  # En-tête seul si aucune ligne
+
+
+async def ndjson_lines(rows: AsyncIterator[Row], columns: Optional[List[str]] = None) -> AsyncIterator[str]:
+    async for row in rows:
+        if columns:
+            row = {key: row.get(key) for key in columns}
+        yield json.dumps(row, ensure_ascii=False, default=str) + "\n"
+
+
+async def markdown_lines(rows: AsyncIterator[Row], columns: Optional[List[str]] = None) -> AsyncIterator[str]:
+    """Tableau Markdown (colonnes de la première ligne)"""
+    first, rows = await _peek(rows)
+    columns = columns or (list(first.keys()) if first else [])
+    if not columns:
+        return
+    yield "| " + " | ".join(columns) + " |\n"
+    yield "|" + "---|" * len(columns) + "\n"
+    async for row in rows:
+        cells = ("" if row.get(key) is None else str(_flat(row.get(key))) for key in columns)
+        yield "| " + " | ".join(c.replace("|", "\\|").replace("\n", " ") for c in cells) + " |\n"
+
+
+WRITERS = {"csv": csv_lines, "ndjson": ndjson_lines, "markdown": markdown_lines}
+
+EXPORT_ERROR = "export interrupted"
+
+
+def error_record(fmt: str, message: str = EXPORT_ERROR) -> str:
+    """Dernière ligne d'un export interrompu, lisible dans chaque format"""
+    if fmt == "ndjson":
+        return json.dumps({"_export_error": message}) + "\n"
+    if fmt == "markdown":
+        return f"\n> ⚠️ {message}\n"
+    return f"# {message}\n"
+
+
+async def _guarded(lines: AsyncIterator[str], fmt: str) -> AsyncIterator[str]:
+    """En-têtes déjà envoyés: l'erreur est journalisée et signalée en fin de fichier"""
+    try:
+        async for line in lines:
+            yield line
+    except Exception as e:
+        logger.error(f"❌ Export stream failed: {e}")
+        yield error_record(fmt)
+
+
+async def gzip_stream(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """Compression gzip en flux"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: format gzip
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def encode_rows(
+    rows: AsyncIterator[Row],
+    fmt: str = "csv",
+    gzip: bool = False,
+    columns: Optional[List[str]] = None,
+    chunk_size: int = CHUNK_SIZE,
+) -> AsyncIterator[bytes]:
+    """Lignes -> blocs d'octets du format demandé (compressés si gzip)"""
+    if fmt not in WRITERS:
+        raise ValueError(f"Unsupported export format: {fmt}")
+    chunks = _chunked(_guarded(WRITERS[fmt](rows, columns), fmt), chunk_size)
+    return gzip_stream(chunks) if gzip else chunks
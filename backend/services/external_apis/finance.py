@@ -228,3 +228,30 @@ class YahooFinanceProvider:
 coingecko = CoinGeckoProvider()
 alphavantage = AlphaVantageProvider()
 yahoo_finance = YahooFinanceProvider()
+
+
+async def coincap_crypto_price(coin_id: str, vs_currency: str = "usd") -> Dict[str, Any]:
+    """Crypto price from CoinCap, in the CoinGecko /simple/price format (USD only)"""
+    from services.external_apis.coincap.provider import CoinCapProvider
+    
+    if vs_currency != "usd":
+        raise Exception(f"CoinCap only quotes USD, not {vs_currency}")
+    asset = await CoinCapProvider().get_asset(coin_id)
+    if not asset.get("found") or asset.get("price_usd") is None:
+        raise Exception(asset.get("error") or f"CoinCap has no price for {coin_id}")
+    return {
+        coin_id: {
+            "usd": asset["price_usd"],
+            "usd_24h_change": asset.get("change_24h"),
+            "usd_market_cap": asset.get("market_cap"),
+        }
+    }
+
+
+def crypto_price_attempts(coin_id: str, vs_currency: str = "usd", primary: Optional[CoinGeckoProvider] = None):
+    """Hedging attempts for a crypto price: CoinGecko, then CoinCap (services/hedging)"""
+    gecko = primary or coingecko
+    return [
+        ("coingecko", lambda: gecko.get_crypto_price(coin_id, vs_currency)),
+        ("coincap", lambda: coincap_crypto_price(coin_id, vs_currency)),
+    ]
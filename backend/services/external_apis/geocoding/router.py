@@ -1,9 +1,13 @@
 """
 Geocoding Router with Intelligent Fallback
+Hedged calls (services/hedging): a slow provider is backed up by the next one
 """
-import logging
-from typing import Dict, Any
 import asyncio
+import logging
+import time
+from typing import Dict, Any, List
+
+from services.hedging import hedger, throttle_sleep
 
 logger = logging.getLogger(__name__)
 
@@ -11,6 +15,11 @@ logger = logging.getLogger(__name__)
 class GeocodingRouter:
     """Router for geocoding with fallback"""
     
+    # Prochain créneau Nominatim (1 req/sec), partagé entre les instances
+    _nominatim_next_slot = 0.0
+    # Créneaux rendus par des tentatives annulées pendant leur attente
+    _nominatim_free_slots: List[float] = []
+    
     def __init__(self):
         self.providers = []
         self._init_providers()
@@ -52,37 +61,61 @@ class GeocodingRouter:
             except Exception as e:
                 logger.warning(f"⚠️ Positionstack failed: {e}")
     
-    async def geocode(self, address: str) -> Dict[str, Any]:
-        """Geocode address with fallback"""
-        errors = []
-        
-        for provider in self.providers:
-            name = provider['name']
-            instance = provider['instance']
-            
+    @classmethod
+    async def _nominatim_throttle(cls):
+        """Respect Nominatim rate limit (1 req/sec): wait only for the remaining interval (not timed)"""
+        now = time.monotonic()
+        cls._nominatim_free_slots = [s for s in cls._nominatim_free_slots if s >= now]
+        if cls._nominatim_free_slots:
+            slot = min(cls._nominatim_free_slots)
+            cls._nominatim_free_slots.remove(slot)
+        else:
+            slot = max(now, cls._nominatim_next_slot)
+            cls._nominatim_next_slot = slot + 1.0
+        if slot > now:
             try:
-                logger.info(f"🔄 Geocoding with {name}...")
-                
-                # Respect Nominatim rate limit (1 req/sec)
-                if name == 'nominatim':
-                    await asyncio.sleep(1)
-                
-                result = await instance.geocode(address)
-                
-                logger.info(f"✅ Geocoded with {name}")
-                return {
-                    **result,
-                    "provider": name
-                }
-            
-            except Exception as e:
-                logger.warning(f"⚠️ {name} failed: {str(e)}")
-                errors.append(f"{name}: {str(e)}")
-                continue
+                await throttle_sleep(slot - now)
+            except asyncio.CancelledError:
+                cls._release_nominatim_slot(slot)  # Hedge cancelled before its request: slot unused
+                raise
+    
+    @classmethod
+    def _release_nominatim_slot(cls, slot: float):
+        """Give back an unused slot (the last one shortens the queue, others go to the next caller)"""
+        cls._nominatim_free_slots.append(slot)
+        # Free slots at the tail of the queue: move the next slot back instead
+        while cls._nominatim_free_slots:
+            last = max(cls._nominatim_free_slots)
+            if abs(last + 1.0 - cls._nominatim_next_slot) > 1e-6:
+                break
+            cls._nominatim_free_slots.remove(last)
+            cls._nominatim_next_slot = last
+    
+    def _attempts(self, method: str, *args):
+        """(name, factory) per provider, in preference order"""
+        async def call(name, instance):
+            if name == 'nominatim':
+                await self._nominatim_throttle()
+            return await getattr(instance, method)(*args)
         
-        error_msg = f"All geocoding providers failed. Errors: {'; '.join(errors)}"
-        logger.error(f"❌ {error_msg}")
-        raise Exception(error_msg)
+        return [
+            (p['name'], lambda n=p['name'], i=p['instance']: call(n, i))
+            for p in self.providers
+        ]
+    
+    async def geocode(self, address: str) -> Dict[str, Any]:
+        """Geocode address (hedged, with fallback)"""
+        try:
+            name, result = await hedger.run("geocoding", self._attempts("geocode", address), operation="geocode")
+        except Exception as e:
+            logger.error(f"❌ {e}")
+            raise
+        
+        logger.info(f"✅ Geocoded with {name}")
+        return {
+            **result,
+            "provider": name
+        }
     
     async def search(self, query: str) -> Dict[str, Any]:
         """
@@ -99,38 +132,22 @@ class GeocodingRouter:
         }
     
     async def reverse_geocode(self, lat: float, lon: float) -> Dict[str, Any]:
-        """Reverse geocode with fallback"""
-        errors = []
-        
-        for provider in self.providers:
-            name = provider['name']
-            instance = provider['instance']
-            
-            try:
-                logger.info(f"🔄 Reverse geocoding with {name}...")
-                
-                # Respect Nominatim rate limit
-                if name == 'nominatim':
-                    await asyncio.sleep(1)
-                
-                result = await instance.reverse_geocode(lat, lon)
-                
-                logger.info(f"✅ Reverse geocoded with {name}")
-                return {
-                    **result,
-                    "provider": name,
-                    "lat": lat,
-                    "lon": lon
-                }
-            
-            except Exception as e:
-                logger.warning(f"⚠️ {name} failed: {str(e)}")
-                errors.append(f"{name}: {str(e)}")
-                continue
+        """Reverse geocode (hedged, with fallback)"""
+        try:
+            name, result = await hedger.run(
+                "geocoding", self._attempts("reverse_geocode", lat, lon), operation="reverse"
+            )
+        except Exception as e:
+            logger.error(f"❌ {e}")
+            raise
         
-        error_msg = f"All geocoding providers failed. Errors: {'; '.join(errors)}"
-        logger.error(f"❌ {error_msg}")
-        raise Exception(error_msg)
+        logger.info(f"✅ Reverse geocoded with {name}")
+        return {
+            **result,
+            "provider": name,
+            "lat": lat,
+            "lon": lon
+        }
     
     def get_status(self) -> Dict[str, Any]:
         """Get router status"""
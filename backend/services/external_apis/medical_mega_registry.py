@@ -3,10 +3,13 @@ MEGA Medical API Registry - World's Complete Medical API Collection
 200+ APIs from every major medical institution worldwide
 With intelligent topic-based routing
 """
+import logging
 from typing import Dict, Any, List, Set, Optional
 from dataclasses import dataclass
 from enum import Enum
 
+logger = logging.getLogger(__name__)
+
 
 class MedicalTopic(Enum):
     """Medical topics for intelligent API routing"""
@@ -1065,5 +1068,5 @@ class MegaMedicalRegistry:
 """
 
 
-# Print summary on load
-print(MegaMedicalRegistry.get_summary())
+# Summary disponible en debug (plus de bannière à l'import)
+logger.debug(MegaMedicalRegistry.get_summary())
@@ -2,6 +2,10 @@
 Translation APIs Package
 Intelligent routing with fallback
 """
+from services.provider_registry import provider_registry
 from .router import TranslationRouter
 
-__all__ = ['TranslationRouter']
+# Routeur partagé (providers initialisés au premier usage ou au warm-up)
+translation_router = provider_registry.register("translation", TranslationRouter)
+
+__all__ = ['TranslationRouter', 'translation_router']
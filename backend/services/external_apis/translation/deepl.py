@@ -4,7 +4,7 @@ Free tier: 500,000 characters/month
 """
 import os
 import logging
-from typing import Dict, Any
+from typing import Dict, Any, List
 
 logger = logging.getLogger(__name__)
 
@@ -12,6 +12,10 @@ logger = logging.getLogger(__name__)
 class DeepLTranslate:
     """DeepL Translation API"""
     
+    # Limites d'une requête /translate (paramètres text, taille du corps)
+    max_batch_segments = 50
+    max_batch_chars = 100000
+    
     def __init__(self):
         self.api_key = os.getenv('DEEPL_API_KEY')
         if not self.api_key:
@@ -57,6 +61,35 @@ class DeepLTranslate:
             logger.error(f"DeepL translation error: {e}")
             raise
     
+    async def translate_batch(
+        self,
+        texts: List[str],
+        source_lang: str = 'auto',
+        target_lang: str = 'EN'
+    ) -> List[Dict[str, Any]]:
+        """Translate several segments in one request (order preserved)"""
+        from services.http_client import http_client
+        
+        data = {
+            'auth_key': self.api_key,
+            'text': texts,
+            'target_lang': target_lang.upper()
+        }
+        
+        if source_lang != 'auto':
+            data['source_lang'] = source_lang.upper()
+        
+        response = await http_client.post(f"{self.base_url}/translate", data=data)
+        response.raise_for_status()
+        
+        return [
+            {
+                'translation': t['text'],
+                'source_lang': t.get('detected_source_language', source_lang).lower()
+            }
+            for t in response.json()['translations']
+        ]
+    
     async def detect_language(self, text: str) -> Dict[str, Any]:
         """Detect language (DeepL doesn't have dedicated endpoint, use translate with auto)"""
         result = await self.translate(text, 'auto', 'EN')
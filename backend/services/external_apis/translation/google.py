@@ -4,13 +4,17 @@ Free tier: 500,000 characters/month
 """
 import os
 import httpx
-from typing import Dict, Any
+from typing import Dict, Any, List
 from services.http_client import http_client
 
 
 class GoogleTranslate:
     """Google Cloud Translation API"""
     
+    # Limites d'une requête v2 (segments q, caractères conseillés)
+    max_batch_segments = 128
+    max_batch_chars = 30000
+    
     def __init__(self):
         self.api_key = os.getenv('GOOGLE_TRANSLATE_API_KEY')
         if not self.api_key:
@@ -26,16 +30,16 @@ class GoogleTranslate:
         target_lang: str = 'en'
     ) -> Dict[str, Any]:
         """Translate text using Google Translate API"""
-        params = {
-            'key': self.api_key,
+        body = {
             'q': text,
             'target': target_lang
         }
         
-        if source_lang != 'auto':
-            params['source'] = source_lang
+        if source_lang and source_lang != 'auto':
+            body['source'] = source_lang
         
-        response = await http_client.post(self.base_url, params=params)
+        # Texte dans le corps JSON: pas de limite de longueur d'URL
+        response = await http_client.post(self.base_url, params={'key': self.api_key}, json=body)
         response.raise_for_status()
         
         data = response.json()
@@ -46,6 +50,34 @@ class GoogleTranslate:
             'source_lang': translation.get('detectedSourceLanguage', source_lang)
         }
     
+    async def translate_batch(
+        self,
+        texts: List[str],
+        source_lang: str = 'auto',
+        target_lang: str = 'en'
+    ) -> List[Dict[str, Any]]:
+        """Translate several segments in one request (order preserved)"""
+        body = {
+            'q': texts,
+            'target': target_lang,
+            'format': 'text'
+        }
+        
+        if source_lang and source_lang != 'auto':
+            body['source'] = source_lang
+        
+        # Jusqu'à max_batch_chars dans le corps JSON (une URL serait limitée à ~2 Ko)
+        response = await http_client.post(self.base_url, params={'key': self.api_key}, json=body)
+        response.raise_for_status()
+        
+        return [
+            {
+                'translation': t['translatedText'],
+                'source_lang': t.get('detectedSourceLanguage', source_lang)
+            }
+            for t in response.json()['data']['translations']
+        ]
+    
     async def detect_language(self, text: str) -> Dict[str, Any]:
         """Detect language of text"""
         url = "https://translation.googleapis.com/language/translate/v2/detect"
@@ -0,0 +1,175 @@
+"""
+Translation quota ledger and translation memory
+Shared between workers through Redis (in-process fallback when Redis is down)
+
+- quota: one counter per provider and calendar month, reserved atomically
+  (Lua INCRBY + rollback above quota) before each provider call
+- translation memory: (normalized text, source, target) -> translation,
+  long TTL, with a small in-process LRU in front of Redis
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional
+
+from services.cache import cache_service
+
+logger = logging.getLogger(__name__)
+
+MEMORY_TTL = int(os.getenv("TRANSLATION_MEMORY_TTL", 90 * 86400))
+MEMORY_LOCAL_SIZE = 5000
+QUOTA_KEY_TTL = 40 * 86400  # Fenêtre mensuelle + marge
+
+# INCRBY puis annulation si le quota est dépassé: réservation atomique entre workers
+_RESERVE_SCRIPT = """
+local used = redis.call('INCRBY', KEYS[1], ARGV[1])
+if used == tonumber(ARGV[1]) then
+    redis.call('EXPIRE', KEYS[1], ARGV[3])
+end
+if tonumber(ARGV[2]) >= 0 and used > tonumber(ARGV[2]) then
+    redis.call('DECRBY', KEYS[1], ARGV[1])
+    return -1
+end
+return used
+"""
+
+
+def normalize_text(text: str) -> str:
+    """Whitespace collapsed: same UI string, same cache entry"""
+    return " ".join(text.split())
+
+
+def month_window(now: Optional[datetime] = None) -> str:
+    return (now or datetime.now()).strftime("%Y-%m")
+
+
+class QuotaLedger:
+    """Monthly character quotas per provider, shared through Redis"""
+
+    def __init__(self, cache=cache_service):
+        self.cache = cache
+        self._local: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(provider: str) -> str:
+        return f"translation_quota:{provider}:{month_window()}"
+
+    def _reserve_sync(self, provider: str, chars: int, quota: float) -> bool:
+        key = self._key(provider)
+        limit = -1 if quota == float('inf') else int(quota)
+        if self.cache.available:
+            try:
+                return self.cache.redis.eval(_RESERVE_SCRIPT, 1, key, chars, limit, QUOTA_KEY_TTL) != -1
+            except Exception as e:
+                logger.warning(f"Quota ledger unavailable, using local counters: {e}")
+        with self._lock:
+            used = self._local.get(key, 0) + chars
+            if limit >= 0 and used > limit:
+                return False
+            self._local[key] = used
+            return True
+
+    def _release_sync(self, provider: str, chars: int):
+        key = self._key(provider)
+        if self.cache.available:
+            try:
+                self.cache.redis.decrby(key, chars)
+                return
+            except Exception as e:
+                logger.warning(f"Quota ledger release failed: {e}")
+        with self._lock:
+            self._local[key] = max(0, self._local.get(key, 0) - chars)
+
+    def _usage_sync(self, provider: str) -> int:
+        key = self._key(provider)
+        if self.cache.available:
+            try:
+                return int(self.cache.redis.get(key) or 0)
+            except Exception:
+                pass
+        with self._lock:
+            return self._local.get(key, 0)
+
+    async def reserve(self, provider: str, chars: int, quota: float) -> bool:
+        """Reserve `chars` for this month; False if it would exceed the quota"""
+        return await asyncio.to_thread(self._reserve_sync, provider, chars, quota)
+
+    async def release(self, provider: str, chars: int):
+        """Give back a reservation (failed provider call)"""
+        await asyncio.to_thread(self._release_sync, provider, chars)
+
+    def usage(self, provider: str) -> int:
+        """Characters used this month"""
+        return self._usage_sync(provider)
+
+
+class TranslationMemory:
+    """Long-lived cache of translated segments"""
+
+    PREFIX = "translation_memory"
+
+    def __init__(self, cache=cache_service, local_size: int = MEMORY_LOCAL_SIZE, ttl: int = MEMORY_TTL):
+        self.cache = cache
+        self.ttl = ttl
+        self.local_size = local_size
+        self._local: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(text: str, source_lang: Optional[str], target_lang: str) -> str:
+        # Langue source absente = détection automatique: même entrée que "auto"
+        source = (source_lang or "auto").lower()
+        payload = json.dumps([normalize_text(text), source, target_lang.lower()], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _remember(self, key: str, translation: str):
+        with self._lock:
+            self._local[key] = translation
+            self._local.move_to_end(key)
+            while len(self._local) > self.local_size:
+                self._local.popitem(last=False)
+
+    def get_many(self, keys) -> Dict[str, str]:
+        """Cached translations for the given keys (local LRU, then Redis)"""
+        found = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in self._local:
+                    self._local.move_to_end(key)
+                    found[key] = self._local[key]
+                else:
+                    missing.append(key)
+        if missing and self.cache.available:
+            try:
+                values = self.cache.redis.mget([f"{self.PREFIX}:{k}" for k in missing])
+                for key, value in zip(missing, values):
+                    if value is not None:
+                        found[key] = value
+                        self._remember(key, value)
+            except Exception as e:
+                logger.warning(f"Translation memory read failed: {e}")
+        return found
+
+    def set_many(self, entries: Dict[str, str]):
+        for key, translation in entries.items():
+            self._remember(key, translation)
+        if entries and self.cache.available:
+            try:
+                pipe = self.cache.redis.pipeline()
+                for key, translation in entries.items():
+                    pipe.setex(f"{self.PREFIX}:{key}", self.ttl, translation)
+                pipe.execute()
+            except Exception as e:
+                logger.warning(f"Translation memory write failed: {e}")
+
+
+# Partagés par toutes les instances de TranslationRouter du processus
+quota_ledger = QuotaLedger()
+translation_memory = TranslationMemory()
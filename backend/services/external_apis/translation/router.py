@@ -1,11 +1,16 @@
 """
 Translation Router with Intelligent Fallback
 Supports: Google Translate, DeepL, Yandex, LibreTranslate
+
+- monthly quotas reserved in a shared ledger (Redis) before each call
+- translation memory: identical segments are translated once
+- batch translation: segments deduped, misses sent in provider-sized batches
 """
 import os
+import asyncio
 import logging
-from typing import Optional, Dict, Any
-from datetime import datetime, timedelta
+from typing import Optional, Dict, Any, List
+from .ledger import normalize_text, quota_ledger, translation_memory
 
 logger = logging.getLogger(__name__)
 
@@ -15,8 +20,8 @@ class TranslationRouter:
     
     def __init__(self):
         self.providers = []
-        self.quota_usage = {}
-        self.last_reset = {}
+        self.ledger = quota_ledger
+        self.memory = translation_memory
         
         # Initialize providers based on available API keys
         self._init_providers()
@@ -46,8 +51,6 @@ class TranslationRouter:
                         'quota': quota,
                         'available': True
                     })
-                    self.quota_usage[name] = 0
-                    self.last_reset[name] = datetime.now()
                     logger.info(f"✅ {name.capitalize()} translation provider initialized (quota: {quota:,} chars/month)")
                 except Exception as e:
                     logger.warning(f"⚠️ Failed to initialize {name}: {e}")
@@ -55,31 +58,6 @@ class TranslationRouter:
         if not self.providers:
             logger.error("❌ No translation providers available!")
     
-    def _check_quota(self, provider_name: str, text_length: int) -> bool:
-        """Check if provider has enough quota"""
-        if provider_name not in self.quota_usage:
-            return False
-        
-        provider = next((p for p in self.providers if p['name'] == provider_name), None)
-        if not provider:
-            return False
-        
-        # Reset quota if month has passed
-        if datetime.now() - self.last_reset[provider_name] > timedelta(days=30):
-            self.quota_usage[provider_name] = 0
-            self.last_reset[provider_name] = datetime.now()
-        
-        # Check if quota available
-        if provider['quota'] == float('inf'):
-            return True
-        
-        return self.quota_usage[provider_name] + text_length <= provider['quota']
-    
-    def _log_usage(self, provider_name: str, text_length: int):
-        """Log API usage"""
-        if provider_name in self.quota_usage:
-            self.quota_usage[provider_name] += text_length
-    
     async def translate(
         self,
         text: str,
@@ -103,6 +81,18 @@ class TranslationRouter:
                 "chars_used": 123
             }
         """
+        key = self.memory.key(text, source_lang, target_lang)
+        cached = (await asyncio.to_thread(self.memory.get_many, [key])).get(key)
+        if cached is not None:
+            return {
+                "translation": cached,
+                "source_lang": source_lang,
+                "target_lang": target_lang,
+                "provider": "memory",
+                "chars_used": 0,
+                "cached": True
+            }
+        
         text_length = len(text)
         errors = []
         
@@ -110,8 +100,8 @@ class TranslationRouter:
             name = provider['name']
             instance = provider['instance']
             
-            # Check quota
-            if not self._check_quota(name, text_length):
+            # Reserve quota in the shared ledger
+            if not await self.ledger.reserve(name, text_length, provider['quota']):
                 logger.warning(f"⚠️ {name.capitalize()} quota exceeded, trying next provider...")
                 errors.append(f"{name}: quota exceeded")
                 continue
@@ -120,29 +110,123 @@ class TranslationRouter:
             try:
                 logger.info(f"🔄 Attempting translation with {name.capitalize()}...")
                 result = await instance.translate(text, source_lang, target_lang)
-                
-                # Log usage
-                self._log_usage(name, text_length)
-                
-                logger.info(f"✅ Translation successful with {name.capitalize()}")
-                return {
-                    "translation": result['translation'],
-                    "source_lang": result.get('source_lang', source_lang),
-                    "target_lang": target_lang,
-                    "provider": name,
-                    "chars_used": text_length
-                }
-            
             except Exception as e:
+                await self.ledger.release(name, text_length)
                 logger.warning(f"⚠️ {name.capitalize()} failed: {str(e)}")
                 errors.append(f"{name}: {str(e)}")
                 continue
+            
+            await asyncio.to_thread(self.memory.set_many, {key: result['translation']})
+            logger.info(f"✅ Translation successful with {name.capitalize()}")
+            return {
+                "translation": result['translation'],
+                "source_lang": result.get('source_lang', source_lang),
+                "target_lang": target_lang,
+                "provider": name,
+                "chars_used": text_length,
+                "cached": False
+            }
         
         # All providers failed
         error_msg = f"All translation providers failed. Errors: {'; '.join(errors)}"
         logger.error(f"❌ {error_msg}")
         raise Exception(error_msg)
     
+    async def translate_batch(
+        self,
+        segments: List[str],
+        source_lang: str = 'auto',
+        target_lang: str = 'en'
+    ) -> Dict[str, Any]:
+        """
+        Translate many segments (UI strings, document lines) at once
+        
+        Blank segments are kept as is, duplicates and memory hits cost
+        nothing; the rest is sent in batches sized for each provider.
+        
+        Returns:
+            {"translations": [...same order...], "providers": {...}, "stats": {...}}
+        """
+        keys = [self.memory.key(s, source_lang, target_lang) if s.strip() else None for s in segments]
+        texts: Dict[str, str] = {}
+        for key, segment in zip(keys, segments):
+            if key is not None:
+                texts.setdefault(key, normalize_text(segment))
+        
+        found = await asyncio.to_thread(self.memory.get_many, list(texts))
+        pending = [key for key in texts if key not in found]
+        cached_count = len(texts) - len(pending)
+        providers_used: Dict[str, int] = {}
+        chars_used = 0
+        errors = []
+        
+        for provider in self.providers:
+            if not pending:
+                break
+            name = provider['name']
+            while pending:
+                batch = self._next_batch(provider['instance'], pending, texts)
+                batch_chars = sum(len(texts[k]) for k in batch)
+                if not await self.ledger.reserve(name, batch_chars, provider['quota']):
+                    errors.append(f"{name}: quota exceeded")
+                    break
+                try:
+                    results = await self._translate_batch_with(
+                        provider['instance'], [texts[k] for k in batch], source_lang, target_lang
+                    )
+                except Exception as e:
+                    await self.ledger.release(name, batch_chars)
+                    logger.warning(f"⚠️ {name.capitalize()} batch failed: {str(e)}")
+                    errors.append(f"{name}: {str(e)}")
+                    break
+                translated = {k: r['translation'] for k, r in zip(batch, results)}
+                await asyncio.to_thread(self.memory.set_many, translated)
+                found.update(translated)
+                pending = pending[len(batch):]
+                providers_used[name] = providers_used.get(name, 0) + len(batch)
+                chars_used += batch_chars
+        
+        if pending:
+            error_msg = f"Batch translation incomplete ({len(pending)} segments). Errors: {'; '.join(errors)}"
+            logger.error(f"❌ {error_msg}")
+            raise Exception(error_msg)
+        
+        return {
+            "translations": [segment if key is None else found[key] for key, segment in zip(keys, segments)],
+            "source_lang": source_lang,
+            "target_lang": target_lang,
+            "providers": providers_used,
+            "stats": {
+                "segments": len(segments),
+                "unique": len(texts),
+                "cached": cached_count,
+                "translated": len(texts) - cached_count,
+                "chars_used": chars_used
+            }
+        }
+    
+    @staticmethod
+    def _next_batch(instance, pending: List[str], texts: Dict[str, str]) -> List[str]:
+        """Leading pending segments that fit the provider's request limits"""
+        max_segments = getattr(instance, 'max_batch_segments', 1)
+        max_chars = getattr(instance, 'max_batch_chars', float('inf'))
+        batch, size = [], 0
+        for key in pending[:max_segments]:
+            if batch and size + len(texts[key]) > max_chars:
+                break
+            batch.append(key)
+            size += len(texts[key])
+        return batch
+    
+    @staticmethod
+    async def _translate_batch_with(instance, texts: List[str], source_lang: str, target_lang: str):
+        if hasattr(instance, 'translate_batch'):
+            results = await instance.translate_batch(texts, source_lang, target_lang)
+            if len(results) != len(texts):
+                raise ValueError(f"expected {len(texts)} translations, got {len(results)}")
+            return results
+        return [await instance.translate(text, source_lang, target_lang) for text in texts]
+    
     async def detect_language(self, text: str) -> Dict[str, Any]:
         """Detect language of text"""
         for provider in self.providers:
@@ -168,7 +252,7 @@ class TranslationRouter:
         for provider in self.providers:
             name = provider['name']
             quota = provider['quota']
-            used = self.quota_usage.get(name, 0)
+            used = self.ledger.usage(name)
             
             status["details"].append({
                 "name": name,
@@ -4,13 +4,17 @@ Free tier: ~100,000 characters/month
 """
 import os
 import httpx
-from typing import Dict, Any
+from typing import Dict, Any, List
 from services.http_client import http_client
 
 
 class YandexTranslate:
     """Yandex Cloud Translation API"""
     
+    # Limite d'une requête: 10 000 caractères au total
+    max_batch_segments = 100
+    max_batch_chars = 10000
+    
     def __init__(self):
         self.api_key = os.getenv('YANDEX_TRANSLATE_API_KEY')
         if not self.api_key:
@@ -52,6 +56,37 @@ class YandexTranslate:
             'source_lang': translation.get('detectedLanguageCode', source_lang)
         }
     
+    async def translate_batch(
+        self,
+        texts: List[str],
+        source_lang: str = 'auto',
+        target_lang: str = 'en'
+    ) -> List[Dict[str, Any]]:
+        """Translate several segments in one request (order preserved)"""
+        headers = {
+            'Authorization': f'Api-Key {self.api_key}',
+            'Content-Type': 'application/json'
+        }
+        
+        data = {
+            'texts': texts,
+            'targetLanguageCode': target_lang
+        }
+        
+        if source_lang != 'auto':
+            data['sourceLanguageCode'] = source_lang
+        
+        response = await http_client.post(f"{self.base_url}/translate", json=data, headers=headers)
+        response.raise_for_status()
+        
+        return [
+            {
+                'translation': t['text'],
+                'source_lang': t.get('detectedLanguageCode', source_lang)
+            }
+            for t in response.json()['translations']
+        ]
+    
     async def detect_language(self, text: str) -> Dict[str, Any]:
         """Detect language using Yandex API"""
         url = f"{self.base_url}/detect"
@@ -0,0 +1,198 @@
+"""
+Weather Cells - Cache météo par cellule geohash
+- les coordonnées sont ramenées au centre de leur cellule geohash: deux
+  utilisateurs à quelques centaines de mètres partagent la même entrée
+- précision par endpoint: grossière pour les conditions actuelles (~5 km),
+  plus fine pour les prévisions (~1 km)
+- stale-while-revalidate: entrée fraîche servie telle quelle, entrée
+  périmée servie immédiatement et rafraîchie en tâche de fond
+- les requêtes simultanées d'une même cellule partagent un seul appel amont
+
+Configuration:
+    WEATHER_CURRENT_GEOHASH_PRECISION=5
+    WEATHER_FORECAST_GEOHASH_PRECISION=6
+    WEATHER_CURRENT_FRESH_S=300
+    WEATHER_CURRENT_STALE_S=1800
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+GEOHASH_ALPHABET = "0123456789bcdefghjkmnpqrstuvwxyz"
+_GEOHASH_INDEX = {c: i for i, c in enumerate(GEOHASH_ALPHABET)}
+
+
+def geohash_encode(latitude: float, longitude: float, precision: int) -> str:
+    """Geohash standard (bits alternés longitude/latitude, base 32)"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars = []
+    bits = value = 0
+    even = True
+    while len(chars) < precision:
+        rng, coord = (lon_range, longitude) if even else (lat_range, latitude)
+        mid = (rng[0] + rng[1]) / 2
+        if coord >= mid:
+            value = (value << 1) | 1
+            rng[0] = mid
+        else:
+            value <<= 1
+            rng[1] = mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(GEOHASH_ALPHABET[value])
+            bits = value = 0
+    return "".join(chars)
+
+
+def geohash_bounds(geohash: str) -> Tuple[float, float, float, float]:
+    """(lat_min, lat_max, lon_min, lon_max) de la cellule"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    even = True
+    for char in geohash:
+        value = _GEOHASH_INDEX[char]
+        for shift in range(4, -1, -1):
+            rng = lon_range if even else lat_range
+            mid = (rng[0] + rng[1]) / 2
+            if (value >> shift) & 1:
+                rng[0] = mid
+            else:
+                rng[1] = mid
+            even = not even
+    return lat_range[0], lat_range[1], lon_range[0], lon_range[1]
+
+
+def snap(latitude: float, longitude: float, precision: int) -> Tuple[str, float, float]:
+    """(geohash, lat, lon) du centre de la cellule contenant le point"""
+    geohash = geohash_encode(latitude, longitude, precision)
+    lat_min, lat_max, lon_min, lon_max = geohash_bounds(geohash)
+    return geohash, round((lat_min + lat_max) / 2, 6), round((lon_min + lon_max) / 2, 6)
+
+
+@dataclass
+class CellPolicy:
+    """Précision geohash et durées de vie d'un endpoint"""
+    precision: int
+    fresh_s: float
+    stale_s: float  # Au-delà de fresh_s et jusqu'à stale_s: servi puis rafraîchi
+
+
+def _policy_from_env(endpoint: str, default: CellPolicy) -> CellPolicy:
+    prefix = f"WEATHER_{endpoint.upper()}_"
+    default.precision = int(os.getenv(prefix + "GEOHASH_PRECISION", default.precision))
+    default.fresh_s = float(os.getenv(prefix + "FRESH_S", default.fresh_s))
+    default.stale_s = float(os.getenv(prefix + "STALE_S", default.stale_s))
+    return default
+
+
+DEFAULT_POLICIES: Dict[str, CellPolicy] = {
+    # Cellule ~4.9 x 4.9 km: la météo actuelle varie peu à cette échelle
+    "current": CellPolicy(precision=5, fresh_s=300, stale_s=1800),
+    # Cellule ~1.2 x 0.6 km: prévisions horaires plus sensibles au relief/littoral
+    "forecast": CellPolicy(precision=6, fresh_s=1800, stale_s=6 * 3600),
+}
+
+
+class CellCache:
+    """
+    Cache mémoire LRU par cellule, stale-while-revalidate et appels partagés
+
+    Les clés sont "<endpoint>:<variante>:<geohash>"; les valeurs sont des dict
+    copiés à la lecture pour que les appelants puissent les modifier.
+    """
+
+    def __init__(self, policies: Optional[Dict[str, CellPolicy]] = None, max_entries: int = 5000):
+        self.policies = policies or {
+            endpoint: _policy_from_env(endpoint, CellPolicy(**vars(policy)))
+            for endpoint, policy in DEFAULT_POLICIES.items()
+        }
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.stats = {"hits": 0, "stale": 0, "misses": 0, "coalesced": 0, "refreshes": 0, "refresh_errors": 0}
+
+    def cell(self, endpoint: str, latitude: float, longitude: float) -> Tuple[str, float, float]:
+        """Cellule (geohash, centre) d'un point pour cet endpoint"""
+        return snap(latitude, longitude, self.policies[endpoint].precision)
+
+    async def get_or_fetch(
+        self,
+        endpoint: str,
+        key: str,
+        fetch: Callable[[], Awaitable[Dict[str, Any]]]
+    ) -> Tuple[Dict[str, Any], str]:
+        """
+        Valeur de la cellule et son état: "hit", "stale", "coalesced" ou "miss"
+
+        Une erreur amont n'est propagée qu'en l'absence de valeur servable.
+        """
+        policy = self.policies[endpoint]
+        entry = self._entries.get(key)
+        if entry is not None:
+            age = time.monotonic() - entry[0]
+            if age <= policy.fresh_s:
+                self._entries.move_to_end(key)
+                self.stats["hits"] += 1
+                return dict(entry[1]), "hit"
+            if age <= policy.stale_s:
+                self._entries.move_to_end(key)
+                self.stats["stale"] += 1
+                if key not in self._inflight:
+                    self.stats["refreshes"] += 1
+                    self._start(key, fetch).add_done_callback(self._log_refresh)
+                return dict(entry[1]), "stale"
+            del self._entries[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            return dict(await asyncio.shield(inflight)), "coalesced"
+
+        self.stats["misses"] += 1
+        return dict(await asyncio.shield(self._start(key, fetch))), "miss"
+
+    def _start(self, key: str, fetch: Callable[[], Awaitable[Dict[str, Any]]]) -> asyncio.Future:
+        """Lancer l'appel amont partagé de la cellule (stocké au succès)"""
+        async def run():
+            try:
+                value = await fetch()
+                self._store(key, value)
+                return value
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        self._inflight[key] = task
+        return task
+
+    def _store(self, key: str, value: Dict[str, Any]):
+        self._entries[key] = (time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _log_refresh(self, task: asyncio.Future):
+        if not task.cancelled() and task.exception() is not None:
+            self.stats["refresh_errors"] += 1
+            logger.warning(f"⚠️ Weather cell refresh failed: {task.exception()}")
+
+    def clear(self):
+        self._entries.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "inflight": len(self._inflight),
+            "precision": {endpoint: p.precision for endpoint, p in self.policies.items()},
+            **self.stats
+        }
+
+
+# Partagé par toutes les instances de WeatherRouter (routers, experts, agrégation)
+weather_cells = CellCache()
@@ -1,11 +1,18 @@
 """
-Weather Router with Dual-API Precision
-Calls both Open-Meteo and WeatherAPI in parallel for maximum accuracy
+Weather Router
+Hedged calls by default (Open-Meteo first, WeatherAPI as backup, see services/hedging).
+WEATHER_DUAL_PRECISION=true calls both APIs in parallel and aggregates them for accuracy.
+Results are cached per geohash cell (see cells.py): coordinates are snapped
+to the cell centre, so nearby requests share one upstream call.
 """
 import logging
 import asyncio
 import math
-from typing import Dict, Any, Optional, Tuple
+import os
+from typing import Dict, Any, List, Optional, Tuple
+
+from services.hedging import hedger
+from .cells import CellCache, weather_cells
 
 logger = logging.getLogger(__name__)
 
@@ -13,8 +20,12 @@ logger = logging.getLogger(__name__)
 class WeatherRouter:
     """Intelligent router for weather - uses BOTH APIs for precision"""
     
-    def __init__(self):
+    BATCH_CONCURRENCY = 8  # Cells fetched at once by get_weather_batch
+    
+    def __init__(self, cells: Optional[CellCache] = None):
         self.providers = []
+        self.dual_precision = os.getenv("WEATHER_DUAL_PRECISION", "false").lower() == "true"
+        self.cells = cells or weather_cells
         self._init_providers()
     
     def _init_providers(self):
@@ -49,9 +60,41 @@ class WeatherRouter:
         longitude: float
     ) -> Dict[str, Any]:
         """
-        Get current weather from BOTH APIs in parallel for precision
-        Aggregates data for maximum accuracy
+        Get current weather for the geohash cell containing the point
+        Served from the cell cache (stale entries are refreshed in background)
+        """
+        geohash, lat, lon = self.cells.cell("current", latitude, longitude)
+        mode = "dual" if self.dual_precision else "hedged"
+        data, state = await self.cells.get_or_fetch(
+            "current", f"current:{mode}:{geohash}",
+            lambda: self._fetch_current_weather(lat, lon)
+        )
+        return {**data, 'geohash': geohash, 'cache': state}
+    
+    async def _fetch_current_weather(
+        self,
+        latitude: float,
+        longitude: float
+    ) -> Dict[str, Any]:
+        """
+        Get current weather from the providers
+        Hedged (first good answer wins) or, in dual precision mode,
+        from BOTH APIs in parallel with aggregated data
         """
+        if not self.dual_precision:
+            name, data = await hedger.run(
+                "weather",
+                [(p['name'], lambda i=p['instance']: i.get_current_weather(latitude, longitude)) for p in self.providers],
+                operation="current",
+            )
+            logger.info(f"✅ Weather data from {name}")
+            return {
+                **data,
+                'provider': name,
+                'sources': [name],
+                'precision_level': 'single_source'
+            }
+        
         # Appeler les 2 APIs en parallèle
         tasks = []
         provider_names = []
@@ -211,42 +254,100 @@ class WeatherRouter:
         longitude: float,
         days: int = 7
     ) -> Dict[str, Any]:
-        """Get weather forecast (uses first available provider)"""
-        errors = []
+        """Get weather forecast for the (finer) geohash cell containing the point"""
+        geohash, lat, lon = self.cells.cell("forecast", latitude, longitude)
+        data, state = await self.cells.get_or_fetch(
+            "forecast", f"forecast:{days}:{geohash}",
+            lambda: self._fetch_forecast(lat, lon, days)
+        )
+        return {**data, 'geohash': geohash, 'cache': state}
+    
+    async def _fetch_forecast(
+        self,
+        latitude: float,
+        longitude: float,
+        days: int = 7
+    ) -> Dict[str, Any]:
+        """Get weather forecast from the providers (hedged: first good answer wins)"""
+        try:
+            name, result = await hedger.run(
+                "weather",
+                [(p['name'], lambda i=p['instance']: i.get_forecast(latitude, longitude, days)) for p in self.providers],
+                operation="forecast",
+            )
+        except Exception as e:
+            logger.error(f"❌ {e}")
+            raise
         
-        for provider in self.providers:
-            name = provider['name']
-            instance = provider['instance']
-            
-            try:
-                logger.info(f"🔄 Getting forecast from {name}...")
-                result = await instance.get_forecast(latitude, longitude, days)
-                
-                logger.info(f"✅ Forecast retrieved from {name}")
-                return {
-                    **result,
-                    "provider": name,
-                    "days": days
-                }
-            
-            except Exception as e:
-                logger.warning(f"⚠️ {name} failed: {str(e)}")
-                errors.append(f"{name}: {str(e)}")
-                continue
+        logger.info(f"✅ Forecast retrieved from {name}")
+        return {
+            **result,
+            "provider": name,
+            "days": days
+        }
+    
+    async def get_weather_batch(
+        self,
+        points: List[Tuple[float, float]],
+        kind: str = "current",
+        days: int = 7
+    ) -> Dict[str, Any]:
+        """
+        Weather for many coordinates, grouped by geohash cell
         
-        error_msg = f"All weather providers failed. Errors: {'; '.join(errors)}"
-        logger.error(f"❌ {error_msg}")
-        raise Exception(error_msg)
+        Each distinct cell is fetched once (at most BATCH_CONCURRENCY at a time);
+        a failing cell only fails the points it contains.
+        
+        Returns:
+            {"results": [...same order as points...], "stats": {...}}
+        """
+        cells: Dict[str, Tuple[float, float]] = {}
+        point_cells = []
+        for latitude, longitude in points:
+            geohash = self.cells.cell(kind, latitude, longitude)[0]
+            cells.setdefault(geohash, (latitude, longitude))
+            point_cells.append(geohash)
+        
+        semaphore = asyncio.Semaphore(self.BATCH_CONCURRENCY)
+        
+        async def fetch_cell(latitude: float, longitude: float):
+            async with semaphore:
+                if kind == "forecast":
+                    return await self.get_forecast(latitude, longitude, days)
+                return await self.get_current_weather(latitude, longitude)
+        
+        fetched = await asyncio.gather(*(fetch_cell(*point) for point in cells.values()), return_exceptions=True)
+        by_cell = dict(zip(cells, fetched))
+        
+        results = []
+        for (latitude, longitude), geohash in zip(points, point_cells):
+            data = by_cell[geohash]
+            if isinstance(data, Exception):
+                logger.warning(f"⚠️ Weather batch cell {geohash} failed: {data}")
+                results.append({'lat': latitude, 'lon': longitude, 'geohash': geohash, 'success': False, 'error': str(data)})
+            else:
+                results.append({'lat': latitude, 'lon': longitude, 'success': True, **data})
+        
+        return {
+            "results": results,
+            "kind": kind,
+            "stats": {
+                "points": len(points),
+                "cells": len(cells),
+                "failed_cells": sum(isinstance(d, Exception) for d in fetched)
+            }
+        }
     
     def get_status(self) -> Dict[str, Any]:
         """Get router status"""
         return {
             "providers": len(self.providers),
-            "mode": "dual_api_precision",
+            "mode": "dual_api_precision" if self.dual_precision else "hedged",
             "details": [
                 {"name": p['name'], "available": True}
                 for p in self.providers
-            ]
+            ],
+            "cell_cache": self.cells.get_stats()
         }
 
 
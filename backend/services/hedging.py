@@ -0,0 +1,286 @@
+"""
+Hedged Requests - Appels redondants pour les providers critiques en latence
+Pour les catégories qui ont des providers équivalents (météo, géocodage,
+prix crypto) :
+- le provider principal est lancé seul
+- s'il n'a pas répondu après son p90 observé (ou le délai configuré), la
+  doublure est lancée (hedge); un échec lance directement le suivant
+- la première réponse valide gagne, les appels restants sont annulés
+- le taux de requêtes doublées est plafonné par catégorie (fenêtre
+  glissante) pour ne pas consommer les quotas gratuits
+- les attentes de rate limit (throttle_sleep) ne comptent pas dans la latence
+  mesurée; elles ne retardent la doublure que si elles restent sous le délai
+  (une file d'attente plus longue que le p90 déclenche la doublure à l'heure)
+
+Les latences par provider sont enregistrées dans services/api_planner
+(clé "<catégorie>/<opération>/<provider>") et persistées avec ses stats.
+
+Configuration:
+    HEDGING_ENABLED=true
+    HEDGE_WEATHER_DELAY_MS=800
+    HEDGE_WEATHER_MAX_RATE=0.2
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+
+from services.api_planner import MIN_SAMPLES, api_planner
+
+logger = logging.getLogger(__name__)
+
+Attempt = Tuple[str, Callable[[], Awaitable[Any]]]
+
+# Attente de rate limit cumulée par la tentative en cours (une liste par tâche)
+_throttled_s: ContextVar[Optional[List[float]]] = ContextVar("hedge_throttled_s", default=None)
+
+
+async def throttle_sleep(seconds: float):
+    """Attente imposée par un rate limit: exclue de la latence du provider (et du délai de doublure si courte)"""
+    throttled = _throttled_s.get()
+    if throttled is not None:
+        throttled[0] += seconds  # Compté dès le début de l'attente
+    await asyncio.sleep(seconds)
+
+
+@dataclass
+class HedgePolicy:
+    """Politique de hedging d'une catégorie"""
+    delay_ms: float = 500.0          # Délai avant doublure sans latence observée
+    use_observed_p90: bool = True    # Délai = p90 observé du provider en cours
+    min_delay_ms: float = 50.0
+    max_delay_ms: float = 3000.0
+    max_hedge_rate: float = 0.2      # Part max des requêtes doublées
+    max_backups: int = 1             # Doublures lancées au plus par requête
+    window_s: float = 60.0
+
+
+def _policy_from_env(category: str, default: HedgePolicy) -> HedgePolicy:
+    prefix = f"HEDGE_{category.upper()}_"
+    default.delay_ms = float(os.getenv(prefix + "DELAY_MS", default.delay_ms))
+    default.max_hedge_rate = float(os.getenv(prefix + "MAX_RATE", default.max_hedge_rate))
+    return default
+
+
+DEFAULT_POLICIES: Dict[str, HedgePolicy] = {
+    "weather": HedgePolicy(delay_ms=800, max_hedge_rate=0.2),
+    # Quotas gratuits faibles (OpenCage 2 500/jour): doublure rare
+    "geocoding": HedgePolicy(delay_ms=1200, max_hedge_rate=0.1),
+    "finance": HedgePolicy(delay_ms=500, max_hedge_rate=0.3),
+    # Recherche IA: doublures décidées par api_planner (APIs lentes seulement)
+    "ai_search": HedgePolicy(delay_ms=1000, max_hedge_rate=0.5),
+}
+
+
+def _is_good(result: Any) -> bool:
+    """Réponse valide: non vide et sans erreur signalée"""
+    if not result:
+        return False
+    return not (isinstance(result, dict) and result.get("error"))
+
+
+class _CategoryStats:
+    """Compteurs d'une catégorie + fenêtre glissante pour le plafond"""
+
+    def __init__(self):
+        self.requests = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.fallbacks = 0
+        self.failures = 0
+        self.hedges_denied = 0
+        self.recent_requests: Deque[float] = deque()
+        self.recent_hedges: Deque[float] = deque()
+
+    def _trim(self, now: float, window_s: float):
+        for events in (self.recent_requests, self.recent_hedges):
+            while events and now - events[0] > window_s:
+                events.popleft()
+
+    def hedge_allowed(self, policy: HedgePolicy) -> bool:
+        now = time.monotonic()
+        self._trim(now, policy.window_s)
+        requests = max(len(self.recent_requests), 1)
+        # La doublure elle-même compte: (h + 1) / n <= taux max
+        return (len(self.recent_hedges) + 1) / requests <= policy.max_hedge_rate
+
+
+class Hedger:
+    """Exécute des tentatives redondantes selon la politique de la catégorie"""
+
+    def __init__(self, policies: Optional[Dict[str, HedgePolicy]] = None, enabled: bool = True):
+        self.policies = policies or {}
+        self.enabled = enabled
+        self.default_policy = HedgePolicy()
+        self.stats: Dict[str, _CategoryStats] = {}
+
+    def policy(self, category: str) -> HedgePolicy:
+        return self.policies.get(category, self.default_policy)
+
+    @staticmethod
+    def latency_key(category: str, operation: str, provider: str) -> str:
+        return f"{category}/{operation}/{provider}"
+
+    def hedge_delay_ms(self, category: str, operation: str, provider: str) -> float:
+        """p90 observé du provider (borné), sinon délai configuré"""
+        policy = self.policy(category)
+        stats = api_planner.stats.get(self.latency_key(category, operation, provider))
+        if policy.use_observed_p90 and stats and len(stats.latencies) >= MIN_SAMPLES:
+            return min(max(stats.percentile(90), policy.min_delay_ms), policy.max_delay_ms)
+        return policy.delay_ms
+
+    async def run(
+        self,
+        category: str,
+        attempts: Sequence[Attempt],
+        operation: str = "default",
+        is_good: Callable[[Any], bool] = _is_good,
+        delay_ms: Optional[float] = None,
+        stats_key: Optional[Callable[[str], str]] = None,
+        intent: Optional[str] = None,
+    ) -> Tuple[str, Any]:
+        """
+        Lancer les tentatives (ordre = préférence) et retourner (provider, résultat)
+        de la première réponse valide. Lève une Exception si toutes échouent.
+
+        `delay_ms` impose le délai de doublure (décidé par api_planner.plan);
+        `stats_key` et `intent` choisissent où les latences sont enregistrées.
+        """
+        if not attempts:
+            raise Exception(f"No {category} providers available")
+
+        policy = self.policy(category)
+        stats = self.stats.setdefault(category, _CategoryStats())
+        stats.requests += 1
+        stats.recent_requests.append(time.monotonic())
+
+        running: Dict[asyncio.Task, Tuple[str, float, List[float]]] = {}
+        errors: List[str] = []
+        next_index = 0
+        backups = 0
+        hedged_names = set()
+
+        async def attempt(factory: Callable[[], Awaitable[Any]], throttled: List[float]) -> Any:
+            _throttled_s.set(throttled)  # Contexte propre à la tâche
+            return await factory()
+
+        def launch() -> asyncio.Task:
+            nonlocal next_index
+            name, factory = attempts[next_index]
+            next_index += 1
+            throttled = [0.0]
+            task = asyncio.ensure_future(attempt(factory, throttled))
+            running[task] = (name, time.perf_counter(), throttled)
+            return task
+
+        def active_ms(started: float, throttled: List[float]) -> float:
+            """Temps écoulé hors attentes de rate limit"""
+            return max((time.perf_counter() - started - throttled[0]) * 1000, 0.0)
+
+        def hedge_elapsed_ms(task: asyncio.Task, delay: float) -> float:
+            """Temps compté pour la doublure: attente de rate limit exclue sauf si elle dépasse le délai"""
+            if task not in running:
+                return 0.0
+            _, started, throttled = running[task]
+            if throttled[0] * 1000 > delay:
+                return (time.perf_counter() - started) * 1000
+            return active_ms(started, throttled)
+
+        def record(name: str, started: float, throttled: List[float], ok: bool, useful: bool = False,
+                   cancelled: bool = False):
+            api_planner.record(
+                stats_key(name) if stats_key else self.latency_key(category, operation, name),
+                active_ms(started, throttled),
+                ok=ok,
+                useful=useful,
+                intent=intent,
+                cancelled=cancelled,
+            )
+
+        current = launch()
+        try:
+            while running:
+                timeout = None
+                delay = 0.0
+                if self.enabled and next_index < len(attempts) and backups < policy.max_backups:
+                    name = attempts[next_index - 1][0]  # Dernière tentative lancée
+                    delay = delay_ms if delay_ms is not None else self.hedge_delay_ms(category, operation, name)
+                    timeout = max(delay - hedge_elapsed_ms(current, delay), 0.0) / 1000
+
+                done, _ = await asyncio.wait(set(running), timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+
+                if not done:
+                    if hedge_elapsed_ms(current, delay) < delay:
+                        continue  # Tentative en attente (courte) de rate limit: pas encore lente
+                    if stats.hedge_allowed(policy):
+                        backups += 1
+                        stats.hedged += 1
+                        stats.recent_hedges.append(time.monotonic())
+                        current = launch()
+                        hedged_names.add(running[current][0])
+                        logger.debug(f"[HEDGE] {category}/{operation}: {running[current][0]} lancé en doublure")
+                    else:
+                        stats.hedges_denied += 1
+                        backups = policy.max_backups  # Plus de doublure pour cette requête
+                    continue
+
+                for task in done:
+                    name, started, throttled = running.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        record(name, started, throttled, ok=False)
+                        errors.append(f"{name}: {e}")
+                        continue
+                    if is_good(result):
+                        record(name, started, throttled, ok=True, useful=True)
+                        if name in hedged_names:
+                            stats.hedge_wins += 1
+                        return name, result
+                    record(name, started, throttled, ok=True)
+                    errors.append(f"{name}: no data")
+
+                # Échec: lancer directement le provider suivant (fallback)
+                if not running and next_index < len(attempts):
+                    stats.fallbacks += 1
+                    current = launch()
+        finally:
+            for task, (name, started, throttled) in running.items():
+                task.cancel()
+                record(name, started, throttled, ok=True, cancelled=True)
+
+        stats.failures += 1
+        raise Exception(f"All {category} providers failed. Errors: {'; '.join(errors)}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "categories": {
+                category: {
+                    "requests": s.requests,
+                    "hedged": s.hedged,
+                    "hedge_rate": round(s.hedged / s.requests, 3) if s.requests else 0.0,
+                    "hedge_wins": s.hedge_wins,
+                    "hedges_denied": s.hedges_denied,
+                    "fallbacks": s.fallbacks,
+                    "failures": s.failures,
+                    "policy": {
+                        "delay_ms": self.policy(category).delay_ms,
+                        "max_hedge_rate": self.policy(category).max_hedge_rate,
+                        "max_backups": self.policy(category).max_backups,
+                    },
+                }
+                for category, s in self.stats.items()
+            },
+        }
+
+
+# Instance globale
+hedger = Hedger(
+    policies={category: _policy_from_env(category, policy) for category, policy in DEFAULT_POLICIES.items()},
+    enabled=os.getenv("HEDGING_ENABLED", "true").lower() == "true",
+)
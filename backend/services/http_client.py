@@ -7,6 +7,8 @@ from typing import Optional
 import asyncio
 import logging
 
+from services.tracing import span
+
 logger = logging.getLogger(__name__)
 
 
@@ -54,11 +56,20 @@ class HTTPClientPool:
                 await self._client.aclose()
                 self._client = None
     
+    @staticmethod
+    async def _send(send, method: str, url: str, **kwargs) -> httpx.Response:
+        """Exécuter la requête dans un span `http.<METHOD>` (services/tracing)"""
+        target = httpx.URL(url)
+        with span(f"http.{method}", host=target.host, path=target.path) as s:
+            response = await send(url, **kwargs)
+            s.set_attribute("http.status_code", response.status_code)
+            return response
+    
     async def get(self, url: str, **kwargs) -> httpx.Response:
         """GET request avec connection pooling"""
         client = await self.get_client()
         try:
-            response = await client.get(url, **kwargs)
+            response = await self._send(client.get, "GET", url, **kwargs)
             logger.debug(f"[HTTP] GET {url} → {response.status_code}")
             return response
         except Exception as e:
@@ -69,7 +80,7 @@ class HTTPClientPool:
         """POST request avec connection pooling"""
         client = await self.get_client()
         try:
-            response = await client.post(url, **kwargs)
+            response = await self._send(client.post, "POST", url, **kwargs)
             logger.debug(f"[HTTP] POST {url} → {response.status_code}")
             return response
         except Exception as e:
@@ -79,12 +90,12 @@ class HTTPClientPool:
     async def put(self, url: str, **kwargs) -> httpx.Response:
         """PUT request avec connection pooling"""
         client = await self.get_client()
-        return await client.put(url, **kwargs)
+        return await self._send(client.put, "PUT", url, **kwargs)
     
     async def delete(self, url: str, **kwargs) -> httpx.Response:
         """DELETE request avec connection pooling"""
         client = await self.get_client()
-        return await client.delete(url, **kwargs)
+        return await self._send(client.delete, "DELETE", url, **kwargs)
 
 
 # Singleton instance
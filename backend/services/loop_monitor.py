@@ -0,0 +1,330 @@
+"""
+Event Loop Monitor - Lag de la boucle et détection d'appels bloquants
+Mesure le lag en continu (histogramme exporté sur /api/metrics/prometheus)
+et capture la stack du code qui bloque la boucle plus de N ms, avec le
+request ID de la requête en cours (middleware/request_id).
+
+La tâche en cours est connue par les APIs publiques: la task factory enveloppe
+chaque coroutine, et chaque étape (send/throw) exécutée dans la boucle note sa
+tâche (surcoût d'un appel Python par étape, moniteur activé seulement).
+
+Activation:
+    LOOP_MONITOR_ENABLED=true
+    LOOP_MONITOR_THRESHOLD_MS=100   # seuil de blocage
+    LOOP_MONITOR_INTERVAL_MS=50     # période d'échantillonnage
+"""
+import asyncio
+import collections.abc
+import logging
+import os
+import sys
+import threading
+import time
+import traceback
+import weakref
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from middleware.request_id import request_id_ctx
+
+logger = logging.getLogger(__name__)
+
+# Buckets de l'histogramme (ms)
+LAG_BUCKETS_MS = (1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+
+class LagHistogram:
+    """Histogramme cumulatif au format Prometheus"""
+
+    def __init__(self, buckets=LAG_BUCKETS_MS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value_ms: float):
+        self.count += 1
+        self.sum += value_ms
+        if value_ms > self.max:
+            self.max = value_ms
+        for i, bound in enumerate(self.buckets):
+            if value_ms <= bound:
+                self.counts[i] += 1
+                break
+
+    def cumulative(self) -> List[int]:
+        total, result = 0, []
+        for c in self.counts:
+            total += c
+            result.append(total)
+        return result
+
+    def percentile(self, pct: float) -> float:
+        """Approximation par borne supérieure du bucket"""
+        if not self.count:
+            return 0.0
+        target = pct / 100 * self.count
+        for bound, cumulative in zip(self.buckets, self.cumulative()):
+            if cumulative >= target:
+                return float(bound)
+        return self.max
+
+
+class _TrackedCoroutine(collections.abc.Coroutine):
+    """Coroutine enveloppée: chaque étape exécutée dans la boucle note sa tâche"""
+
+    __slots__ = ("_coro", "_monitor", "task_ref")
+
+    def __init__(self, coro, monitor: "LoopMonitor"):
+        self._coro = coro
+        self._monitor = monitor
+        self.task_ref: Optional["weakref.ref[asyncio.Task]"] = None
+
+    def send(self, value):
+        self._monitor._running_task = self.task_ref
+        try:
+            return self._coro.send(value)
+        finally:
+            self._monitor._running_task = None
+
+    def throw(self, *args):
+        self._monitor._running_task = self.task_ref
+        try:
+            return self._coro.throw(*args)
+        finally:
+            self._monitor._running_task = None
+
+    def close(self):
+        return self._coro.close()
+
+    def __await__(self):
+        return self
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.send(None)
+
+    def __getattr__(self, name):
+        # cr_frame, cr_code... (repr et stacks des tâches)
+        return getattr(self._coro, name)
+
+
+class LoopMonitor:
+    """
+    Moniteur de la boucle d'événements
+
+    - Une tâche asyncio se réveille toutes les `interval_ms` et mesure son retard
+    - Un thread watchdog vérifie le heartbeat de cette tâche; si la boucle ne
+      répond plus depuis `threshold_ms`, il capture la stack du thread de la
+      boucle et l'attribue à la requête en cours
+    """
+
+    def __init__(self, interval_ms: float = 50.0, threshold_ms: float = 100.0, max_events: int = 50):
+        self.interval = interval_ms / 1000
+        self.threshold = threshold_ms / 1000
+        self.histogram = LagHistogram()
+        self.blocking_events: Deque[Dict[str, Any]] = deque(maxlen=max_events)
+        self.blocking_total = 0
+        self.running = False
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._heartbeat = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._watchdog: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._current_event: Optional[Dict[str, Any]] = None
+        self._previous_factory = None
+        # Tâche dont une étape s'exécute dans la boucle (lu par le watchdog)
+        self._running_task: Optional["weakref.ref[asyncio.Task]"] = None
+        # Tâche -> request ID (rempli par la task factory et le middleware)
+        self._task_request_ids: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+
+    # ------------------------------------------------------------------
+    # Attribution des requêtes
+    # ------------------------------------------------------------------
+
+    def _task_factory(self, loop, coro, **kwargs):
+        tracked = _TrackedCoroutine(coro, self)
+        if self._previous_factory is not None:
+            task = self._previous_factory(loop, tracked, **kwargs)
+        else:
+            task = asyncio.Task(tracked, loop=loop, **kwargs)
+        tracked.task_ref = weakref.ref(task)  # Avant la première étape (planifiée par call_soon)
+        context = kwargs.get("context")
+        request_id = context.get(request_id_ctx, "") if context is not None else request_id_ctx.get()
+        if request_id:
+            self._task_request_ids[task] = request_id
+        return task
+
+    def bind_current_task(self, request_id: str):
+        """Associer la tâche courante à un request ID (appelé par le middleware)"""
+        if not self.running:
+            return
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            return
+        if task is not None:
+            self._task_request_ids[task] = request_id
+
+    def _current_task(self) -> Optional[asyncio.Task]:
+        """Tâche bloquant la boucle (notée par son étape en cours)"""
+        task_ref = self._running_task
+        return task_ref() if task_ref is not None else None
+
+    def _current_request_id(self, task: Optional[asyncio.Task]) -> str:
+        if task is None:
+            return ""
+        return self._task_request_ids.get(task, "")
+
+    # ------------------------------------------------------------------
+    # Échantillonnage (dans la boucle)
+    # ------------------------------------------------------------------
+
+    async def _sample(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag_ms = max(0.0, (loop.time() - expected) * 1000)
+            self.histogram.observe(lag_ms)
+            self._heartbeat = time.monotonic()
+
+    # ------------------------------------------------------------------
+    # Watchdog (thread séparé)
+    # ------------------------------------------------------------------
+
+    def _capture_stack(self) -> List[str]:
+        frame = sys._current_frames().get(self._loop_thread_id)
+        if frame is None:
+            return []
+        return [line.rstrip() for line in traceback.format_stack(frame, limit=25)]
+
+    def _watch(self):
+        check_every = max(self.threshold / 4, 0.005)
+        while not self._stop.wait(check_every):
+            stalled = time.monotonic() - self._heartbeat - self.interval
+            if stalled >= self.threshold:
+                if self._current_event is None:
+                    task = self._current_task()
+                    self._current_event = {
+                        "started_at": time.time() - stalled,
+                        "blocked_ms": round(stalled * 1000, 1),
+                        "task": task.get_name() if task is not None else None,
+                        "request_id": self._current_request_id(task) or None,
+                        "stack": self._capture_stack(),
+                    }
+                else:
+                    self._current_event["blocked_ms"] = round(stalled * 1000, 1)
+            elif self._current_event is not None:
+                self._finish_event()
+
+    def _finish_event(self):
+        event = self._current_event
+        self._current_event = None
+        self.blocking_events.append(event)
+        self.blocking_total += 1
+        where = event["stack"][-1].strip().splitlines()[0] if event["stack"] else "?"
+        logger.warning(
+            f"⏱️ Event loop blocked {event['blocked_ms']:.0f}ms "
+            f"[request_id={event['request_id'] or '-'}] at {where}"
+        )
+
+    # ------------------------------------------------------------------
+    # Cycle de vie
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Démarrer le moniteur sur la boucle courante"""
+        if self.running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread_id = threading.get_ident()
+        self._previous_factory = self._loop.get_task_factory()
+        self._loop.set_task_factory(self._task_factory)
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self.running = True
+        self._task = self._loop.create_task(self._sample())
+        self._watchdog = threading.Thread(target=self._watch, name="loop-monitor", daemon=True)
+        self._watchdog.start()
+        logger.info(
+            f"🩺 Loop monitor started (interval={self.interval * 1000:.0f}ms, "
+            f"threshold={self.threshold * 1000:.0f}ms)"
+        )
+
+    async def stop(self):
+        """Arrêter le moniteur"""
+        if not self.running:
+            return
+        self.running = False
+        self._stop.set()
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        if self._loop is not None:
+            self._loop.set_task_factory(self._previous_factory)
+        if self._watchdog:
+            self._watchdog.join(timeout=1)
+
+    # ------------------------------------------------------------------
+    # Export
+    # ------------------------------------------------------------------
+
+    def get_stats(self, include_stacks: bool = True) -> Dict[str, Any]:
+        h = self.histogram
+        events = list(self.blocking_events)
+        if not include_stacks:
+            events = [{k: v for k, v in e.items() if k != "stack"} for e in events]
+        return {
+            "enabled": self.running,
+            "interval_ms": self.interval * 1000,
+            "threshold_ms": self.threshold * 1000,
+            "lag_ms": {
+                "count": h.count,
+                "mean": round(h.sum / h.count, 2) if h.count else 0.0,
+                "p50": h.percentile(50),
+                "p95": h.percentile(95),
+                "p99": h.percentile(99),
+                "max": round(h.max, 2),
+            },
+            "blocking_total": self.blocking_total,
+            "recent_blocking_events": events,
+        }
+
+    def to_prometheus(self) -> str:
+        h = self.histogram
+        lines = [
+            "# HELP event_loop_lag_ms Event loop scheduling lag in milliseconds",
+            "# TYPE event_loop_lag_ms histogram",
+        ]
+        for bound, cumulative in zip(h.buckets, h.cumulative()):
+            lines.append(f'event_loop_lag_ms_bucket{{le="{bound}"}} {cumulative}')
+        lines.append(f'event_loop_lag_ms_bucket{{le="+Inf"}} {h.count}')
+        lines.append(f"event_loop_lag_ms_sum {h.sum:.2f}")
+        lines.append(f"event_loop_lag_ms_count {h.count}")
+        lines.append("# HELP event_loop_lag_max_ms Maximum observed event loop lag")
+        lines.append("# TYPE event_loop_lag_max_ms gauge")
+        lines.append(f"event_loop_lag_max_ms {h.max:.2f}")
+        lines.append("# HELP event_loop_blocking_total Callbacks that blocked the loop beyond the threshold")
+        lines.append("# TYPE event_loop_blocking_total counter")
+        lines.append(f"event_loop_blocking_total {self.blocking_total}")
+        return "\n".join(lines)
+
+
+def is_enabled() -> bool:
+    return os.getenv("LOOP_MONITOR_ENABLED", "false").lower() == "true"
+
+
+# Instance globale (démarrée par le lifespan si LOOP_MONITOR_ENABLED=true)
+loop_monitor = LoopMonitor(
+    interval_ms=float(os.getenv("LOOP_MONITOR_INTERVAL_MS", "50")),
+    threshold_ms=float(os.getenv("LOOP_MONITOR_THRESHOLD_MS", "100")),
+)
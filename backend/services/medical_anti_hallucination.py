@@ -1,12 +1,18 @@
 """
 Medical Anti-Hallucination System
 Ensures factual accuracy and proper source attribution for medical information
+
+Claims, sources and dangerous patterns are compiled once into a single
+PatternSet; one scan of the response yields every claim and source
+position, and claims are matched to nearby sources with a two-pointer
+walk over both sorted lists.
 """
-import re
 from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
 from enum import Enum
 
+from services.pattern_scan import PatternSet, literal_alternation, merge_spans
+
 
 class SourceType(str, Enum):
     """Types of medical information sources"""
@@ -77,6 +83,22 @@ class MedicalFactChecker:
             "environ", "approximately", "about",
             "estimation", "estimate"
         ]
+        
+        # Citations accepted next to a claim
+        self.source_patterns = [
+            r"\[PUBMED\]", r"\[FDA\]", r"\[OMS\]", r"\[WHO\]",
+            r"\[ANALYSE IA\]", r"\[RxNorm\]", r"\[Source:",
+            r"selon", r"according to", r"d'après"
+        ]
+        
+        # Compiled once: one scan of the response yields every flag, claim and source position
+        self.claim_rules = [f"claim_{i}" for i in range(len(self.requires_source_keywords))]
+        self.rules = PatternSet({
+            **{f"danger_{i}": p for i, p in enumerate(self.dangerous_claims)},
+            **dict(zip(self.claim_rules, self.requires_source_keywords)),
+            "source": "|".join(self.source_patterns),
+            "uncertainty": literal_alternation(self.uncertainty_markers),
+        }, every=self.claim_rules + ["source"])
     
     def check_response(self, response: str, context_data: Dict[str, Any] = None) -> Dict[str, Any]:
         """
@@ -97,22 +119,22 @@ class MedicalFactChecker:
             "confidence_score": 1.0
         }
         
+        found = self.rules.scan(response)
+        claims = merge_spans(found, self.claim_rules)
+        sources = found.get("source", [])
+        
         # Check for dangerous claims
-        for pattern in self.dangerous_claims:
-            if re.search(pattern, response, re.IGNORECASE):
+        for i, pattern in enumerate(self.dangerous_claims):
+            if f"danger_{i}" in found:
                 result["is_safe"] = False
                 result["warnings"].append(f"Claim dangereuse détectée: {pattern}")
                 result["confidence_score"] -= 0.3
         
         # Check for claims requiring sources
-        unverified_claims = []
-        for pattern in self.requires_source_keywords:
-            matches = re.findall(pattern, response, re.IGNORECASE)
-            if matches:
-                # Check if source is mentioned nearby
-                for match in matches:
-                    if not self._has_source_nearby(response, match):
-                        unverified_claims.append(str(match))
+        unverified_claims = [
+            response[start:end]
+            for start, end in self._unsourced_claims(claims, sources)
+        ]
         
         if unverified_claims:
             result["suggestions"].append(
@@ -121,7 +143,7 @@ class MedicalFactChecker:
             result["confidence_score"] -= 0.1 * len(unverified_claims)
         
         # Check for uncertainty markers (good practice)
-        has_uncertainty = any(marker in response.lower() for marker in self.uncertainty_markers)
+        has_uncertainty = "uncertainty" in found
         if not has_uncertainty and len(response) > 200:
             result["suggestions"].append(
                 "Consider adding uncertainty markers for claims that aren't 100% certain"
@@ -136,25 +158,32 @@ class MedicalFactChecker:
         
         return result
     
-    def _has_source_nearby(self, text: str, claim: str, window: int = 100) -> bool:
-        """Check if a source citation is near a claim"""
-        source_patterns = [
-            r"\[PUBMED\]", r"\[FDA\]", r"\[OMS\]", r"\[WHO\]",
-            r"\[ANALYSE IA\]", r"\[RxNorm\]", r"\[Source:",
-            r"selon", r"according to", r"d'après"
-        ]
-        
-        # Find claim position
-        pos = text.lower().find(str(claim).lower())
-        if pos == -1:
-            return True  # Claim not found, assume OK
-        
-        # Check window around claim
-        start = max(0, pos - window)
-        end = min(len(text), pos + len(str(claim)) + window)
-        window_text = text[start:end]
+    @staticmethod
+    def _unsourced_claims(
+        claims: List[Tuple[int, int]],
+        sources: List[Tuple[int, int]],
+        window: int = 100
+    ) -> List[Tuple[int, int]]:
+        """
+        Claims with no source citation within `window` characters.
         
-        return any(re.search(p, window_text, re.IGNORECASE) for p in source_patterns)
+        Both lists are sorted by start position: the first candidate source
+        only moves forward, so the walk is linear in claims + sources.
+        """
+        unsourced = []
+        first = 0
+        for claim_start, claim_end in claims:
+            while first < len(sources) and sources[first][0] < claim_start - window:
+                first += 1
+            limit = claim_end + window
+            j = first
+            while j < len(sources) and sources[j][0] < limit:
+                if sources[j][1] <= limit:
+                    break
+                j += 1
+            else:
+                unsourced.append((claim_start, claim_end))
+        return unsourced
     
     def _determine_sources(self, context_data: Dict[str, Any]) -> Dict[str, List[str]]:
         """Determine which sources were used based on context data"""
@@ -25,6 +25,7 @@ from .agents import (
     NotificationAgent, ApiAgent, MetaAgent, BuilderAgent
 )
 from .agents.config import WORKFLOWS
+from .provider_registry import provider_registry
 
 logger = logging.getLogger(__name__)
 
@@ -529,5 +530,5 @@ class Orchestrator:
         return count
 
 
-# Global orchestrator instance
-orchestrator = Orchestrator()
+# Global orchestrator instance (créé au premier usage)
+orchestrator = provider_registry.register("orchestrator", Orchestrator)
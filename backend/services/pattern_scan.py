@@ -0,0 +1,70 @@
+"""
+Pattern Scan - Règles regex compilées une fois pour tout un validateur
+- le texte est mis en minuscules une seule fois; les règles sans majuscule
+  sont compilées sans IGNORECASE (recherche littérale rapide de `re`)
+- règles "présence": arrêt à la première occurrence
+- règles "positions" (every): toutes les occurrences, sans chevauchement
+  comme re.findall, pour les traitements par position (affirmations, sources)
+- le moteur `re` de CPython n'a pas d'automate multi-motifs: une grande
+  alternation essaie chaque branche à chaque position et s'avère plus lente
+  que des recherches séparées, chacune en C sur le même texte
+"""
+import re
+from typing import Dict, Iterable, List, Tuple
+
+Span = Tuple[int, int]
+
+
+def _compile(pattern: str) -> "re.Pattern":
+    """Motif appliqué au texte en minuscules (IGNORECASE seulement si nécessaire)"""
+    return re.compile(pattern) if pattern == pattern.lower() else re.compile(pattern, re.IGNORECASE)
+
+
+class PatternSet:
+    """Ensemble de règles nommées appliquées à un même texte"""
+
+    def __init__(self, rules: Dict[str, str], every: Iterable[str] = ()):
+        self.names = list(rules)
+        self.rules = {name: _compile(pattern) for name, pattern in rules.items()}
+        self.every = set(every)
+        self._ignorecase = None
+
+    def scan(self, text: str) -> Dict[str, List[Span]]:
+        """
+        Règles trouvées -> positions dans `text`
+        (première occurrence seulement, sauf pour les règles `every`)
+        """
+        lowered = text.lower()
+        if len(lowered) != len(text):  # Minuscules de longueur différente (rare): positions du texte d'origine
+            lowered = text
+            if self._ignorecase is None:
+                self._ignorecase = {name: re.compile(rule.pattern, re.IGNORECASE) for name, rule in self.rules.items()}
+            rules = self._ignorecase
+        else:
+            rules = self.rules
+
+        found: Dict[str, List[Span]] = {}
+        for name, rule in rules.items():
+            if name in self.every:
+                spans = [m.span() for m in rule.finditer(lowered)]
+                if spans:
+                    found[name] = spans
+            else:
+                match = rule.search(lowered)
+                if match:
+                    found[name] = [match.span()]
+        return found
+
+    def search(self, name: str, text: str) -> bool:
+        """Une règle seule (requête, vérification isolée)"""
+        return self.rules[name].search(text.lower()) is not None
+
+
+def literal_alternation(words: Iterable[str]) -> str:
+    """Mots-clés littéraux -> alternation (plus longs d'abord)"""
+    return "|".join(re.escape(w) for w in sorted(words, key=len, reverse=True))
+
+
+def merge_spans(found: Dict[str, List[Span]], names: Iterable[str]) -> List[Span]:
+    """Positions de plusieurs règles, triées dans l'ordre du texte"""
+    return sorted(span for name in names for span in found.get(name, ()))
@@ -0,0 +1,183 @@
+"""
+Provider Registry - Singletons paresseux
+Les providers (AI router, cache, orchestrator...) sont créés au premier usage
+ou pendant le warm-up asynchrone du lifespan, jamais à l'import.
+"""
+import asyncio
+import inspect
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class ProviderRegistry:
+    """
+    Registre de singletons paresseux
+
+    Usage:
+        cache_service = provider_registry.register("cache", CacheService)
+        # ... rien n'est construit tant que cache_service n'est pas utilisé
+
+        await provider_registry.warm_up()  # dans le lifespan
+        auth = await provider_registry.aget("auth")  # depuis la boucle: sans la bloquer
+
+    Le proxy est synchrone: son premier accès construit l'instance (ou attend le
+    warm-up qui la construit) dans le thread appelant. Dans la boucle, préférer
+    `aget()` sur les chemins de requête susceptibles d'être le premier usage.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._locks: Dict[str, threading.Lock] = {}
+        self.init_times_ms: Dict[str, float] = {}
+        self.warm_up_times_ms: Dict[str, float] = {}
+        self.warm_up_errors: Dict[str, str] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]) -> "LazyProvider":
+        """Enregistrer une factory et retourner un proxy paresseux"""
+        self._factories[name] = factory
+        self._locks[name] = threading.Lock()
+        return LazyProvider(self, name)
+
+    def get(self, name: str) -> Any:
+        """
+        Obtenir l'instance (créée au premier appel, thread-safe)
+
+        Bloquant tant que l'instance n'existe pas: durée du constructeur, ou attente
+        du verrou si le warm-up la construit dans un thread. Depuis la boucle, `aget()`.
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        if name not in self._factories:
+            raise KeyError(f"Unknown provider: {name}")
+
+        with self._locks[name]:
+            instance = self._instances.get(name)
+            if instance is None:
+                start = time.perf_counter()
+                instance = self._factories[name]()
+                self.init_times_ms[name] = (time.perf_counter() - start) * 1000
+                self._instances[name] = instance
+                logger.debug(f"[Registry] {name} created in {self.init_times_ms[name]:.1f}ms")
+        return instance
+
+    async def aget(self, name: str) -> Any:
+        """Obtenir l'instance sans bloquer la boucle (construction et attente du verrou dans un thread)"""
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        return await asyncio.to_thread(self.get, name)
+
+    def is_loaded(self, name: str) -> bool:
+        """Vérifier si le provider a déjà été instancié"""
+        return name in self._instances
+
+    def names(self) -> List[str]:
+        """Noms des providers enregistrés"""
+        return list(self._factories)
+
+    def reset(self, name: str):
+        """Oublier une instance (elle sera recréée au prochain usage)"""
+        self._instances.pop(name, None)
+
+    async def _warm_up_one(self, name: str):
+        start = time.perf_counter()
+        try:
+            # Construction hors de la boucle (les __init__ peuvent être sync/lents)
+            instance = await self.aget(name)
+            warm_up = getattr(instance, "warm_up", None)
+            if warm_up is not None:
+                result = warm_up()
+                if inspect.isawaitable(result):
+                    await result
+        except Exception as e:
+            self.warm_up_errors[name] = str(e)
+            logger.warning(f"[Registry] Warm-up failed for {name}: {e}")
+        finally:
+            self.warm_up_times_ms[name] = (time.perf_counter() - start) * 1000
+
+    async def warm_up(self, names: Optional[List[str]] = None, timeout: float = 10.0) -> Dict[str, Any]:
+        """
+        Créer et préchauffer les providers en parallèle
+
+        Les sondes réseau (ping Redis, /api/tags Ollama...) tournent en
+        concurrence; un provider lent n'empêche pas les autres d'être prêts.
+        """
+        names = names or self.names()
+        start = time.perf_counter()
+
+        tasks = [asyncio.create_task(self._warm_up_one(name)) for name in names]
+        done, pending = await asyncio.wait(tasks, timeout=timeout)
+        for task in pending:
+            task.cancel()
+
+        timed_out = [name for name, task in zip(names, tasks) if task in pending]
+        for name in timed_out:
+            self.warm_up_errors[name] = f"timeout after {timeout}s"
+
+        return {
+            "total_ms": round((time.perf_counter() - start) * 1000, 1),
+            "providers": {
+                name: {
+                    "loaded": self.is_loaded(name),
+                    "init_ms": round(self.init_times_ms.get(name, 0.0), 1),
+                    "warm_up_ms": round(self.warm_up_times_ms.get(name, 0.0), 1),
+                    "error": self.warm_up_errors.get(name),
+                }
+                for name in names
+            },
+            "timed_out": timed_out,
+        }
+
+    def get_status(self) -> Dict[str, Any]:
+        """Statut du registre (pour health/debug)"""
+        return {
+            name: {
+                "loaded": self.is_loaded(name),
+                "init_ms": round(self.init_times_ms.get(name, 0.0), 1),
+                "warm_up_ms": round(self.warm_up_times_ms.get(name, 0.0), 1),
+                "error": self.warm_up_errors.get(name),
+            }
+            for name in self._factories
+        }
+
+
+class LazyProvider:
+    """
+    Proxy vers un singleton du registre
+
+    Se comporte comme l'instance réelle (attributs, méthodes) et permet
+    de garder `from services.cache import cache_service` partout.
+    """
+
+    __slots__ = ("_registry", "_name")
+
+    def __init__(self, registry: ProviderRegistry, name: str):
+        object.__setattr__(self, "_registry", registry)
+        object.__setattr__(self, "_name", name)
+
+    def _resolve(self) -> Any:
+        return self._registry.get(self._name)
+
+    def __getattr__(self, item: str) -> Any:
+        return getattr(self._resolve(), item)
+
+    def __setattr__(self, key: str, value: Any):
+        setattr(self._resolve(), key, value)
+
+    def __delattr__(self, item: str):
+        delattr(self._resolve(), item)
+
+    def __repr__(self) -> str:
+        state = "loaded" if self._registry.is_loaded(self._name) else "lazy"
+        return f"<LazyProvider {self._name} ({state})>"
+
+
+# Registre global
+provider_registry = ProviderRegistry()
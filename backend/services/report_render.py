@@ -0,0 +1,362 @@
+"""
+Report Render - Gabarits compilés et rendu Markdown / HTML / PDF en flux
+- gabarits str.format analysés une fois (littéraux + champs), statistiques
+  de mots des littéraux précalculées
+- FragmentWriter: liste de fragments + nombre de mots courant, identique à
+  len("".join(fragments).split()) sans jamais reconstruire le texte
+- rendus HTML et PDF produits à partir du flux Markdown, section par
+  section (aucune dépendance externe: PDF texte minimal en Helvetica)
+"""
+import html
+import re
+from string import Formatter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+REPORT_FORMATS = {
+    "markdown": ("text/markdown; charset=utf-8", "md"),
+    "html": ("text/html; charset=utf-8", "html"),
+    "pdf": ("application/pdf", "pdf"),
+}
+
+
+# ----------------------------------------------------------------------
+# Gabarits et comptage de mots
+# ----------------------------------------------------------------------
+
+class _Piece:
+    """Littéral d'un gabarit avec ses statistiques de mots"""
+    __slots__ = ("text", "words", "lead", "trail")
+
+    def __init__(self, text: str):
+        self.text = text
+        self.words = len(text.split())
+        self.lead = not text[0].isspace()  # Colle au mot précédent
+        self.trail = not text[-1].isspace()  # Colle au mot suivant
+
+
+class FragmentWriter:
+    """Fragments de texte et nombre de mots courant (raccords entre fragments compris)"""
+
+    def __init__(self, keep: bool = True):
+        self.fragments: List[str] = []
+        self.words = 0
+        self.keep = keep  # False: comptage seul
+        self._glued = False
+
+    def _add(self, text: str, words: int, lead: bool, trail: bool):
+        if self._glued and lead:
+            words -= 1  # Dernier mot du fragment précédent prolongé
+        self.words += words
+        self._glued = trail
+        if self.keep:
+            self.fragments.append(text)
+
+    def write(self, text: str):
+        if text:
+            self._add(text, len(text.split()), not text[0].isspace(), not text[-1].isspace())
+
+    def write_piece(self, piece: _Piece):
+        self._add(piece.text, piece.words, piece.lead, piece.trail)
+
+    def drain(self) -> str:
+        """Texte écrit depuis le dernier drain (le compteur continue)"""
+        text = "".join(self.fragments)
+        self.fragments.clear()
+        return text
+
+
+class CompiledTemplate:
+    """Gabarit str.format analysé une fois"""
+
+    def __init__(self, source: str):
+        self.parts: List[Tuple[Optional[_Piece], Optional[str], str, Optional[str]]] = []
+        for literal, field, spec, conversion in Formatter().parse(source):
+            if literal:
+                self.parts.append((_Piece(literal), None, "", None))
+            if field is not None:
+                self.parts.append((None, field, spec or "", conversion))
+        self.fields = {field for _, field, _, _ in self.parts if field is not None}
+
+    @staticmethod
+    def _value(value: Any, spec: str, conversion: Optional[str]) -> str:
+        if conversion == "r":
+            value = repr(value)
+        elif conversion == "s":
+            value = str(value)
+        return format(value, spec)
+
+    def render_into(self, writer: FragmentWriter, fields: Dict[str, Any]):
+        for piece, field, spec, conversion in self.parts:
+            if piece is not None:
+                writer.write_piece(piece)
+            else:
+                writer.write(self._value(fields[field], spec, conversion))
+
+    def render(self, fields: Dict[str, Any]) -> str:
+        writer = FragmentWriter()
+        self.render_into(writer, fields)
+        return writer.drain()
+
+    def count_words(self, fields: Dict[str, Any]) -> int:
+        writer = FragmentWriter(keep=False)
+        self.render_into(writer, fields)
+        return writer.words
+
+
+# ----------------------------------------------------------------------
+# Markdown -> HTML (sous-ensemble utilisé par les rapports)
+# ----------------------------------------------------------------------
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*)$")
+_ORDERED = re.compile(r"^\s*\d+\.\s+(.*)$")
+_BULLET = re.compile(r"^\s*[-*]\s+(.*)$")
+_TABLE_SEPARATOR = re.compile(r"^\|[\s:|-]+\|$")
+_BOLD = re.compile(r"\*\*(.+?)\*\*")
+_ITALIC = re.compile(r"(?<!\*)\*(?!\s)(.+?)(?<!\s)\*(?!\*)")
+
+
+def _inline(text: str) -> str:
+    text = html.escape(text, quote=False)
+    return _ITALIC.sub(r"<em>\1</em>", _BOLD.sub(r"<strong>\1</strong>", text))
+
+
+class MarkdownHtml:
+    """Conversion ligne à ligne; état (liste, tableau) conservé entre sections"""
+
+    def __init__(self, title: str = "Rapport"):
+        self.title = title
+        self._block: Optional[str] = None  # "ul", "ol", "table", "p"
+        self._table_rows = 0
+        self._pending = ""
+
+    def _close(self) -> List[str]:
+        out = []
+        if self._block == "table":
+            out.append("</tbody></table>" if self._table_rows > 1 else "</table>")
+        elif self._block:
+            out.append(f"</{self._block}>")
+        self._block = None
+        return out
+
+    def _open(self, block: str) -> List[str]:
+        if self._block == block:
+            return []
+        out = self._close()
+        self._block = block
+        self._table_rows = 0
+        out.append("<table>" if block == "table" else f"<{block}>")
+        return out
+
+    def _line(self, line: str) -> List[str]:
+        stripped = line.strip()
+        if not stripped:
+            return self._close()
+        if stripped == "---":
+            return self._close() + ["<hr>"]
+        heading = _HEADING.match(stripped)
+        if heading:
+            level = len(heading.group(1))
+            return self._close() + [f"<h{level}>{_inline(heading.group(2))}</h{level}>"]
+        if stripped.startswith("|") and stripped.endswith("|"):
+            if _TABLE_SEPARATOR.match(stripped):
+                return []
+            out = self._open("table")
+            cells = [c.strip() for c in stripped[1:-1].split("|")]
+            tag = "th" if self._table_rows == 0 else "td"
+            if self._table_rows == 0:
+                out.append("<thead>")
+            elif self._table_rows == 1:
+                out.append("<tbody>")
+            out.append("<tr>" + "".join(f"<{tag}>{_inline(c)}</{tag}>" for c in cells) + "</tr>")
+            if self._table_rows == 0:
+                out.append("</thead>")
+            self._table_rows += 1
+            return out
+        for pattern, block in ((_ORDERED, "ol"), (_BULLET, "ul")):
+            item = pattern.match(line)
+            if item:
+                return self._open(block) + [f"<li>{_inline(item.group(1))}</li>"]
+        if self._block in ("ul", "ol"):  # Ligne de suite d'un élément de liste
+            return [f"<br>{_inline(stripped)}"]
+        if self._block == "p":
+            return [f"<br>{_inline(stripped)}"]
+        return self._open("p") + [_inline(stripped)]
+
+    def start(self) -> str:
+        return (
+            "<!DOCTYPE html>\n<html lang=\"fr\"><head><meta charset=\"utf-8\">"
+            f"<title>{html.escape(self.title)}</title></head><body>\n"
+        )
+
+    def feed(self, markdown: str) -> str:
+        """HTML des lignes complètes reçues (la dernière ligne partielle attend la suite)"""
+        lines = (self._pending + markdown).split("\n")
+        self._pending = lines.pop()
+        out = []
+        for line in lines:
+            out.extend(self._line(line))
+        return "\n".join(out) + "\n" if out else ""
+
+    def finish(self) -> str:
+        out = self._line(self._pending) if self._pending else []
+        self._pending = ""
+        out.extend(self._close())
+        return "\n".join(out) + "\n</body></html>\n"
+
+
+def markdown_to_html(sections: Iterable[str], title: str = "Rapport") -> Iterator[str]:
+    converter = MarkdownHtml(title)
+    yield converter.start()
+    for markdown in sections:
+        chunk = converter.feed(markdown)
+        if chunk:
+            yield chunk
+    yield converter.finish()
+
+
+# ----------------------------------------------------------------------
+# Markdown -> PDF texte (A4, Helvetica, pages émises au fil de l'eau)
+# ----------------------------------------------------------------------
+
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+MARGIN = 50
+FONT_SIZE = 10
+LEADING = 13
+LINE_CHARS = 95
+LINES_PER_PAGE = (PAGE_HEIGHT - 2 * MARGIN) // LEADING
+
+_MARKUP = re.compile(r"\*\*|(?<!\w)\*(?=\S)|(?<=\S)\*(?!\w)")
+
+
+def _pdf_text(text: str) -> bytes:
+    """Chaîne PDF (WinAnsi): caractères hors cp1252 (emojis) retirés"""
+    raw = text.encode("cp1252", errors="ignore")
+    return raw.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)")
+
+
+def _wrap(text: str, width: int = LINE_CHARS) -> List[str]:
+    lines, current = [], ""
+    for word in text.split(" "):
+        if current and len(current) + 1 + len(word) > width:
+            lines.append(current)
+            current = word
+        else:
+            current = f"{current} {word}" if current else word
+    lines.append(current)
+    return lines
+
+
+class PdfWriter:
+    """PDF 1.4 écrit objet par objet; xref construite à partir des tailles émises"""
+
+    def __init__(self, title: str = "Rapport"):
+        self.title = title
+        self.offsets: Dict[int, int] = {}
+        self.position = 0
+        self.pages: List[int] = []
+        self.next_id = 5  # 1 catalogue, 2 arbre des pages, 3-4 polices
+        self._lines: List[Tuple[bool, str]] = []
+        self._pending = ""
+
+    def _emit(self, data: bytes) -> bytes:
+        self.position += len(data)
+        return data
+
+    def _object(self, obj_id: int, body: bytes) -> bytes:
+        self.offsets[obj_id] = self.position
+        return self._emit(b"%d 0 obj\n" % obj_id + body + b"\nendobj\n")
+
+    def start(self) -> bytes:
+        out = self._emit(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        out += self._object(3, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+        out += self._object(4, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>")
+        return out
+
+    def _page(self, lines: List[Tuple[bool, str]]) -> bytes:
+        ops = [b"BT", b"%d TL" % LEADING, b"%d %d Td" % (MARGIN, PAGE_HEIGHT - MARGIN)]
+        font = None
+        for bold, text in lines:
+            if bold != font:
+                ops.append(b"/F%d %d Tf" % (2 if bold else 1, FONT_SIZE))
+                font = bold
+            ops.append(b"(" + _pdf_text(text) + b") Tj T*")
+        ops.append(b"ET")
+        stream = b"\n".join(ops)
+        content_id, page_id = self.next_id, self.next_id + 1
+        self.next_id += 2
+        self.pages.append(page_id)
+        out = self._object(content_id, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        out += self._object(
+            page_id,
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %d %d] "
+            b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents %d 0 R >>"
+            % (PAGE_WIDTH, PAGE_HEIGHT, content_id)
+        )
+        return out
+
+    def _layout(self, line: str):
+        stripped = line.strip()
+        if stripped == "---" or _TABLE_SEPARATOR.match(stripped):
+            self._lines.append((False, ""))
+            return
+        heading = _HEADING.match(stripped)
+        bold = heading is not None
+        text = _MARKUP.sub("", heading.group(2) if heading else line.rstrip())
+        indent = len(text) - len(text.lstrip())
+        for wrapped in _wrap(text.strip(), LINE_CHARS - indent):
+            self._lines.append((bold, " " * indent + wrapped))
+
+    def feed(self, markdown: str) -> bytes:
+        """Pages complètes prêtes à être envoyées"""
+        lines = (self._pending + markdown).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._layout(line)
+        out = b""
+        while len(self._lines) >= LINES_PER_PAGE:
+            out += self._page(self._lines[:LINES_PER_PAGE])
+            del self._lines[:LINES_PER_PAGE]
+        return out
+
+    def finish(self) -> bytes:
+        if self._pending:
+            self._layout(self._pending)
+            self._pending = ""
+        out = b""
+        if self._lines or not self.pages:
+            out += self._page(self._lines)
+            self._lines = []
+        kids = b" ".join(b"%d 0 R" % page for page in self.pages)
+        out += self._object(2, b"<< /Type /Pages /Kids [%s] /Count %d >>" % (kids, len(self.pages)))
+        out += self._object(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        info_id = self.next_id
+        out += self._object(info_id, b"<< /Title (" + _pdf_text(self.title) + b") /Producer (Universal API) >>")
+
+        xref_at = self.position
+        xref = [b"xref", b"0 %d" % (info_id + 1), b"0000000000 65535 f "]
+        xref += [b"%010d 00000 n " % self.offsets[i] for i in range(1, info_id + 1)]
+        out += self._emit(
+            b"\n".join(xref)
+            + b"\ntrailer\n<< /Size %d /Root 1 0 R /Info %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (info_id + 1, info_id, xref_at)
+        )
+        return out
+
+
+def markdown_to_pdf(sections: Iterable[str], title: str = "Rapport") -> Iterator[bytes]:
+    writer = PdfWriter(title)
+    yield writer.start()
+    for markdown in sections:
+        chunk = writer.feed(markdown)
+        if chunk:
+            yield chunk
+    yield writer.finish()
+
+
+def render_markdown(sections: Iterable[str], fmt: str = "markdown", title: str = "Rapport") -> Iterator[Any]:
+    """Flux Markdown -> flux au format demandé (str pour markdown/html, bytes pour pdf)"""
+    if fmt == "html":
+        return markdown_to_html(sections, title)
+    if fmt == "pdf":
+        return markdown_to_pdf(sections, title)
+    return iter(sections)
@@ -1,46 +1,215 @@
 """
 Search History Service - Track and manage user search history
+Stockage SQLite (WAL) en ajout seul :
+- une recherche = un INSERT (plus de réécriture complète du fichier JSON)
+- index global de récence = clé séquentielle (seq), index (user_id, seq) par utilisateur
+- compteurs de popularité maintenus à l'insertion (table query_counts indexée
+  par count): le top-k ne parcourt plus tout l'historique
+- totaux globaux maintenus dans history_totals
+
+L'ancien fichier data/search_history.json est importé au premier démarrage.
 """
 import json
 import os
+import sqlite3
+import threading
 import time
-from typing import Dict, Any, List, Optional
-from collections import defaultdict
+from typing import AsyncIterator, Dict, Any, List, Optional
 from datetime import datetime
 
+from services.export_stream import iter_sqlite_rows
+from services.provider_registry import provider_registry
+
+# Type "toutes catégories" des compteurs de popularité
+ALL_TYPES = "*"
+
+
 class SearchHistoryService:
     """Service for managing search history"""
-    
-    def __init__(self, storage_path: str = "data/search_history.json"):
-        self.storage_path = storage_path
-        self.history: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
+
+    def __init__(self, db_path: str = "data/search_history.db", legacy_path: str = "data/search_history.json"):
+        self.db_path = db_path
+        self.legacy_path = legacy_path
         self.max_history_per_user = 100
+        self._lock = threading.Lock()
         self._ensure_storage()
-        self._load_history()
+        self._conn = self._connect()
+        self._init_database()
+        self._migrate_legacy_json()
         print("[OK] Search History Service initialized")
-    
+
     def _ensure_storage(self):
         """Ensure storage directory exists"""
-        os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
-    
-    def _load_history(self):
-        """Load history from file"""
-        try:
-            if os.path.exists(self.storage_path):
-                with open(self.storage_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                    self.history = defaultdict(list, data)
-        except Exception as e:
-            print(f"[WARN] Could not load search history: {e}")
-    
-    def _save_history(self):
-        """Save history to file"""
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        """Connexion persistante en mode WAL (écritures en ajout, lectures concurrentes)"""
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _init_database(self):
+        """Tables et index"""
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS searches (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    id TEXT NOT NULL,
+                    user_id TEXT NOT NULL,
+                    query TEXT NOT NULL,
+                    query_norm TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    results_count INTEGER DEFAULT 0,
+                    timestamp TEXT NOT NULL,
+                    metadata TEXT
+                );
+                CREATE INDEX IF NOT EXISTS idx_searches_user ON searches(user_id, seq);
+                CREATE INDEX IF NOT EXISTS idx_searches_user_type ON searches(user_id, type, seq);
+                CREATE INDEX IF NOT EXISTS idx_searches_id ON searches(user_id, id);
+
+                CREATE TABLE IF NOT EXISTS query_counts (
+                    query_norm TEXT NOT NULL,
+                    type TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (query_norm, type)
+                );
+                CREATE INDEX IF NOT EXISTS idx_query_counts_top ON query_counts(type, count);
+
+                CREATE TABLE IF NOT EXISTS user_counts (
+                    user_id TEXT PRIMARY KEY,
+                    searches INTEGER NOT NULL
+                );
+
+                CREATE TABLE IF NOT EXISTS history_totals (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    users INTEGER NOT NULL,
+                    searches INTEGER NOT NULL
+                );
+                INSERT OR IGNORE INTO history_totals (id, users, searches) VALUES (1, 0, 0);
+            """)
+
+    def _migrate_legacy_json(self):
+        """Importer l'ancien historique JSON (une seule fois)"""
+        if not self.legacy_path or not os.path.exists(self.legacy_path):
+            return
         try:
-            with open(self.storage_path, 'w', encoding='utf-8') as f:
-                json.dump(dict(self.history), f, ensure_ascii=False, indent=2)
+            with open(self.legacy_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            for user_id, entries in data.items():
+                # Fichier: plus récent en premier -> insertion du plus ancien au plus récent
+                for entry in reversed(entries):
+                    self._insert(
+                        user_id,
+                        entry.get("query", ""),
+                        entry.get("type", "general"),
+                        entry.get("results_count", 0),
+                        entry.get("metadata") or {},
+                        entry_id=entry.get("id"),
+                        timestamp=entry.get("timestamp"),
+                    )
+            os.replace(self.legacy_path, f"{self.legacy_path}.migrated")
+            print(f"[OK] Search history migrated from {self.legacy_path}")
         except Exception as e:
-            print(f"[WARN] Could not save search history: {e}")
-    
+            print(f"[WARN] Could not migrate search history: {e}")
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+
+    def _bump_counts(self, query_norm: str, search_type: str, delta: int):
+        for type_key in (search_type, ALL_TYPES):
+            self._conn.execute(
+                """INSERT INTO query_counts (query_norm, type, count) VALUES (?, ?, ?)
+                   ON CONFLICT(query_norm, type) DO UPDATE SET count = count + excluded.count""",
+                (query_norm, type_key, delta),
+            )
+        if delta < 0:
+            self._conn.execute("DELETE FROM query_counts WHERE query_norm = ? AND count <= 0", (query_norm,))
+
+    def _bump_user(self, user_id: str, delta: int):
+        """Compteur par utilisateur + totaux globaux"""
+        row = self._conn.execute("SELECT searches FROM user_counts WHERE user_id = ?", (user_id,)).fetchone()
+        before = row["searches"] if row else 0
+        after = max(before + delta, 0)
+        if after:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO user_counts (user_id, searches) VALUES (?, ?)", (user_id, after)
+            )
+        else:
+            self._conn.execute("DELETE FROM user_counts WHERE user_id = ?", (user_id,))
+        users_delta = (1 if after and not before else 0) - (1 if before and not after else 0)
+        self._conn.execute(
+            "UPDATE history_totals SET users = users + ?, searches = searches + ? WHERE id = 1",
+            (users_delta, after - before),
+        )
+        return after
+
+    def _next_id(self, user_id: str) -> str:
+        """
+        Id "<user>_<ms>" strictement croissant par utilisateur, dérivé du dernier
+        id en base (appelé dans la transaction d'écriture: unique entre processus
+        et après redémarrage, même dans la même milliseconde)
+        """
+        row = self._conn.execute(
+            "SELECT id FROM searches WHERE user_id = ? ORDER BY seq DESC LIMIT 1", (user_id,)
+        ).fetchone()
+        last_ms = 0
+        if row:
+            try:
+                last_ms = int(row["id"].rsplit("_", 1)[-1])
+            except ValueError:
+                pass
+        return f"{user_id}_{max(int(time.time() * 1000), last_ms + 1)}"
+
+    def _insert(
+        self,
+        user_id: str,
+        query: str,
+        search_type: str,
+        results_count: int,
+        metadata: Dict[str, Any],
+        entry_id: Optional[str] = None,
+        timestamp: Optional[str] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Insérer une entrée (None si `entry_id` existe déjà pour cet utilisateur)"""
+        entry = {
+            "id": entry_id,
+            "query": query,
+            "type": search_type,
+            "results_count": results_count,
+            "timestamp": timestamp or datetime.utcnow().isoformat(),
+            "metadata": metadata
+        }
+        with self._lock, self._conn:
+            # Verrou d'écriture pris avant de lire le dernier id (autres processus compris)
+            self._conn.execute("BEGIN IMMEDIATE")
+            entry["id"] = entry["id"] or self._next_id(user_id)
+            # INSERT OR IGNORE sur la clé naturelle (user_id, id): import rejouable
+            cursor = self._conn.execute(
+                """INSERT INTO searches (id, user_id, query, query_norm, type, results_count, timestamp, metadata)
+                   SELECT ?, ?, ?, ?, ?, ?, ?, ?
+                   WHERE NOT EXISTS (SELECT 1 FROM searches WHERE user_id = ? AND id = ?)""",
+                (entry["id"], user_id, query, query.lower(), search_type, results_count,
+                 entry["timestamp"], json.dumps(metadata, ensure_ascii=False), user_id, entry["id"]),
+            )
+            if not cursor.rowcount:
+                return None
+            self._bump_counts(query.lower(), search_type, 1)
+            retained = self._bump_user(user_id, 1)
+
+            # Trim to max history (les compteurs de popularité gardent l'historique complet)
+            if retained > self.max_history_per_user:
+                cursor = self._conn.execute(
+                    """DELETE FROM searches WHERE user_id = ? AND seq <= (
+                           SELECT seq FROM searches WHERE user_id = ?
+                           ORDER BY seq DESC LIMIT 1 OFFSET ?)""",
+                    (user_id, user_id, self.max_history_per_user),
+                )
+                self._bump_user(user_id, -cursor.rowcount)
+        return entry
+
     def add_search(
         self,
         user_id: str,
@@ -50,27 +219,26 @@ class SearchHistoryService:
         metadata: Optional[Dict[str, Any]] = None
     ) -> Dict[str, Any]:
         """Add a search to history"""
+        return self._insert(user_id, query, search_type, results_count, metadata or {})
+
+    # ------------------------------------------------------------------
+    # Lecture
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _row_to_entry(row: sqlite3.Row, with_user: bool = False) -> Dict[str, Any]:
         entry = {
-            "id": f"{user_id}_{int(time.time() * 1000)}",
-            "query": query,
-            "type": search_type,
-            "results_count": results_count,
-            "timestamp": datetime.utcnow().isoformat(),
-            "metadata": metadata or {}
+            "id": row["id"],
+            "query": row["query"],
+            "type": row["type"],
+            "results_count": row["results_count"],
+            "timestamp": row["timestamp"],
+            "metadata": json.loads(row["metadata"]) if row["metadata"] else {}
         }
-        
-        # Add to history
-        self.history[user_id].insert(0, entry)
-        
-        # Trim to max history
-        if len(self.history[user_id]) > self.max_history_per_user:
-            self.history[user_id] = self.history[user_id][:self.max_history_per_user]
-        
-        # Save
-        self._save_history()
-        
+        if with_user:
+            entry["user_id"] = row["user_id"]
         return entry
-    
+
     def get_history(
         self,
         user_id: str,
@@ -78,100 +246,114 @@ class SearchHistoryService:
         search_type: Optional[str] = None
     ) -> List[Dict[str, Any]]:
         """Get search history for a user"""
-        history = self.history.get(user_id, [])
-        
-        if search_type:
-            history = [h for h in history if h.get("type") == search_type]
-        
-        return history[:limit]
-    
+        with self._lock:
+            if search_type:
+                rows = self._conn.execute(
+                    "SELECT * FROM searches WHERE user_id = ? AND type = ? ORDER BY seq DESC LIMIT ?",
+                    (user_id, search_type, limit),
+                ).fetchall()
+            else:
+                rows = self._conn.execute(
+                    "SELECT * FROM searches WHERE user_id = ? ORDER BY seq DESC LIMIT ?",
+                    (user_id, limit),
+                ).fetchall()
+        return [self._row_to_entry(row) for row in rows]
+
     def get_popular_searches(
         self,
         limit: int = 10,
         search_type: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Get most popular searches across all users"""
-        query_counts: Dict[str, int] = defaultdict(int)
-        
-        for user_history in self.history.values():
-            for entry in user_history:
-                if search_type and entry.get("type") != search_type:
-                    continue
-                query_counts[entry["query"].lower()] += 1
-        
-        # Sort by count
-        sorted_queries = sorted(
-            query_counts.items(),
-            key=lambda x: x[1],
-            reverse=True
-        )[:limit]
-        
+        """Get most popular searches across all users (compteurs incrémentaux)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT query_norm, count FROM query_counts WHERE type = ? ORDER BY count DESC LIMIT ?",
+                (search_type or ALL_TYPES, limit),
+            ).fetchall()
         return [
-            {"query": q, "count": c}
-            for q, c in sorted_queries
+            {"query": row["query_norm"], "count": row["count"]}
+            for row in rows
         ]
-    
+
     def get_recent_searches(
         self,
         limit: int = 20
     ) -> List[Dict[str, Any]]:
-        """Get most recent searches across all users"""
-        all_searches = []
-        for user_id, user_history in self.history.items():
-            for entry in user_history:
-                entry_copy = entry.copy()
-                entry_copy["user_id"] = user_id
-                all_searches.append(entry_copy)
-        
-        # Sort by timestamp
-        all_searches.sort(key=lambda x: x.get("timestamp", ""), reverse=True)
-        
-        return all_searches[:limit]
-    
+        """Get most recent searches across all users (index de récence global)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT * FROM searches ORDER BY seq DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self._row_to_entry(row, with_user=True) for row in rows]
+
+    def iter_searches(
+        self,
+        user_id: str,
+        search_type: Optional[str] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """Historique complet d'un utilisateur en flux (export), du plus ancien au plus récent"""
+        where, params = "user_id = ? AND ", [user_id]
+        if search_type:
+            where += "type = ? AND "
+            params.append(search_type)
+        return iter_sqlite_rows(
+            lambda: sqlite3.connect(self.db_path),
+            f"SELECT seq, id, user_id, query, type, results_count, timestamp, metadata "
+            f"FROM searches WHERE {where}{{after}} ORDER BY seq",
+            params,
+            key="seq",
+        )
+
+    # ------------------------------------------------------------------
+    # Suppression
+    # ------------------------------------------------------------------
+
+    def _delete_where(self, where: str, params: tuple) -> int:
+        """Supprimer des entrées et décrémenter compteurs de popularité et totaux"""
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                f"SELECT user_id, query_norm, type FROM searches WHERE {where}", params
+            ).fetchall()
+            if not rows:
+                return 0
+            self._conn.execute(f"DELETE FROM searches WHERE {where}", params)
+            for row in rows:
+                self._bump_counts(row["query_norm"], row["type"], -1)
+            self._bump_user(rows[0]["user_id"], -len(rows))
+            return len(rows)
+
     def delete_search(self, user_id: str, search_id: str) -> bool:
         """Delete a specific search from history"""
-        if user_id not in self.history:
-            return False
-        
-        original_len = len(self.history[user_id])
-        self.history[user_id] = [
-            h for h in self.history[user_id]
-            if h.get("id") != search_id
-        ]
-        
-        if len(self.history[user_id]) < original_len:
-            self._save_history()
-            return True
-        return False
-    
+        return self._delete_where("user_id = ? AND id = ?", (user_id, search_id)) > 0
+
     def clear_history(self, user_id: str) -> bool:
         """Clear all history for a user"""
-        if user_id in self.history:
-            del self.history[user_id]
-            self._save_history()
-            return True
-        return False
-    
+        return self._delete_where("user_id = ?", (user_id,)) > 0
+
     def get_stats(self, user_id: Optional[str] = None) -> Dict[str, Any]:
         """Get search statistics"""
-        if user_id:
-            user_history = self.history.get(user_id, [])
-            search_types = defaultdict(int)
-            for entry in user_history:
-                search_types[entry.get("type", "general")] += 1
-            
-            return {
-                "user_id": user_id,
-                "total_searches": len(user_history),
-                "search_types": dict(search_types),
-                "first_search": user_history[-1]["timestamp"] if user_history else None,
-                "last_search": user_history[0]["timestamp"] if user_history else None
-            }
-        
-        # Global stats
-        total_searches = sum(len(h) for h in self.history.values())
-        total_users = len(self.history)
-        
+        with self._lock:
+            if user_id:
+                row = self._conn.execute(
+                    "SELECT COUNT(*) AS total, MIN(timestamp) AS first, MAX(timestamp) AS last "
+                    "FROM searches WHERE user_id = ?",
+                    (user_id,),
+                ).fetchone()
+                types = self._conn.execute(
+                    "SELECT type, COUNT(*) AS n FROM searches WHERE user_id = ? GROUP BY type", (user_id,)
+                ).fetchall()
+                return {
+                    "user_id": user_id,
+                    "total_searches": row["total"],
+                    "search_types": {t["type"]: t["n"] for t in types},
+                    "first_search": row["first"],
+                    "last_search": row["last"]
+                }
+
+            # Global stats (totaux maintenus à l'écriture)
+            totals = self._conn.execute("SELECT users, searches FROM history_totals WHERE id = 1").fetchone()
+        total_users, total_searches = totals["users"], totals["searches"]
+
         return {
             "total_users": total_users,
             "total_searches": total_searches,
@@ -179,11 +361,5 @@ class SearchHistoryService:
         }
 
 
-# Singleton instance
-search_history_service = SearchHistoryService()
-
-
-
-
-
-
+# Singleton instance (créé au premier usage ou au warm-up)
+search_history_service = provider_registry.register("search_history", SearchHistoryService)
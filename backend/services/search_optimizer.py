@@ -8,6 +8,7 @@ from enum import Enum
 import hashlib
 import json
 from services.cache import cache_service
+from services.api_planner import api_planner
 
 
 class APICategory(Enum):
@@ -96,7 +97,7 @@ class SearchOptimizer:
     def __init__(self):
         self.api_groups = self._initialize_api_groups()
         self.category_keywords = self._initialize_category_keywords()
-        self.api_performance = {}  # Cache des performances par API
+        self.api_performance = api_planner.stats  # Performances observées par API
         
     def _initialize_api_groups(self) -> Dict[APICategory, APIGroup]:
         """Initialise les groupes d'APIs avec stratégie d'optimisation"""
@@ -369,24 +370,15 @@ class SearchOptimizer:
         return f"search_opt:{hashlib.md5(cache_str.encode()).hexdigest()}"
     
     def _estimate_execution_time(self, api_groups: List[APIGroup]) -> float:
-        """Estime le temps d'exécution en millisecondes"""
+        """Estime le temps d'exécution en millisecondes (latences p50 observées, 200ms sinon)"""
         if not api_groups:
             return 0.0
         
-        # Temps de base par groupe
-        base_time_per_group = 200  # 200ms par groupe
-        
-        # Si exécution parallèle, prendre le maximum
-        if all(group.parallel_execution for group in api_groups):
-            return base_time_per_group * len(api_groups)
-        
-        # Sinon, additionner les temps
-        total_time = 0
+        total_time = 0.0
         for group in api_groups:
-            if group.parallel_execution:
-                total_time += base_time_per_group
-            else:
-                total_time += base_time_per_group * len(group.priority_order)
+            latencies = [api_planner.expected_latency_ms(api) for api in group.priority_order] or [api_planner.default_latency_ms]
+            # Parallèle: la plus lente du groupe; séquentiel: somme des fallbacks
+            total_time += max(latencies) if group.parallel_execution else sum(latencies)
         
         return total_time
     
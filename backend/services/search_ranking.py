@@ -0,0 +1,146 @@
+"""
+Search Ranking - Classement des résultats de la recherche universelle
+Étape de classement unique par requête :
+- la requête est tokenisée une seule fois et les intentions calculées une fois
+- le contenu de chaque résultat est sérialisé puis tokenisé une fois; les
+  fréquences comptent des tokens entiers ("art" ne compte pas dans "article")
+- scoring BM25F en lot sur les champs titre et contenu (matrices NumPy
+  documents x termes)
+- fusion inter-catégories par tas (top-k)
+
+Configuration:
+    SEARCH_CRYPTO_PRICE_PRIOR=0.9   # Score a priori du résultat prix crypto
+
+Usage:
+    ctx = QueryContext.build(query, detect_search_intent(query))
+    rank_category(ctx, "finance", results)           # tri + relevance_score
+    top = merge_top_k(results_by_category, k=10)
+"""
+import heapq
+import json
+import os
+import re
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# Paramètres BM25 et poids des champs (BM25F simplifié)
+K1 = 1.2
+B = 0.75
+FIELD_WEIGHTS = {"title": 2.0, "content": 1.0}
+
+# Mélange final: pertinence textuelle, score a priori de la source, intention
+TEXT_WEIGHT = 0.5
+PRIOR_WEIGHT = 0.5
+INTENT_BONUS = 0.1
+
+# Score a priori fixé par la source pour le prix d'une crypto (CoinGecko / CoinCap)
+CRYPTO_PRICE_PRIOR = float(os.getenv("SEARCH_CRYPTO_PRICE_PRIOR", 0.9))
+
+
+# Encodeur réutilisé (json.dumps avec options en recrée un à chaque appel)
+_ENCODER = json.JSONEncoder(ensure_ascii=False, default=str)
+
+
+def tokenize(text: str) -> List[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+def content_text(content: Any) -> str:
+    """Texte d'un contenu JSON (sérialisé une seule fois, en C), en minuscules"""
+    if content is None:
+        return ""
+    if isinstance(content, str):
+        return content.lower()
+    return _ENCODER.encode(content).lower()
+
+
+class QueryContext:
+    """Requête préparée une fois: termes uniques, motif de recherche des termes et intentions"""
+
+    __slots__ = ("query", "terms", "intents", "pattern")
+
+    def __init__(self, query: str, terms: List[str], intents: Dict[str, bool]):
+        self.query = query
+        self.terms = terms
+        self.intents = intents
+        # Termes en tokens entiers (mêmes frontières \w que tokenize), un seul passage par champ.
+        # Le motif commence par les littéraux (recherche rapide par préfixe); la frontière
+        # gauche est vérifiée par un lookbehind de largeur fixe propre à chaque terme.
+        self.pattern = re.compile("(?:%s)\\b" % "|".join(
+            f"{re.escape(term)}(?<!\\w{re.escape(term)})" for term in terms
+        )) if terms else None
+
+    @classmethod
+    def build(cls, query: str, intents: Optional[Dict[str, bool]] = None) -> "QueryContext":
+        # Mots de 1-2 lettres ("du", "et", "à") ignorés: ils matchent partout
+        terms = [t for t in dict.fromkeys(tokenize(query)) if len(t) > 2 or t.isdigit()]
+        return cls(query, terms, intents or {})
+
+    def has_intent(self, category: str) -> bool:
+        # "geocoding" est la catégorie de résultat de l'intention "location"
+        if category == "geocoding":
+            return self.intents.get("location", False) or self.intents.get("geocoding", False)
+        return self.intents.get(category, False)
+
+
+def _field_matrix(ctx: QueryContext, texts: Sequence[str]):
+    """Fréquences [doc, terme] des termes de la requête (tokens entiers) et longueur de chaque champ"""
+    tf = np.zeros((len(texts), len(ctx.terms)))
+    for i, text in enumerate(texts):
+        matches = ctx.pattern.findall(text)
+        if matches:
+            tf[i] = [matches.count(term) for term in ctx.terms]
+    return tf, np.fromiter(map(len, texts), dtype=float, count=len(texts))
+
+
+def bm25_scores(ctx: QueryContext, titles: Sequence[str], contents: Sequence[str]) -> List[float]:
+    """
+    Scores BM25F d'un lot de documents (textes en minuscules)
+    IDF calculé sur le lot, longueur des champs en caractères
+    """
+    n_docs = len(titles)
+    if not n_docs or not ctx.terms:
+        return [0.0] * n_docs
+
+    title_tf, title_len = _field_matrix(ctx, titles)
+    content_tf, content_len = _field_matrix(ctx, contents)
+
+    df = np.count_nonzero(title_tf + content_tf, axis=0)
+    idf = np.log1p((n_docs - df + 0.5) / (df + 0.5))
+
+    # Fréquence pondérée par champ et normalisée par longueur
+    k_title = FIELD_WEIGHTS["title"] / (1 - B + B * title_len / (title_len.mean() or 1.0))
+    k_content = FIELD_WEIGHTS["content"] / (1 - B + B * content_len / (content_len.mean() or 1.0))
+    tf = k_title[:, None] * title_tf + k_content[:, None] * content_tf
+    return (idf * tf * (K1 + 1) / (tf + K1)).sum(axis=1).tolist()
+
+
+def rank_category(ctx: QueryContext, category: str, results: List[Any], top_k: Optional[int] = None) -> List[Any]:
+    """
+    Scorer un lot de SearchResult d'une catégorie et les trier
+    Le score a priori fixé par la source (relevance_score) est conservé dans le mélange.
+    """
+    if not results:
+        return results
+    titles = [(r.title or "").lower() for r in results]
+    contents = [content_text(r.content) for r in results]
+    raw = bm25_scores(ctx, titles, contents)
+    best = max(raw) or 1.0
+    bonus = INTENT_BONUS if ctx.has_intent(category) else 0.0
+    for result, text_score in zip(results, raw):
+        score = TEXT_WEIGHT * (text_score / best) + PRIOR_WEIGHT * result.relevance_score + bonus
+        result.relevance_score = round(min(score, 1.0), 4)
+    results.sort(key=lambda r: r.relevance_score, reverse=True)
+    return results[:top_k] if top_k else results
+
+
+def merge_top_k(results_by_category: Dict[str, List[Any]], k: int) -> List[Any]:
+    """Meilleurs résultats toutes catégories confondues (tas de taille k)"""
+    return heapq.nlargest(
+        k,
+        (r for results in results_by_category.values() for r in results),
+        key=lambda r: r.relevance_score,
+    )
@@ -0,0 +1,302 @@
+"""
+Semantic Cache - Réponses IA par similarité de question
+Complète le cache exact (services/cache) : une question reformulée
+("symptômes de la grippe ?" / "quels sont les symptômes de la grippe") retrouve
+la réponse déjà générée au lieu de relancer un appel LLM.
+
+- Embedding local et gratuit: hashing vectorizer (mots normalisés et bigrammes,
+  sans stopwords FR/EN, vecteur creux normalisé L2)
+- Garde-fou: nombres et négation identiques exigés pour un hit
+  ("diabète de type 1" != "type 2", "je ne peux pas" != "je peux")
+- Un index en mémoire par namespace (expert) et scope (langue, mode), index inversé
+  feature -> entrées pour ne scorer que les candidats
+- Seuil cosinus, TTL et éviction LRU
+- Catégories sensibles au temps exclues (finance, news, weather), réponses
+  médicales (health) jamais partagées par similarité, ainsi que les questions volatiles de tout namespace (prix, "aujourd'hui", météo, actualités)
+
+Activation (opt-in):
+    SEMANTIC_CACHE_ENABLED=true
+    SEMANTIC_CACHE_THRESHOLD=0.85
+    SEMANTIC_CACHE_TTL=3600
+    SEMANTIC_CACHE_MAX_ENTRIES=500
+"""
+import math
+import os
+import re
+import time
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from services.tracing import span
+
+# Données qui périment en minutes, ou réponses médicales (une nuance change la
+# réponse): jamais servies par similarité
+EXCLUDED_NAMESPACES = {"finance", "news", "weather", "health"}
+
+# Questions dont la réponse périme en minutes, quel que soit le namespace
+# (termes normalisés: minuscules, sans accents)
+VOLATILE_TERMS = {
+    "prix", "price", "prices", "cours", "cotation", "bourse", "taux", "rate", "bitcoin", "btc",
+    "aujourd", "today", "tonight", "maintenant", "now", "actuel", "actuelle", "actuellement",
+    "current", "currently", "demain", "tomorrow", "hier", "yesterday", "soir", "live", "direct",
+    "meteo", "weather", "temperature", "pluie", "rain", "forecast", "previsions",
+    "news", "actualite", "actualites", "actu", "nouvelles", "latest", "dernier", "derniere",
+    "dernieres", "derniers", "recent", "recente", "score", "election", "elections",
+}
+
+STOPWORDS = {
+    # Français
+    "le", "la", "les", "l", "un", "une", "des", "du", "de", "d", "au", "aux", "et", "ou", "a",
+    "est", "sont", "quel", "quelle", "quels", "quelles", "que", "qu", "qui", "quoi", "comment",
+    "pourquoi", "ce", "c", "cet", "cette", "ces", "en", "dans", "sur", "pour", "par", "avec",
+    "je", "j", "tu", "il", "elle", "on", "nous", "vous", "ils", "elles", "me", "m", "te", "t",
+    "se", "s", "mon", "ma", "mes", "ton", "ta", "tes", "son", "sa", "ses", "y",
+    "peux", "peut", "moi", "dis", "donne", "svp", "stp", "merci", "bonjour", "est-ce", "ca",
+    # English
+    "the", "an", "of", "to", "in", "on", "for", "with", "is", "are", "was", "what", "which",
+    "who", "how", "why", "do", "does", "can", "could", "i", "you", "me", "my", "your", "it",
+    "this", "that", "please", "tell", "about", "be", "and", "or", "hi", "hello", "thanks",
+    "should", "would", "there", "some", "any",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_NUMBER_RE = re.compile(r"\d+")
+# Négations FR/EN (texte normalisé: "n'", "don't" inclus)
+_NEGATION_RE = re.compile(
+    r"\b(?:ne|n|pas|non|sans|jamais|aucun|aucune|rien|not|no|never|without|nor)\b|n't\b"
+)
+
+
+def _normalize(text: str) -> str:
+    """Minuscules sans accents"""
+    text = unicodedata.normalize("NFKD", text.lower())
+    return "".join(c for c in text if not unicodedata.combining(c))
+
+
+def _stem(token: str) -> str:
+    """Racinisation minimale: pluriels FR/EN"""
+    if len(token) > 3 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+class HashingEmbedder:
+    """Vectorisation par hachage (pas de vocabulaire, pas de modèle)"""
+
+    def __init__(self, dim: int = 2 ** 18):
+        self.dim = dim
+
+    def tokens(self, text: str) -> List[str]:
+        return [_stem(t) for t in _TOKEN_RE.findall(_normalize(text)) if t not in STOPWORDS]
+
+    def features(self, text: str) -> List[str]:
+        """Mots + bigrammes de mots (l'ordre compte: "type 1" != "1 type")"""
+        tokens = self.tokens(text)
+        return tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+
+    def embed(self, text: str) -> Dict[int, float]:
+        """Vecteur creux {feature: poids} normalisé L2"""
+        counts: Dict[int, float] = {}
+        for token in self.features(text):
+            feature = zlib.crc32(token.encode()) % self.dim
+            counts[feature] = counts.get(feature, 0.0) + 1.0
+        norm = math.sqrt(sum(w * w for w in counts.values()))
+        if not norm:
+            return {}
+        return {f: w / norm for f, w in counts.items()}
+
+
+def guard_key(text: str) -> Tuple[frozenset, bool]:
+    """Nombres et polarité de la question: doivent être identiques pour un hit"""
+    normalized = _normalize(text)
+    return frozenset(_NUMBER_RE.findall(normalized)), _NEGATION_RE.search(normalized) is not None
+
+
+def is_volatile(text: str) -> bool:
+    """Question sensible au temps (prix, "aujourd'hui", météo, actualités)"""
+    return not VOLATILE_TERMS.isdisjoint(_TOKEN_RE.findall(_normalize(text)))
+
+
+def cosine(a: Dict[int, float], b: Dict[int, float]) -> float:
+    """Produit scalaire de deux vecteurs normalisés"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(w * b.get(f, 0.0) for f, w in a.items())
+
+
+class _Entry:
+    __slots__ = ("vector", "value", "expires_at", "text", "guard")
+
+    def __init__(self, vector: Dict[int, float], value: Any, expires_at: float, text: str, guard: Tuple = ()):
+        self.vector = vector
+        self.value = value
+        self.expires_at = expires_at
+        self.text = text
+        self.guard = guard
+
+
+class SemanticIndex:
+    """
+    Index d'un namespace: entrées LRU + index inversé feature -> ids
+    Seules les entrées partageant au moins un terme avec la question sont scorées.
+    """
+
+    def __init__(self, max_entries: int = 500):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._postings: Dict[int, Set[int]] = {}
+        self._next_id = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        for feature in entry.vector:
+            ids = self._postings.get(feature)
+            if ids is not None:
+                ids.discard(entry_id)
+                if not ids:
+                    del self._postings[feature]
+
+    def _candidates(self, vector: Dict[int, float]) -> Iterable[int]:
+        ids: Set[int] = set()
+        for feature in vector:
+            ids.update(self._postings.get(feature, ()))
+        return ids
+
+    def search(
+        self, vector: Dict[int, float], threshold: float, guard: Tuple = ()
+    ) -> Optional[Tuple[_Entry, float]]:
+        """Meilleure entrée au-dessus du seuil, de même garde-fou (expirées purgées au passage)"""
+        now = time.time()
+        best: Optional[Tuple[int, float]] = None
+        for entry_id in self._candidates(vector):
+            entry = self._entries[entry_id]
+            if entry.expires_at <= now:
+                self._remove(entry_id)
+                continue
+            if entry.guard != guard:
+                continue
+            score = cosine(vector, entry.vector)
+            if score >= threshold and (best is None or score > best[1]):
+                best = (entry_id, score)
+        if best is None:
+            return None
+        self._entries.move_to_end(best[0])
+        return self._entries[best[0]], best[1]
+
+    def add(self, vector: Dict[int, float], value: Any, ttl: int, text: str = "", guard: Tuple = ()):
+        while len(self._entries) >= self.max_entries:
+            self._remove(next(iter(self._entries)))
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = _Entry(vector, value, time.time() + ttl, text, guard)
+        for feature in vector:
+            self._postings.setdefault(feature, set()).add(entry_id)
+
+    def clear(self):
+        self._entries.clear()
+        self._postings.clear()
+
+
+class SemanticCache:
+    """Cache sémantique multi-namespace avec statistiques"""
+
+    def __init__(
+        self,
+        enabled: bool = False,
+        threshold: float = 0.85,
+        ttl: int = 3600,
+        max_entries: int = 500,
+        excluded: Optional[Set[str]] = None,
+    ):
+        self.enabled = enabled
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.excluded = set(EXCLUDED_NAMESPACES if excluded is None else excluded)
+        self.embedder = HashingEmbedder()
+        self._indexes: Dict[str, SemanticIndex] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def is_cacheable(self, namespace: str, text: str = "") -> bool:
+        return self.enabled and namespace not in self.excluded and not is_volatile(text)
+
+    def _key(self, namespace: str, scope: str) -> str:
+        return f"{namespace}:{scope}" if scope else namespace
+
+    def _count(self, namespace: str, field: str):
+        stats = self._stats.setdefault(namespace, {"lookups": 0, "hits": 0, "stores": 0})
+        stats[field] += 1
+
+    def get(self, namespace: str, text: str, scope: str = "") -> Optional[Dict[str, Any]]:
+        """
+        Chercher une réponse pour une question similaire
+        `scope` sépare les sous-index d'un namespace (langue, mode de recherche...)
+        Returns: {"value": ..., "similarity": float, "matched": str} ou None
+        """
+        if not self.is_cacheable(namespace, text):
+            return None
+        index = self._indexes.get(self._key(namespace, scope))
+        self._count(namespace, "lookups")
+        if index is None:
+            return None
+        with span("cache.semantic", namespace=namespace) as s:
+            vector = self.embedder.embed(text)
+            found = index.search(vector, self.threshold, guard_key(text)) if vector else None
+            s.set_attribute("cache.hit", found is not None)
+        if found is None:
+            return None
+        entry, score = found
+        self._count(namespace, "hits")
+        return {"value": entry.value, "similarity": round(score, 4), "matched": entry.text}
+
+    def set(self, namespace: str, text: str, value: Any, scope: str = "", ttl: Optional[int] = None):
+        """Indexer la réponse générée pour cette question"""
+        if not self.is_cacheable(namespace, text):
+            return
+        vector = self.embedder.embed(text)
+        if not vector:
+            return
+        key = self._key(namespace, scope)
+        index = self._indexes.get(key)
+        if index is None:
+            index = self._indexes[key] = SemanticIndex(self.max_entries)
+        index.add(vector, value, self.ttl if ttl is None else ttl, text[:200], guard_key(text))
+        self._count(namespace, "stores")
+
+    def clear(self):
+        self._indexes.clear()
+        self._stats.clear()
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = sum(s["lookups"] for s in self._stats.values())
+        hits = sum(s["hits"] for s in self._stats.values())
+        return {
+            "enabled": self.enabled,
+            "threshold": self.threshold,
+            "ttl": self.ttl,
+            "excluded": sorted(self.excluded),
+            "lookups": lookups,
+            "hits": hits,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "llm_calls_saved": hits,
+            "entries": sum(len(i) for i in self._indexes.values()),
+            "namespaces": {
+                ns: {**s, "hit_rate": round(s["hits"] / s["lookups"], 4) if s["lookups"] else 0.0}
+                for ns, s in self._stats.items()
+            },
+        }
+
+
+semantic_cache = SemanticCache(
+    enabled=os.getenv("SEMANTIC_CACHE_ENABLED", "false").lower() == "true",
+    threshold=float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.85")),
+    ttl=int(os.getenv("SEMANTIC_CACHE_TTL", "3600")),
+    max_entries=int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "500")),
+)
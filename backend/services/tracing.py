@@ -0,0 +1,308 @@
+"""
+Tracing - Spans légers par requête
+API de spans basée sur des ContextVar, corrélée au request ID
+(middleware/request_id). Les traces sont exportées au format OTLP/JSON
+(fichier JSON lines ou collector OTLP/HTTP) et résumées dans le header
+`Server-Timing` de la réponse.
+
+Usage:
+    from services.tracing import span, traced
+
+    async with span("context.fetch", expert=expert_id):
+        ...
+
+    with span("cache.get", prefix=prefix) as s:
+        s.set_attribute("cache.hit", True)
+
+    @traced("db.add_message")
+    def add_message(...): ...
+
+Configuration:
+    TRACING_ENABLED=false                # opt-in: spans + Server-Timing
+    TRACING_EXPORT=none|file|otlp
+    TRACING_FILE=./data/traces.jsonl
+    TRACING_OTLP_ENDPOINT=http://localhost:4318/v1/traces
+"""
+import asyncio
+import functools
+import hashlib
+import inspect
+import json
+import logging
+import os
+import time
+import uuid
+from contextvars import Context, ContextVar
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SERVICE_NAME = "universal-multi-api-backend"
+# Span racine ouvert par middleware/tracing (reporté dans `total` du Server-Timing)
+ROOT_SPAN_NAME = "request"
+
+
+class Span:
+    """Un span: nom, début/fin, attributs, statut"""
+
+    __slots__ = ("name", "span_id", "parent_id", "start_ns", "end_ns", "attributes", "error", "_token")
+
+    def __init__(self, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.name = name
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.start_ns = time.time_ns()
+        self.end_ns: Optional[int] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        self._token = None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns or time.time_ns()
+        return (end - self.start_ns) / 1_000_000
+
+    @property
+    def phase(self) -> str:
+        """Phase pour Server-Timing: 'cache.get' -> 'cache'"""
+        return self.name.split(".", 1)[0]
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+
+class Trace:
+    """Ensemble des spans d'une requête"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.trace_id = _trace_id_from_request_id(request_id)
+        self.spans: List[Span] = []
+
+
+def _trace_id_from_request_id(request_id: str) -> str:
+    """Trace ID OTLP (32 hex) dérivé du request ID"""
+    try:
+        return uuid.UUID(request_id).hex
+    except (ValueError, AttributeError, TypeError):
+        return hashlib.md5((request_id or uuid.uuid4().hex).encode()).hexdigest()
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+
+
+def is_enabled() -> bool:
+    return os.getenv("TRACING_ENABLED", "false").lower() == "true"
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+def start_trace(request_id: str) -> Optional[Trace]:
+    """Démarrer une trace pour la requête courante"""
+    trace = Trace(request_id)
+    _current_trace.set(trace)
+    _current_span.set(None)
+    return trace
+
+
+class span:
+    """
+    Context manager (sync et async) qui enregistre un span dans la trace courante.
+    Sans trace active (hors requête, tracing désactivé), c'est un no-op.
+    """
+
+    __slots__ = ("name", "attributes", "_span")
+
+    def __init__(self, name: str, **attributes: Any):
+        self.name = name
+        self.attributes = attributes
+        self._span: Optional[Span] = None
+
+    def __enter__(self) -> "Span":
+        trace = _current_trace.get()
+        if trace is None:
+            self._span = None
+            return _NOOP_SPAN
+        parent = _current_span.get()
+        s = Span(self.name, parent.span_id if parent else None, self.attributes)
+        s._token = _current_span.set(s)
+        trace.spans.append(s)
+        self._span = s
+        return s
+
+    def __exit__(self, exc_type, exc, tb):
+        s = self._span
+        if s is None:
+            return False
+        s.end_ns = time.time_ns()
+        if exc is not None:
+            s.error = f"{exc_type.__name__}: {str(exc)[:200]}"
+        try:
+            _current_span.reset(s._token)
+        except ValueError:
+            # Reset depuis un autre contexte (générateur async) - ignorer
+            pass
+        return False
+
+    async def __aenter__(self) -> "Span":
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+class _NoopSpan:
+    """Span factice quand aucune trace n'est active"""
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def traced(name: str):
+    """Décorateur: exécuter la fonction (sync ou async) dans un span"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        return sync_wrapper
+    return decorator
+
+
+# ============================================
+# SERVER-TIMING
+# ============================================
+
+def server_timing_header(trace: Trace, total_ms: float, top: int = 5) -> str:
+    """
+    Résumer les phases principales: `ai;dur=812.3;desc="2 spans", total;dur=950.1`
+    Les spans imbriqués dans une même phase ne sont comptés qu'une fois.
+    """
+    by_id = {s.span_id: s for s in trace.spans}
+    phases: Dict[str, List[float]] = {}
+    for s in trace.spans:
+        if s.name == ROOT_SPAN_NAME:
+            continue
+        parent = by_id.get(s.parent_id) if s.parent_id else None
+        if parent is not None and parent.phase == s.phase:
+            continue
+        phases.setdefault(s.phase, []).append(s.duration_ms)
+
+    ranked = sorted(phases.items(), key=lambda item: sum(item[1]), reverse=True)[:top]
+    parts = [f'{phase};dur={sum(durations):.1f};desc="{len(durations)} spans"' for phase, durations in ranked]
+    parts.append(f"total;dur={total_ms:.1f}")
+    return ", ".join(parts)
+
+
+# ============================================
+# EXPORT OTLP/JSON
+# ============================================
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def trace_to_otlp(trace: Trace) -> Dict[str, Any]:
+    """Convertir une trace au format OTLP/JSON (ExportTraceServiceRequest)"""
+    spans = []
+    for s in trace.spans:
+        attributes = [{"key": k, "value": _otlp_value(v)} for k, v in s.attributes.items()]
+        attributes.append({"key": "request.id", "value": {"stringValue": trace.request_id}})
+        spans.append({
+            "traceId": trace.trace_id,
+            "spanId": s.span_id,
+            "parentSpanId": s.parent_id or "",
+            "name": s.name,
+            "kind": 2 if s.parent_id is None else 1,  # SERVER pour la racine, INTERNAL sinon
+            "startTimeUnixNano": str(s.start_ns),
+            "endTimeUnixNano": str(s.end_ns or time.time_ns()),
+            "attributes": attributes,
+            "status": {"code": 2, "message": s.error} if s.error else {"code": 1},
+        })
+    return {
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+            "scopeSpans": [{"scope": {"name": "services.tracing"}, "spans": spans}],
+        }]
+    }
+
+
+class TraceExporter:
+    """Export en lots, hors du chemin de la requête"""
+
+    def __init__(self, mode: str = "none", file_path: str = "./data/traces.jsonl",
+                 endpoint: str = "", batch_size: int = 20, flush_interval_s: float = 5.0):
+        self.mode = mode
+        self.file_path = file_path
+        self.endpoint = endpoint
+        self.batch_size = batch_size
+        self.flush_interval_s = flush_interval_s
+        self._buffer: List[Dict[str, Any]] = []
+        self._last_flush = time.monotonic()
+        self.exported = 0
+        self.errors = 0
+
+    def export(self, trace: Trace):
+        if self.mode == "none" or not trace.spans:
+            return
+        self._buffer.append(trace_to_otlp(trace))
+        if len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval_s:
+            batch, self._buffer = self._buffer, []
+            self._last_flush = time.monotonic()
+            try:
+                loop = asyncio.get_running_loop()
+                # Contexte vide: les spans de l'export n'atterrissent pas dans la trace de la requête
+                Context().run(loop.create_task, self._flush(batch))
+            except RuntimeError:
+                self._write_file(batch)
+
+    async def flush(self):
+        """Vider le buffer (arrêt de l'application)"""
+        batch, self._buffer = self._buffer, []
+        if batch:
+            await self._flush(batch)
+
+    async def _flush(self, batch: List[Dict[str, Any]]):
+        try:
+            if self.mode == "file":
+                await asyncio.to_thread(self._write_file, batch)
+            elif self.mode == "otlp" and self.endpoint:
+                from services.http_client import http_client
+                merged = {"resourceSpans": [rs for payload in batch for rs in payload["resourceSpans"]]}
+                await http_client.post(self.endpoint, json=merged, headers={"Content-Type": "application/json"})
+            self.exported += len(batch)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Trace export failed ({self.mode}): {e}")
+
+    def _write_file(self, batch: List[Dict[str, Any]]):
+        os.makedirs(os.path.dirname(self.file_path) or ".", exist_ok=True)
+        with open(self.file_path, "a", encoding="utf-8") as f:
+            for payload in batch:
+                f.write(json.dumps(payload) + "\n")
+
+
+trace_exporter = TraceExporter(
+    mode=os.getenv("TRACING_EXPORT", "none").lower(),
+    file_path=os.getenv("TRACING_FILE", "./data/traces.jsonl"),
+    endpoint=os.getenv("TRACING_OTLP_ENDPOINT", ""),
+)
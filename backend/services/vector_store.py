@@ -0,0 +1,360 @@
+"""
+Vector Store - Embeddings par lots et index vectoriel local (RAG)
+- embed_batch: textes dédupliqués, cache consulté en une requête, seuls les
+  absents partent en un seul appel amont asynchrone (pool httpx partagé)
+- vecteurs stockés en blobs binaires compacts float32/float16 (SQLite WAL);
+  le cache Redis (decode_responses=True) ne stocke que du texte; les entrées
+  expirées (CACHE_TTL_EMBEDDINGS) sont purgées par lots à l'écriture
+- index plat persistant en mémoire (matrice NumPy normalisée par namespace
+  et modèle): recherche top-k par produit scalaire + argpartition
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from services.http_client import http_client
+
+logger = logging.getLogger(__name__)
+
+# Modèles d'embeddings (API REST, un appel par lot)
+EMBEDDING_MODELS = {
+    "cohere": {
+        "name": "cohere-embed-multilingual-v3.0",
+        "model": "embed-multilingual-v3.0",
+        "url": "https://api.cohere.com/v1/embed",
+        "key_env": "COHERE_API_KEY",
+        "max_batch": 96,
+    },
+    "openai": {
+        "name": "openai-text-embedding-3-small",
+        "model": "text-embedding-3-small",
+        "url": "https://api.openai.com/v1/embeddings",
+        "key_env": "OPENAI_API_KEY",
+        "max_batch": 2048,
+    },
+}
+DTYPES = {"float32": "<f4", "float16": "<f2"}  # Little-endian, indépendant de la plateforme
+EVICT_INTERVAL_S = 600
+EVICT_BATCH = 5000
+
+
+class EmbeddingUnavailable(Exception):
+    """Modèle d'embeddings non configuré (clé API absente)"""
+
+
+def encode_vector(vector, dtype: str = "float32") -> bytes:
+    """Vecteur -> blob binaire little-endian"""
+    return np.asarray(vector, dtype=DTYPES[dtype]).tobytes()
+
+
+def decode_vector(blob: bytes, dtype: str = "float32") -> np.ndarray:
+    """Blob binaire -> vecteur float32"""
+    return np.frombuffer(blob, dtype=DTYPES[dtype]).astype(np.float32)
+
+
+def _api_key(model: str) -> Optional[str]:
+    key = os.getenv(EMBEDDING_MODELS[model]["key_env"])
+    if not key or key.startswith("your_"):
+        return None
+    return key
+
+
+async def fetch_embeddings(texts: List[str], model: str, input_type: str) -> List[List[float]]:
+    """Un appel amont pour tout le lot (découpé seulement au-delà de la limite du provider)"""
+    config = EMBEDDING_MODELS[model]
+    api_key = _api_key(model)
+    if not api_key:
+        raise EmbeddingUnavailable(f"{model} embeddings not configured")
+
+    vectors: List[List[float]] = []
+    headers = {"Authorization": f"Bearer {api_key}"}
+    for start in range(0, len(texts), config["max_batch"]):
+        chunk = texts[start:start + config["max_batch"]]
+        if model == "cohere":
+            payload = {"texts": chunk, "model": config["model"], "input_type": input_type, "embedding_types": ["float"]}
+        else:
+            payload = {"input": chunk, "model": config["model"]}
+        response = await http_client.post(config["url"], json=payload, headers=headers, timeout=30.0)
+        response.raise_for_status()
+        data = response.json()
+        if model == "cohere":
+            embeddings = data["embeddings"]
+            vectors.extend(embeddings["float"] if isinstance(embeddings, dict) else embeddings)
+        else:
+            vectors.extend(item["embedding"] for item in sorted(data["data"], key=lambda d: d["index"]))
+    return vectors
+
+
+class _Namespace:
+    """Matrice normalisée (capacité doublée à la croissance) + métadonnées par ligne"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self.matrix = np.zeros((16, dim), dtype=np.float32)
+        self.size = 0
+        self.ids: List[str] = []
+        self.rows: Dict[str, int] = {}
+        self.docs: List[Dict[str, Any]] = []
+
+    def upsert(self, doc_id: str, vector: np.ndarray, doc: Dict[str, Any]):
+        norm = np.linalg.norm(vector)
+        vector = vector / norm if norm else vector
+        row = self.rows.get(doc_id)
+        if row is None:
+            if self.size == len(self.matrix):
+                grown = np.zeros((len(self.matrix) * 2, self.dim), dtype=np.float32)
+                grown[:self.size] = self.matrix[:self.size]
+                self.matrix = grown
+            row = self.size
+            self.size += 1
+            self.ids.append(doc_id)
+            self.docs.append(doc)
+            self.rows[doc_id] = row
+        else:
+            self.docs[row] = doc
+        self.matrix[row] = vector
+
+    def remove(self, doc_id: str) -> bool:
+        """Supprimer une ligne en la remplaçant par la dernière"""
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return False
+        last = self.size - 1
+        if row != last:
+            self.matrix[row] = self.matrix[last]
+            self.ids[row], self.docs[row] = self.ids[last], self.docs[last]
+            self.rows[self.ids[row]] = row
+        self.ids.pop()
+        self.docs.pop()
+        self.size -= 1
+        return True
+
+    def search(self, query: np.ndarray, k: int) -> List[Tuple[int, float]]:
+        if not self.size:
+            return []
+        norm = np.linalg.norm(query)
+        scores = self.matrix[:self.size] @ (query / norm if norm else query)
+        k = min(k, self.size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+
+class VectorStore:
+    """Cache d'embeddings binaire + index vectoriel local persistant"""
+
+    def __init__(self, db_path: str = "data/vectors.db", dtype: Optional[str] = None):
+        self.db_path = db_path
+        self.dtype = dtype or os.getenv("EMBEDDINGS_DTYPE", "float32")
+        if self.dtype not in DTYPES:
+            raise ValueError(f"Unsupported embeddings dtype: {self.dtype}")
+        self.cache_ttl = int(os.getenv("CACHE_TTL_EMBEDDINGS", 86400))
+        self._lock = threading.Lock()  # Connexion SQLite
+        self._index_lock = threading.RLock()  # Index en mémoire (pris avant _lock)
+        self._last_eviction = 0.0
+        self._conn: Optional[sqlite3.Connection] = None
+        self._namespaces: Dict[Tuple[str, str], _Namespace] = {}
+        self.stats = {"cache_hits": 0, "cache_misses": 0, "upstream_calls": 0}
+
+    def _db(self) -> sqlite3.Connection:
+        """Connexion persistante ouverte au premier usage (pas à l'import)"""
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS embedding_cache (
+                    key TEXT PRIMARY KEY,
+                    dtype TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    created_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_embedding_cache_created ON embedding_cache(created_at);
+                CREATE TABLE IF NOT EXISTS vector_index (
+                    namespace TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    doc_id TEXT NOT NULL,
+                    text TEXT NOT NULL,
+                    metadata TEXT,
+                    dtype TEXT NOT NULL,
+                    vector BLOB NOT NULL,
+                    PRIMARY KEY (namespace, model, doc_id)
+                );
+            """)
+            self._conn = conn
+        return self._conn
+
+    # ------------------------------------------------------------------
+    # Embeddings (cache + lot amont)
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _cache_key(text: str, model: str, input_type: str) -> str:
+        return hashlib.sha256(f"{model}:{input_type}:{text}".encode()).hexdigest()
+
+    def _get_cached(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        min_created = time.time() - self.cache_ttl
+        with self._lock:
+            rows = self._db().execute(
+                f"SELECT key, dtype, vector FROM embedding_cache "
+                f"WHERE key IN ({','.join('?' * len(keys))}) AND created_at >= ?",
+                (*keys, min_created),
+            ).fetchall()
+        return {key: decode_vector(blob, dtype) for key, dtype, blob in rows}
+
+    def _set_cached(self, items: List[Tuple[str, List[float]]]):
+        now = time.time()
+        with self._lock, self._db():
+            self._db().executemany(
+                "INSERT OR REPLACE INTO embedding_cache (key, dtype, vector, created_at) VALUES (?, ?, ?, ?)",
+                [(key, self.dtype, encode_vector(vector, self.dtype), now) for key, vector in items],
+            )
+        if now - self._last_eviction > EVICT_INTERVAL_S:
+            self._last_eviction = now
+            self.evict_expired()
+
+    def evict_expired(self) -> int:
+        """Supprimer les embeddings expirés (index sur created_at, lots bornés)"""
+        cutoff = time.time() - self.cache_ttl
+        deleted = 0
+        while True:
+            with self._lock, self._db():
+                count = self._db().execute(
+                    "DELETE FROM embedding_cache WHERE rowid IN "
+                    "(SELECT rowid FROM embedding_cache WHERE created_at < ? LIMIT ?)",
+                    (cutoff, EVICT_BATCH),
+                ).rowcount
+            deleted += count
+            if count < EVICT_BATCH:
+                return deleted
+
+    async def embed_batch(
+        self,
+        texts: List[str],
+        model: str = "cohere",
+        input_type: str = "search_document",
+    ) -> Tuple[List[np.ndarray], Dict[str, int]]:
+        """Vecteurs dans l'ordre des textes + compteurs (cached/computed)"""
+        if model not in EMBEDDING_MODELS:
+            raise ValueError(f"Unsupported model: {model}")
+        keys = {text: self._cache_key(text, model, input_type) for text in texts}  # Dédupliqué, ordre conservé
+        found = await asyncio.to_thread(self._get_cached, list(keys.values()))
+        misses = [text for text, key in keys.items() if key not in found]
+        self.stats["cache_hits"] += len(keys) - len(misses)
+        self.stats["cache_misses"] += len(misses)
+
+        if misses:
+            self.stats["upstream_calls"] += 1
+            vectors = await fetch_embeddings(misses, model, input_type)
+            if len(vectors) != len(misses):
+                raise ValueError(f"{model} returned {len(vectors)} embeddings for {len(misses)} texts")
+            computed = [(keys[text], vector) for text, vector in zip(misses, vectors)]
+            await asyncio.to_thread(self._set_cached, computed)
+            # Valeurs relues telles que stockées (précision identique cache/non-cache)
+            for key, vector in computed:
+                found[key] = decode_vector(encode_vector(vector, self.dtype), self.dtype)
+
+        return [found[keys[text]] for text in texts], {
+            "unique": len(keys), "cached": len(keys) - len(misses), "computed": len(misses)
+        }
+
+    # ------------------------------------------------------------------
+    # Index vectoriel
+    # ------------------------------------------------------------------
+
+    def _namespace(self, namespace: str, model: str, create_dim: Optional[int] = None) -> Optional[_Namespace]:
+        """Index du namespace, chargé depuis SQLite au premier accès (bloquant: hors de la boucle)"""
+        key = (namespace, model)
+        with self._index_lock:
+            if key not in self._namespaces:
+                with self._lock:
+                    rows = self._db().execute(
+                        "SELECT doc_id, text, metadata, dtype, vector FROM vector_index "
+                        "WHERE namespace = ? AND model = ? ORDER BY rowid",
+                        (namespace, model),
+                    ).fetchall()
+                if not rows and create_dim is None:
+                    return None
+                index = _Namespace(create_dim) if not rows else None
+                for doc_id, text, metadata, dtype, blob in rows:
+                    vector = decode_vector(blob, dtype)
+                    index = index or _Namespace(len(vector))
+                    index.upsert(doc_id, vector, {"text": text, "metadata": json.loads(metadata) if metadata else {}})
+                self._namespaces[key] = index
+            return self._namespaces[key]
+
+    def _upsert(self, namespace: str, model: str, documents: List[Dict[str, Any]], vectors: List[np.ndarray]) -> int:
+        """Mise à jour de l'index en mémoire et de SQLite sous le verrou de l'index"""
+        with self._index_lock:
+            index = self._namespace(namespace, model, create_dim=len(vectors[0]))
+            if index.dim != len(vectors[0]):
+                raise ValueError(f"Dimension mismatch for namespace '{namespace}': {len(vectors[0])} != {index.dim}")
+
+            rows = []
+            for doc, vector in zip(documents, vectors):
+                metadata = doc.get("metadata") or {}
+                index.upsert(doc["id"], vector, {"text": doc["text"], "metadata": metadata})
+                rows.append((namespace, model, doc["id"], doc["text"], json.dumps(metadata, ensure_ascii=False),
+                             self.dtype, encode_vector(vector, self.dtype)))
+            with self._lock, self._db():
+                self._db().executemany(
+                    "INSERT OR REPLACE INTO vector_index "
+                    "(namespace, model, doc_id, text, metadata, dtype, vector) VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+            return index.size
+
+    async def index_documents(self, namespace: str, documents: List[Dict[str, Any]], model: str = "cohere") -> Dict[str, int]:
+        """Embeddings des documents (lot) puis ajout/mise à jour dans l'index"""
+        vectors, counts = await self.embed_batch([doc["text"] for doc in documents], model, "search_document")
+        total = await asyncio.to_thread(self._upsert, namespace, model, documents, vectors)
+        return {"indexed": len(documents), "total": total, **counts}
+
+    def _top_k(self, index: _Namespace, vector: np.ndarray, k: int) -> List[Dict[str, Any]]:
+        with self._index_lock:
+            return [
+                {"id": index.ids[row], "score": round(score, 4), **index.docs[row]}
+                for row, score in index.search(vector, k)
+            ]
+
+    async def search(self, namespace: str, query: str, k: int = 5, model: str = "cohere") -> List[Dict[str, Any]]:
+        """Top-k documents par similarité cosinus"""
+        index = await asyncio.to_thread(self._namespace, namespace, model)
+        if index is None:
+            return []
+        vectors, _ = await self.embed_batch([query], model, "search_query")
+        return await asyncio.to_thread(self._top_k, index, vectors[0], k)
+
+    def delete_document(self, namespace: str, doc_id: str, model: str = "cohere") -> bool:
+        """Supprimer un document (bloquant: appeler via asyncio.to_thread depuis la boucle)"""
+        with self._index_lock:
+            index = self._namespace(namespace, model)
+            if index is None or not index.remove(doc_id):
+                return False
+            with self._lock, self._db():
+                self._db().execute(
+                    "DELETE FROM vector_index WHERE namespace = ? AND model = ? AND doc_id = ?",
+                    (namespace, model, doc_id),
+                )
+        return True
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._index_lock:
+            namespaces = {
+                f"{namespace}/{model}": {"documents": index.size, "dimensions": index.dim}
+                for (namespace, model), index in self._namespaces.items()
+            }
+        return {**self.stats, "dtype": self.dtype, "namespaces": namespaces}
+
+
+# Singleton instance
+vector_store = VectorStore(os.getenv("VECTOR_STORE_PATH", "data/vectors.db"))
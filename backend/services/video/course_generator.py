@@ -1,18 +1,145 @@
 """
 Course Generator - Génération automatique de cours vidéo
+
+Pipeline concurrent :
+- les vidéos des sections sont soumises ensemble à la file vidéo persistante,
+  qui applique le plafond de rendus simultanés par provider
+- le quiz est généré pendant le rendu des vidéos
+- chaque section est émise dès qu'elle est terminée (stream_course, suivi
+  par course_id), avec retry par section en cas d'échec
 """
-from typing import Dict, Any, List
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, Optional
 from services.ai_router import ai_router
 from services.video.video_router import video_router
+from services.video.queue_manager import video_queue
 import asyncio
+import os
+import uuid
+
+SECTION_RETRIES = int(os.getenv("COURSE_SECTION_RETRIES", 2))
+SECTION_TIMEOUT_S = 15 * 60
+MAX_TRACKED_COURSES = 200
 
 
 class CourseGenerator:
     """Générateur de cours vidéo automatique"""
     
-    def __init__(self):
+    def __init__(self, queue=None):
         self.ai_router = ai_router
         self.video_router = video_router
+        self.video_queue = queue or video_queue
+        self.courses: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._tasks: set = set()
+    
+    # ------------------------------------------------------------------
+    # Suivi des cours
+    # ------------------------------------------------------------------
+    
+    def _new_course(self, topic: str, **options) -> Dict[str, Any]:
+        slug = "_".join(topic.lower().split())[:40]
+        course = {
+            "course_id": f"course_{slug}_{uuid.uuid4().hex[:8]}",
+            "topic": topic,
+            **options,
+            "title": None,
+            "status": "generating_content",
+            "sections": [],
+            "quiz": None,
+            "events": 0
+        }
+        self.courses[course["course_id"]] = course
+        while len(self.courses) > MAX_TRACKED_COURSES:
+            self.courses.popitem(last=False)
+        return course
+    
+    def get_course(self, course_id: str) -> Optional[Dict[str, Any]]:
+        """Progression d'un cours (sections terminées, en cours, en échec)"""
+        course = self.courses.get(course_id)
+        if course is None:
+            return None
+        sections = course["sections"]
+        return {
+            **{k: v for k, v in course.items() if k != "events"},
+            "progress": {
+                "total": len(sections),
+                "done": sum(1 for s in sections if s["status"] == "done"),
+                "failed": sum(1 for s in sections if s["status"] == "error"),
+                "rendering": sum(1 for s in sections if s["status"] == "rendering")
+            }
+        }
+    
+    # ------------------------------------------------------------------
+    # Pipeline
+    # ------------------------------------------------------------------
+    
+    async def stream_course(
+        self,
+        topic: str,
+        duration_minutes: int = 5,
+        language: str = "fr",
+        avatar_id: str = "anna",
+        include_quiz: bool = True,
+        course: Optional[Dict[str, Any]] = None
+    ) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Générer un cours en émettant les événements au fil de l'eau :
+        content, puis section / quiz dans l'ordre de complétion, puis completed
+        """
+        course = course or self._new_course(
+            topic, language=language, duration_minutes=duration_minutes,
+            avatar_id=avatar_id, include_quiz=include_quiz
+        )
+        
+        # 1. Générer le contenu du cours avec IA
+        course_content = await self._generate_course_content(
+            topic=topic,
+            duration_minutes=duration_minutes,
+            language=language
+        )
+        sections = course_content.get("sections", [])
+        course["title"] = course_content.get("title")
+        course["status"] = "rendering"
+        course["sections"] = [
+            {"number": i, "section": section, "status": "rendering", "video": None, "attempts": 0}
+            for i, section in enumerate(sections, 1)
+        ]
+        yield {
+            "type": "content",
+            "course_id": course["course_id"],
+            "title": course["title"],
+            "sections": [{"number": i, "title": s.get("title")} for i, s in enumerate(sections, 1)]
+        }
+        
+        # 2. Vidéos de toutes les sections en même temps (plafond par provider dans la file)
+        self.video_queue.start()
+        pending = [
+            asyncio.create_task(self._render_section(course, entry, avatar_id, language))
+            for entry in course["sections"]
+        ]
+        
+        # 3. Quiz pendant le rendu des vidéos
+        if include_quiz:
+            pending.append(asyncio.create_task(self._quiz_event(course, topic, course_content, language)))
+        
+        try:
+            for next_done in asyncio.as_completed(pending):
+                event = await next_done
+                course["events"] += 1
+                yield event
+        finally:
+            for task in pending:
+                task.cancel()
+        
+        failed = [s["number"] for s in course["sections"] if s["status"] == "error"]
+        course["status"] = "partial" if failed else "completed"
+        yield {
+            "type": "completed",
+            "course_id": course["course_id"],
+            "status": course["status"],
+            "failed_sections": failed,
+            "total_sections": len(course["sections"])
+        }
     
     async def generate_course(
         self,
@@ -35,65 +162,99 @@ class CourseGenerator:
         Returns:
             Dict avec sections, vidéos, quiz, etc.
         """
-        # 1. Générer le contenu du cours avec IA
-        course_content = await self._generate_course_content(
-            topic=topic,
-            duration_minutes=duration_minutes,
-            language=language
+        course = self._new_course(
+            topic, language=language, duration_minutes=duration_minutes,
+            avatar_id=avatar_id, include_quiz=include_quiz
         )
+        async for _ in self.stream_course(topic, duration_minutes, language, avatar_id, include_quiz, course=course):
+            pass
+        return self._result(course)
+    
+    def start_course(self, topic: str, **options) -> Dict[str, Any]:
+        """Lancer la génération en tâche de fond (suivi via get_course)"""
+        course = self._new_course(topic, **options)
         
-        # 2. Diviser en sections (chacune ~30 secondes)
-        sections = course_content.get("sections", [])
-        
-        # 3. Générer les vidéos pour chaque section
-        video_tasks = []
-        for i, section in enumerate(sections, 1):
-            video_task = self._generate_section_video(
-                section_text=section.get("content", ""),
-                section_number=i,
-                total_sections=len(sections),
-                avatar_id=avatar_id,
-                language=language
-            )
-            video_tasks.append((section, video_task))
+        async def run():
+            async for _ in self.stream_course(topic, course=course, **options):
+                pass
         
-        # Générer toutes les vidéos en parallèle
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return course
+    
+    async def retry_section(self, course_id: str, number: int) -> Optional[Dict[str, Any]]:
+        """Relancer le rendu d'une section en échec"""
+        course = self.courses.get(course_id)
+        if course is None or not 1 <= number <= len(course["sections"]):
+            return None
+        entry = course["sections"][number - 1]
+        if entry["status"] != "error":
+            return {"type": "section", "course_id": course_id, **entry}
+        entry["status"] = "rendering"
+        self.video_queue.start()
+        event = await self._render_section(course, entry, course.get("avatar_id", "anna"), course.get("language", "fr"))
+        if course["status"] == "partial" and not any(s["status"] == "error" for s in course["sections"]):
+            course["status"] = "completed"
+        return event
+    
+    @staticmethod
+    def _result(course: Dict[str, Any]) -> Dict[str, Any]:
+        """Format historique de generate_course"""
         section_videos = []
-        for section, video_task in video_tasks:
-            try:
-                video_result = await video_task
-                section_videos.append({
-                    "section": section,
-                    "video": video_result
-                })
-            except Exception as e:
-                print(f"Error generating video for section: {e}")
-                section_videos.append({
-                    "section": section,
-                    "video": None,
-                    "error": str(e)
-                })
-        
-        # 4. Générer quiz si demandé
-        quiz = None
-        if include_quiz:
-            quiz = await self._generate_quiz(
-                topic=topic,
-                content=course_content,
-                language=language
-            )
-        
+        for entry in course["sections"]:
+            item = {"section": entry["section"], "video": entry["video"]}
+            if entry["status"] == "error":
+                item["error"] = entry.get("error")
+            section_videos.append(item)
         return {
-            "course_id": f"course_{topic.lower().replace(' ', '_')}",
-            "topic": topic,
-            "language": language,
-            "duration_minutes": duration_minutes,
+            "course_id": course["course_id"],
+            "topic": course["topic"],
+            "language": course.get("language"),
+            "duration_minutes": course.get("duration_minutes"),
             "sections": section_videos,
-            "quiz": quiz,
-            "total_sections": len(sections),
-            "status": "completed"
+            "quiz": course["quiz"],
+            "total_sections": len(course["sections"]),
+            "status": course["status"]
         }
     
+    async def _render_section(
+        self,
+        course: Dict[str, Any],
+        entry: Dict[str, Any],
+        avatar_id: str,
+        language: str
+    ) -> Dict[str, Any]:
+        """Rendu d'une section via la file vidéo, avec retry en cas d'échec"""
+        params = self._section_params(
+            section_text=entry["section"].get("content", ""),
+            section_number=entry["number"],
+            total_sections=len(course["sections"]),
+            avatar_id=avatar_id,
+            language=language
+        )
+        for _ in range(SECTION_RETRIES + 1):
+            entry["attempts"] += 1
+            try:
+                job = await asyncio.to_thread(self.video_queue.submit, "avatar", params)
+                job = await self.video_queue.wait_for(job["job_id"], timeout=SECTION_TIMEOUT_S)
+            except Exception as e:
+                job = {"status": "error", "error": str(e)}
+            if job and job["status"] == "done":
+                entry.update(status="done", error=None, video={
+                    "video_id": job["video_id"],
+                    "job_id": job["job_id"],
+                    "result_url": job.get("result_url"),
+                    "provider": job["provider"]
+                })
+                break
+            entry.update(status="error", error=(job or {}).get("error") or "render timeout")
+        return {"type": "section", "course_id": course["course_id"], **entry}
+    
+    async def _quiz_event(self, course, topic, course_content, language) -> Dict[str, Any]:
+        course["quiz"] = await self._generate_quiz(topic=topic, content=course_content, language=language)
+        return {"type": "quiz", "course_id": course["course_id"], "quiz": course["quiz"]}
+    
     async def _generate_course_content(
         self,
         topic: str,
@@ -133,8 +294,8 @@ class CourseGenerator:
         """
         
         try:
-            response = await self.ai_router.chat(prompt, max_tokens=2000)
-            content = response.get("content", "")
+            response = await self.ai_router.route(prompt=prompt)
+            content = response.get("response", "")
             
             # Parser le JSON (peut être dans des blocs markdown)
             import json
@@ -168,15 +329,15 @@ class CourseGenerator:
                 "conclusion": "Fin du cours."
             }
     
-    async def _generate_section_video(
-        self,
+    @staticmethod
+    def _section_params(
         section_text: str,
         section_number: int,
         total_sections: int,
         avatar_id: str,
         language: str
     ) -> Dict[str, Any]:
-        """Générer une vidéo pour une section"""
+        """Paramètres du rendu d'une section (clé d'idempotence de la file)"""
         # Ajouter numéro de section au texte
         text = f"Section {section_number} sur {total_sections}. {section_text}"
         
@@ -184,14 +345,12 @@ class CourseGenerator:
         if len(text) > 500:
             text = text[:497] + "..."
         
-        result = await self.video_router.create_talking_avatar(
-            text=text,
-            avatar_id=avatar_id,
-            language=language,
-            use_free=False
-        )
-        
-        return result
+        return {
+            "text": text,
+            "avatar_id": avatar_id,
+            "language": language,
+            "use_free": False
+        }
     
     async def _generate_quiz(
         self,
@@ -228,8 +387,8 @@ class CourseGenerator:
         """
         
         try:
-            response = await self.ai_router.chat(prompt, max_tokens=1000)
-            content_text = response.get("content", "")
+            response = await self.ai_router.route(prompt=prompt)
+            content_text = response.get("response", "")
             
             import json
             import re
@@ -1,20 +1,201 @@
 """
 Queue Manager pour générations vidéo asynchrones
+
+File de jobs persistante (SQLite WAL, partagée entre workers) :
+- états: queued -> submitting -> processing -> done | error
+- clé d'idempotence: une demande identique réutilise le rendu en cours ou terminé
+- baux (lease) + heartbeat: un job réservé par un worker arrêté est repris
+  après expiration du bail
+- plafond de jobs simultanés par provider (soumission différée sinon)
+- soumission en échec retentée avec backoff exponentiel (MAX_SUBMIT_ATTEMPTS)
+- statut des providers interrogé par lots sur un planning (un tick pour tous
+  les jobs dus) au lieu d'une boucle de polling par client
 """
 import asyncio
-from typing import Dict, Any, Optional
-from datetime import datetime, timedelta
+import hashlib
 import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LEASE_S = 120
+TICK_S = 5.0
+POLL_INTERVAL_S = float(os.getenv("VIDEO_POLL_INTERVAL_S", 10))
+POLL_BATCH = 50
+WAIT_INTERVAL_S = 1.0
+MAX_PROCESSING_S = 30 * 60  # Rendu abandonné au-delà
+MAX_SUBMIT_ATTEMPTS = int(os.getenv("VIDEO_MAX_SUBMIT_ATTEMPTS", 3))
+SUBMIT_BACKOFF_S = float(os.getenv("VIDEO_SUBMIT_BACKOFF_S", 15))
+RETENTION_HOURS = 24
+CLEANUP_INTERVAL_S = 3600
+
+
+@dataclass
+class VideoProvider:
+    """Provider de rendu: soumission et interrogation de statut"""
+    name: str
+    submit: Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]  # -> {video_id, status_url}
+    poll: Callable[[str], Awaitable[Dict[str, Any]]]  # -> {status, result_url}
+    max_concurrent: int = 3
+    on_done: Optional[Callable[[Dict[str, Any]], None]] = None  # Bloquant autorisé (exécuté hors de la boucle)
+
+
+def job_key(kind: str, params: Dict[str, Any]) -> str:
+    """Clé d'idempotence: même type de rendu et mêmes paramètres"""
+    return hashlib.sha256(f"{kind}:{json.dumps(params, sort_keys=True)}".encode()).hexdigest()
 
 
 class VideoQueue:
     """Gestionnaire de queue pour générations vidéo"""
-    
-    def __init__(self):
-        self.queue: Dict[str, Dict[str, Any]] = {}
-        self.max_queue_size = 100
-        self.cleanup_interval = 3600  # 1 heure
-    
+
+    def __init__(self, db_path: str = "./data/video_jobs.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.providers: Dict[str, VideoProvider] = {}
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA busy_timeout=5000")
+        self._init_database()
+        self._tasks: set = set()
+        self._runner: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._last_cleanup = 0.0
+
+    def _init_database(self):
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS video_jobs (
+                    job_id TEXT PRIMARY KEY,
+                    job_key TEXT UNIQUE,
+                    kind TEXT NOT NULL,
+                    provider TEXT NOT NULL,
+                    provider_job_id TEXT,
+                    params TEXT,
+                    state TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    status_url TEXT,
+                    result_url TEXT,
+                    error TEXT,
+                    lease_owner TEXT,
+                    lease_expires_at REAL,
+                    next_poll_at REAL,
+                    submitted_at REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_video_jobs_state ON video_jobs(state, provider, created_at);
+                CREATE INDEX IF NOT EXISTS idx_video_jobs_poll ON video_jobs(state, next_poll_at);
+                CREATE INDEX IF NOT EXISTS idx_video_jobs_provider_id ON video_jobs(provider_job_id);
+                CREATE INDEX IF NOT EXISTS idx_video_jobs_updated ON video_jobs(state, updated_at);
+            """)
+
+    @contextmanager
+    def _tx(self):
+        """Transaction IMMEDIATE: réservations atomiques entre processus"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self._conn
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def register_provider(self, provider: VideoProvider):
+        self.providers[provider.name] = provider
+
+    # ------------------------------------------------------------------
+    # Jobs
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        entry = {
+            "job_id": row["job_id"],
+            "video_id": row["provider_job_id"] or row["job_id"],
+            "kind": row["kind"],
+            "status": row["state"],
+            "provider": row["provider"],
+            "attempts": row["attempts"],
+            "created_at": datetime.fromtimestamp(row["created_at"]).isoformat(),
+            "updated_at": datetime.fromtimestamp(row["updated_at"]).isoformat()
+        }
+        for column in ("status_url", "result_url", "error"):
+            if row[column]:
+                entry[column] = row[column]
+        return entry
+
+    def submit(
+        self,
+        kind: str,
+        params: Dict[str, Any],
+        provider: str = "d-id",
+        key: Optional[str] = None
+    ) -> Dict[str, Any]:
+        """
+        Inscrire un rendu. Une demande de même clé réutilise le job en cours
+        ou terminé (deduplicated=True); un job en erreur est remplacé.
+
+        Transaction bloquante: depuis la boucle, appeler via asyncio.to_thread.
+        """
+        key = key or job_key(kind, params)
+        now = time.time()
+        with self._tx() as conn:
+            row = conn.execute("SELECT * FROM video_jobs WHERE job_key = ?", (key,)).fetchone()
+            if row is not None and row["state"] != "error":
+                return {**self._to_dict(row), "deduplicated": True}
+            if row is not None:
+                conn.execute("UPDATE video_jobs SET job_key = NULL WHERE job_id = ?", (row["job_id"],))
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO video_jobs (job_id, job_key, kind, provider, params, state, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, key, kind, provider, json.dumps(params), now, now),
+            )
+            row = conn.execute("SELECT * FROM video_jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if self._wakeup is not None and not self._loop.is_closed():
+            # Appelable depuis un thread: réveil planifié sur la boucle du planificateur
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return {**self._to_dict(row), "deduplicated": False}
+
+    def get_job(self, job_or_video_id: str) -> Optional[Dict[str, Any]]:
+        """Job par identifiant interne ou identifiant du provider (lisible par tous les workers)"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT * FROM video_jobs WHERE job_id = ? UNION ALL "
+                "SELECT * FROM video_jobs WHERE provider_job_id = ? LIMIT 1",
+                (job_or_video_id, job_or_video_id),
+            ).fetchone()
+        return self._to_dict(row) if row else None
+
+    async def wait_for(self, job_id: str, timeout: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Attendre l'état final d'un job (lecture de la table partagée, sans appel provider)"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = await asyncio.to_thread(self.get_job, job_id)
+            if job is None or job["status"] in ("done", "error"):
+                return job
+            if deadline is not None and time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(WAIT_INTERVAL_S)
+
+    # Compatibilité: vidéos créées hors de la file
     def add_to_queue(
         self,
         video_id: str,
@@ -23,18 +204,16 @@ class VideoQueue:
         created_at: Optional[datetime] = None
     ) -> None:
         """Ajouter une vidéo à la queue"""
-        if len(self.queue) >= self.max_queue_size:
-            # Nettoyer les anciennes entrées
-            self._cleanup_old_entries()
-        
-        self.queue[video_id] = {
-            "video_id": video_id,
-            "status": status,
-            "provider": provider,
-            "created_at": created_at or datetime.now(),
-            "updated_at": datetime.now()
-        }
-    
+        now = time.time()
+        created = created_at.timestamp() if created_at else now
+        with self._tx() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO video_jobs "
+                "(job_id, kind, provider, provider_job_id, state, next_poll_at, submitted_at, created_at, updated_at) "
+                "VALUES (?, 'external', ?, ?, ?, ?, ?, ?, ?)",
+                (video_id, provider, video_id, status, now + POLL_INTERVAL_S, created, created, now),
+            )
+
     def update_status(
         self,
         video_id: str,
@@ -42,53 +221,216 @@ class VideoQueue:
         result_url: Optional[str] = None
     ) -> bool:
         """Mettre à jour le statut d'une vidéo"""
-        if video_id in self.queue:
-            self.queue[video_id]["status"] = status
-            self.queue[video_id]["updated_at"] = datetime.now()
-            if result_url:
-                self.queue[video_id]["result_url"] = result_url
-            return True
-        return False
-    
+        with self._tx() as conn:
+            cursor = conn.execute(
+                "UPDATE video_jobs SET state = ?, result_url = COALESCE(?, result_url), updated_at = ? "
+                "WHERE job_id = ? OR provider_job_id = ?",
+                (status, result_url, time.time(), video_id, video_id),
+            )
+        return cursor.rowcount > 0
+
     def get_status(self, video_id: str) -> Optional[Dict[str, Any]]:
         """Obtenir le statut d'une vidéo"""
-        if video_id in self.queue:
-            entry = self.queue[video_id].copy()
-            # Convertir datetime en string pour JSON
-            entry["created_at"] = entry["created_at"].isoformat()
-            entry["updated_at"] = entry["updated_at"].isoformat()
-            return entry
-        return None
-    
-    def _cleanup_old_entries(self, max_age_hours: int = 24) -> int:
-        """Nettoyer les entrées anciennes"""
-        now = datetime.now()
-        to_remove = []
-        
-        for video_id, entry in self.queue.items():
-            age = now - entry["created_at"]
-            if age > timedelta(hours=max_age_hours):
-                to_remove.append(video_id)
-        
-        for video_id in to_remove:
-            del self.queue[video_id]
-        
-        return len(to_remove)
-    
+        return self.get_job(video_id)
+
+    # ------------------------------------------------------------------
+    # Réservations (baux)
+    # ------------------------------------------------------------------
+
+    def _claim_submissions(self, provider: VideoProvider) -> List[sqlite3.Row]:
+        """Jobs à soumettre dans la limite des places libres du provider"""
+        now = time.time()
+        with self._tx() as conn:
+            active = conn.execute(
+                "SELECT COUNT(*) FROM video_jobs WHERE provider = ? AND state IN ('submitting', 'processing') "
+                "AND NOT (state = 'submitting' AND lease_expires_at < ?)",
+                (provider.name, now),
+            ).fetchone()[0]
+            slots = provider.max_concurrent - active
+            if slots <= 0:
+                return []
+            # File d'attente (hors backoff) + soumissions dont le worker a perdu son bail
+            rows = conn.execute(
+                "SELECT * FROM video_jobs WHERE provider = ? AND "
+                "((state = 'queued' AND (next_poll_at IS NULL OR next_poll_at <= ?)) "
+                "OR (state = 'submitting' AND lease_expires_at < ?)) "
+                "ORDER BY created_at LIMIT ?",
+                (provider.name, now, now, slots),
+            ).fetchall()
+            for row in rows:
+                conn.execute(
+                    "UPDATE video_jobs SET state = 'submitting', lease_owner = ?, lease_expires_at = ?, "
+                    "attempts = attempts + 1, updated_at = ? WHERE job_id = ?",
+                    (self.owner, now + LEASE_S, now, row["job_id"]),
+                )
+            return rows
+
+    def _claim_polls(self, submitted_before: Optional[float] = None) -> List[sqlite3.Row]:
+        """Jobs en rendu dont le statut est dû (lot), hors soumissions postérieures à submitted_before"""
+        now = time.time()
+        submitted_before = now if submitted_before is None else submitted_before
+        with self._tx() as conn:
+            rows = conn.execute(
+                "SELECT * FROM video_jobs WHERE state = 'processing' AND next_poll_at <= ? "
+                "AND (lease_expires_at IS NULL OR lease_expires_at < ?) "
+                "AND COALESCE(submitted_at, 0) < ? ORDER BY next_poll_at LIMIT ?",
+                (now, now, submitted_before, POLL_BATCH),
+            ).fetchall()
+            for row in rows:
+                conn.execute(
+                    "UPDATE video_jobs SET lease_owner = ?, lease_expires_at = ? WHERE job_id = ?",
+                    (self.owner, now + LEASE_S, row["job_id"]),
+                )
+            return rows
+
+    def heartbeat(self) -> int:
+        """Prolonger les baux détenus par ce worker"""
+        now = time.time()
+        with self._tx() as conn:
+            return conn.execute(
+                "UPDATE video_jobs SET lease_expires_at = ? WHERE lease_owner = ? AND lease_expires_at >= ?",
+                (now + LEASE_S, self.owner, now),
+            ).rowcount
+
+    def _finish(self, job_id: str, **fields):
+        """Mettre à jour un job et libérer son bail"""
+        fields.update(lease_owner=None, lease_expires_at=None, updated_at=time.time())
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._tx() as conn:
+            conn.execute(
+                f"UPDATE video_jobs SET {assignments} WHERE job_id = ? AND lease_owner = ?",
+                (*fields.values(), job_id, self.owner),
+            )
+
+    # ------------------------------------------------------------------
+    # Planificateur
+    # ------------------------------------------------------------------
+
+    async def _submit(self, provider: VideoProvider, row: sqlite3.Row):
+        try:
+            result = await provider.submit(json.loads(row["params"] or "{}"))
+            now = time.time()
+            await asyncio.to_thread(
+                self._finish, row["job_id"], state="processing", provider_job_id=result.get("video_id"),
+                status_url=result.get("status_url"), submitted_at=now, next_poll_at=now + POLL_INTERVAL_S, error=None,
+            )
+        except Exception as e:
+            # row["attempts"] précède la réservation: tentative courante = attempts + 1
+            attempt = row["attempts"] + 1
+            if attempt < MAX_SUBMIT_ATTEMPTS:
+                delay = SUBMIT_BACKOFF_S * 2 ** (attempt - 1)
+                logger.warning(f"Video job {row['job_id']} submission failed (attempt {attempt}), retry in {delay:.0f}s: {e}")
+                await asyncio.to_thread(self._finish, row["job_id"], state="queued", error=str(e)[:500],
+                                        next_poll_at=time.time() + delay)
+            else:
+                logger.warning(f"Video job {row['job_id']} submission failed: {e}")
+                await asyncio.to_thread(self._finish, row["job_id"], state="error", error=str(e)[:500])
+
+    async def _poll(self, provider: VideoProvider, row: sqlite3.Row, semaphore: asyncio.Semaphore):
+        now = time.time()
+        async with semaphore:
+            try:
+                status = await provider.poll(row["provider_job_id"])
+            except Exception as e:
+                status = {"status": "processing", "poll_error": str(e)}
+        state = status.get("status") or "processing"
+        if state == "done":
+            await asyncio.to_thread(self._finish, row["job_id"], state="done", result_url=status.get("result_url"))
+            if provider.on_done:
+                try:
+                    await asyncio.to_thread(
+                        provider.on_done, {**self._to_dict(row), "result_url": status.get("result_url")}
+                    )
+                except Exception as e:
+                    logger.warning(f"Video job {row['job_id']} on_done failed: {e}")
+        elif state in ("error", "rejected"):
+            await asyncio.to_thread(self._finish, row["job_id"], state="error",
+                                    error=str(status.get("error") or state)[:500])
+        elif now - (row["submitted_at"] or row["created_at"]) > MAX_PROCESSING_S:
+            await asyncio.to_thread(self._finish, row["job_id"], state="error", error="render timeout")
+        else:
+            await asyncio.to_thread(self._finish, row["job_id"], next_poll_at=now + POLL_INTERVAL_S)
+
+    async def tick(self):
+        """Un passage du planificateur: heartbeat, soumissions, statuts dus en lot, nettoyage"""
+        started = time.time()
+        await asyncio.to_thread(self.heartbeat)
+
+        for provider in self.providers.values():
+            for row in await asyncio.to_thread(self._claim_submissions, provider):
+                task = asyncio.create_task(self._submit(provider, row))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+        # Les soumissions lancées par ce tick ne sont interrogées qu'au suivant
+        due = await asyncio.to_thread(self._claim_polls, started)
+        semaphores = {name: asyncio.Semaphore(p.max_concurrent) for name, p in self.providers.items()}
+        polls = []
+        for row in due:
+            provider = self.providers.get(row["provider"])
+            if provider is None:
+                await asyncio.to_thread(self._finish, row["job_id"], next_poll_at=time.time() + POLL_INTERVAL_S)
+                continue
+            polls.append(self._poll(provider, row, semaphores[provider.name]))
+        await asyncio.gather(*polls)
+
+        if time.time() - self._last_cleanup > CLEANUP_INTERVAL_S:
+            self._last_cleanup = time.time()
+            await asyncio.to_thread(self._cleanup_old_entries)
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                logger.error(f"Video scheduler tick failed: {e}")
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), TICK_S)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self):
+        """Démarrer le planificateur sur la boucle courante"""
+        if self._runner and not self._runner.done():
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Arrêter le planificateur (les baux expirent et les jobs sont repris ailleurs)"""
+        tasks = [t for t in [self._runner, *self._tasks] if t]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._runner = None
+
+    # ------------------------------------------------------------------
+    # Maintenance
+    # ------------------------------------------------------------------
+
+    def _cleanup_old_entries(self, max_age_hours: int = RETENTION_HOURS) -> int:
+        """Nettoyer les jobs terminés anciens (index sur état + date: O(expirés))"""
+        cutoff = time.time() - max_age_hours * 3600
+        with self._tx() as conn:
+            return conn.execute(
+                "DELETE FROM video_jobs WHERE state IN ('done', 'error') AND updated_at < ?", (cutoff,)
+            ).rowcount
+
     def get_queue_stats(self) -> Dict[str, Any]:
         """Obtenir les statistiques de la queue"""
-        status_counts = {}
-        for entry in self.queue.values():
-            status = entry["status"]
-            status_counts[status] = status_counts.get(status, 0) + 1
-        
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM video_jobs GROUP BY state").fetchall()
+        status_counts = {state: count for state, count in rows}
+
         return {
-            "total": len(self.queue),
+            "total": sum(status_counts.values()),
             "by_status": status_counts,
-            "max_size": self.max_queue_size
+            "providers": {name: {"max_concurrent": p.max_concurrent} for name, p in self.providers.items()},
+            "scheduler_running": bool(self._runner and not self._runner.done())
         }
 
 
 # Singleton instance
-video_queue = VideoQueue()
-
+video_queue = VideoQueue(os.getenv("VIDEO_QUEUE_PATH", "./data/video_jobs.db"))
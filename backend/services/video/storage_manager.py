@@ -1,22 +1,140 @@
 """
 Storage Manager pour vidéos temporaires
 Stockage local avec nettoyage automatique après 24h
+
+Manifeste SQLite (un fichier par stockage) au lieu d'un info.json par vidéo :
+- index sur expires_at: le nettoyage ne lit que les lignes expirées
+- statistiques (nombre, taille) tenues à jour par triggers, lues en O(1)
+- nettoyage planifié en tâche de fond, par lots bornés à chaque tick
 """
+import asyncio
+import json
+import logging
 import os
 import shutil
+import sqlite3
+import threading
+import time
 from typing import Optional, Dict, Any
 from datetime import datetime, timedelta
 from pathlib import Path
 
+from services.provider_registry import provider_registry
+
+logger = logging.getLogger(__name__)
+
+CLEANUP_INTERVAL_S = float(os.getenv("VIDEO_STORAGE_CLEANUP_INTERVAL_S", 300))
+CLEANUP_BATCH = int(os.getenv("VIDEO_STORAGE_CLEANUP_BATCH", 100))
+BACKLOG_DELAY_S = 1.0  # Lot plein: lot suivant peu après, sans bloquer le disque
+
 
 class VideoStorage:
     """Gestionnaire de stockage pour vidéos temporaires"""
-    
-    def __init__(self, base_path: str = "./storage/videos"):
+
+    def __init__(self, base_path: str = "./storage/videos", manifest_path: Optional[str] = None):
         self.base_path = Path(base_path)
         self.base_path.mkdir(parents=True, exist_ok=True)
         self.max_age_hours = 24  # Vidéos supprimées après 24h
-    
+        self.manifest_path = Path(manifest_path) if manifest_path else self.base_path / "manifest.db"
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.manifest_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._init_database()
+        self._runner: Optional[asyncio.Task] = None
+
+    def _init_database(self):
+        with self._lock:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    video_id TEXT PRIMARY KEY,
+                    provider TEXT NOT NULL,
+                    video_url TEXT,
+                    local_path TEXT,
+                    size_bytes INTEGER NOT NULL DEFAULT 0,
+                    created_at REAL NOT NULL,
+                    expires_at REAL NOT NULL
+                );
+                CREATE INDEX IF NOT EXISTS idx_videos_expires ON videos(expires_at);
+
+                CREATE TABLE IF NOT EXISTS storage_stats (
+                    id INTEGER PRIMARY KEY CHECK (id = 1),
+                    total_videos INTEGER NOT NULL,
+                    total_bytes INTEGER NOT NULL
+                );
+
+                CREATE TRIGGER IF NOT EXISTS videos_stats_insert AFTER INSERT ON videos BEGIN
+                    UPDATE storage_stats SET total_videos = total_videos + 1,
+                                             total_bytes = total_bytes + NEW.size_bytes;
+                END;
+                CREATE TRIGGER IF NOT EXISTS videos_stats_delete AFTER DELETE ON videos BEGIN
+                    UPDATE storage_stats SET total_videos = total_videos - 1,
+                                             total_bytes = total_bytes - OLD.size_bytes;
+                END;
+                CREATE TRIGGER IF NOT EXISTS videos_stats_update AFTER UPDATE OF size_bytes ON videos BEGIN
+                    UPDATE storage_stats SET total_bytes = total_bytes - OLD.size_bytes + NEW.size_bytes;
+                END;
+            """)
+            created = self._conn.execute(
+                "INSERT OR IGNORE INTO storage_stats (id, total_videos, total_bytes) VALUES (1, 0, 0)"
+            ).rowcount
+            self._conn.commit()
+        if created:
+            self._import_legacy_info_files()
+
+    def _import_legacy_info_files(self):
+        """Migration unique: reprendre les info.json d'avant le manifeste"""
+        imported = 0
+        for info_file in self.base_path.glob("*/info.json"):
+            try:
+                with open(info_file, 'r') as f:
+                    info = json.load(f)
+                created_at = datetime.fromisoformat(info["created_at"]).timestamp()
+                expires_at = datetime.fromisoformat(info.get("expires_at", "2000-01-01")).timestamp()
+            except (OSError, ValueError, KeyError) as e:
+                logger.warning(f"Skipping legacy video info {info_file}: {e}")
+                continue
+            self._upsert(info.get("video_id") or info_file.parent.name, info.get("provider", "unknown"),
+                         info.get("video_url"), info.get("local_path"), created_at, expires_at)
+            info_file.unlink()
+            imported += 1
+        if imported:
+            logger.info(f"Imported {imported} legacy video entries into the storage manifest")
+
+    @staticmethod
+    def _file_size(path: Optional[str]) -> int:
+        try:
+            return os.path.getsize(path) if path else 0
+        except OSError:
+            return 0
+
+    def _upsert(self, video_id, provider, video_url, local_path, created_at, expires_at):
+        with self._lock:
+            self._conn.execute(
+                """
+                INSERT INTO videos (video_id, provider, video_url, local_path, size_bytes, created_at, expires_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(video_id) DO UPDATE SET
+                    provider = excluded.provider, video_url = excluded.video_url,
+                    local_path = excluded.local_path, size_bytes = excluded.size_bytes,
+                    created_at = excluded.created_at, expires_at = excluded.expires_at
+                """,
+                (video_id, provider, video_url, local_path, self._file_size(local_path), created_at, expires_at),
+            )
+            self._conn.commit()
+
+    @staticmethod
+    def _to_info(row: sqlite3.Row) -> Dict[str, Any]:
+        return {
+            "video_id": row["video_id"],
+            "provider": row["provider"],
+            "video_url": row["video_url"],
+            "local_path": row["local_path"],
+            "created_at": datetime.fromtimestamp(row["created_at"]).isoformat(),
+            "expires_at": datetime.fromtimestamp(row["expires_at"]).isoformat()
+        }
+
     def save_video_info(
         self,
         video_id: str,
@@ -25,76 +143,78 @@ class VideoStorage:
         local_path: Optional[str] = None
     ) -> Dict[str, Any]:
         """Sauvegarder les infos d'une vidéo"""
-        video_dir = self.base_path / video_id
-        video_dir.mkdir(exist_ok=True)
-        
-        info = {
-            "video_id": video_id,
-            "provider": provider,
-            "video_url": video_url,
-            "local_path": local_path,
-            "created_at": datetime.now().isoformat(),
-            "expires_at": (datetime.now() + timedelta(hours=self.max_age_hours)).isoformat()
-        }
-        
-        # Sauvegarder dans un fichier JSON
-        info_file = video_dir / "info.json"
-        import json
-        with open(info_file, 'w') as f:
-            json.dump(info, f, indent=2)
-        
-        return info
-    
+        (self.base_path / video_id).mkdir(exist_ok=True)  # Fichiers locaux de la vidéo
+
+        now = datetime.now()
+        self._upsert(
+            video_id, provider, video_url, local_path,
+            now.timestamp(), (now + timedelta(hours=self.max_age_hours)).timestamp()
+        )
+        return self.get_video_info(video_id)
+
     def get_video_info(self, video_id: str) -> Optional[Dict[str, Any]]:
         """Obtenir les infos d'une vidéo"""
-        info_file = self.base_path / video_id / "info.json"
-        
-        if info_file.exists():
-            import json
-            with open(info_file, 'r') as f:
-                return json.load(f)
-        return None
-    
-    def cleanup_expired(self) -> int:
-        """Nettoyer les vidéos expirées"""
-        cleaned = 0
-        now = datetime.now()
-        
-        for video_dir in self.base_path.iterdir():
-            if video_dir.is_dir():
-                info_file = video_dir / "info.json"
-                if info_file.exists():
-                    import json
-                    with open(info_file, 'r') as f:
-                        info = json.load(f)
-                    
-                    expires_at = datetime.fromisoformat(info.get("expires_at", "2000-01-01"))
-                    if now > expires_at:
-                        # Supprimer le dossier
-                        shutil.rmtree(video_dir)
-                        cleaned += 1
-        
-        return cleaned
-    
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM videos WHERE video_id = ?", (video_id,)).fetchone()
+        return self._to_info(row) if row else None
+
+    def cleanup_expired(self, limit: Optional[int] = None) -> int:
+        """Nettoyer les vidéos expirées (au plus `limit`, plus anciennes d'abord)"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id FROM videos WHERE expires_at <= ? ORDER BY expires_at LIMIT ?",
+                (time.time(), -1 if limit is None else limit),
+            ).fetchall()
+        if not rows:
+            return 0
+
+        video_ids = [row["video_id"] for row in rows]
+        for video_id in video_ids:
+            shutil.rmtree(self.base_path / video_id, ignore_errors=True)
+
+        with self._lock:
+            self._conn.executemany("DELETE FROM videos WHERE video_id = ?", [(v,) for v in video_ids])
+            self._conn.commit()
+        return len(video_ids)
+
     def get_storage_stats(self) -> Dict[str, Any]:
         """Obtenir les statistiques de stockage"""
-        total_videos = 0
-        total_size = 0
-        
-        for video_dir in self.base_path.iterdir():
-            if video_dir.is_dir():
-                total_videos += 1
-                # Calculer la taille
-                for file in video_dir.rglob("*"):
-                    if file.is_file():
-                        total_size += file.stat().st_size
-        
+        with self._lock:
+            row = self._conn.execute("SELECT total_videos, total_bytes FROM storage_stats WHERE id = 1").fetchone()
+
         return {
-            "total_videos": total_videos,
-            "total_size_mb": round(total_size / (1024 * 1024), 2),
+            "total_videos": row["total_videos"],
+            "total_size_mb": round(row["total_bytes"] / (1024 * 1024), 2),
             "max_age_hours": self.max_age_hours
         }
 
+    # ------------------------------------------------------------------
+    # Nettoyage planifié
+    # ------------------------------------------------------------------
+
+    async def _run(self):
+        while True:
+            try:
+                cleaned = await asyncio.to_thread(self.cleanup_expired, CLEANUP_BATCH)
+            except Exception as e:
+                logger.error(f"Video storage cleanup failed: {e}")
+                cleaned = 0
+            if cleaned:
+                logger.info(f"🧹 {cleaned} expired videos removed")
+            await asyncio.sleep(BACKLOG_DELAY_S if cleaned >= CLEANUP_BATCH else CLEANUP_INTERVAL_S)
+
+    def start(self):
+        """Démarrer le nettoyage périodique sur la boucle courante"""
+        if self._runner and not self._runner.done():
+            return
+        self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
 
-# Singleton instance
-video_storage = VideoStorage()
+# Singleton instance (créé au premier usage ou au warm-up)
+video_storage = provider_registry.register("video_storage", VideoStorage)
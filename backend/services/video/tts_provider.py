@@ -1,31 +1,185 @@
 """
 Text-to-Speech Providers
 Support pour Coqui TTS (gratuit) et ElevenLabs (déjà intégré)
+
+Synthèse hors de la boucle d'événements :
+- pool de processus dédié, modèle Coqui chargé une fois par worker
+- file bornée (backpressure) : au-delà de TTS_MAX_PENDING demandes, refus immédiat
+- cache adressé par contenu (texte, langue, voix) : une narration identique
+  (salutations, introductions de cours) n'est synthétisée qu'une fois,
+  demandes simultanées comprises
+- audio compressé (Opus via ffmpeg si présent), éviction LRU sur disque
 """
+import asyncio
+import hashlib
+import importlib.util
+import json
 import os
+import shutil
+import subprocess
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor
 from typing import Dict, Any, Optional
 from dotenv import load_dotenv
 
 load_dotenv()
 
+COQUI_MODEL = os.getenv("TTS_COQUI_MODEL", "tts_models/fr/css10/vits")
+CACHE_DIR = os.getenv("TTS_CACHE_DIR", "./data/tts_cache")
+CACHE_MAX_BYTES = int(float(os.getenv("TTS_CACHE_MAX_MB", 500)) * 1024 * 1024)
+WORKERS = int(os.getenv("TTS_WORKERS", 2))
+MAX_PENDING = int(os.getenv("TTS_MAX_PENDING", 16))
+AUDIO_EXTENSIONS = ("ogg", "wav")
+
+
+class TTSQueueFull(Exception):
+    """File de synthèse pleine (réessayer plus tard)"""
+
+
+# ----------------------------------------------------------------------
+# Worker (processus du pool)
+# ----------------------------------------------------------------------
+
+_worker_tts = None
+
+
+def _init_worker(model_name: str):
+    """Charger le modèle une seule fois par processus worker"""
+    global _worker_tts
+    from TTS.api import TTS
+    _worker_tts = TTS(model_name=model_name, progress_bar=False)
+
+
+def _synthesize(text: str, language: str, voice: Optional[str], output_base: str) -> str:
+    """
+    Synthétiser puis compresser dans des fichiers temporaires; le fichier final
+    n'apparaît dans le cache (os.replace atomique) qu'une fois complet
+    """
+    tmp_base = f"{output_base}.{os.getpid()}.tmp"
+    wav_path = f"{tmp_base}.wav"
+    kwargs = {"speaker": voice} if voice and getattr(_worker_tts, "is_multi_speaker", False) else {}
+    try:
+        _worker_tts.tts_to_file(text=text, file_path=wav_path, language=language, **kwargs)
+        tmp_path = _compress(wav_path, tmp_base)
+        final_path = output_base + os.path.splitext(tmp_path)[1]
+        os.replace(tmp_path, final_path)
+        return final_path
+    finally:
+        for leftover in (wav_path, f"{tmp_base}.ogg"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+
+
+def _compress(wav_path: str, output_base: str) -> str:
+    """WAV -> Opus (~10x plus petit); WAV conservé si ffmpeg est absent ou échoue"""
+    if not shutil.which("ffmpeg"):
+        return wav_path
+    ogg_path = f"{output_base}.ogg"
+    result = subprocess.run(
+        ["ffmpeg", "-y", "-loglevel", "error", "-i", wav_path, "-c:a", "libopus", "-b:a", "32k", ogg_path],
+        capture_output=True
+    )
+    if result.returncode != 0:
+        return wav_path
+    os.remove(wav_path)
+    return ogg_path
+
+
+# ----------------------------------------------------------------------
+# Cache adressé par contenu
+# ----------------------------------------------------------------------
+
+def audio_key(text: str, language: str, voice: Optional[str]) -> str:
+    """Clé de contenu: même texte, langue et voix -> même fichier"""
+    payload = json.dumps([" ".join(text.split()), language, voice or ""], ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class AudioCache:
+    """Fichiers audio nommés par clé de contenu, éviction LRU (mtime = dernier accès)"""
+    
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self.total_bytes = sum(
+            entry.stat().st_size for entry in os.scandir(directory) if entry.is_file() and ".tmp." not in entry.name
+        )
+    
+    def base_path(self, key: str) -> str:
+        return os.path.join(self.directory, key)
+    
+    def get(self, key: str) -> Optional[str]:
+        """Chemin du fichier en cache (accès enregistré pour le LRU)"""
+        for ext in AUDIO_EXTENSIONS:
+            path = f"{self.base_path(key)}.{ext}"
+            try:
+                os.utime(path)
+                return path
+            except FileNotFoundError:
+                continue
+        return None
+    
+    def added(self, path: str):
+        """Prendre en compte un nouveau fichier puis évincer si besoin"""
+        with self._lock:
+            self.total_bytes += os.path.getsize(path)
+            if self.total_bytes > self.max_bytes:
+                self._evict(keep=path)
+    
+    def _evict(self, keep: str):
+        """Supprimer les moins récemment utilisés jusqu'à 90% de la limite"""
+        entries = sorted(
+            (e for e in os.scandir(self.directory) if e.is_file() and e.path != keep and ".tmp." not in e.name),
+            key=lambda e: e.stat().st_mtime
+        )
+        target = self.max_bytes * 0.9
+        for entry in entries:
+            if self.total_bytes <= target:
+                break
+            try:
+                size = entry.stat().st_size
+                os.remove(entry.path)
+                self.total_bytes -= size
+            except FileNotFoundError:
+                continue
+    
+    def get_stats(self) -> Dict[str, Any]:
+        files = sum(1 for e in os.scandir(self.directory) if e.is_file() and ".tmp." not in e.name)
+        return {
+            "files": files,
+            "size_mb": round(self.total_bytes / 1024 / 1024, 2),
+            "max_mb": round(self.max_bytes / 1024 / 1024, 2)
+        }
+
 
 class TTSProvider:
     """Provider TTS avec fallback"""
     
-    def __init__(self):
+    def __init__(
+        self,
+        cache: Optional[AudioCache] = None,
+        executor: Optional[Executor] = None,
+        max_pending: int = MAX_PENDING
+    ):
         self.providers = []
+        self.cache = cache
+        self.max_pending = max_pending
+        self._executor = executor
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._pending = 0
+        self.stats = {"hits": 0, "coalesced": 0, "synthesized": 0, "rejected": 0}
         self._init_providers()
     
     def _init_providers(self):
         """Initialiser les providers TTS disponibles"""
-        # Coqui TTS (gratuit, local)
-        try:
-            from TTS.api import TTS
+        # Coqui TTS (gratuit, local) - modèle chargé dans les workers, pas ici
+        if importlib.util.find_spec("TTS") is not None:
             self.coqui_available = True
-            self.coqui_tts = TTS(model_name="tts_models/fr/css10/vits", progress_bar=False)
             self.providers.append("coqui")
-            print("[OK] Coqui TTS initialized")
-        except ImportError:
+            print("[OK] Coqui TTS available")
+        else:
             self.coqui_available = False
             print("[WARN] Coqui TTS not available (install: pip install TTS)")
         
@@ -38,6 +192,24 @@ class TTSProvider:
         else:
             self.elevenlabs_available = False
     
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=WORKERS, initializer=_init_worker, initargs=(COQUI_MODEL,)
+            )
+        return self._executor
+    
+    def _get_cache(self) -> AudioCache:
+        if self.cache is None:
+            self.cache = AudioCache()
+        return self.cache
+    
+    def shutdown(self):
+        """Arrêter le pool de workers"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+    
     async def generate_speech(
         self,
         text: str,
@@ -53,29 +225,16 @@ class TTSProvider:
             voice: ID de la voix (optionnel)
         
         Returns:
-            Dict avec audio_url ou audio_data
+            Dict avec audio_path (fichier du cache, ne pas supprimer), cached
         """
+        language = language[:2] if len(language) >= 2 else "fr"
+        
         # Essayer Coqui TTS d'abord (gratuit)
         if self.coqui_available:
             try:
-                import tempfile
-                import os
-                
-                # Générer audio avec Coqui
-                with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as tmp_file:
-                    output_path = tmp_file.name
-                
-                self.coqui_tts.tts_to_file(
-                    text=text,
-                    file_path=output_path,
-                    language=language[:2] if len(language) >= 2 else "fr"
-                )
-                
-                return {
-                    "audio_path": output_path,
-                    "provider": "coqui",
-                    "format": "wav"
-                }
+                return await self._coqui_speech(text, language, voice)
+            except TTSQueueFull:
+                raise
             except Exception as e:
                 print(f"[WARN] Coqui TTS failed: {e}")
         
@@ -91,6 +250,72 @@ class TTSProvider:
         
         raise Exception("No TTS provider available")
     
+    async def _coqui_speech(self, text: str, language: str, voice: Optional[str]) -> Dict[str, Any]:
+        """Synthèse en cours (partagée) -> cache -> nouvelle synthèse dans le pool"""
+        cache = self._get_cache()
+        key = audio_key(text, language, voice)
+        
+        # Avant le cache: une synthèse en cours n'est servie qu'une fois terminée
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.stats["coalesced"] += 1
+            return self._result(key, await asyncio.shield(inflight), cached=True)
+        
+        path = await asyncio.to_thread(cache.get, key)
+        if path:
+            self.stats["hits"] += 1
+            return self._result(key, path, cached=True)
+        
+        inflight = self._inflight.get(key)
+        if inflight is not None:  # Démarrée pendant la lecture du cache
+            self.stats["coalesced"] += 1
+            return self._result(key, await asyncio.shield(inflight), cached=True)
+        
+        if self._pending >= self.max_pending:
+            self.stats["rejected"] += 1
+            raise TTSQueueFull(f"TTS queue full ({self.max_pending} pending)")
+        
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        self._pending += 1
+        try:
+            path = await asyncio.get_running_loop().run_in_executor(
+                self._get_executor(), _synthesize, text, language, voice, cache.base_path(key)
+            )
+            await asyncio.to_thread(cache.added, path)
+            self.stats["synthesized"] += 1
+            future.set_result(path)
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Marquer comme lue si personne n'attend
+            raise
+        finally:
+            if not future.done():
+                future.cancel()
+            self._pending -= 1
+            del self._inflight[key]
+        return self._result(key, path, cached=False)
+    
+    @staticmethod
+    def _result(key: str, path: str, cached: bool) -> Dict[str, Any]:
+        return {
+            "audio_path": path,
+            "audio_key": key,
+            "provider": "coqui",
+            "format": os.path.splitext(path)[1].lstrip("."),
+            "cached": cached
+        }
+    
+    def get_queue_stats(self) -> Dict[str, Any]:
+        """Statistiques de la file de synthèse et du cache audio"""
+        return {
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "workers": WORKERS,
+            **self.stats,
+            "cache": self._get_cache().get_stats()
+        }
+    
     def get_available_voices(self, language: str = "fr") -> list:
         """Obtenir les voix disponibles"""
         voices = []
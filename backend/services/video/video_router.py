@@ -6,6 +6,8 @@ import os
 from typing import Dict, Any, Optional
 from .did_provider import did_provider
 from .tts_provider import tts_provider
+from .queue_manager import video_queue, VideoProvider
+from .storage_manager import video_storage
 
 
 class VideoRouter:
@@ -88,10 +90,11 @@ class VideoRouter:
     async def generate_audio(
         self,
         text: str,
-        language: str = "fr"
+        language: str = "fr",
+        voice: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Générer audio à partir de texte"""
-        return await tts_provider.generate_speech(text, language)
+        """Générer audio à partir de texte (cache par texte, langue et voix)"""
+        return await tts_provider.generate_speech(text, language, voice)
     
     def get_status(self) -> Dict[str, Any]:
         """Obtenir le statut du router"""
@@ -99,9 +102,37 @@ class VideoRouter:
             "providers": [p["name"] for p in self.providers],
             "d_id_available": did_provider.available,
             "wav2lip_available": self.wav2lip_available,
-            "tts_available": tts_provider.coqui_available or tts_provider.elevenlabs_available
+            "tts_available": tts_provider.coqui_available or tts_provider.elevenlabs_available,
+            "tts_queue": tts_provider.get_queue_stats()
         }
 
 
 # Singleton instance
 video_router = VideoRouter()
+
+
+async def _submit_avatar(params: Dict[str, Any]) -> Dict[str, Any]:
+    return await video_router.create_talking_avatar(**params)
+
+
+async def _poll_did(video_id: str) -> Dict[str, Any]:
+    return await video_router.get_video_status(video_id, "d-id")
+
+
+def _store_result(job: Dict[str, Any]):
+    """Rendu terminé: conserver l'URL dans le stockage local"""
+    video_storage.save_video_info(
+        video_id=job["video_id"],
+        provider=job["provider"],
+        video_url=job.get("result_url")
+    )
+
+
+# Jobs D-ID: soumission et statut gérés par le planificateur de la file persistante
+video_queue.register_provider(VideoProvider(
+    name="d-id",
+    submit=_submit_avatar,
+    poll=_poll_did,
+    max_concurrent=int(os.getenv("VIDEO_MAX_CONCURRENT_DID", 3)),
+    on_done=_store_result
+))
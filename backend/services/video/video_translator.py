@@ -4,7 +4,7 @@ Video Translator - Traduction de vidéos existantes
 from typing import Dict, Any, Optional
 import asyncio
 from services.video.video_router import video_router
-from services.external_apis.translation import TranslationRouter
+from services.external_apis.translation import translation_router
 
 
 class VideoTranslator:
@@ -12,7 +12,7 @@ class VideoTranslator:
     
     def __init__(self):
         self.video_router = video_router
-        self.translation_router = TranslationRouter()
+        self.translation_router = translation_router
     
     async def translate_video(
         self,
@@ -1,22 +1,53 @@
 """
 Webhook System
 Notifications pour événements importants
+
+Livraison découplée des requêtes :
+- trigger() ne fait qu'inscrire la livraison dans une file durable (SQLite,
+  data/webhooks.db): aucune attente réseau dans la requête de l'appelant,
+  les livraisons en attente survivent à un redémarrage
+- pool de workers en tâche de fond sur le client HTTP partagé, avec une
+  limite de livraisons simultanées par endpoint
+- retries planifiés dans la file (backoff exponentiel avec jitter), plus de
+  sleep dans la boucle d'envoi
+- événements fréquents (request.completed) regroupés en un seul payload signé:
+  la fenêtre démarre au plus ancien événement en attente du lot
+- réservations avec bail (lease): seules les livraisons dont le bail a expiré
+  (processus arrêté pendant l'envoi) sont reprises par un autre worker
 """
 import os
 import hashlib
 import hmac
+import random
+import sqlite3
+import threading
 import time
 import json
 import asyncio
 import logging
-from typing import Dict, Any, List, Optional, Callable
+from collections import deque
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Callable, Set, Tuple
 from datetime import datetime
 from dataclasses import dataclass, field
 from enum import Enum
-import httpx
+
+from services.http_client import http_client
 
 logger = logging.getLogger(__name__)
 
+# Pool de workers et file
+WORKERS = int(os.getenv("WEBHOOK_WORKERS", 4))
+IDLE_POLL_S = 5.0
+ERROR_BACKOFF_MAX_S = 30.0  # Pause max d'un worker après des erreurs répétées (base verrouillée...)
+LEASE_S = float(os.getenv("WEBHOOK_LEASE_S", 60))  # Durée d'une réservation (> timeout d'envoi)
+BACKOFF_BASE_S = float(os.getenv("WEBHOOK_BACKOFF_BASE_S", 2))
+BACKOFF_MAX_S = float(os.getenv("WEBHOOK_BACKOFF_MAX_S", 300))
+
+# Regroupement des événements fréquents: fenêtre d'accumulation et taille max d'un lot
+BATCH_WINDOW_S = float(os.getenv("WEBHOOK_BATCH_WINDOW_S", 5))
+BATCH_MAX = int(os.getenv("WEBHOOK_BATCH_MAX", 100))
+
 
 class WebhookEvent(str, Enum):
     """Types d'événements webhook"""
@@ -40,6 +71,7 @@ class WebhookConfig:
     active: bool = True
     retry_count: int = 3
     timeout: float = 10.0
+    max_concurrency: int = 2  # Livraisons simultanées vers cet endpoint
     created_at: datetime = field(default_factory=datetime.now)
 
 
@@ -52,14 +84,204 @@ class WebhookPayload:
     webhook_id: str = ""
 
 
+def _batched_events() -> Set[WebhookEvent]:
+    """Événements regroupés (WEBHOOK_BATCH_EVENTS, vide = aucun)"""
+    events = set()
+    for name in os.getenv("WEBHOOK_BATCH_EVENTS", WebhookEvent.REQUEST_COMPLETED.value).split(","):
+        if name.strip():
+            try:
+                events.add(WebhookEvent(name.strip()))
+            except ValueError:
+                logger.warning(f"Unknown webhook batch event: {name}")
+    return events
+
+
+def backoff_delay(attempts: int) -> float:
+    """Backoff exponentiel avec jitter complet (évite les retries synchronisés)"""
+    return random.uniform(0, min(BACKOFF_MAX_S, BACKOFF_BASE_S * 2 ** attempts))
+
+
+class DeliveryQueue:
+    """
+    File de livraisons persistante (SQLite WAL).
+
+    pending -> in_flight (bail lease_until) -> supprimée (livrée) | failed (dead letter)
+    Les livraisons in_flight dont le bail a expiré (processus arrêté pendant
+    l'envoi) repassent pending; celles d'un autre processus actif sont laissées.
+    """
+
+    def __init__(self, db_path: str = "./data/webhooks.db"):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        with self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS webhook_deliveries (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    webhook_id TEXT NOT NULL,
+                    event TEXT NOT NULL,
+                    data TEXT NOT NULL,
+                    timestamp TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at REAL NOT NULL,
+                    last_error TEXT,
+                    lease_until REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_deliveries_due
+                ON webhook_deliveries(status, next_attempt_at);
+                CREATE INDEX IF NOT EXISTS idx_deliveries_batch
+                ON webhook_deliveries(webhook_id, event, status);
+            """)
+            columns = {row["name"] for row in self._conn.execute("PRAGMA table_info(webhook_deliveries)")}
+            if "lease_until" not in columns:
+                self._conn.execute("ALTER TABLE webhook_deliveries ADD COLUMN lease_until REAL")
+
+    def enqueue(
+        self,
+        webhook_id: str,
+        event: str,
+        data: Dict[str, Any],
+        delay: float = 0.0,
+        batch_window: Optional[float] = None
+    ) -> int:
+        """
+        Inscrire une livraison. Avec `batch_window`, l'échéance est celle du lot
+        en attente (même endpoint, même événement) ou, sans lot, maintenant + fenêtre.
+        """
+        values = (webhook_id, event, json.dumps(data, default=str), datetime.now().isoformat())
+        with self._lock, self._conn:
+            if batch_window is None:
+                cursor = self._conn.execute(
+                    "INSERT INTO webhook_deliveries (webhook_id, event, data, timestamp, next_attempt_at) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    (*values, time.time() + delay),
+                )
+            else:
+                cursor = self._conn.execute(
+                    "INSERT INTO webhook_deliveries (webhook_id, event, data, timestamp, next_attempt_at) "
+                    "SELECT ?, ?, ?, ?, COALESCE(MIN(next_attempt_at), ?) FROM webhook_deliveries "
+                    "WHERE webhook_id = ? AND event = ? AND status = 'pending' AND attempts = 0",
+                    (*values, time.time() + batch_window, webhook_id, event),
+                )
+            return cursor.lastrowid
+
+    def recover(self) -> int:
+        """Remettre en attente les livraisons dont le bail a expiré (arrêt pendant l'envoi)"""
+        with self._lock, self._conn:
+            return self._conn.execute(
+                "UPDATE webhook_deliveries SET status = 'pending', lease_until = NULL "
+                "WHERE status = 'in_flight' AND (lease_until IS NULL OR lease_until <= ?)",
+                (time.time(),),
+            ).rowcount
+
+    def claim(
+        self,
+        exclude: Set[str],
+        batch_events: Set[str],
+        batch_max: int = BATCH_MAX,
+        lease_s: Optional[float] = None
+    ) -> Optional[Tuple[str, str, List[sqlite3.Row]]]:
+        """
+        Réserver la prochaine livraison due (hors endpoints saturés) pour `lease_s`.
+        Pour un événement regroupé, toutes les livraisons en attente du même
+        endpoint et du même événement sont réservées ensemble, quelle que soit
+        leur échéance (le lot part quand son plus ancien événement est dû).
+        """
+        now = time.time()
+        lease_until = now + (LEASE_S if lease_s is None else lease_s)
+        with self._lock, self._conn:
+            excluded = ",".join("?" * len(exclude))
+            row = self._conn.execute(
+                f"SELECT * FROM webhook_deliveries WHERE status = 'pending' AND next_attempt_at <= ? "
+                f"{f'AND webhook_id NOT IN ({excluded})' if exclude else ''} "
+                f"ORDER BY next_attempt_at LIMIT 1",
+                (now, *exclude),
+            ).fetchone()
+            if row is None:
+                return None
+            rows = [row]
+            if row["event"] in batch_events:
+                rows = self._conn.execute(
+                    "SELECT * FROM webhook_deliveries WHERE status = 'pending' "
+                    "AND webhook_id = ? AND event = ? ORDER BY id LIMIT ?",
+                    (row["webhook_id"], row["event"], batch_max),
+                ).fetchall()
+            ids = [r["id"] for r in rows]
+            # Réservation conditionnelle: un autre processus peut partager la base
+            claimed = self._conn.execute(
+                f"UPDATE webhook_deliveries SET status = 'in_flight', lease_until = ? "
+                f"WHERE status = 'pending' AND id IN ({','.join('?' * len(ids))})",
+                (lease_until, *ids),
+            ).rowcount
+            if claimed != len(ids):
+                self._conn.rollback()
+                return None
+            return row["webhook_id"], row["event"], rows
+
+    def complete(self, ids: List[int]):
+        with self._lock, self._conn:
+            self._conn.execute(f"DELETE FROM webhook_deliveries WHERE id IN ({','.join('?' * len(ids))})", ids)
+
+    def retry(self, ids: List[int], delay: float, error: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE webhook_deliveries SET status = 'pending', attempts = attempts + 1, "
+                f"next_attempt_at = ?, last_error = ?, lease_until = NULL WHERE id IN ({','.join('?' * len(ids))})",
+                (time.time() + delay, error[:500], *ids),
+            )
+
+    def fail(self, ids: List[int], error: str):
+        with self._lock, self._conn:
+            self._conn.execute(
+                f"UPDATE webhook_deliveries SET status = 'failed', attempts = attempts + 1, last_error = ? "
+                f"WHERE id IN ({','.join('?' * len(ids))})",
+                (error[:500], *ids),
+            )
+
+    def next_due_in(self) -> Optional[float]:
+        """Secondes avant la prochaine livraison en attente"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT MIN(next_attempt_at) FROM webhook_deliveries WHERE status = 'pending'"
+            ).fetchone()
+        return None if row[0] is None else max(row[0] - time.time(), 0.0)
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT status, COUNT(*) FROM webhook_deliveries GROUP BY status"
+            ).fetchall()
+        return {status: count for status, count in rows}
+
+
 class WebhookManager:
     """Gestionnaire de webhooks"""
     
-    def __init__(self):
+    def __init__(self, db_path: Optional[str] = None, workers: int = WORKERS):
         self.webhooks: Dict[str, WebhookConfig] = {}
-        self.delivery_history: List[Dict[str, Any]] = []
+        self.delivery_history: deque = deque(maxlen=1000)
+        self.db_path = db_path or os.getenv("WEBHOOK_QUEUE_PATH", "./data/webhooks.db")
+        self._queue: Optional[DeliveryQueue] = None
+        self.batched_events = {event.value for event in _batched_events()}
+        self.workers = workers
+        self._tasks: List[asyncio.Task] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._claim_lock: Optional[asyncio.Lock] = None
+        self._in_flight: Dict[str, int] = {}
         self._load_webhooks_from_env()
     
+    @property
+    def queue(self) -> DeliveryQueue:
+        """File durable, ouverte au premier usage (pas de fichier créé à l'import)"""
+        if self._queue is None:
+            self._queue = DeliveryQueue(self.db_path)
+        return self._queue
+    
     def _load_webhooks_from_env(self):
         """Charger les webhooks depuis les variables d'environnement"""
         # Format: WEBHOOK_1_URL, WEBHOOK_1_SECRET, WEBHOOK_1_EVENTS
@@ -85,7 +307,8 @@ class WebhookManager:
                     id=f"webhook_{i}",
                     url=url,
                     secret=secret,
-                    events=events
+                    events=events,
+                    max_concurrency=int(os.getenv(f"WEBHOOK_{i}_CONCURRENCY", 2))
                 )
                 self.webhooks[webhook.id] = webhook
                 logger.info(f"Loaded webhook: {webhook.id} -> {url}")
@@ -114,23 +337,117 @@ class WebhookManager:
             hashlib.sha256
         ).hexdigest()
     
-    async def _send_webhook(
-        self,
-        webhook: WebhookConfig,
-        payload: WebhookPayload
-    ) -> bool:
-        """Envoyer un webhook avec retry"""
-        payload_dict = {
-            "event": payload.event.value,
-            "data": payload.data,
-            "timestamp": payload.timestamp,
-            "webhook_id": webhook.id
+    # ------------------------------------------------------------------
+    # Pool de workers
+    # ------------------------------------------------------------------
+    
+    @property
+    def running(self) -> bool:
+        return any(not task.done() for task in self._tasks)
+    
+    def start(self):
+        """Démarrer les workers sur la boucle courante (reprise des livraisons au bail expiré)"""
+        if self.running:
+            return
+        recovered = self.queue.recover()
+        if recovered:
+            logger.info(f"Webhook deliveries recovered: {recovered}")
+        self._wakeup = asyncio.Event()
+        self._claim_lock = asyncio.Lock()
+        self._in_flight = {}
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+    
+    async def stop(self):
+        """Arrêter les workers (les livraisons en cours seront reprises à l'expiration de leur bail)"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+    
+    def _saturated(self) -> Set[str]:
+        return {
+            webhook_id for webhook_id, count in self._in_flight.items()
+            if webhook_id in self.webhooks and count >= self.webhooks[webhook_id].max_concurrency
         }
-        payload_json = json.dumps(payload_dict)
+    
+    async def _worker(self):
+        errors = 0
+        while True:
+            try:
+                await self._work_once()
+                errors = 0
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # Erreur de base (database is locked...) ou de livraison: le worker survit
+                errors += 1
+                delay = min(ERROR_BACKOFF_MAX_S, 0.5 * 2 ** min(errors, 6))
+                logger.error(f"Webhook worker error (retry in {delay:.1f}s): {e}", exc_info=True)
+                await asyncio.sleep(delay)
+    
+    async def _work_once(self):
+        """Une réservation et sa livraison, ou une attente si rien n'est dû"""
+        # Réservation + compteur par endpoint sous verrou: limite de concurrence exacte
+        async with self._claim_lock:
+            claimed = await asyncio.to_thread(self.queue.claim, self._saturated(), self.batched_events)
+            if claimed is not None:
+                self._in_flight[claimed[0]] = self._in_flight.get(claimed[0], 0) + 1
         
+        if claimed is None:
+            # Rien de dû: reprendre les baux expirés, attendre un nouvel événement ou la prochaine échéance
+            recovered = await asyncio.to_thread(self.queue.recover)
+            if recovered:
+                logger.info(f"Webhook deliveries recovered (lease expired): {recovered}")
+                return
+            due_in = await asyncio.to_thread(self.queue.next_due_in)
+            timeout = IDLE_POLL_S if due_in is None else min(max(due_in, 0.05), IDLE_POLL_S)
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+            return
+        
+        webhook_id, event, rows = claimed
+        try:
+            await self._deliver(webhook_id, event, rows)
+        finally:
+            self._in_flight[webhook_id] -= 1
+    
+    # ------------------------------------------------------------------
+    # Livraison
+    # ------------------------------------------------------------------
+    
+    def _build_payload(self, webhook_id: str, event: str, rows: List[sqlite3.Row]) -> Dict[str, Any]:
+        """Payload unitaire (format historique) ou lot d'événements regroupés"""
+        if len(rows) == 1 and event not in self.batched_events:
+            return {
+                "event": event,
+                "data": json.loads(rows[0]["data"]),
+                "timestamp": rows[0]["timestamp"],
+                "webhook_id": webhook_id
+            }
+        return {
+            "event": event,
+            "batch": True,
+            "count": len(rows),
+            "data": [{"data": json.loads(row["data"]), "timestamp": row["timestamp"]} for row in rows],
+            "timestamp": datetime.now().isoformat(),
+            "webhook_id": webhook_id
+        }
+    
+    async def _deliver(self, webhook_id: str, event: str, rows: List[sqlite3.Row]) -> bool:
+        """Un envoi signé; en cas d'échec, retry planifié dans la file ou dead letter"""
+        ids = [row["id"] for row in rows]
+        webhook = self.webhooks.get(webhook_id)
+        if webhook is None or not webhook.active:
+            await asyncio.to_thread(self.queue.fail, ids, "webhook removed or inactive")
+            return False
+        
+        payload_json = json.dumps(self._build_payload(webhook_id, event, rows))
         headers = {
             "Content-Type": "application/json",
-            "X-Webhook-Event": payload.event.value,
+            "X-Webhook-Event": event,
             "X-Webhook-Timestamp": str(int(time.time())),
         }
         
@@ -139,67 +456,64 @@ class WebhookManager:
             signature = self._generate_signature(payload_json, webhook.secret)
             headers["X-Webhook-Signature"] = f"sha256={signature}"
         
-        # Retry logic
-        for attempt in range(webhook.retry_count):
-            try:
-                async with httpx.AsyncClient(timeout=webhook.timeout) as client:
-                    response = await client.post(
-                        webhook.url,
-                        content=payload_json,
-                        headers=headers
-                    )
-                    
-                    if response.status_code in [200, 201, 202, 204]:
-                        self._record_delivery(webhook.id, payload.event, True)
-                        logger.info(f"Webhook sent: {webhook.id} -> {payload.event.value}")
-                        return True
-                    else:
-                        logger.warning(
-                            f"Webhook failed: {webhook.id} -> {response.status_code}"
-                        )
-            
-            except Exception as e:
-                logger.error(f"Webhook error: {webhook.id} -> {e}")
-            
-            # Attendre avant retry (backoff exponentiel)
-            if attempt < webhook.retry_count - 1:
-                await asyncio.sleep(2 ** attempt)
+        error = None
+        try:
+            response = await http_client.post(
+                webhook.url,
+                content=payload_json,
+                headers=headers,
+                timeout=webhook.timeout
+            )
+            if response.status_code in [200, 201, 202, 204]:
+                await asyncio.to_thread(self.queue.complete, ids)
+                self._record_delivery(webhook_id, event, True, len(rows))
+                logger.info(f"Webhook sent: {webhook_id} -> {event} ({len(rows)})")
+                return True
+            error = f"HTTP {response.status_code}"
+        except Exception as e:
+            error = str(e) or type(e).__name__
         
-        self._record_delivery(webhook.id, payload.event, False)
+        logger.warning(f"Webhook failed: {webhook_id} -> {error}")
+        attempts = max(row["attempts"] for row in rows) + 1
+        if attempts >= webhook.retry_count:
+            await asyncio.to_thread(self.queue.fail, ids, error)
+            self._record_delivery(webhook_id, event, False, len(rows))
+        else:
+            await asyncio.to_thread(self.queue.retry, ids, backoff_delay(attempts), error)
         return False
     
-    def _record_delivery(self, webhook_id: str, event: WebhookEvent, success: bool):
-        """Enregistrer l'historique de livraison"""
+    def _record_delivery(self, webhook_id: str, event: str, success: bool, count: int = 1):
+        """Enregistrer l'historique de livraison (1000 derniers)"""
         self.delivery_history.append({
             "webhook_id": webhook_id,
-            "event": event.value,
+            "event": event,
             "success": success,
+            "count": count,
             "timestamp": datetime.now().isoformat()
         })
-        
-        # Garder seulement les 1000 derniers
-        if len(self.delivery_history) > 1000:
-            self.delivery_history = self.delivery_history[-1000:]
     
-    async def trigger(self, event: WebhookEvent, data: Dict[str, Any]):
-        """Déclencher un événement webhook"""
-        payload = WebhookPayload(event=event, data=data)
+    async def trigger(self, event: WebhookEvent, data: Dict[str, Any]) -> List[int]:
+        """Déclencher un événement webhook (inscription dans la file, sans envoi réseau)"""
+        targets = [w for w in self.webhooks.values() if w.active and event in w.events]
+        if not targets:
+            return []
         
-        # Trouver tous les webhooks qui écoutent cet événement
-        tasks = []
-        for webhook in self.webhooks.values():
-            if webhook.active and event in webhook.events:
-                tasks.append(self._send_webhook(webhook, payload))
+        # Événements regroupés: le lot part à la fin de la fenêtre ouverte par son plus ancien événement
+        window = BATCH_WINDOW_S if event.value in self.batched_events else None
+        ids = await asyncio.to_thread(
+            lambda: [self.queue.enqueue(w.id, event.value, data, batch_window=window) for w in targets]
+        )
         
-        # Envoyer en parallèle
-        if tasks:
-            await asyncio.gather(*tasks, return_exceptions=True)
+        if not self.running:
+            self.start()
+        self._wakeup.set()
+        return ids
     
     def get_delivery_history(self, webhook_id: Optional[str] = None) -> List[Dict[str, Any]]:
         """Obtenir l'historique de livraison"""
         if webhook_id:
             return [h for h in self.delivery_history if h["webhook_id"] == webhook_id]
-        return self.delivery_history
+        return list(self.delivery_history)
     
     def get_status(self) -> Dict[str, Any]:
         """Obtenir le statut des webhooks"""
@@ -207,12 +521,19 @@ class WebhookManager:
             "total_webhooks": len(self.webhooks),
             "active_webhooks": sum(1 for w in self.webhooks.values() if w.active),
             "recent_deliveries": len(self.delivery_history),
+            "queue": {
+                "workers": len(self._tasks),
+                "in_flight": {k: v for k, v in self._in_flight.items() if v},
+                "batched_events": sorted(self.batched_events),
+                **(self._queue.counts() if self._queue is not None else {})
+            },
             "webhooks": [
                 {
                     "id": w.id,
                     "url": w.url[:50] + "..." if len(w.url) > 50 else w.url,
                     "events": [e.value for e in w.events],
-                    "active": w.active
+                    "active": w.active,
+                    "max_concurrency": w.max_concurrency
                 }
                 for w in self.webhooks.values()
             ]
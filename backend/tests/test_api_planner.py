@@ -0,0 +1,114 @@
+"""
+Tests pour le planificateur adaptatif des APIs de la recherche IA
+"""
+import asyncio
+import pytest
+
+import services.ai_search_engine as engine_module
+import services.hedging as hedging
+from services.ai_search_engine import AISearchEngine, SearchIntent
+from services.api_planner import APIPlanner
+
+
+@pytest.fixture
+def planner(tmp_path):
+    return APIPlanner(path=str(tmp_path / "stats.json"))
+
+
+def _observe(planner, api, latency_ms, n=10, ok=True, useful=True, intent="realtime"):
+    for _ in range(n):
+        planner.record(api, latency_ms, ok=ok, useful=useful, intent=intent)
+
+
+def test_plan_prefers_fast_useful_apis_and_drops_bad_ones(planner):
+    """Tri par utilité/latence, APIs hors budget, en erreur ou inutiles écartées"""
+    _observe(planner, "slow", 5000)
+    _observe(planner, "broken", 50, ok=False, useful=False)
+    _observe(planner, "useless", 50, useful=False)
+    _observe(planner, "fast", 80)
+    _observe(planner, "medium", 400)
+
+    decision = planner.plan(
+        {"finance": ["slow", "broken", "useless", "medium", "fast"]},
+        intent="realtime",
+        latency_budget_ms=3000,
+    )
+    assert decision.apis == ["fast", "medium"]
+    assert set(decision.dropped) == {"slow", "broken", "useless"}
+    assert decision.dropped["useless"].startswith("rarely_useful[realtime]")
+
+    # Pour une autre intention, "useless" n'est pas jugée
+    other = planner.plan({"finance": ["useless"]}, intent="analysis", latency_budget_ms=3000)
+    assert other.apis == ["useless"]
+
+
+def test_plan_hedges_slow_api_and_keeps_fallback(planner):
+    """Doublure pour une API lente; catégorie jamais vide"""
+    _observe(planner, "primary", 1800)
+    decision = planner.plan({"weather": ["primary", "backup"]}, latency_budget_ms=3000, per_category=1)
+    assert decision.apis == ["backup"]  # Inconnue = optimiste
+
+    _observe(planner, "backup", 2000)
+    decision = planner.plan({"weather": ["primary", "backup"]}, latency_budget_ms=3000, per_category=1)
+    assert decision.apis == ["primary"]
+    assert decision.hedges == {"primary": "backup"}
+    assert decision.hedge_delays_ms["primary"] == 1500  # min(p50, budget * 0.5)
+
+    # Catégorie de 2 APIs avec per_category par défaut: la seconde devient la doublure
+    decision = planner.plan({"weather": ["primary", "backup"]}, latency_budget_ms=3000)
+    assert decision.apis == ["primary"] and decision.hedges == {"primary": "backup"}
+
+    _observe(planner, "primary", 9000, n=30)
+    _observe(planner, "backup", 9000, n=30)
+    decision = planner.plan({"weather": ["primary", "backup"]}, latency_budget_ms=3000)
+    assert len(decision.apis) == 1
+
+
+def test_stats_persisted_across_restarts(planner):
+    """Sauvegarde JSON puis rechargement paresseux"""
+    _observe(planner, "coincap", 120, n=6)
+    planner.record("coincap", 900, cancelled=True)
+    asyncio.run(planner.save())
+
+    reloaded = APIPlanner(path=planner.path)
+    stats = reloaded.get_stats()["apis"]["coincap"]
+    assert stats["calls"] == pytest.approx(6, rel=0.01)
+    assert stats["useful_rate"] == 1.0
+    assert stats["latency_ms"]["p99"] == 900
+
+    reloaded.reset()
+    asyncio.run(reloaded.save())
+    assert APIPlanner(path=planner.path).get_stats()["apis"] == {}
+
+
+async def test_execute_search_hedges_and_records(planner, monkeypatch):
+    """La doublure répond avant l'API lente; appels mesurés et budget respecté"""
+    monkeypatch.setattr(engine_module, "api_planner", planner)
+    monkeypatch.setattr(hedging, "api_planner", planner)
+    engine = AISearchEngine()
+    calls = []
+
+    async def fake_call(api_name, plan):
+        calls.append(api_name)
+        delays = {"coingecko": 5, "coincap": 0.01, "wikipedia": 0.01}
+        await asyncio.sleep(delays[api_name])
+        return 200, {"api": api_name}
+
+    monkeypatch.setattr(engine, "_call_api", fake_call)
+    _observe(planner, "coingecko", 1000)
+    _observe(planner, "coincap", 1200)
+
+    plan = await engine.create_search_plan(
+        "prix bitcoin",
+        {"intent": "realtime", "freshness": "realtime", "entities": ["bitcoin"], "categories": ["finance_crypto"]},
+    )
+    assert plan.apis_to_call == ["coincap"] and plan.dropped_apis["coingecko"] == "no_endpoint"
+    plan.hedges, plan.hedge_delays_ms = {"coingecko": "coincap"}, {"coingecko": 20}
+    plan.apis_to_call = ["coingecko", "wikipedia"]
+    plan.latency_budget_ms = 1000
+
+    results = await engine.execute_search(plan)
+    assert results == {"coincap": {"api": "coincap"}, "wikipedia": {"api": "wikipedia"}}
+    assert sorted(calls) == ["coincap", "coingecko", "wikipedia"]
+    assert planner.stats["wikipedia"].calls == 1
+    assert plan.intent == SearchIntent.REALTIME
@@ -5,6 +5,7 @@ import pytest
 from services.assistant.memory_store import MemoryStore
 from services.assistant.preference_learner import PreferenceLearner
 from services.assistant.assistant_router import AssistantRouter
+from services.assistant.automation_engine import AutomationEngine, InteractionColumns, analyze_columns
 import os
 import tempfile
 
@@ -121,6 +122,8 @@ class TestAssistantRouter:
         """Créer un router avec base de données temporaire"""
         router = AssistantRouter()
         router.memory_store = temp_db
+        router.preference_learner = PreferenceLearner()
+        router.preference_learner.memory_store = temp_db
         return router
     
     @pytest.mark.asyncio
@@ -157,9 +160,121 @@ class TestAssistantRouter:
         # Peut être vide si pas assez de données
         assert isinstance(recommendations["recommendations"], list)
     
+    async def test_incremental_profile_matches_rebuild(self, router, temp_db):
+        """Mise à jour par interaction sans relecture; recalcul complet identique"""
+        calls = []
+        original = temp_db.iter_interactions
+        temp_db.iter_interactions = lambda user_id, **kw: calls.append(user_id) or original(user_id, **kw)
+        
+        for i in range(30):
+            category = "finance" if i % 3 else "news"
+            result = await router.learn_from_interaction("u1", f"bitcoin cours {i % 2}", category)
+        assert result["total_interactions"] == 30 and calls == []
+        
+        incremental = router.preference_learner.get_user_preferences("u1")
+        assert incremental["finance"]["weight"] == pytest.approx(2 / 3, rel=0.01)
+        assert incremental["finance"]["keywords"][:2] == ["bitcoin", "cours"]
+        assert "preferred_hour" in incremental["_time_patterns"]
+        
+        rebuilt = router.preference_learner.learn_from_interactions("u1")
+        assert rebuilt["finance"]["weight"] == pytest.approx(incremental["finance"]["weight"], rel=0.01)
+        assert temp_db.profiles_to_reconcile(older_than=0) == []
+    
+    def test_reconcile_replays_concurrent_interactions(self, temp_db):
+        """Interaction arrivée pendant le recalcul: rejouée une fois, pas de double comptage"""
+        learner = PreferenceLearner()
+        learner.memory_store = temp_db
+        for _ in range(3):
+            temp_db.save_interaction("u3", "bourse", "finance")
+        
+        original = temp_db.iter_interactions
+        pending = []
+        
+        def iter_then_insert(user_id, after_id=0):
+            yield from original(user_id, after_id=after_id)
+            if after_id == 0:  # Fin du parcours: une requête concurrente écrit
+                pending.append(temp_db.save_interaction("u3", "match", "sport"))
+        
+        temp_db.iter_interactions = iter_then_insert
+        preferences = learner.learn_from_interactions("u3")
+        temp_db.iter_interactions = original
+        assert set(preferences) >= {"finance", "sport"}
+        
+        # L'observation incrémentale de cette interaction arrive après le recalcul
+        profile = learner.observe_interaction("u3", "match", "sport", interaction_id=pending[0])
+        assert profile["n"] == 4
+    
+    def test_users_without_interactions_leave_reconcile_queue(self, temp_db):
+        """Utilisateur sans interaction: profil vide écrit, les autres sont traités ensuite"""
+        learner = PreferenceLearner()
+        learner.memory_store = temp_db
+        temp_db.save_preferences("empty", {"finance": {"weight": 1, "manual": True}})
+        temp_db.save_interaction("active", "bourse", "finance")
+        
+        assert learner.reconcile(limit=1) == 1
+        assert learner.reconcile(limit=1) == 1
+        assert temp_db.profiles_to_reconcile(older_than=0) == []
+        assert temp_db.get_profile("empty")["n"] == 0
+    
+    def test_decay_favours_recent_interest(self, temp_db):
+        """Demi-vie: une catégorie ancienne pèse moins qu'une récente à volume égal"""
+        from services.assistant import preference_learner as learner_module
+        learner = PreferenceLearner()
+        learner.memory_store = temp_db
+        now = 1_700_000_000
+        old = now - 60 * 86400  # Deux demi-vies
+        for _ in range(4):
+            learner.observe_interaction("u2", "match foot", "sport", timestamp=old)
+        for _ in range(4):
+            learner.observe_interaction("u2", "bourse", "finance", timestamp=now)
+        
+        preferences = learner_module.to_preferences(temp_db.get_profile("u2"), now=now)
+        assert preferences["finance"]["weight"] == pytest.approx(0.8)
+        assert preferences["sport"]["frequency"] == pytest.approx(1.0)
+    
     def test_get_user_profile(self, router):
         """Test profil utilisateur"""
         profile = router.get_user_profile("test_user")
         assert "user_id" in profile or "total_interactions" in profile
 
 
+class TestAutomationEngine:
+    """Tests pour l'analyse de routine en colonnes"""
+    
+    def test_histograms_periodicity_and_co_occurrence(self):
+        """Histogrammes, créneau par catégorie, période hebdomadaire, co-occurrences"""
+        monday = 4 * 86400  # 1970-01-05, un lundi
+        rows = []
+        for week in range(4):
+            day = monday + week * 7 * 86400
+            rows += [(day + 8 * 3600, "news"), (day + 8 * 3600 + 600, "finance"), (day + 8 * 3600 + 900, "weather")]
+            rows.append((day + 2 * 86400 + 20 * 3600, None))  # Mercredi soir, sans catégorie
+        
+        analysis = analyze_columns(InteractionColumns.from_rows(list(reversed(rows))), days=28)
+        assert analysis["total_interactions"] == 16
+        assert analysis["most_active_hour"] == 8 and analysis["most_active_day"] == 0
+        assert analysis["hour_histogram"][8] == 12 and analysis["day_histogram"][2] == 4
+        assert analysis["categories_used"] == {"weather": 4, "finance": 4, "news": 4}
+        assert analysis["periodicity"]["period_days"] == 7
+        
+        by_type = {}
+        for pattern in analysis["routine_patterns"]:
+            by_type.setdefault(pattern["type"], []).append(pattern)
+        assert {p["category"] for p in by_type["category_time"]} == {"news", "finance", "weather"}
+        assert sorted(tuple(sorted(p["categories"])) for p in by_type["co_occurrence"]) == [
+            ("finance", "news"), ("finance", "weather")
+        ]
+        assert by_type["periodic"][0]["period_days"] == 7
+    
+    async def test_analyze_routine_from_store(self, temp_db):
+        """Fenêtre de jours appliquée en SQL; message si rien de récent"""
+        engine = AutomationEngine()
+        engine.memory_store = temp_db
+        assert (await engine.analyze_routine("nobody"))["routine_analyzed"] is False
+        
+        for _ in range(3):
+            temp_db.save_interaction("u3", "bitcoin", "finance")
+        result = await engine.analyze_routine("u3", days=7)
+        assert result["routine_analyzed"] is True
+        assert result["analysis"]["categories_used"] == {"finance": 3}
+
@@ -0,0 +1,102 @@
+"""
+Tests pour le contexte de conversation sous budget de tokens (résumé glissant)
+"""
+import asyncio
+import pytest
+
+import services.context_builder as context_module
+from services.context_builder import budget_for, extractive_summary, fit_messages
+from services.conversation_manager import ConversationManager
+from services.enhanced_memory import EnhancedConversationMemory
+
+
+@pytest.fixture
+def manager(tmp_path):
+    manager = ConversationManager(db_path=str(tmp_path / "conversations.db"))
+    manager.context_builder.summarizer = extractive_summary
+    return manager
+
+
+def _exchange(manager, turns, session="s1", expert="health"):
+    for i in range(turns):
+        manager.add_message(session, expert, "user", f"Question {i}. Détails de la question {i}")
+        manager.add_message(session, expert, "assistant", f"Réponse {i}. " + "texte " * 50)
+
+
+def test_budget_per_provider(monkeypatch):
+    """Budget par provider (surchargeable), derniers messages conservés en priorité"""
+    monkeypatch.setenv("CONTEXT_BUDGET_GROQ", "40")
+    assert budget_for("groq") == 40
+    assert budget_for("gemini") > budget_for("ollama")
+
+    messages = [{"role": "user", "message": "x" * 100} for _ in range(5)]
+    messages[-1] = {"role": "user", "message": "dernier"}
+    kept = fit_messages(messages, budget_for("groq"))
+    assert [m["message"] for m in kept] == ["x" * 100, "dernier"]
+
+
+async def test_rolling_summary_compacts_old_turns(manager):
+    """Après une réponse, les anciens tours sont résumés en tâche de fond et persistés"""
+    builder = manager.context_builder
+    _exchange(manager, 8)
+    await asyncio.gather(*builder._tasks)
+
+    summary, messages = builder.select("s1", "health", provider="gemini")
+    assert summary.startswith("U: Question 0")
+    assert builder.stats["summaries"] >= 1
+    assert all(m["id"] > builder._cache[("s1", "health")]["covered_until"] for m in messages)
+    assert messages[-1]["message"].startswith("Réponse 7")
+
+    # Résumé stocké avec la session: relu par une nouvelle instance
+    reopened = ConversationManager(db_path=str(manager.db_path))
+    context = reopened.build_history_context("s1", "health", provider="gemini")
+    assert "[RÉSUMÉ DE LA CONVERSATION]\nU: Question 0" in context
+    assert "Question 0. Détails" not in context.split("[HISTORIQUE DE LA CONVERSATION]")[1]
+
+
+def test_session_cache_write_through(manager):
+    """Après le premier chargement, un tour ne relit plus la base"""
+    builder = manager.context_builder
+    manager.add_message("s2", "finance", "user", "Prix du bitcoin ?")
+    builder.select("s2", "finance")
+    manager.add_message("s2", "finance", "assistant", "Environ 60 000 $")
+
+    _, messages = builder.select("s2", "finance")
+    assert [m["message"] for m in messages] == ["Prix du bitcoin ?", "Environ 60 000 $"]
+    assert builder.stats == {"cache_hits": 1, "cache_misses": 1, "summaries": 0}
+
+
+def test_enhanced_memory_smart_context_within_budget(tmp_path, monkeypatch):
+    """Le contexte intelligent respecte le budget du provider"""
+    monkeypatch.setenv("CONTEXT_BUDGET_OLLAMA", "120")
+    memory = EnhancedConversationMemory(db_path=str(tmp_path / "memory.db"))
+    for i in range(10):
+        memory.add_message("s3", "general", "user", f"message {i} " + "mot " * 40)
+
+    context = memory.build_smart_context("s3", "general", include_profile=False, provider="ollama")
+    assert "message 9" in context and "message 0" not in context
+    history = context.split("[HISTORIQUE CONVERSATION]\n")[1].split("[FIN HISTORIQUE]")[0]
+    assert len(history) // 4 <= 120
+
+
+async def test_summary_debounced_per_session(manager, monkeypatch):
+    """Une seule tentative de résumé par fenêtre de debounce, même si le résumé échoue"""
+    builder = manager.context_builder
+    calls = []
+
+    async def failing_summary(previous, messages):
+        calls.append(len(messages))
+        raise RuntimeError("LLM indisponible")
+
+    builder.summarizer = failing_summary
+    builder.select("s4", "tech")  # Session en cache
+    for _ in range(3):
+        _exchange(manager, 4, session="s4", expert="tech")
+        await asyncio.gather(*builder._tasks)
+    assert len(calls) == 1
+
+    monkeypatch.setattr(context_module, "SUMMARY_DEBOUNCE_S", 0)
+    builder.summarizer = extractive_summary
+    _exchange(manager, 1, session="s4", expert="tech")
+    await asyncio.gather(*builder._tasks)
+    assert builder.stats["summaries"] == 1
@@ -0,0 +1,127 @@
+"""
+Tests pour le graphe de sources de contexte (dépendances, budget, sources coupées)
+"""
+import asyncio
+import time
+
+import pytest
+
+import routers.expert_chat as expert_chat
+import services.external_apis.geocoding as geocoding
+import services.external_apis.weather.router as weather_router
+from services.context_graph import ContextSource, run_graph
+from services.expert_config import get_expert
+
+
+def _sleeper(value, delay, log=None, name=None):
+    async def fetch(done):
+        if log is not None:
+            log.append((name, time.perf_counter(), dict(done)))
+        await asyncio.sleep(delay)
+        return value
+    return fetch
+
+
+async def test_sources_wait_only_on_dependencies():
+    """Les sources indépendantes démarrent ensemble; la dépendante reçoit le résultat"""
+    log = []
+    start = time.perf_counter()
+    graph = await run_graph(
+        [
+            ContextSource("geocoding", _sleeper({"lat": 1}, 0.1, log, "geocoding")),
+            ContextSource("tourism", _sleeper("musées", 0.1, log, "tourism")),
+            ContextSource("weather", _sleeper("soleil", 0.1, log, "weather"), after=("geocoding",)),
+        ],
+        budget_s=2.0,
+    )
+
+    assert graph.results == {"geocoding": {"lat": 1}, "tourism": "musées", "weather": "soleil"}
+    assert graph.cut == [] and graph.failed == {}
+    started = {name: (at - start, done) for name, at, done in log}
+    assert started["tourism"][0] < 0.05
+    assert started["weather"] == (pytest.approx(0.1, abs=0.05), {"geocoding": {"lat": 1}})
+    assert graph.elapsed_ms < 300
+
+
+async def test_budget_cuts_late_sources_and_dependents():
+    """À l'échéance: source lente et ses dépendantes coupées, les autres conservées"""
+    graph = await run_graph(
+        [
+            ContextSource("fast", _sleeper("ok", 0.01)),
+            ContextSource("slow", _sleeper("trop tard", 5)),
+            ContextSource("after_slow", _sleeper("jamais", 0), after=("slow",)),
+        ],
+        budget_s=0.1,
+    )
+
+    assert graph.results == {"fast": "ok"}
+    assert graph.cut == ["slow", "after_slow"]
+    assert graph.cut_labels() == ["slow:timeout", "after_slow:timeout"]
+    assert graph.elapsed_ms < 1000
+
+
+async def test_failure_isolated_and_order_checked():
+    """Une source en échec n'empêche pas ses dépendantes; déclaration hors ordre refusée"""
+    async def boom(done):
+        raise RuntimeError("API down")
+
+    async def fallback(done):
+        return "repli" if "primary" not in done else None
+
+    graph = await run_graph(
+        [ContextSource("primary", boom), ContextSource("fallback", fallback, after=("primary",))],
+        budget_s=1.0,
+    )
+    assert graph.failed == {"primary": "RuntimeError: API down"}
+    assert graph.results == {"fallback": "repli"}
+
+    with pytest.raises(ValueError):
+        await run_graph([ContextSource("weather", boom, after=("geocoding",))], budget_s=1.0)
+
+
+async def test_weather_expert_reports_cut_source(monkeypatch):
+    """Expert météo: la météo hors budget est signalée dans les sources sans retarder la réponse"""
+    class FakeGeocoding:
+        async def search(self, query):
+            return {"results": [{"name": "Paris", "lat": 48.85, "lon": 2.35}]}
+
+    class SlowWeather:
+        async def get_current_weather(self, lat, lon):
+            await asyncio.sleep(5)
+
+    monkeypatch.setattr(geocoding, "GeocodingRouter", FakeGeocoding)
+    monkeypatch.setattr(weather_router, "WeatherRouter", SlowWeather)
+    monkeypatch.setitem(expert_chat.CONTEXT_BUDGETS_S, "weather", 0.2)
+
+    start = time.perf_counter()
+    context, sources = await expert_chat.fetch_context_data(
+        get_expert("weather"), "Quel temps fait-il à Paris ?", search_mode_override="fast"
+    )
+
+    assert time.perf_counter() - start < 1.5
+    assert context == "[ERREUR]: Service météo temporairement indisponible."
+    assert sources == ["weather:timeout"]
+
+
+async def test_finance_fallbacks_keep_reserved_budget(monkeypatch):
+    """Deep finance hors délai: les replis gardent leur part du budget (surchargé par l'environnement)"""
+    import services.deep_finance_search as deep_finance
+
+    async def slow_deep_search(*args):
+        await asyncio.sleep(5)
+
+    async def fetch(api_name, query, query_params=None):
+        await asyncio.sleep(0.05)
+        return f"données {api_name}"
+
+    monkeypatch.setattr(deep_finance, "perform_deep_finance_search", slow_deep_search)
+    monkeypatch.setattr(expert_chat, "_fetch_from_api", fetch)
+    monkeypatch.setenv("EXPERT_CONTEXT_BUDGET_FINANCE", "0.4")
+    monkeypatch.setenv("EXPERT_CONTEXT_BUDGET_FINANCE_FALLBACK", "0.2")
+
+    start = time.perf_counter()
+    context, sources = await expert_chat.fetch_context_data(get_expert("finance"), "Quel est le cours du bitcoin aujourd hui ?")
+
+    assert time.perf_counter() - start < 1.0
+    assert sources[-1] == "deep_finance:timeout"
+    assert "coincap" in sources and "[COINCAP]: données coincap" in context
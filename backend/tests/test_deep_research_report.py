@@ -0,0 +1,95 @@
+"""
+Tests pour le générateur de rapports DEEP (gabarits compilés, flux Markdown / HTML / PDF)
+"""
+import re
+from types import SimpleNamespace
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.medical as medical
+import services.smart_medical_router as smart_medical_router
+from services.deep_research_report import DeepResearchReportGenerator
+from services.report_render import CompiledTemplate, FragmentWriter
+
+
+@pytest.fixture
+def search_result():
+    return SimpleNamespace(
+        apis_called=["pubmed", "openfda", "who_gho"],
+        apis_with_data=["pubmed"],
+        detected_topics=["diabetes"],
+        total_time_ms=1234.0,
+        data={"pubmed": {"articles": [{"title": "Metformin <trial>", "authors": "Doe", "year": 2024}]}},
+    )
+
+
+def test_fragment_writer_counts_like_split():
+    """Compteur courant identique à split() sur le texte complet, raccords compris"""
+    template = CompiledTemplate("**{a}**-{b} suite\n{c}{{x}}")
+    fields = {"a": "mot composé", "b": "", "c": 3}
+    writer = FragmentWriter()
+    for chunk in ("dé", "but ", "\n"):
+        writer.write(chunk)
+    template.render_into(writer, fields)
+
+    text = writer.drain()
+    assert text == "début \n**mot composé**- suite\n3{x}"
+    assert writer.words == len(text.split())
+    assert template.count_words(fields) == len(template.render(fields).split())
+
+
+async def test_report_word_count_and_stream(search_result):
+    """Nombre de mots de l'en-tête exact; le flux Markdown reconstitue le rapport"""
+    generator = DeepResearchReportGenerator()
+    report = generator.build_report("diabète type 2", search_result, "Synthèse **IA**.")
+    markdown = "".join(generator.iter_markdown(report))
+    header, body = markdown.split("---\n", 1)
+
+    assert f"**Nombre de mots**: {report['word_count']}+" in header
+    assert report["word_count"] == len(body.split()) >= generator.min_words
+    assert report["sections"][2]["id"] == "drug_information"
+
+    chunks = [chunk async for chunk in generator.stream_report("diabète type 2", search_result, "Synthèse **IA**.")]
+    assert len(chunks) == len(report["sections"]) + 1
+    assert "".join(chunks).split("---\n", 1)[1] == body
+
+
+def test_same_report_renders_html_and_pdf(search_result):
+    """HTML échappé et structuré; PDF valide (xref pointant sur chaque objet)"""
+    generator = DeepResearchReportGenerator()
+    report = generator.build_report("diabète", search_result)
+
+    page = "".join(generator.render(report, "html"))
+    assert page.startswith("<!DOCTYPE html>") and page.endswith("</body></html>\n")
+    assert "<h2>📋 INTRODUCTION</h2>" in page
+    assert "<strong>Metformin &lt;trial&gt;</strong>" in page
+    assert "<thead>\n<tr><th>Source</th>" in page
+
+    pdf = b"".join(generator.render(report, "pdf"))
+    assert pdf.startswith(b"%PDF-1.4") and pdf.endswith(b"%%EOF\n")
+    xref_at = int(pdf.rsplit(b"startxref\n", 1)[1].split(b"\n")[0])
+    entries = pdf[xref_at:].split(b"\n")[3:]
+    offsets = [int(e[:10]) for e in entries if e.endswith(b" n ")]
+    for obj_id, offset in enumerate(offsets, 1):
+        assert pdf[offset:].startswith(b"%d 0 obj" % obj_id)
+    assert len(re.findall(rb"/Type /Page\b", pdf)) > 1
+
+
+def test_report_endpoint_streams_format(search_result, monkeypatch):
+    """Endpoint: recherche faite avant le flux, type de contenu selon le format"""
+    async def fake_search(query):
+        return "", search_result
+
+    monkeypatch.setattr(smart_medical_router, "smart_medical_search", fake_search)
+    app = FastAPI()
+    app.include_router(medical.router)
+    client = TestClient(app)
+
+    response = client.get("/api/medical/research/report", params={"query": "diabète", "format": "pdf"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/pdf"
+    assert response.content.startswith(b"%PDF")
+
+    assert client.get("/api/medical/research/report", params={"query": "diabète", "format": "docx"}).status_code == 422
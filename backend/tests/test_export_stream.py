@@ -0,0 +1,127 @@
+"""
+Tests pour les exports en flux (CSV / NDJSON / Markdown, gzip)
+"""
+import gzip
+import json
+import sqlite3
+import tracemalloc
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.export as export
+from services.auth import get_current_user
+from services.export_stream import encode_rows, iter_list, iter_sqlite_rows
+from services.search_history import SearchHistoryService
+
+
+async def _collect(chunks):
+    return b"".join([chunk async for chunk in chunks])
+
+
+async def test_sqlite_pages_and_formats(tmp_path):
+    """Pagination par clé et écriture CSV / NDJSON / Markdown / gzip"""
+    db = str(tmp_path / "rows.db")
+    with sqlite3.connect(db) as conn:
+        conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, name TEXT, tags TEXT)")
+        conn.executemany("INSERT INTO t (name, tags) VALUES (?, ?)", [(f"n{i}", "a|b") for i in range(7)])
+
+    def rows():
+        return iter_sqlite_rows(lambda: sqlite3.connect(db), "SELECT * FROM t WHERE {after} ORDER BY id", page_size=3)
+
+    csv_text = (await _collect(encode_rows(rows(), "csv"))).decode()
+    assert csv_text.splitlines()[:2] == ["id,name,tags", "1,n0,a|b"]
+    assert len(csv_text.splitlines()) == 8
+
+    ndjson = (await _collect(encode_rows(rows(), "ndjson", columns=["name"]))).decode().splitlines()
+    assert [json.loads(line) for line in ndjson][-1] == {"name": "n6"}
+
+    markdown = (await _collect(encode_rows(iter_list([{"a": 1, "b": {"x": "|"}}]), "markdown"))).decode()
+    assert markdown == '| a | b |\n|---|---|\n| 1 | {"x": "\\|"} |\n'
+
+    compressed = await _collect(encode_rows(rows(), "csv", gzip=True))
+    assert gzip.decompress(compressed).decode() == csv_text
+
+
+async def test_constant_memory_large_export():
+    """Blocs bornés et mémoire constante sur 50 000 lignes"""
+    async def many_rows():
+        for i in range(50_000):
+            yield {"id": i, "endpoint": f"/api/endpoint/{i}", "status_code": 200, "response_time_ms": 12.5}
+
+    tracemalloc.start()
+    total, largest = 0, 0
+    async for chunk in encode_rows(many_rows(), "csv", chunk_size=16 * 1024):
+        total += len(chunk)
+        largest = max(largest, len(chunk))
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert total > 1_500_000
+    assert largest < 17 * 1024
+    assert peak < 500_000
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    service = SearchHistoryService(db_path=str(tmp_path / "history.db"), legacy_path="")
+    for i in range(5):
+        service.add_search("alice", f"query {i}", search_type="web")
+    service.add_search("bob", "other")
+    monkeypatch.setattr(export, "search_history_service", service)
+
+    app = FastAPI()
+    app.include_router(export.router)
+    app.dependency_overrides[get_current_user] = lambda: {"user_id": "alice"}
+    return TestClient(app)
+
+
+def test_search_history_export_gzip(client):
+    """Historique de l'appelant, NDJSON compressé, du plus ancien au plus récent"""
+    response = client.get("/api/export/search-history", params={"user_id": "bob", "format": "ndjson", "gzip": True})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "application/gzip"
+    assert "search_history.ndjson.gz" in response.headers["content-disposition"]
+
+    lines = gzip.decompress(response.content).decode().splitlines()
+    assert [json.loads(line)["query"] for line in lines] == [f"query {i}" for i in range(5)]
+
+
+def test_stored_exports_require_auth(client):
+    """Sans token: 401 pour les exports de données stockées"""
+    client.app.dependency_overrides.clear()
+    for path in ("/api/export/search-history", "/api/export/conversations", "/api/export/analytics"):
+        assert client.get(path).status_code == 401
+
+
+def test_ndjson_upload_and_csv_body(client):
+    """Corps NDJSON converti ligne par ligne; /csv valide sa liste JSON"""
+    body = "\n".join(json.dumps({"a": i, "nested": {"k": i}}) for i in range(3))
+    response = client.post("/api/export/ndjson-upload", content=body, headers={"content-type": "application/x-ndjson"})
+    assert response.text.splitlines() == ["a,nested", '0,"{""k"": 0}"', '1,"{""k"": 1}"', '2,"{""k"": 2}"']
+    assert client.post("/api/export/ndjson-upload", content="not json").status_code == 400
+
+    assert client.post("/api/export/csv", json=[{"a": 1}]).text.splitlines() == ["a", "1"]
+    assert client.post("/api/export/csv", json=[]).status_code == 400
+    assert client.post("/api/export/csv", json={"a": 1}).status_code == 422
+
+
+def test_source_failure_before_and_during_stream(client, monkeypatch):
+    """Échec sur la première page: 500; échec en cours de flux: enregistrement d'erreur final"""
+    def failing(after_rows):
+        async def rows(user_id, search_type=None):
+            for i in range(after_rows):
+                yield {"query": f"q{i}"}
+            raise RuntimeError("database is locked")
+        return rows
+
+    monkeypatch.setattr(export.search_history_service, "iter_searches", failing(0))
+    assert client.get("/api/export/search-history").status_code == 500
+
+    monkeypatch.setattr(export.search_history_service, "iter_searches", failing(2))
+    response = client.get("/api/export/search-history", params={"format": "ndjson"})
+    assert response.status_code == 200
+    assert [json.loads(line) for line in response.text.splitlines()] == [
+        {"query": "q0"}, {"query": "q1"}, {"_export_error": "export interrupted"}
+    ]
@@ -0,0 +1,140 @@
+"""
+Tests pour les requêtes doublées (hedging)
+"""
+import asyncio
+import pytest
+
+import services.hedging as hedging
+from services.api_planner import APIPlanner
+from services.hedging import Hedger, HedgePolicy
+
+
+@pytest.fixture(autouse=True)
+def planner(tmp_path, monkeypatch):
+    planner = APIPlanner(path=str(tmp_path / "stats.json"))
+    monkeypatch.setattr(hedging, "api_planner", planner)
+    return planner
+
+
+def _provider(calls, name, delay, result=None, error=None):
+    async def call():
+        calls.append(name)
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            calls.append(f"{name}:cancelled")
+            raise
+        if error:
+            raise Exception(error)
+        return result if result is not None else {"provider": name}
+    return name, call
+
+
+async def test_backup_started_after_delay_and_slow_primary_cancelled():
+    """Doublure lancée après le délai; la première réponse gagne, l'autre est annulée"""
+    hedger = Hedger({"weather": HedgePolicy(delay_ms=20, max_hedge_rate=1.0)})
+    calls = []
+    name, result = await hedger.run(
+        "weather", [_provider(calls, "open_meteo", 5), _provider(calls, "weatherapi", 0.01)]
+    )
+    assert name == "weatherapi" and result == {"provider": "weatherapi"}
+    await asyncio.sleep(0)  # Annulation traitée au tour de boucle suivant
+    assert calls == ["open_meteo", "weatherapi", "open_meteo:cancelled"]
+    stats = hedger.get_stats()["categories"]["weather"]
+    assert stats["hedged"] == 1 and stats["hedge_wins"] == 1
+
+    # Principal rapide: pas de doublure
+    calls.clear()
+    name, _ = await hedger.run("weather", [_provider(calls, "open_meteo", 0), _provider(calls, "weatherapi", 0)])
+    assert name == "open_meteo" and calls == ["open_meteo"]
+
+
+async def test_failure_falls_back_immediately():
+    """Erreur ou réponse vide: provider suivant sans attendre; toutes en échec -> Exception"""
+    hedger = Hedger({"geocoding": HedgePolicy(delay_ms=10_000, max_hedge_rate=0.0)})
+    calls = []
+    name, _ = await hedger.run("geocoding", [
+        _provider(calls, "nominatim", 0, error="boom"),
+        _provider(calls, "opencage", 0, result={}),
+        _provider(calls, "positionstack", 0),
+    ])
+    assert name == "positionstack"
+    assert hedger.get_stats()["categories"]["geocoding"]["fallbacks"] == 2
+
+    with pytest.raises(Exception, match="All geocoding providers failed"):
+        await hedger.run("geocoding", [_provider(calls, "nominatim", 0, error="down")])
+
+
+async def test_hedge_rate_cap_and_observed_p90(planner):
+    """Plafond du taux de doublure; délai = p90 observé du provider"""
+    hedger = Hedger({"finance": HedgePolicy(delay_ms=10, max_hedge_rate=0.5)})
+    calls = []
+    for _ in range(4):
+        await hedger.run("finance", [_provider(calls, "coingecko", 0.05), _provider(calls, "coincap", 0)])
+    stats = hedger.get_stats()["categories"]["finance"]
+    assert stats["hedged"] == 2 and stats["hedges_denied"] == 2
+
+    for _ in range(10):
+        planner.record("finance/default/coingecko", 400)
+    assert hedger.hedge_delay_ms("finance", "default", "coingecko") == 400
+    assert hedger.hedge_delay_ms("finance", "default", "coincap") == 10
+
+
+async def test_throttle_wait_not_timed_nor_hedged(planner):
+    """Attente de rate limit sous le délai: pas de doublure, latence mesurée sans elle"""
+    hedger = Hedger({"geocoding": HedgePolicy(delay_ms=150, max_hedge_rate=1.0)})
+    calls = []
+
+    async def throttled_nominatim():
+        await hedging.throttle_sleep(0.1)
+        await asyncio.sleep(0.08)  # Attente + requête > délai, requête seule < délai
+        calls.append("nominatim")
+        return {"provider": "nominatim"}
+
+    name, _ = await hedger.run(
+        "geocoding", [("nominatim", throttled_nominatim), _provider(calls, "opencage", 0)], operation="geocode"
+    )
+    assert name == "nominatim" and calls == ["nominatim"]
+    assert hedger.get_stats()["categories"]["geocoding"]["hedged"] == 0
+    assert planner.stats["geocoding/geocode/nominatim"].latencies[-1] < 150
+
+
+async def test_long_throttle_queue_triggers_hedge():
+    """File d'attente de rate limit plus longue que le délai: doublure à l'heure"""
+    hedger = Hedger({"geocoding": HedgePolicy(delay_ms=30, max_hedge_rate=1.0)})
+    calls = []
+
+    async def queued_nominatim():
+        await hedging.throttle_sleep(5)
+        return {"provider": "nominatim"}
+
+    name, _ = await asyncio.wait_for(hedger.run(
+        "geocoding", [("nominatim", queued_nominatim), _provider(calls, "opencage", 0)], operation="geocode"
+    ), timeout=1)
+    assert name == "opencage"
+    assert hedger.get_stats()["categories"]["geocoding"]["hedged"] == 1
+
+
+async def test_cancelled_nominatim_wait_refunds_slot(monkeypatch):
+    """Une tentative annulée pendant son attente rend son créneau Nominatim"""
+    from services.external_apis.geocoding.router import GeocodingRouter
+
+    monkeypatch.setattr(GeocodingRouter, "_nominatim_next_slot", 0.0)
+    monkeypatch.setattr(GeocodingRouter, "_nominatim_free_slots", [])
+    await GeocodingRouter._nominatim_throttle()  # Créneau immédiat
+    queue_end = GeocodingRouter._nominatim_next_slot
+
+    first = asyncio.create_task(GeocodingRouter._nominatim_throttle())
+    second = asyncio.create_task(GeocodingRouter._nominatim_throttle())
+    await asyncio.sleep(0.01)
+    first.cancel()  # Créneau au milieu de la file: repris par le prochain appel
+    await asyncio.gather(first, return_exceptions=True)
+    third = asyncio.create_task(GeocodingRouter._nominatim_throttle())
+    await asyncio.sleep(0.01)
+    assert GeocodingRouter._nominatim_next_slot == queue_end + 2.0
+    assert GeocodingRouter._nominatim_free_slots == []
+
+    for task in (second, third):
+        task.cancel()
+    await asyncio.gather(second, third, return_exceptions=True)
+    assert GeocodingRouter._nominatim_next_slot == queue_end
@@ -0,0 +1,65 @@
+"""
+Tests pour le benchmark hermétique et les upstreams simulés
+"""
+import pytest
+from fastapi.testclient import TestClient
+from scripts.mock_upstreams import MockUpstreams, MockUpstreamConfig
+from scripts.hermetic_benchmark import percentile, summarize, compare_reports
+
+
+@pytest.fixture
+def mock():
+    """Upstreams simulés sans latence"""
+    return MockUpstreams(MockUpstreamConfig(llm_latency_ms=0, api_latency_ms=0, jitter_ms=0, llm_tokens=5))
+
+
+def test_mock_openai_completion(mock):
+    """Format OpenAI (Groq/Mistral)"""
+    client = TestClient(mock.app)
+    response = client.post("/api.mistral.ai/v1/chat/completions", json={"model": "m", "messages": []})
+
+    assert response.status_code == 200
+    content = response.json()["choices"][0]["message"]["content"]
+    assert len(content.split()) == 5
+    assert mock.hits["api.mistral.ai"] == 1
+
+
+def test_mock_stream_tokens(mock):
+    """Stream SSE token par token"""
+    mock.config.llm_token_interval_ms = 0
+    client = TestClient(mock.app)
+    response = client.post("/api.groq.com/openai/v1/chat/completions", json={"stream": True})
+
+    chunks = [line for line in response.text.splitlines() if line.startswith("data: ")]
+    assert chunks[-1] == "data: [DONE]"
+    assert len(chunks) == 6
+
+
+def test_mock_unknown_host(mock):
+    """Les upstreams non simulés répondent 404 et sont comptés"""
+    client = TestClient(mock.app)
+    response = client.get("/unknown.example.com/anything")
+
+    assert response.status_code == 404
+    assert mock.stats()["unmocked"] == {"unknown.example.com": 1}
+
+
+def test_percentiles():
+    """Percentiles au rang le plus proche"""
+    values = list(range(1, 101))
+    assert percentile(values, 50) == 50
+    assert percentile(values, 95) == 95
+    assert percentile(values, 99) == 99
+    assert percentile([], 99) == 0.0
+    assert summarize([10.0])["p99"] == 10.0
+
+
+def test_compare_reports_detects_regression():
+    """Régression p95 au-delà de la tolérance"""
+    baseline = {"scenarios": {"chat": {"latency_ms": {"p95": 100, "p99": 150}, "throughput_rps": 50}}}
+    current = {"scenarios": {"chat": {"latency_ms": {"p95": 130, "p99": 155}, "throughput_rps": 49}}}
+
+    regressions = compare_reports(current, baseline, tolerance=0.2)
+
+    assert len(regressions) == 1
+    assert "p95" in regressions[0]
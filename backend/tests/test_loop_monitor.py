@@ -0,0 +1,59 @@
+"""
+Tests pour le moniteur de lag de la boucle d'événements
+"""
+import asyncio
+import time
+import pytest
+from services.loop_monitor import LoopMonitor, LagHistogram
+from middleware.request_id import request_id_ctx
+
+
+def test_histogram_buckets():
+    """Histogramme cumulatif"""
+    h = LagHistogram(buckets=(10, 100))
+    for value in (1, 5, 50, 500):
+        h.observe(value)
+
+    assert h.count == 4
+    assert h.cumulative() == [2, 3]
+    assert h.max == 500
+    assert h.percentile(50) == 10
+
+
+@pytest.mark.asyncio
+async def test_detects_blocking_call_with_request_id():
+    """Un time.sleep() dans la boucle est détecté et attribué"""
+    monitor = LoopMonitor(interval_ms=10, threshold_ms=50)
+    monitor.start()
+    try:
+        async def handler():
+            request_id_ctx.set("req-123")
+            monitor.bind_current_task("req-123")
+            time.sleep(0.2)  # Appel bloquant volontaire
+
+        await asyncio.create_task(handler(), name="handler-task")
+        await asyncio.sleep(0.1)
+    finally:
+        await monitor.stop()
+
+    stats = monitor.get_stats()
+    assert stats["blocking_total"] >= 1
+    event = stats["recent_blocking_events"][0]
+    assert event["request_id"] == "req-123"
+    assert event["task"] == "handler-task"
+    assert event["blocked_ms"] >= 50
+    assert any("handler" in line for line in event["stack"])
+
+
+@pytest.mark.asyncio
+async def test_prometheus_export():
+    """Export Prometheus de l'histogramme"""
+    monitor = LoopMonitor(interval_ms=5, threshold_ms=100)
+    monitor.start()
+    await asyncio.sleep(0.05)
+    await monitor.stop()
+
+    output = monitor.to_prometheus()
+    assert "# TYPE event_loop_lag_ms histogram" in output
+    assert 'event_loop_lag_ms_bucket{le="+Inf"}' in output
+    assert "event_loop_blocking_total" in output
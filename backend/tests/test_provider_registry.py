@@ -0,0 +1,137 @@
+"""
+Tests pour le registre de providers paresseux
+"""
+import pytest
+from services.provider_registry import ProviderRegistry
+
+
+class DummyProvider:
+    instances = 0
+
+    def __init__(self):
+        DummyProvider.instances += 1
+        self.warmed = False
+        self.value = 42
+
+    async def warm_up(self):
+        self.warmed = True
+
+
+def test_lazy_creation():
+    """Le provider n'est créé qu'au premier accès"""
+    DummyProvider.instances = 0
+    registry = ProviderRegistry()
+    proxy = registry.register("dummy", DummyProvider)
+
+    assert DummyProvider.instances == 0
+    assert not registry.is_loaded("dummy")
+
+    assert proxy.value == 42
+    assert proxy.value == 42
+    assert DummyProvider.instances == 1
+    assert registry.is_loaded("dummy")
+
+
+def test_proxy_setattr():
+    """Les attributs assignés via le proxy vont sur l'instance"""
+    registry = ProviderRegistry()
+    proxy = registry.register("dummy", DummyProvider)
+
+    proxy.value = 7
+    assert registry.get("dummy").value == 7
+
+
+@pytest.mark.asyncio
+async def test_warm_up_runs_probes():
+    """Le warm-up crée les instances et appelle warm_up()"""
+    registry = ProviderRegistry()
+    registry.register("a", DummyProvider)
+    registry.register("b", DummyProvider)
+
+    report = await registry.warm_up()
+
+    assert registry.get("a").warmed
+    assert registry.get("b").warmed
+    assert report["providers"]["a"]["loaded"]
+    assert report["timed_out"] == []
+
+
+@pytest.mark.asyncio
+async def test_warm_up_isolates_failures():
+    """Un provider en échec n'empêche pas les autres"""
+    def broken():
+        raise RuntimeError("boom")
+
+    registry = ProviderRegistry()
+    registry.register("broken", broken)
+    registry.register("ok", DummyProvider)
+
+    report = await registry.warm_up()
+
+    assert report["providers"]["ok"]["loaded"]
+    assert "boom" in report["providers"]["broken"]["error"]
+
+
+@pytest.mark.asyncio
+async def test_cache_available_never_connects(monkeypatch):
+    """available ne sonde jamais Redis; connect() s'exécute une seule fois hors de la boucle"""
+    from services.cache import CacheService
+
+    calls = []
+
+    def fake_connect(self):
+        calls.append(1)
+        self._available = True
+        return True
+
+    monkeypatch.setattr(CacheService, "_connect_sync", fake_connect)
+    service = CacheService()
+
+    assert service.available is False
+    assert calls == []
+
+    assert await service.connect() is True
+    assert await service.connect() is True
+    assert service.available is True
+    assert calls == [1]
+
+
+def test_service_singletons_are_lazy():
+    """Les services à base SQLite sont des proxys du registre (rien n'est construit à l'import)"""
+    from services.provider_registry import LazyProvider
+    from services.auth import auth_service
+    from services.search_history import search_history_service
+    from services.conversation_manager import conversation_manager
+    from services.ai_search_engine import ai_search_engine
+    from services.external_apis.translation import translation_router
+
+    for proxy in (auth_service, search_history_service, conversation_manager, ai_search_engine, translation_router):
+        assert isinstance(proxy, LazyProvider)
+
+
+@pytest.mark.asyncio
+async def test_aget_waits_for_construction_off_loop():
+    """Pendant une construction en cours (warm-up), aget() attend sans bloquer la boucle"""
+    import asyncio
+    import threading
+
+    release = threading.Event()
+    built = []
+
+    def slow_factory():
+        release.wait(5)
+        built.append(1)
+        return DummyProvider()
+
+    registry = ProviderRegistry()
+    registry.register("slow", slow_factory)
+    warm_up = asyncio.create_task(registry.warm_up())
+    waiter = asyncio.create_task(registry.aget("slow"))
+
+    await asyncio.sleep(0.05)  # La boucle tourne pendant la construction
+    assert not waiter.done()
+    release.set()
+
+    assert (await waiter) is registry.get("slow")
+    await warm_up
+    assert built == [1]
@@ -0,0 +1,55 @@
+"""
+Tests pour les validateurs de réponses (AIResponseValidator, MedicalFactChecker)
+"""
+from services.ai_response_validator import AIResponseValidator
+from services.medical_anti_hallucination import MedicalFactChecker
+
+
+def test_validator_flags_from_single_scan():
+    """Contradictions, dates futures et affirmations non sourcées détectées ensemble"""
+    response = (
+        "Il a toujours raison et jamais tort. Le record est 12 points, "
+        "prévu en 2090 puis en 2095, un résultat vrai."
+    )
+    _, result = AIResponseValidator().validate_response(response, "question générale")
+
+    assert result["warnings"] == [
+        "Information politique/électorale détectée: Contenu politique détecté - nécessite vérification",
+        "Contradictions détectées: ['toujours vs jamais']",
+        "Affirmation factuelle sans source",
+        "Date future suspecte: 2090",
+        "Date future suspecte: 2095",
+    ]
+
+
+def test_validator_disclaimers_ignore_case():
+    """Disclaimer reconnu quelle que soit la casse; requête médicale repérée"""
+    validator = AIResponseValidator()
+    response = "Repos et hydratation. CONSULTEZ UN MÉDECIN si la fièvre persiste."
+    _, result = validator.validate_response(response, "Quel traitement pour la fièvre ?")
+
+    assert "Réponse médicale sans disclaimer approprié" not in result["warnings"]
+    assert validator._has_medical_disclaimer(response)
+
+
+def test_fact_checker_sources_near_claims():
+    """Affirmation sourcée dans la fenêtre acceptée; affirmation isolée signalée en entier"""
+    checker = MedicalFactChecker()
+    response = (
+        "Selon [PUBMED], la molécule réduit de 30 les crises. "
+        + "Texte de remplissage sans aucune citation. " * 5
+        + "Prendre 250 mg le soir."
+    )
+    result = checker.check_response(response)
+
+    assert result["suggestions"][0] == "Les affirmations suivantes devraient mentionner leur source: 250 mg"
+    assert result["confidence_score"] == 0.9
+    assert result["is_safe"]
+
+
+def test_unsourced_claims_window_bounds():
+    """La source doit tenir entièrement dans la fenêtre autour de l'affirmation"""
+    claims = [(200, 210), (400, 410), (600, 610)]
+    sources = [(95, 105), (305, 315), (700, 710)]
+
+    assert MedicalFactChecker._unsourced_claims(claims, sources) == [(200, 210)]
@@ -0,0 +1,88 @@
+"""
+Tests pour l'historique de recherche (SQLite en ajout seul)
+"""
+import json
+import pytest
+
+from services.search_history import SearchHistoryService
+
+
+@pytest.fixture
+def service(tmp_path):
+    return SearchHistoryService(
+        db_path=str(tmp_path / "history.db"),
+        legacy_path=str(tmp_path / "history.json"),
+    )
+
+
+def test_history_recent_and_trim(service):
+    """Plus récent en premier, filtre par type, limite par utilisateur"""
+    service.max_history_per_user = 3
+    for i in range(5):
+        service.add_search("alice", f"q{i}", search_type="web" if i % 2 else "news")
+    service.add_search("bob", "météo", results_count=4, metadata={"city": "Paris"})
+
+    assert [e["query"] for e in service.get_history("alice")] == ["q4", "q3", "q2"]
+    assert [e["query"] for e in service.get_history("alice", search_type="web")] == ["q3"]
+
+    recent = service.get_recent_searches(limit=2)
+    assert [(e["user_id"], e["query"]) for e in recent] == [("bob", "météo"), ("alice", "q4")]
+    assert recent[0]["metadata"] == {"city": "Paris"} and recent[0]["results_count"] == 4
+
+    assert service.get_stats() == {"total_users": 2, "total_searches": 4, "avg_searches_per_user": 2.0}
+    assert service.get_stats("alice")["search_types"] == {"news": 2, "web": 1}
+
+
+def test_popular_counters_maintained_incrementally(service):
+    """Compteurs par requête normalisée, par type et tous types; décrémentés à la suppression"""
+    for user in ("a", "b", "c"):
+        service.add_search(user, "Bitcoin", search_type="finance")
+    entry = service.add_search("a", "paris", search_type="weather")
+    service.add_search("b", "Paris", search_type="weather")
+
+    assert service.get_popular_searches(limit=2) == [
+        {"query": "bitcoin", "count": 3},
+        {"query": "paris", "count": 2},
+    ]
+    assert service.get_popular_searches(search_type="weather") == [{"query": "paris", "count": 2}]
+
+    assert service.delete_search("a", entry["id"]) is True
+    assert service.delete_search("a", "unknown") is False
+    assert service.clear_history("b") is True
+    assert service.get_popular_searches() == [{"query": "bitcoin", "count": 2}]
+    assert service.get_stats()["total_searches"] == 2
+
+
+def test_legacy_json_migrated_once(tmp_path):
+    """L'ancien fichier JSON est importé puis renommé"""
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps({"alice": [
+        {"id": "alice_2", "query": "new", "type": "general", "results_count": 0,
+         "timestamp": "2024-01-02T00:00:00", "metadata": {}},
+        {"id": "alice_1", "query": "old", "type": "general", "results_count": 0,
+         "timestamp": "2024-01-01T00:00:00", "metadata": {}},
+    ]}), encoding="utf-8")
+
+    service = SearchHistoryService(db_path=str(tmp_path / "history.db"), legacy_path=str(legacy))
+    assert [e["id"] for e in service.get_history("alice")] == ["alice_2", "alice_1"]
+    assert not legacy.exists() and (tmp_path / "history.json.migrated").exists()
+
+    reopened = SearchHistoryService(db_path=str(tmp_path / "history.db"), legacy_path=str(legacy))
+    assert reopened.get_stats()["total_searches"] == 2
+
+
+def test_ids_unique_across_instances_and_replayed_migration(tmp_path):
+    """Ids dérivés de la base (deux processus, même milliseconde); import rejoué sans doublon"""
+    db_path = str(tmp_path / "history.db")
+    first = SearchHistoryService(db_path=db_path, legacy_path=None)
+    second = SearchHistoryService(db_path=db_path, legacy_path=None)
+    ids = [service.add_search("alice", f"q{i}")["id"] for i in range(10) for service in (first, second)]
+    assert len(set(ids)) == 20
+
+    legacy = tmp_path / "history.json"
+    entries = {"bob": [{"id": "bob_1", "query": "old", "type": "general", "timestamp": "2024-01-01T00:00:00"}]}
+    for _ in range(2):  # Renommage échoué: l'import est rejoué au démarrage suivant
+        legacy.write_text(json.dumps(entries), encoding="utf-8")
+        SearchHistoryService(db_path=db_path, legacy_path=str(legacy))
+    assert first.get_stats("bob")["total_searches"] == 1
+    assert first.get_stats()["total_searches"] == 21
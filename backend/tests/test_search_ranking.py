@@ -0,0 +1,60 @@
+"""
+Tests pour le classement en lot des résultats de recherche
+"""
+from routers.search import SearchResult, detect_search_intent
+from services.search_ranking import QueryContext, bm25_scores, merge_top_k, rank_category
+
+
+def _result(category, title, content=None, score=0.8):
+    return SearchResult(category=category, title=title, content=content or {}, source="test", relevance_score=score)
+
+
+def test_query_prepared_once():
+    """Tokens uniques, mots très courts ignorés, intentions conservées"""
+    ctx = QueryContext.build("Prix du bitcoin et prix de l'ETH", detect_search_intent("prix du bitcoin"))
+    assert ctx.terms == ["prix", "bitcoin", "eth"]
+    assert ctx.has_intent("finance")
+    assert not ctx.has_intent("weather")
+
+
+def test_bm25_prefers_title_and_rare_terms():
+    """Titre pondéré plus que le contenu; terme rare plus discriminant"""
+    ctx = QueryContext.build("bitcoin halving")
+    titles = ["bitcoin halving explained", "market update", "bitcoin news"]
+    contents = ["", "bitcoin halving mentioned in passing", "bitcoin bitcoin"]
+    scores = bm25_scores(ctx, titles, contents)
+    assert scores[0] > scores[1]
+    assert scores[0] > scores[2]
+    assert bm25_scores(ctx, [], []) == []
+
+
+def test_terms_counted_as_whole_tokens():
+    """Un terme ne compte pas à l'intérieur d'un autre mot ("art" dans "article")"""
+    ctx = QueryContext.build("art moderne")
+    titles = ["article de presse", "art moderne", "l'art, l'art_deco et art."]
+    scores = bm25_scores(ctx, titles, ["", "", ""])
+    assert scores[0] == 0.0
+    assert scores[1] > 0 and scores[2] > 0
+    assert ctx.pattern.findall(titles[2]) == ["art", "art"]
+
+
+def test_rank_category_blends_prior_and_intent():
+    """Tri par pertinence, score a priori conservé, bonus d'intention"""
+    ctx = QueryContext.build("recette tarte pommes", detect_search_intent("recette tarte pommes"))
+    results = [
+        _result("nutrition", "Salade niçoise", {"calories": 300}),
+        _result("nutrition", "Tarte aux pommes", {"servings": 6, "tags": ["recette", "dessert"]}),
+    ]
+    ranked = rank_category(ctx, "nutrition", results)
+    assert ranked[0].title == "Tarte aux pommes"
+    assert ranked[0].relevance_score == 1.0  # 0.5 * 1 + 0.5 * 0.8 + 0.1, plafonné
+    assert ranked[1].relevance_score == round(0.5 * 0.8 + 0.1, 4)
+
+
+def test_merge_top_k_across_categories():
+    """Fusion inter-catégories par tas"""
+    by_category = {
+        "news": [_result("news", "a", score=0.9), _result("news", "b", score=0.4)],
+        "media": [_result("media", "c", score=0.7)],
+    }
+    assert [r.title for r in merge_top_k(by_category, 2)] == ["a", "c"]
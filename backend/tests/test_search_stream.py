@@ -0,0 +1,119 @@
+"""
+Tests pour la recherche universelle en streaming (NDJSON / SSE)
+"""
+import asyncio
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.search as search
+from routers.search import SearchResult
+
+
+class FakeCache:
+    """Cache en mémoire (remplace Redis)"""
+
+    def __init__(self):
+        self.store = {}
+
+    def get(self, prefix, data):
+        return self.store.get((prefix, data))
+
+    def set(self, prefix, data, value, ttl=3600):
+        self.store[(prefix, data)] = json.loads(json.dumps(value))
+
+
+class FakeAIRouter:
+    def __init__(self):
+        self.calls = 0
+
+    async def route(self, prompt, system_prompt=None, preferred_provider=None):
+        self.calls += 1
+        return {"response": "Résumé", "source": "fake"}
+
+
+def _result(category, title, score):
+    return SearchResult(category=category, title=title, content={}, source="test", relevance_score=score)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    """App minimale: finance rapide, news lente, medical hors budget"""
+    async def fast_finance(query, max_results=5):
+        return [_result("finance", "low", 0.2), _result("finance", "high", 0.9)]
+
+    async def slow_news(query, language, max_results=5):
+        await asyncio.sleep(0.1)
+        return [_result("news", "article", 0.5)]
+
+    async def stuck_medical(query, max_results=5):
+        await asyncio.sleep(5)
+        return [_result("medical", "never", 1.0)]
+
+    cache = FakeCache()
+    monkeypatch.setattr(search, "search_finance", fast_finance)
+    monkeypatch.setattr(search, "search_news", slow_news)
+    monkeypatch.setattr(search, "search_medical", stuck_medical)
+    monkeypatch.setattr(search, "cache_service", cache)
+    ai = FakeAIRouter()
+    monkeypatch.setattr(search, "ai_router", ai)
+
+    app = FastAPI()
+    app.include_router(search.router)
+    with TestClient(app) as test_client:
+        test_client.cache = cache
+        test_client.ai = ai
+        yield test_client
+
+
+PAYLOAD = {
+    "query": "bitcoin",
+    "categories": ["finance", "news", "medical"],
+    "time_budgets": {"medical": 0.2},
+    "include_summary": True,
+}
+
+
+def test_ndjson_frames_in_completion_order(client):
+    """Catégories au fil de l'eau, résumé IA, puis done"""
+    response = client.post("/api/search/universal/stream", json=PAYLOAD)
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+
+    frames = [json.loads(line) for line in response.text.splitlines() if line]
+    assert [f["type"] for f in frames] == ["category", "category", "category", "summary", "done"]
+    assert [f["category"] for f in frames[:3]] == ["finance", "news", "medical"]
+    assert [r["title"] for r in frames[0]["results"]] == ["high", "low"]
+    assert frames[2]["status"] == "timeout" and frames[2]["results"] == []
+    assert frames[3]["ai_summary"] == "Résumé"
+
+    done = frames[-1]
+    assert done["total_results"] == 3
+    assert done["performance"]["incomplete_categories"] == {"medical": "timeout"}
+    assert done["performance"]["total_time_ms"] < 1000
+
+    # Réponse partielle (medical hors budget): jamais resservie par /universal
+    assert client.cache.store == {}
+
+
+def test_complete_stream_cached_and_summary_opt_in(client):
+    """Flux complet mis en cache pour /universal; pas d'appel LLM sans include_summary"""
+    payload = {"query": "bitcoin", "categories": ["finance", "news"]}
+    frames = [json.loads(line) for line in client.post("/api/search/universal/stream", json=payload).text.splitlines()]
+    assert frames[-2] == {"type": "summary", "ai_summary": None, "suggested_queries": []}
+
+    cached = client.post("/api/search/universal", json=payload).json()
+    assert cached["performance"]["cached"] is True and cached["total_results"] == 3
+    assert client.ai.calls == 0
+
+    summarized = client.post("/api/search/universal", json={**payload, "include_summary": True}).json()
+    assert summarized["ai_summary"] == "Résumé" and summarized["performance"]["cached"] is False
+
+
+def test_sse_format(client):
+    """Même flux encodé en Server-Sent Events"""
+    response = client.post("/api/search/universal/stream?format=sse", json=PAYLOAD)
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [block for block in response.text.split("\n\n") if block]
+    assert events[0].startswith("event: category\ndata: ")
+    assert events[-1].startswith("event: done\ndata: ")
@@ -0,0 +1,96 @@
+"""
+Tests pour le cache sémantique des réponses IA
+"""
+import time
+import pytest
+from services.semantic_cache import SemanticCache
+
+
+@pytest.fixture
+def cache():
+    """Cache activé, seuil par défaut"""
+    return SemanticCache(enabled=True, threshold=0.85, ttl=60, max_entries=3)
+
+
+def test_rephrased_question_hits(cache):
+    """Une reformulation retrouve la réponse"""
+    cache.set("cuisine", "Quelle est la recette de la tarte aux pommes ?", {"response": "..."}, scope="fr")
+
+    hit = cache.get("cuisine", "recette tarte pommes", scope="fr")
+    assert hit is not None
+    assert hit["value"] == {"response": "..."}
+    assert hit["similarity"] >= 0.85
+
+    # Autre sujet, autre scope ou autre expert: pas de hit
+    assert cache.get("cuisine", "recette du gâteau au chocolat", scope="fr") is None
+    assert cache.get("cuisine", "recette tarte pommes", scope="en") is None
+    assert cache.get("tech", "recette tarte pommes", scope="fr") is None
+
+
+def test_time_sensitive_namespaces_excluded(cache):
+    """finance/news/weather ne sont jamais servis par similarité"""
+    cache.set("finance", "prix du bitcoin ?", {"response": "42k"})
+    assert cache.get("finance", "quel est le prix du bitcoin") is None
+
+    disabled = SemanticCache(enabled=False)
+    disabled.set("chat", "hello world", {"response": "hi"})
+    assert disabled.get("chat", "hello world") is None
+
+
+def test_volatile_questions_bypass_any_namespace(cache):
+    """Prix, "aujourd'hui", météo, actualités: ni stockés ni servis, même hors finance"""
+    for question in ("prix du bitcoin ?", "Que faire aujourd'hui à Lyon", "météo à Nice", "dernières actualités tech"):
+        cache.set("chat", question, {"response": "périmé"})
+        assert cache.get("chat", question) is None
+    assert cache.get_stats()["entries"] == 0
+
+    cache.set("chat", "histoire du bitcoin", {"response": "..."})  # Actif coté: toujours volatile
+    assert cache.get("chat", "histoire bitcoin") is None
+
+
+def test_ttl_and_lru_eviction(cache):
+    """Expiration et éviction de l'entrée la moins récemment utilisée"""
+    cache.set("chat", "visiter louvre", {"response": "a"})
+    cache.set("chat", "visiter orsay", {"response": "b"})
+    cache.set("chat", "visiter versailles", {"response": "c"})
+    assert cache.get("chat", "visiter louvre")  # louvre devient récent
+    cache.set("chat", "visiter pompidou", {"response": "d"})  # évince orsay
+
+    assert cache.get("chat", "visiter orsay") is None
+    assert cache.get("chat", "visiter louvre") is not None
+
+    cache.set("chat", "horaires metro", {"response": "e"}, ttl=0)
+    time.sleep(0.01)
+    assert cache.get("chat", "horaires metro") is None
+
+
+def test_stats_report_hit_rate(cache):
+    """Taux de hit et appels LLM évités"""
+    cache.set("chat", "meilleurs films 2023", {"response": "..."})
+    cache.get("chat", "Quels sont les meilleurs films de 2023 ?")
+    cache.get("chat", "meilleures séries 2023")
+
+    stats = cache.get_stats()
+    assert stats["lookups"] == 2
+    assert stats["llm_calls_saved"] == 1
+    assert stats["hit_rate"] == 0.5
+    assert stats["namespaces"]["chat"]["stores"] == 1
+
+
+def test_numbers_and_negation_must_agree(cache):
+    """Nombre ou négation différents: pas de hit, même avec les mêmes mots"""
+    cache.set("chat", "Traitement du diabète de type 2 ?", {"response": "type 2"})
+    assert cache.get("chat", "Traitement du diabète de type 1 ?") is None
+    assert cache.get("chat", "traitement diabète type 2") is not None
+
+    cache.set("chat", "Je peux prendre de l'ibuprofène enceinte ?", {"response": "oui"})
+    assert cache.get("chat", "Je ne peux pas prendre de l'ibuprofène enceinte ?") is None
+
+    cache.set("tech", "python 3", {"response": "3"})
+    assert cache.get("tech", "python 2") is None
+
+
+def test_health_answers_never_shared(cache):
+    """Réponses médicales exclues du cache sémantique"""
+    cache.set("health", "symptômes de la grippe", {"response": "..."})
+    assert cache.get("health", "symptômes de la grippe") is None
@@ -0,0 +1,175 @@
+"""
+Tests pour le tracing par requête (spans, Server-Timing, export OTLP)
+"""
+import asyncio
+import json
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from services.tracing import (
+    TraceExporter, span, start_trace, server_timing_header, trace_to_otlp, traced, _current_trace,
+)
+from middleware.tracing import TracingMiddleware
+from middleware.request_id import RequestIDMiddleware
+
+
+@pytest.fixture
+def trace():
+    """Trace active, nettoyée après le test"""
+    t = start_trace("6f1c2b4e-8d0a-4a43-9b4b-2a1f0f7f9c11")
+    yield t
+    _current_trace.set(None)
+
+
+def test_span_is_noop_without_trace():
+    """Hors requête, un span ne fait rien"""
+    _current_trace.set(None)
+    with span("cache.get") as s:
+        s.set_attribute("cache.hit", True)
+
+
+@pytest.mark.asyncio
+async def test_nested_spans_and_concurrent_tasks(trace):
+    """Parenté conservée, y compris dans les tâches concurrentes"""
+    @traced("db.query")
+    def query():
+        return 42
+
+    async with span("context.fetch") as parent:
+        async def child(name):
+            with span(name):
+                await asyncio.sleep(0.01)
+        await asyncio.gather(child("http.GET"), child("http.POST"))
+        assert query() == 42
+
+    assert trace.trace_id == "6f1c2b4e8d0a4a439b4b2a1f0f7f9c11"
+    children = [s for s in trace.spans if s.parent_id == parent.span_id]
+    assert sorted(s.name for s in children) == ["db.query", "http.GET", "http.POST"]
+
+
+def test_error_status_exported_as_otlp(trace):
+    """Les exceptions marquent le span en erreur"""
+    with pytest.raises(ValueError):
+        with span("ai.attempt", provider="groq"):
+            raise ValueError("boom")
+
+    payload = trace_to_otlp(trace)
+    otlp_span = payload["resourceSpans"][0]["scopeSpans"][0]["spans"][0]
+    assert otlp_span["name"] == "ai.attempt"
+    assert otlp_span["status"]["code"] == 2
+    assert {"key": "provider", "value": {"stringValue": "groq"}} in otlp_span["attributes"]
+
+
+def test_server_timing_groups_phases(trace):
+    """Une phase par préfixe, sans double comptage des spans imbriqués"""
+    with span("ai.route"):
+        with span("ai.attempt"):
+            pass
+    with span("cache.get"):
+        pass
+
+    header = server_timing_header(trace, total_ms=12.5)
+    assert header.count("ai;") == 1
+    assert 'desc="1 spans"' in header
+    assert "cache;dur=" in header
+    assert header.endswith("total;dur=12.5")
+
+
+def test_middleware_adds_header_and_exports(tmp_path, monkeypatch):
+    """Header Server-Timing + export fichier OTLP/JSON"""
+    import middleware.tracing as tracing_middleware
+
+    monkeypatch.setenv("TRACING_ENABLED", "true")
+
+    exporter = TraceExporter(mode="file", file_path=str(tmp_path / "traces.jsonl"), batch_size=1)
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+    app.add_middleware(RequestIDMiddleware)
+
+    @app.get("/ping")
+    async def ping():
+        with span("cache.get"):
+            pass
+        return {"ok": True}
+
+    original = tracing_middleware.trace_exporter
+    tracing_middleware.trace_exporter = exporter
+    try:
+        with TestClient(app) as client:
+            response = client.get("/ping", headers={"X-Request-ID": "req-abc"})
+    finally:
+        tracing_middleware.trace_exporter = original
+
+    assert "cache;dur=" in response.headers["Server-Timing"]
+    lines = (tmp_path / "traces.jsonl").read_text().splitlines()
+    spans = json.loads(lines[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    assert {s["name"] for s in spans} == {"request", "cache.get"}
+    assert {"key": "request.id", "value": {"stringValue": "req-abc"}} in spans[0]["attributes"]
+
+
+def _traced_app(monkeypatch, exporter):
+    import middleware.tracing as tracing_middleware
+
+    monkeypatch.setattr(tracing_middleware, "trace_exporter", exporter)
+    app = FastAPI()
+    app.add_middleware(TracingMiddleware)
+    app.add_middleware(RequestIDMiddleware)
+    return app
+
+
+def test_tracing_is_opt_in(tmp_path, monkeypatch):
+    """Sans TRACING_ENABLED, ni Server-Timing ni export"""
+    monkeypatch.delenv("TRACING_ENABLED", raising=False)
+    exporter = TraceExporter(mode="file", file_path=str(tmp_path / "traces.jsonl"), batch_size=1)
+    app = _traced_app(monkeypatch, exporter)
+
+    @app.get("/ping")
+    async def ping():
+        return {"ok": True}
+
+    with TestClient(app) as client:
+        response = client.get("/ping")
+    assert "Server-Timing" not in response.headers
+    assert not (tmp_path / "traces.jsonl").exists()
+
+
+def test_streaming_root_span_covers_body(tmp_path, monkeypatch):
+    """Réponse en streaming: la racine se ferme après le dernier chunk"""
+    from fastapi.responses import StreamingResponse
+
+    monkeypatch.setenv("TRACING_ENABLED", "true")
+    exporter = TraceExporter(mode="file", file_path=str(tmp_path / "traces.jsonl"), batch_size=1)
+    app = _traced_app(monkeypatch, exporter)
+
+    @app.get("/stream")
+    async def stream():
+        async def body():
+            for i in range(3):
+                await asyncio.sleep(0.02)
+                yield f"chunk {i}\n"
+        return StreamingResponse(body(), media_type="text/plain")
+
+    with TestClient(app) as client:
+        response = client.get("/stream")
+    assert response.text.count("chunk") == 3
+
+    spans = json.loads((tmp_path / "traces.jsonl").read_text().splitlines()[0])["resourceSpans"][0]["scopeSpans"][0]["spans"]
+    root = next(s for s in spans if s["name"] == "request")
+    assert int(root["endTimeUnixNano"]) - int(root["startTimeUnixNano"]) >= 60_000_000
+
+
+async def test_otlp_flush_task_runs_outside_request_trace(trace, monkeypatch):
+    """La tâche d'export ne voit pas la trace de la requête (ses spans n'y sont pas ajoutés)"""
+    exporter = TraceExporter(mode="file", file_path="unused", batch_size=1)
+    seen = []
+
+    async def fake_flush(batch):
+        seen.append(_current_trace.get())
+
+    monkeypatch.setattr(exporter, "_flush", fake_flush)
+    with span("cache.get"):
+        pass
+    exporter.export(trace)
+    await asyncio.sleep(0)
+    assert seen == [None]
@@ -0,0 +1,113 @@
+"""
+Tests pour le routeur de traduction (quotas partagés, mémoire, lots)
+"""
+import pytest
+
+from services.external_apis.translation import TranslationRouter
+from services.external_apis.translation.ledger import QuotaLedger, TranslationMemory
+
+
+class NoRedis:
+    available = False
+
+
+class FakeProvider:
+    """Provider factice: traduction = texte en majuscules"""
+
+    def __init__(self, max_batch_segments=None, max_batch_chars=None, fail=False):
+        if max_batch_segments:
+            self.max_batch_segments = max_batch_segments
+            self.max_batch_chars = max_batch_chars
+            self.translate_batch = self._translate_batch
+        self.fail = fail
+        self.calls = []
+
+    async def translate(self, text, source_lang, target_lang):
+        if self.fail:
+            raise RuntimeError("down")
+        self.calls.append([text])
+        return {"translation": text.upper(), "source_lang": "fr"}
+
+    async def _translate_batch(self, texts, source_lang, target_lang):
+        self.calls.append(list(texts))
+        return [{"translation": t.upper(), "source_lang": "fr"} for t in texts]
+
+
+@pytest.fixture
+def make_router():
+    def make(*providers):
+        router = TranslationRouter()
+        router.providers = [
+            {"name": name, "instance": instance, "quota": quota, "available": True}
+            for name, instance, quota in providers
+        ]
+        router.ledger = QuotaLedger(cache=NoRedis())
+        router.memory = TranslationMemory(cache=NoRedis())
+        return router
+    return make
+
+
+async def test_memory_hit_and_quota_fallback(make_router):
+    """Texte déjà traduit: aucun appel; quota mensuel épuisé: provider suivant"""
+    google, libre = FakeProvider(), FakeProvider()
+    router = make_router(("google", google, 20), ("libre", libre, float("inf")))
+
+    first = await router.translate("Bonjour  le monde", "fr", "en")
+    again = await router.translate("Bonjour le monde ", "fr", "en")
+    assert first["provider"] == "google" and first["chars_used"] == 17
+    assert again == {**again, "translation": "BONJOUR  LE MONDE", "provider": "memory", "cached": True}
+    assert len(google.calls) == 1
+
+    other = await router.translate("Salut", "fr", "en")  # 17 + 5 > 20
+    assert other["provider"] == "libre"
+    assert router.get_status()["details"][0]["used"] == 17
+
+
+async def test_failed_call_refunds_quota(make_router):
+    """Échec du provider: la réservation est rendue au ledger"""
+    router = make_router(("deepl", FakeProvider(fail=True), 100), ("libre", FakeProvider(), float("inf")))
+    assert (await router.translate("Merci", "fr", "en"))["provider"] == "libre"
+    assert router.ledger.usage("deepl") == 0
+
+
+async def test_batch_dedupes_and_respects_provider_limits(make_router):
+    """Doublons et blancs non envoyés; lots bornés en segments et en caractères"""
+    google = FakeProvider(max_batch_segments=2, max_batch_chars=10)
+    router = make_router(("google", google, 1000))
+    await router.translate("oui", "fr", "en")
+
+    segments = ["oui", "non", "", "peut-être", "non", "abc", "d"]
+    result = await router.translate_batch(segments, "fr", "en")
+
+    assert result["translations"] == ["OUI", "NON", "", "PEUT-ÊTRE", "NON", "ABC", "D"]
+    assert google.calls[1:] == [["non"], ["peut-être"], ["abc", "d"]]
+    assert result["stats"] == {"segments": 7, "unique": 5, "cached": 1, "translated": 4, "chars_used": 16}
+    assert result["providers"] == {"google": 4}
+
+
+async def test_memory_key_and_google_batch_in_body(monkeypatch):
+    """Source absente = "auto"; segments Google envoyés dans le corps JSON, pas dans l'URL"""
+    assert TranslationMemory.key("Bonjour", None, "EN") == TranslationMemory.key("Bonjour ", "auto", "en")
+
+    from services.external_apis.translation import google
+    sent = {}
+
+    class Response:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"data": {"translations": [{"translatedText": t.upper()} for t in sent["json"]["q"]]}}
+
+    async def post(url, **kwargs):
+        sent.update(kwargs)
+        return Response()
+
+    monkeypatch.setenv("GOOGLE_TRANSLATE_API_KEY", "k")
+    monkeypatch.setattr(google.http_client, "post", post)
+    segments = ["x" * 5000] * 6
+    results = await google.GoogleTranslate().translate_batch(segments, None, "en")
+
+    assert sent["params"] == {"key": "k"}
+    assert sent["json"] == {"q": segments, "target": "en", "format": "text"}
+    assert [r["translation"] for r in results] == [s.upper() for s in segments]
@@ -0,0 +1,85 @@
+"""
+Tests pour les embeddings par lots et l'index vectoriel local
+"""
+import numpy as np
+import pytest
+
+import services.vector_store as vs
+from services.vector_store import VectorStore, decode_vector, encode_vector
+
+
+@pytest.fixture
+def upstream(monkeypatch):
+    """Provider factice: vecteur = fréquence des lettres a-h"""
+    calls = []
+
+    async def fake_fetch(texts, model, input_type):
+        calls.append(list(texts))
+        return [[text.count(c) + 0.1 for c in "abcdefgh"] for text in texts]
+
+    monkeypatch.setattr(vs, "fetch_embeddings", fake_fetch)
+    return calls
+
+
+async def test_batch_dedupes_against_cache(tmp_path, upstream):
+    """Doublons et textes en cache ne partent pas en amont; un appel pour les absents"""
+    store = VectorStore(str(tmp_path / "vectors.db"))
+    vectors, counts = await store.embed_batch(["abc", "bad", "abc"])
+    assert upstream == [["abc", "bad"]]
+    assert counts == {"unique": 2, "cached": 0, "computed": 2}
+    assert np.array_equal(vectors[0], vectors[2])
+
+    _, counts = await store.embed_batch(["bad", "cafe"])
+    assert upstream[-1] == ["cafe"]
+    assert counts == {"unique": 2, "cached": 1, "computed": 1}
+
+
+def test_binary_blobs_compact():
+    """float16 = 2 octets par dimension, float32 = 4"""
+    vector = [0.25, -1.5, 3.0]
+    assert len(encode_vector(vector, "float16")) == 6
+    assert decode_vector(encode_vector(vector, "float32"), "float32").tolist() == vector
+    assert decode_vector(encode_vector(vector, "float16"), "float16").tolist() == vector
+
+
+async def test_index_search_top_k_persistent(tmp_path, upstream):
+    """Top-k par cosinus, mise à jour et suppression persistées"""
+    path = str(tmp_path / "vectors.db")
+    store = VectorStore(path, dtype="float16")
+    docs = [{"id": str(i), "text": text} for i, text in enumerate(["aaaa", "bbbb", "cccc", "aab"])]
+    docs += [{"id": f"x{i}", "text": "hhhh" * (i + 1)} for i in range(20)]  # Croissance de la matrice
+    result = await store.index_documents("kb", docs)
+    assert result["total"] == 24
+
+    hits = await store.search("kb", "aaa", k=2)
+    assert [h["id"] for h in hits] == ["0", "3"]
+    assert hits[0]["score"] > hits[1]["score"]
+
+    assert store.delete_document("kb", "0") is True
+    await store.index_documents("kb", [{"id": "1", "text": "aaab", "metadata": {"lang": "fr"}}])
+
+    reopened = VectorStore(path, dtype="float16")
+    hits = await reopened.search("kb", "aaa", k=2)
+    assert [h["id"] for h in hits] == ["1", "3"]
+    assert hits[0]["metadata"] == {"lang": "fr"}
+    assert reopened.get_stats()["namespaces"]["kb/cohere"] == {"documents": 23, "dimensions": 8}
+    assert await reopened.search("empty", "aaa") == []
+
+
+async def test_expired_cache_rows_evicted(tmp_path, upstream, monkeypatch):
+    """Les embeddings expirés sont purgés à l'écriture, par lots bornés"""
+    monkeypatch.setattr(vs, "EVICT_INTERVAL_S", 0)
+    store = VectorStore(str(tmp_path / "vectors.db"))
+    await store.embed_batch(["abc", "bad"])
+    with store._db():
+        store._db().execute("UPDATE embedding_cache SET created_at = created_at - ?", (store.cache_ttl + 1,))
+
+    await store.embed_batch(["cafe"])
+    count = store._db().execute("SELECT COUNT(*) FROM embedding_cache").fetchone()[0]
+    assert count == 1
+
+    await store.embed_batch(["dead", "face"])
+    monkeypatch.setattr(vs, "EVICT_BATCH", 1)
+    with store._db():
+        store._db().execute("UPDATE embedding_cache SET created_at = 0")
+    assert store.evict_expired() == 3
@@ -1,8 +1,16 @@
 """
 Tests pour le service Vidéo IA
 """
+import asyncio
+import time
 import pytest
-from services.video.queue_manager import VideoQueue
+import json
+import services.video.queue_manager as queue_manager
+from concurrent.futures import ThreadPoolExecutor
+import services.video.tts_provider as tts_module
+from services.video.course_generator import CourseGenerator
+from services.video.tts_provider import AudioCache, TTSProvider, TTSQueueFull
+from services.video.queue_manager import VideoQueue, VideoProvider
 from services.video.storage_manager import VideoStorage
 import os
 import tempfile
@@ -21,12 +29,18 @@ def temp_storage():
         shutil.rmtree(temp_dir)
 
 
+@pytest.fixture
+def queue_db(tmp_path):
+    """Base de la file de jobs temporaire"""
+    return str(tmp_path / "video_jobs.db")
+
+
 class TestQueueManager:
     """Tests pour VideoQueue"""
     
-    def test_add_to_queue(self):
+    def test_add_to_queue(self, queue_db):
         """Test ajout à la queue"""
-        queue = VideoQueue()
+        queue = VideoQueue(queue_db)
         video_id = "test_video_123"
         queue.add_to_queue(
             video_id=video_id,
@@ -34,12 +48,12 @@ class TestQueueManager:
             provider="d-id"
         )
         
-        assert video_id in queue.queue
-        assert queue.queue[video_id]["status"] == "processing"
+        assert queue.get_status(video_id) is not None
+        assert queue.get_status(video_id)["status"] == "processing"
     
-    def test_get_status(self):
+    def test_get_status(self, queue_db):
         """Test obtention statut"""
-        queue = VideoQueue()
+        queue = VideoQueue(queue_db)
         video_id = "test_video_456"
         queue.add_to_queue(
             video_id=video_id,
@@ -51,9 +65,9 @@ class TestQueueManager:
         assert status["status"] == "processing"
         assert status["video_id"] == video_id
     
-    def test_update_status(self):
+    def test_update_status(self, queue_db):
         """Test mise à jour statut"""
-        queue = VideoQueue()
+        queue = VideoQueue(queue_db)
         video_id = "test_video_789"
         queue.add_to_queue(video_id, status="processing")
         
@@ -62,9 +76,9 @@ class TestQueueManager:
         assert status["status"] == "done"
         assert status["result_url"] == "http://example.com/video.mp4"
     
-    def test_get_queue_stats(self):
+    def test_get_queue_stats(self, queue_db):
         """Test statistiques queue"""
-        queue = VideoQueue()
+        queue = VideoQueue(queue_db)
         queue.add_to_queue("video1", status="processing")
         queue.add_to_queue("video2", status="done")
         
@@ -74,6 +88,288 @@ class TestQueueManager:
         assert "done" in stats["by_status"]
 
 
+class FakeRenderer:
+    """Provider factice: rendu terminé après `polls_until_done` interrogations"""
+
+    def __init__(self, polls_until_done=1):
+        self.polls_until_done = polls_until_done
+        self.submitted = []
+        self.polled = []
+        self.done = []
+
+    async def submit(self, params):
+        self.submitted.append(params)
+        return {"video_id": f"did_{len(self.submitted)}", "status_url": "https://d-id.test/talks"}
+
+    async def poll(self, video_id):
+        self.polled.append(video_id)
+        if self.polled.count(video_id) >= self.polls_until_done:
+            return {"status": "done", "result_url": f"https://cdn.test/{video_id}.mp4"}
+        return {"status": "started"}
+
+    def provider(self, max_concurrent=3):
+        return VideoProvider("d-id", self.submit, self.poll, max_concurrent, on_done=self.done.append)
+
+
+async def _run_tick(queue):
+    await queue.tick()
+    await asyncio.gather(*queue._tasks)
+
+
+class TestVideoJobScheduler:
+    """Tests pour le planificateur persistant (idempotence, plafonds, baux)"""
+
+    async def test_idempotent_submit_reuses_job(self, queue_db, monkeypatch):
+        """Même demande -> même job, en cours puis terminé"""
+        monkeypatch.setattr(queue_manager, "POLL_INTERVAL_S", 0)
+        renderer = FakeRenderer()
+        queue = VideoQueue(queue_db)
+        queue.register_provider(renderer.provider())
+
+        first = queue.submit("avatar", {"text": "Bonjour"})
+        assert first["status"] == "queued" and first["deduplicated"] is False
+        await _run_tick(queue)
+        await _run_tick(queue)
+
+        again = queue.submit("avatar", {"text": "Bonjour"})
+        assert again["deduplicated"] is True and again["job_id"] == first["job_id"]
+        assert again["status"] == "done" and again["result_url"] == "https://cdn.test/did_1.mp4"
+        assert len(renderer.submitted) == 1 and renderer.done[0]["video_id"] == "did_1"
+
+    async def test_provider_cap_and_batched_polling(self, queue_db, monkeypatch):
+        """Au plus max_concurrent rendus actifs; statuts interrogés en lot par tick"""
+        monkeypatch.setattr(queue_manager, "POLL_INTERVAL_S", 0)
+        renderer = FakeRenderer(polls_until_done=2)
+        queue = VideoQueue(queue_db)
+        queue.register_provider(renderer.provider(max_concurrent=2))
+        for i in range(3):
+            queue.submit("avatar", {"text": f"vidéo {i}"})
+
+        await _run_tick(queue)
+        assert len(renderer.submitted) == 2
+        await _run_tick(queue)  # Premier lot de statuts: encore en cours
+        assert sorted(renderer.polled) == ["did_1", "did_2"]
+        assert len(renderer.submitted) == 2
+        await _run_tick(queue)  # Deux rendus terminés -> place libérée
+        await _run_tick(queue)
+        assert len(renderer.submitted) == 3
+        assert queue.get_queue_stats()["by_status"] == {"done": 2, "processing": 1}
+
+    async def test_failed_submission_retried_with_backoff(self, queue_db, monkeypatch):
+        """Soumission en échec: remise en file après backoff, erreur définitive au-delà du maximum"""
+        monkeypatch.setattr(queue_manager, "SUBMIT_BACKOFF_S", 0)
+        monkeypatch.setattr(queue_manager, "MAX_SUBMIT_ATTEMPTS", 2)
+        renderer = FakeRenderer()
+        failures = []
+
+        async def flaky_submit(params):
+            if len(failures) < 1 or params["text"] == "toujours en échec":
+                failures.append(params["text"])
+                raise RuntimeError("503 upstream")
+            return await renderer.submit(params)
+
+        queue = VideoQueue(queue_db)
+        queue.register_provider(VideoProvider("d-id", flaky_submit, renderer.poll))
+        job = queue.submit("avatar", {"text": "reprise"})
+        doomed = queue.submit("avatar", {"text": "toujours en échec"})
+
+        await _run_tick(queue)
+        assert queue.get_job(job["job_id"])["status"] == "queued"
+        await _run_tick(queue)
+
+        retried = queue.get_job(job["job_id"])
+        assert retried["status"] == "processing" and retried["attempts"] == 2 and "error" not in retried
+        failed = queue.get_job(doomed["job_id"])
+        assert failed["status"] == "error" and failed["error"] == "503 upstream" and failed["attempts"] == 2
+
+    async def test_expired_lease_taken_over_by_other_worker(self, queue_db):
+        """Job réservé par un worker disparu: repris après expiration du bail, visible partout"""
+        crashed = VideoQueue(queue_db)
+        crashed.register_provider(FakeRenderer().provider())
+        job = crashed.submit("avatar", {"text": "reprise"})
+        crashed._claim_submissions(crashed.providers["d-id"])
+        crashed._conn.execute("UPDATE video_jobs SET lease_expires_at = ?", (time.time() - 1,))
+
+        renderer = FakeRenderer()
+        other = VideoQueue(queue_db)
+        other.register_provider(renderer.provider())
+        await _run_tick(other)
+
+        assert renderer.submitted == [{"text": "reprise"}]
+        status = VideoQueue(queue_db).get_status("did_1")
+        assert status["job_id"] == job["job_id"] and status["status"] == "processing"
+        assert status["attempts"] == 2
+
+
+class FakeCourseAI:
+    """ai_router factice: plan de cours de 3 sections, puis quiz"""
+
+    async def route(self, prompt, **kwargs):
+        if "quiz" in prompt:
+            return {"response": json.dumps({"questions": [{"question": "Q?", "options": ["a", "b"], "correct": 0}]})}
+        sections = [{"number": i, "title": f"S{i}", "content": f"contenu {i}"} for i in (1, 2, 3)]
+        return {"response": json.dumps({"title": "Cours", "sections": sections})}
+
+
+class TestCourseGenerator:
+    """Tests pour le pipeline de génération de cours"""
+
+    @pytest.fixture
+    async def scheduler(self, queue_db, monkeypatch):
+        monkeypatch.setattr(queue_manager, "POLL_INTERVAL_S", 0)
+        monkeypatch.setattr(queue_manager, "TICK_S", 0.01)
+        monkeypatch.setattr(queue_manager, "WAIT_INTERVAL_S", 0.01)
+        monkeypatch.setattr(queue_manager, "SUBMIT_BACKOFF_S", 0)
+        queue = VideoQueue(queue_db)
+        yield queue
+        await queue.stop()
+
+    async def test_sections_concurrent_quiz_overlaps_retry(self, scheduler):
+        """Sections rendues ensemble, quiz émis avant la fin des rendus, échec de soumission relancé par la file"""
+        renderer = FakeRenderer(polls_until_done=3)
+        failures = []
+
+        async def flaky_submit(params):
+            if "Section 2" in params["text"] and not failures:
+                failures.append(params)
+                raise RuntimeError("provider down")
+            return await renderer.submit(params)
+
+        scheduler.register_provider(VideoProvider("d-id", flaky_submit, renderer.poll, 3))
+        generator = CourseGenerator(queue=scheduler)
+        generator.ai_router = FakeCourseAI()
+
+        events = [e async for e in generator.stream_course("Python", duration_minutes=1)]
+        types = [e["type"] for e in events]
+        assert types[0] == "content" and types[-1] == "completed"
+        assert types.index("quiz") == 1  # Quiz pendant le rendu des vidéos
+        assert sorted(e["number"] for e in events if e["type"] == "section") == [1, 2, 3]
+
+        course = generator.get_course(events[0]["course_id"])
+        assert course["status"] == "completed"
+        assert course["progress"] == {"total": 3, "done": 3, "failed": 0, "rendering": 0}
+        assert [s["attempts"] for s in course["sections"]] == [1, 1, 1]
+        assert scheduler.get_job(course["sections"][1]["video"]["job_id"])["attempts"] == 2
+        assert len(failures) == 1 and len(renderer.submitted) == 3
+
+    async def test_partial_course_and_manual_retry(self, scheduler, monkeypatch):
+        """Section en échec après ses retries: cours partiel, relance manuelle"""
+        import services.video.course_generator as course_module
+        monkeypatch.setattr(course_module, "SECTION_RETRIES", 0)
+        renderer = FakeRenderer()
+        broken = {"on": True}
+
+        async def submit(params):
+            if "Section 3" in params["text"] and broken["on"]:
+                raise RuntimeError("quota exceeded")
+            return await renderer.submit(params)
+
+        scheduler.register_provider(VideoProvider("d-id", submit, renderer.poll, 3))
+        generator = CourseGenerator(queue=scheduler)
+        generator.ai_router = FakeCourseAI()
+
+        result = await generator.generate_course("Python", duration_minutes=1, include_quiz=False)
+        assert result["status"] == "partial" and result["quiz"] is None
+        assert "quota exceeded" in result["sections"][2]["error"]
+        assert result["sections"][0]["video"]["result_url"].startswith("https://cdn.test/")
+
+        broken["on"] = False
+        section = await generator.retry_section(result["course_id"], 3)
+        assert section["status"] == "done"
+        assert generator.get_course(result["course_id"])["status"] == "completed"
+        assert await generator.retry_section(result["course_id"], 9) is None
+
+
+class TestTTSProvider:
+    """Tests pour la synthèse hors boucle et le cache audio"""
+
+    @pytest.fixture
+    def synth(self, monkeypatch):
+        """Synthèse factice (lente) dans un pool de threads"""
+        calls = []
+
+        def fake_synthesize(text, language, voice, output_base):
+            calls.append(text)
+            time.sleep(0.05)
+            path = f"{output_base}.ogg"
+            with open(path, "wb") as f:
+                f.write(b"x" * 400)
+            return path
+
+        monkeypatch.setattr(tts_module, "_synthesize", fake_synthesize)
+        return calls
+
+    def _provider(self, tmp_path, max_bytes=10_000, max_pending=16):
+        provider = TTSProvider(
+            cache=AudioCache(str(tmp_path / "tts"), max_bytes=max_bytes),
+            executor=ThreadPoolExecutor(2),
+            max_pending=max_pending
+        )
+        provider.coqui_available = True
+        return provider
+
+    async def test_identical_narration_synthesized_once(self, tmp_path, synth):
+        """Demandes identiques simultanées puis ultérieures: une seule synthèse"""
+        provider = self._provider(tmp_path)
+        results = await asyncio.gather(*[provider.generate_speech("Bonjour  à tous", "fr-FR") for _ in range(5)])
+        again = await provider.generate_speech("Bonjour à tous", "fr")
+
+        assert synth == ["Bonjour  à tous"]
+        assert len({r["audio_path"] for r in results + [again]}) == 1
+        assert again["cached"] is True and again["format"] == "ogg"
+        assert provider.stats == {"hits": 1, "coalesced": 4, "synthesized": 1, "rejected": 0}
+
+        await provider.generate_speech("Bonjour à tous", "fr", voice="other")
+        assert len(synth) == 2  # Autre voix -> autre clé
+
+    async def test_backpressure_rejects_when_queue_full(self, tmp_path, synth):
+        """Au-delà de max_pending synthèses distinctes: refus immédiat"""
+        provider = self._provider(tmp_path, max_pending=2)
+        results = await asyncio.gather(
+            *[provider.generate_speech(f"texte {i}") for i in range(3)], return_exceptions=True
+        )
+        assert sum(isinstance(r, TTSQueueFull) for r in results) == 1
+        assert provider.get_queue_stats()["pending"] == 0
+
+    async def test_lru_eviction(self, tmp_path, synth):
+        """Cache plein: les fichiers les moins récemment utilisés sont supprimés"""
+        provider = self._provider(tmp_path, max_bytes=1000)
+        first = await provider.generate_speech("un")
+        old = time.time() - 100
+        os.utime(first["audio_path"], (old, old))
+        await provider.generate_speech("deux")
+        second = await provider.generate_speech("deux")  # Accès -> récent
+        await provider.generate_speech("trois")
+
+        assert not os.path.exists(first["audio_path"])
+        assert os.path.exists(second["audio_path"])
+        assert provider.cache.total_bytes == 800
+
+    def test_synthesis_written_to_temp_then_replaced(self, tmp_path, monkeypatch):
+        """Le fichier final n'apparaît qu'une fois compressé; aucun temporaire ne reste"""
+        final = tmp_path / "key.ogg"
+        seen = []
+
+        class FakeTTS:
+            def tts_to_file(self, text, file_path, language):
+                seen.append((file_path, final.exists()))
+                with open(file_path, "wb") as f:
+                    f.write(b"w" * 100)
+
+        def fake_compress(wav_path, output_base):
+            with open(f"{output_base}.ogg", "wb") as f:
+                f.write(b"o" * 10)
+            os.remove(wav_path)
+            return f"{output_base}.ogg"
+
+        monkeypatch.setattr(tts_module, "_worker_tts", FakeTTS(), raising=False)
+        monkeypatch.setattr(tts_module, "_compress", fake_compress)
+
+        assert tts_module._synthesize("Bonjour", "fr", None, str(tmp_path / "key")) == str(final)
+        assert seen == [(seen[0][0], False)] and ".tmp." in seen[0][0]
+        assert [p.name for p in tmp_path.iterdir()] == ["key.ogg"]
+
+
 class TestStorageManager:
     """Tests pour VideoStorage"""
     
@@ -115,3 +411,37 @@ class TestStorageManager:
         assert "total_size_mb" in stats
         assert isinstance(stats["total_videos"], int)
         assert stats["total_videos"] >= 2
+
+    def test_cleanup_only_expired_in_batches(self, temp_storage):
+        """Nettoyage par lots via l'index d'expiration; stats incrémentales"""
+        video_file = temp_storage.base_path / "old0" / "video.mp4"
+        for i in range(5):
+            temp_storage.save_video_info(f"old{i}", provider="d-id")
+        video_file.write_bytes(b"x" * 2048)
+        temp_storage.save_video_info("old0", provider="d-id", local_path=str(video_file))
+        temp_storage.save_video_info("fresh", provider="d-id")
+        temp_storage._conn.execute("UPDATE videos SET expires_at = 0 WHERE video_id LIKE 'old%'")
+        temp_storage._conn.commit()
+        assert temp_storage._conn.execute("SELECT total_bytes FROM storage_stats").fetchone()[0] == 2048
+
+        assert temp_storage.cleanup_expired(limit=3) == 3
+        assert temp_storage.cleanup_expired(limit=3) == 2
+        assert temp_storage.cleanup_expired() == 0
+        assert not (temp_storage.base_path / "old0").exists()
+        assert temp_storage.get_video_info("fresh") is not None
+        assert temp_storage.get_storage_stats()["total_videos"] == 1
+        assert temp_storage._conn.execute("SELECT total_bytes FROM storage_stats").fetchone()[0] == 0
+
+    def test_legacy_info_files_imported(self, tmp_path):
+        """Les info.json existants sont repris dans le manifeste au premier démarrage"""
+        legacy = tmp_path / "videos" / "legacy1"
+        legacy.mkdir(parents=True)
+        (legacy / "info.json").write_text(json.dumps({
+            "video_id": "legacy1", "provider": "d-id", "video_url": "http://x/v.mp4",
+            "created_at": "2024-01-01T10:00:00", "expires_at": "2024-01-02T10:00:00"
+        }))
+
+        storage = VideoStorage(base_path=str(tmp_path / "videos"))
+        assert storage.get_video_info("legacy1")["video_url"] == "http://x/v.mp4"
+        assert storage.cleanup_expired() == 1
+        assert not legacy.exists()
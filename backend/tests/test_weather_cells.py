@@ -0,0 +1,96 @@
+"""
+Tests pour le cache météo par cellule geohash (snapping, SWR, appels partagés, batch)
+"""
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+import routers.weather as weather
+from services.external_apis.weather import WeatherRouter
+from services.external_apis.weather.cells import CellCache, CellPolicy, geohash_bounds, geohash_encode, snap
+
+PARIS_A = (48.8566, 2.3522)    # Hôtel de Ville
+PARIS_B = (48.8584, 2.3470)    # ~450 m plus loin
+LYON = (45.7640, 4.8357)
+
+
+def _router(policies=None, fail_lat=None):
+    """Routeur dont l'appel amont est compté (et échoue pour une latitude donnée)"""
+    router = WeatherRouter(cells=CellCache(policies))
+    router.calls = []
+
+    async def fetch(latitude, longitude):
+        router.calls.append((latitude, longitude))
+        await asyncio.sleep(0.01)
+        if fail_lat is not None and abs(latitude - fail_lat) < 0.1:
+            raise Exception("All weather providers failed")
+        return {"temperature": 10 + len(router.calls), "provider": "fake"}
+
+    router._fetch_current_weather = fetch
+    return router
+
+
+def test_geohash_snapping():
+    """Geohash de référence; centre de cellule partagé par deux points proches"""
+    assert geohash_encode(57.64911, 10.40744, 11) == "u4pruydqqvj"
+    lat_min, lat_max, lon_min, lon_max = geohash_bounds("u4pruydqqvj")
+    assert lat_min <= 57.64911 <= lat_max and lon_min <= 10.40744 <= lon_max
+
+    assert snap(*PARIS_A, 5) == snap(*PARIS_B, 5)
+    assert snap(*PARIS_A, 5)[0] == snap(*PARIS_A, 6)[0][:5]
+    assert snap(*PARIS_A, 5) != snap(*LYON, 5)
+
+
+async def test_nearby_requests_share_one_upstream_call():
+    """Requêtes simultanées d'une cellule: un seul appel amont, au centre de la cellule"""
+    router = _router()
+    first, second = await asyncio.gather(router.get_current_weather(*PARIS_A), router.get_current_weather(*PARIS_B))
+    third = await router.get_current_weather(*PARIS_A)
+
+    geohash, lat, lon = snap(*PARIS_A, 5)
+    assert router.calls == [(lat, lon)]
+    assert (first["cache"], second["cache"], third["cache"]) == ("miss", "coalesced", "hit")
+    assert first["temperature"] == second["temperature"] == third["temperature"] == 11
+    assert first["geohash"] == geohash
+
+    third["temperature"] = None
+    assert (await router.get_current_weather(*PARIS_B))["temperature"] == 11
+
+
+async def test_stale_entry_served_then_refreshed():
+    """Entrée périmée servie immédiatement, rafraîchie en tâche de fond"""
+    router = _router({"current": CellPolicy(precision=5, fresh_s=0, stale_s=60)})
+    assert (await router.get_current_weather(*PARIS_A))["temperature"] == 11
+
+    stale = await router.get_current_weather(*PARIS_A)
+    assert (stale["cache"], stale["temperature"]) == ("stale", 11)
+    await asyncio.sleep(0.05)
+
+    assert len(router.calls) == 2
+    assert (await router.get_current_weather(*PARIS_A))["temperature"] == 12
+    assert router.cells.get_stats()["refreshes"] == 2
+
+
+def test_batch_endpoint_groups_points_by_cell(monkeypatch):
+    """Batch: une requête amont par cellule, ordre conservé, échec limité à sa cellule"""
+    router = _router(fail_lat=LYON[0])
+    monkeypatch.setattr(weather, "weather_router", router)
+    app = FastAPI()
+    app.include_router(weather.router)
+    client = TestClient(app)
+
+    points = [PARIS_A, LYON, PARIS_B]
+    response = client.post("/api/weather/batch", json={"points": [{"lat": a, "lon": o} for a, o in points]})
+    assert response.status_code == 200
+    body = response.json()
+
+    assert body["stats"] == {"points": 3, "cells": 2, "failed_cells": 1}
+    assert len(router.calls) == 2
+    results = body["results"]
+    assert [(r["lat"], r["lon"]) for r in results] == [tuple(p) for p in points]
+    assert [r["success"] for r in results] == [True, False, True]
+    assert results[0]["geohash"] == results[2]["geohash"] != results[1]["geohash"]
+
+    assert client.post("/api/weather/batch", json={"points": [{"lat": 95, "lon": 0}]}).status_code == 422
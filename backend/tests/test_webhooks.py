@@ -0,0 +1,182 @@
+"""
+Tests pour la file durable de livraison des webhooks
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+
+import pytest
+
+import services.webhooks as webhooks
+from services.webhooks import WebhookConfig, WebhookEvent, WebhookManager
+
+
+class FakeResponse:
+    def __init__(self, status_code):
+        self.status_code = status_code
+
+
+class FakeHTTP:
+    """Endpoint factice: codes de statut programmés, concurrence observée"""
+
+    def __init__(self, statuses=(), delay=0.0):
+        self.statuses = list(statuses)
+        self.delay = delay
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def post(self, url, content=None, headers=None, timeout=None):
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            self.calls.append((url, json.loads(content), headers))
+            return FakeResponse(self.statuses.pop(0) if self.statuses else 200)
+        finally:
+            self.active -= 1
+
+
+@pytest.fixture
+def http(monkeypatch):
+    fake = FakeHTTP()
+    monkeypatch.setattr(webhooks, "http_client", fake)
+    monkeypatch.setattr(webhooks, "backoff_delay", lambda attempts: 0.0)
+    monkeypatch.setattr(webhooks, "BATCH_WINDOW_S", 0.05)
+    return fake
+
+
+@pytest.fixture
+async def manager(tmp_path):
+    manager = WebhookManager(db_path=str(tmp_path / "webhooks.db"), workers=3)
+    manager.register_webhook(WebhookConfig(
+        id="hook", url="https://example.test/hook", secret="s3cret",
+        events=[WebhookEvent.API_ERROR, WebhookEvent.REQUEST_COMPLETED], max_concurrency=1
+    ))
+    yield manager
+    await manager.stop()
+
+
+async def _drain(manager, timeout=3.0):
+    """Attendre que la file ne contienne plus de livraisons en attente"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while asyncio.get_running_loop().time() < deadline:
+        counts = manager.queue.counts()
+        if not counts.get("pending") and not counts.get("in_flight"):
+            return counts
+        await asyncio.sleep(0.02)
+    raise AssertionError(f"Queue not drained: {manager.queue.counts()}")
+
+
+async def _drain_pending(manager, timeout=3.0):
+    """Attendre qu'aucune livraison ne soit en attente (réservations d'autres processus ignorées)"""
+    deadline = asyncio.get_running_loop().time() + timeout
+    while manager.queue.counts().get("pending"):
+        assert asyncio.get_running_loop().time() < deadline, manager.queue.counts()
+        await asyncio.sleep(0.02)
+    await asyncio.sleep(0.05)
+
+async def test_trigger_enqueues_and_retries_in_background(manager, http):
+    """trigger n'envoie rien lui-même; échec -> retry planifié, payload signé"""
+    http.statuses = [500, 200]
+    http.delay = 0.2
+    ids = await asyncio.wait_for(manager.trigger(WebhookEvent.API_ERROR, {"api": "weather"}), 0.1)
+    assert len(ids) == 1 and http.calls == []
+
+    assert await _drain(manager) == {}
+    assert len(http.calls) == 2
+    _, payload, headers = http.calls[-1]
+    assert payload["event"] == "api.error" and payload["data"] == {"api": "weather"}
+    expected = hmac.new(b"s3cret", json.dumps(payload).encode(), hashlib.sha256).hexdigest()
+    assert headers["X-Webhook-Signature"] == f"sha256={expected}"
+    assert manager.get_delivery_history("hook")[-1]["success"] is True
+
+
+async def test_dead_letter_after_retry_count(manager, http):
+    """Après retry_count échecs, la livraison reste en échec définitif"""
+    http.statuses = [503, 503, 503]
+    await manager.trigger(WebhookEvent.API_ERROR, {"api": "news"})
+    assert await _drain(manager) == {"failed": 1}
+    assert len(http.calls) == 3
+
+
+async def test_batched_events_single_payload_per_endpoint_limit(manager, http):
+    """request.completed regroupés en un payload; une livraison à la fois par endpoint"""
+    http.delay = 0.05
+    for i in range(5):
+        await manager.trigger(WebhookEvent.REQUEST_COMPLETED, {"request": i})
+    for i in range(3):
+        await manager.trigger(WebhookEvent.API_ERROR, {"error": i})
+    await _drain(manager)
+
+    batches = [payload for _, payload, _ in http.calls if payload["event"] == "request.completed"]
+    assert len(batches) == 1 and batches[0]["batch"] is True
+    assert [item["data"]["request"] for item in batches[0]["data"]] == list(range(5))
+    assert http.max_active == 1
+
+
+async def test_pending_deliveries_survive_restart(tmp_path, http):
+    """Livraisons en attente ou interrompues reprises par une nouvelle instance"""
+    path = str(tmp_path / "webhooks.db")
+    first = WebhookManager(db_path=path)
+    first.queue.enqueue("webhook_x", "api.error", {"n": 1})
+    first.queue.enqueue("webhook_x", "api.error", {"n": 2})
+    first.queue.claim(set(), set(), lease_s=0)  # Interrompue pendant l'envoi, bail expiré
+
+    restarted = WebhookManager(db_path=path, workers=2)
+    restarted.register_webhook(WebhookConfig(
+        id="webhook_x", url="https://example.test/x", secret="", events=[WebhookEvent.API_ERROR]
+    ))
+    restarted.start()
+    try:
+        await _drain(restarted)
+    finally:
+        await restarted.stop()
+    assert sorted(payload["data"]["n"] for _, payload, _ in http.calls) == [1, 2]
+
+
+async def test_batch_window_anchored_on_oldest_event(manager, http, monkeypatch):
+    """Événements espacés dans la fenêtre: un seul lot, parti à l'échéance du premier"""
+    monkeypatch.setattr(webhooks, "BATCH_WINDOW_S", 0.3)
+    start = asyncio.get_running_loop().time()
+    for i in range(3):
+        await manager.trigger(WebhookEvent.REQUEST_COMPLETED, {"request": i})
+        await asyncio.sleep(0.1)
+    await _drain(manager)
+
+    assert len(http.calls) == 1
+    assert [item["data"]["request"] for item in http.calls[0][1]["data"]] == [0, 1, 2]
+    assert asyncio.get_running_loop().time() - start < 0.6
+
+
+async def test_live_lease_not_recovered_and_worker_survives_errors(tmp_path, http, monkeypatch):
+    """Bail en cours d'un autre processus laissé intact; erreur de base sans tuer le worker"""
+    path = str(tmp_path / "webhooks.db")
+    other = WebhookManager(db_path=path)
+    other.queue.enqueue("webhook_x", "api.error", {"n": 1})
+    other.queue.claim(set(), set())  # Autre processus en train d'envoyer
+
+    manager = WebhookManager(db_path=path, workers=1)
+    manager.register_webhook(WebhookConfig(
+        id="webhook_x", url="https://example.test/x", secret="", events=[WebhookEvent.API_ERROR]
+    ))
+    assert manager.queue.recover() == 0
+
+    failures = iter([webhooks.sqlite3.OperationalError("database is locked")])
+    real_claim = manager.queue.claim
+
+    def flaky_claim(*args, **kwargs):
+        for error in failures:
+            raise error
+        return real_claim(*args, **kwargs)
+
+    monkeypatch.setattr(manager.queue, "claim", flaky_claim)
+    monkeypatch.setattr(webhooks, "ERROR_BACKOFF_MAX_S", 0.05)
+    await manager.trigger(WebhookEvent.API_ERROR, {"n": 2})
+    try:
+        await _drain_pending(manager)
+    finally:
+        await manager.stop()
+    assert [payload["data"]["n"] for _, payload, _ in http.calls] == [2]
+    assert manager.queue.counts() == {"in_flight": 1}